@@ -0,0 +1,98 @@
+"""
+Compares the batch query APIs with calling the handlers one query at a time.
+
+It generates a synthetic knowledge base and catalogues (see `synthetic_corpora.py`)
+plus a synthetic question log, then times, for each handler:
+- one call per query (`get_answer_from_kb`, `get_doc_link`, `get_algokit_help`),
+  on a sample of the log and extrapolated
+- a single batch call (`get_answers_batch`, `get_doc_links_batch`, `get_algokit_help_batch`)
+and checks that both return the same results.
+
+Usage (from the project root):
+    python -m benchmarks.bench_batch --queries 50000 --size 10000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+# Make the project root importable when the script is run directly.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import qa_handler, doc_linker, algokit_handler
+from benchmarks import synthetic_corpora
+from benchmarks.bench_handlers import quiet, loader_default_path
+
+def generate_query_log(count: int, seed: int = 42) -> List[str]:
+    """
+    Builds a synthetic question log: the representative queries plus random
+    keyword combinations, so both repeated and unique questions are present.
+    """
+    rng = random.Random(seed)
+    templates = (synthetic_corpora.QA_QUERIES + synthetic_corpora.DOC_QUERIES
+                 + synthetic_corpora.ALGOKIT_QUERIES)
+    vocabulary = synthetic_corpora.DOMAIN_TERMS + synthetic_corpora.FILLER_WORDS
+    queries = []
+    for _ in range(count):
+        if rng.random() < 0.3:
+            queries.append(rng.choice(templates))
+        else:
+            words = [rng.choice(vocabulary) for _ in range(rng.randint(2, 8))]
+            queries.append(rng.choice(["", "what is ", "how do I ", "docs for "]) + " ".join(words) + "?")
+    return queries
+
+def compare_handler(name: str, single: Callable[[str], Optional[str]],
+                    batch: Callable[[List[str]], List[Optional[str]]],
+                    queries: List[str], sample_size: int) -> None:
+    """
+    Times the batch path of one handler on all queries and the one-at-a-time path
+    on the first `sample_size` queries (extrapolated to the whole log, since it can
+    take minutes), and checks that both agree on the sample.
+    """
+    sample = queries[:sample_size]
+    with quiet():
+        start = time.perf_counter()
+        expected = [single(query) for query in sample]
+        single_seconds = (time.perf_counter() - start) * len(queries) / max(len(sample), 1)
+        start = time.perf_counter()
+        results = batch(queries)
+        batch_seconds = time.perf_counter() - start
+    status = "ok" if results[:len(sample)] == expected else "MISMATCH"
+    speedup = single_seconds / batch_seconds if batch_seconds else float('inf')
+    print(f"  {name:<10} single ~{single_seconds:8.2f} s | batch {batch_seconds:8.2f} s | "
+          f"x{speedup:.1f} | {status}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare batch and single-query handler APIs.")
+    parser.add_argument('--queries', type=int, default=50000, help="Number of queries in the synthetic log.")
+    parser.add_argument('--size', type=int, default=10000, help="Corpus size (lines/entries).")
+    parser.add_argument('--seed', type=int, default=42, help="Seed for the synthetic query log.")
+    parser.add_argument('--single-sample', type=int, default=2000,
+                        help="Queries timed one at a time (the total is extrapolated).")
+    args = parser.parse_args(argv)
+
+    queries = generate_query_log(args.queries, args.seed)
+    with tempfile.TemporaryDirectory() as workdir:
+        paths = synthetic_corpora.write_corpora(workdir, args.size)
+        with quiet():
+            qa_handler._knowledge_base_lines = None
+            qa_handler.load_knowledge_base(paths["kb"])
+            algokit_handler._algokit_commands_data = None
+            algokit_handler.load_algokit_commands(paths["algokit_commands"])
+        print(f"{len(queries)} queries against corpora with {args.size} lines/entries:")
+        compare_handler("qa", qa_handler.get_answer_from_kb, qa_handler.get_answers_batch, queries,
+                        args.single_sample)
+        with loader_default_path(doc_linker.load_doc_links, paths["doc_links"]):
+            compare_handler("doc_links", doc_linker.get_doc_link, doc_linker.get_doc_links_batch, queries,
+                            args.single_sample)
+        compare_handler("algokit", algokit_handler.get_algokit_help, algokit_handler.get_algokit_help_batch,
+                        queries, args.single_sample)
+    qa_handler._knowledge_base_lines = None
+    algokit_handler._algokit_commands_data = None
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+Micro-benchmark suite for the query handlers and the routing logic.
+
+For every corpus size it generates synthetic data files (see `synthetic_corpora.py`),
+points the real loaders at them and runs a representative query set through:
+- `qa_handler.get_answer_from_kb`
+- `doc_linker.get_doc_link`
+- `algokit_handler.get_algokit_help`
+- `query_router.route_query` (the routing used by `on_message`)
+
+It reports load time, per-call latency distributions and memory usage, and saves
+the results as JSON so runs from different commits can be compared.
+
+Usage (from the project root):
+    python -m benchmarks.bench_handlers --sizes 1000,10000 --output before.json
+    python -m benchmarks.bench_handlers --sizes 1000,10000 --compare before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Any, List, Optional
+
+# Make the project root importable when the script is run directly.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import qa_handler, doc_linker, algokit_handler
+from benchmarks import synthetic_corpora
+
+# --- Constants ---
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+HANDLERS = ["qa", "doc_links", "algokit", "router"]
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+# --- Helpers ---
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Returns the given percentile (0-100) of an already sorted list using nearest-rank."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Builds a latency distribution summary (in milliseconds) from raw timings in seconds."""
+    values = sorted(latency * 1000.0 for latency in latencies)
+    if not values:
+        return {"calls": 0}
+    return {
+        "calls": len(values),
+        "mean_ms": sum(values) / len(values),
+        "min_ms": values[0],
+        "p50_ms": percentile(values, 50),
+        "p90_ms": percentile(values, 90),
+        "p99_ms": percentile(values, 99),
+        "max_ms": values[-1],
+    }
+
+def max_rss_bytes() -> int:
+    """Returns the peak resident set size of this process in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes.
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def git_commit() -> Optional[str]:
+    """Returns the short hash of the current git commit, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(__file__)).decode().strip()
+    except Exception:
+        return None
+
+@contextlib.contextmanager
+def quiet():
+    """Silences the handlers' console output so it doesn't flood the benchmark report."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+@contextlib.contextmanager
+def loader_default_path(loader: Callable, filepath: str):
+    """
+    Temporarily changes the default `filepath` argument of a loader function.
+
+    The handlers call their loaders without arguments, so the default path decides
+    which file is read whenever a loader's cache is empty (e.g. when the router
+    benchmark first reaches `doc_linker`). This makes that the synthetic catalogue.
+    """
+    original_defaults = loader.__defaults__
+    loader.__defaults__ = (filepath,)
+    try:
+        yield
+    finally:
+        loader.__defaults__ = original_defaults
+
+def time_calls(call: Callable[[str], Any], queries: List[str], repeats: int) -> List[float]:
+    """Calls `call` once per query, `repeats` times over, and returns each call's duration."""
+    latencies = []
+    for _ in range(repeats):
+        for query in queries:
+            start = time.perf_counter()
+            call(query)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def measure_peak_memory(call: Callable[[], Any]) -> int:
+    """Runs `call` under tracemalloc and returns the peak traced allocation in bytes."""
+    tracemalloc.start()
+    try:
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+# --- Benchmarks ---
+def bench_handler(name: str, load: Callable[[], Any], call: Callable[[str], Any],
+                  queries: List[str], repeats: int) -> Dict[str, Any]:
+    """
+    Benchmarks one handler: load time and memory, then per-call latency and memory.
+
+    Latencies are measured without tracemalloc (which slows Python down a lot);
+    memory is measured in a separate, single pass over the queries.
+    """
+    with quiet():
+        start = time.perf_counter()
+        load()
+        load_seconds = time.perf_counter() - start
+        load_peak = measure_peak_memory(load)
+        # One untimed warm-up pass so one-off costs (e.g. regex compilation) don't skew p99.
+        time_calls(call, queries, 1)
+        latencies = time_calls(call, queries, repeats)
+        query_peak = measure_peak_memory(lambda: time_calls(call, queries, 1))
+    return {
+        "handler": name,
+        "load_seconds": load_seconds,
+        "load_peak_bytes": load_peak,
+        "query_peak_bytes": query_peak,
+        "latency": summarize(latencies),
+    }
+
+def run_size(size: int, handlers: List[str], repeats: int, workdir: str) -> List[Dict[str, Any]]:
+    """Generates corpora of one size and benchmarks the selected handlers against them."""
+    print(f"Generating synthetic corpora with {size} lines/entries...")
+    paths = synthetic_corpora.write_corpora(workdir, size)
+    results = []
+
+    def load_kb():
+        qa_handler._knowledge_base_lines = None # Drop the cache so the file is really read
+        return qa_handler.load_knowledge_base(paths["kb"])
+
+    def load_commands():
+        algokit_handler._algokit_commands_data = None
+        return algokit_handler.load_algokit_commands(paths["algokit_commands"])
+
+    def load_doc_links():
+        doc_linker._doc_links_data = None
+        return doc_linker.load_doc_links(paths["doc_links"])
+
+    with loader_default_path(doc_linker.load_doc_links, paths["doc_links"]):
+        if "qa" in handlers:
+            results.append(bench_handler("qa", load_kb, qa_handler.get_answer_from_kb,
+                                         synthetic_corpora.QA_QUERIES, repeats))
+        if "doc_links" in handlers:
+            results.append(bench_handler("doc_links", load_doc_links, doc_linker.get_doc_link,
+                                         synthetic_corpora.DOC_QUERIES, repeats))
+        if "algokit" in handlers:
+            results.append(bench_handler("algokit", load_commands, algokit_handler.get_algokit_help,
+                                         synthetic_corpora.ALGOKIT_QUERIES, repeats))
+        if "router" in handlers:
+            try:
+                from modules import query_router # Imports network_info, which needs algosdk
+            except ImportError as e:
+                print(f"  Skipping router benchmark: {e}")
+            else:
+                loop = asyncio.new_event_loop()
+                try:
+                    def route(query: str) -> Any:
+                        return loop.run_until_complete(query_router.route_query(query))
+
+                    def load_all():
+                        load_kb()
+                        load_commands()
+                        load_doc_links()
+
+                    results.append(bench_handler("router", load_all, route,
+                                                 synthetic_corpora.ROUTER_QUERIES, repeats))
+                finally:
+                    loop.close()
+
+    for result in results:
+        result["size"] = size
+        latency = result["latency"]
+        print(f"  {result['handler']:<10} load {result['load_seconds'] * 1000:9.1f} ms | "
+              f"p50 {latency.get('p50_ms', 0):9.3f} ms | p99 {latency.get('p99_ms', 0):9.3f} ms | "
+              f"query peak {result['query_peak_bytes'] / 1024:9.1f} KiB")
+
+    # Release the loaded data before moving on to the next (bigger) size.
+    qa_handler._knowledge_base_lines = None
+    algokit_handler._algokit_commands_data = None
+    doc_linker._doc_links_data = None
+    for path in paths.values():
+        os.remove(path)
+    return results
+
+def compare(results: List[Dict[str, Any]], baseline_path: str) -> None:
+    """Prints the latency ratio of each result against a previously saved run."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    baseline_by_key = {(r["handler"], r["size"]): r for r in baseline.get("results", [])}
+    print(f"\nComparison against {baseline_path} (commit {baseline.get('meta', {}).get('commit')}):")
+    for result in results:
+        old = baseline_by_key.get((result["handler"], result["size"]))
+        if not old or not old["latency"].get("calls"):
+            continue
+        ratios = []
+        for key in ("p50_ms", "p99_ms"):
+            old_value = old["latency"][key]
+            ratio = result["latency"][key] / old_value if old_value else float('inf')
+            ratios.append(f"{key} x{ratio:.2f}")
+        print(f"  {result['handler']:<10} size {result['size']:>8}: {', '.join(ratios)}")
+
+# --- Entry Point ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the AlgoDevHelper query handlers.")
+    parser.add_argument('--sizes', default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated corpus sizes (lines/entries).")
+    parser.add_argument('--handlers', default=",".join(HANDLERS),
+                        help=f"Comma-separated handlers to run ({', '.join(HANDLERS)}).")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed passes over the query set.")
+    parser.add_argument('--output', default=None, help="Where to save the JSON results.")
+    parser.add_argument('--compare', default=None, help="A previous results file to compare against.")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    handlers = [handler for handler in args.handlers.split(",") if handler]
+    commit = git_commit()
+
+    results: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            results.extend(run_size(size, handlers, args.repeats, workdir))
+
+    report = {
+        "meta": {
+            "commit": commit,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeats": args.repeats,
+            "max_rss_bytes": max_rss_bytes(),
+        },
+        "results": results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"handlers-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""
+Compares phrase and proximity scoring with the plain keyword mode of the Q&A handler.
+
+It generates a synthetic knowledge base (see `synthetic_corpora.py`), with and
+without a word index (positional postings), and times `get_answer_from_kb` on:
+- the representative Q&A queries and random keyword queries, with
+  QA_PROXIMITY_SCORING off (plain keyword overlap) and on
+- the same queries with their first two keywords quoted as a phrase
+It also reports how often proximity changes the answer.
+
+Usage (from the project root):
+    python -m benchmarks.bench_proximity --sizes 10000,100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List, Optional
+
+# Make the project root importable when the script is run directly.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import qa_handler
+from modules.kb_store import CompactKnowledgeBase
+from benchmarks import synthetic_corpora
+from benchmarks.bench_handlers import quiet, summarize
+
+def generate_queries(count: int, seed: int = 42) -> List[str]:
+    """The representative Q&A queries plus random domain keyword queries (3-5 keywords)."""
+    rng = random.Random(seed)
+    queries = list(synthetic_corpora.QA_QUERIES)
+    while len(queries) < count:
+        queries.append(" ".join(rng.sample(synthetic_corpora.DOMAIN_TERMS, rng.randint(3, 5))))
+    return queries
+
+def quote_first_phrase(query: str) -> str:
+    """Quotes the first two keywords of a query, e.g. 'box storage costs' -> '"box storage" costs'."""
+    words = query.split()
+    return f'"{words[0]} {words[1]}" ' + " ".join(words[2:]) if len(words) > 2 else query
+
+def run(kb: CompactKnowledgeBase, queries: List[str], proximity: bool) -> List[Optional[str]]:
+    """Answers every query one at a time (as the live message path does) and prints the latencies."""
+    qa_handler.QA_PROXIMITY_SCORING = proximity
+    latencies = []
+    answers = []
+    with quiet():
+        for query in queries:
+            start = time.perf_counter()
+            answers.append(qa_handler.get_answer_from_kb(query, kb))
+            latencies.append(time.perf_counter() - start)
+    stats = summarize(latencies)
+    print(f"    {'proximity' if proximity else 'keyword':<10} p50 {stats['p50_ms']:8.3f} ms | "
+          f"p99 {stats['p99_ms']:8.3f} ms | answered {sum(answer is not None for answer in answers)}")
+    return answers
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare proximity/phrase scoring with plain keyword scoring.")
+    parser.add_argument('--sizes', default="10000,100000", help="Comma-separated knowledge base sizes (lines).")
+    parser.add_argument('--queries', type=int, default=500, help="Number of queries per run.")
+    args = parser.parse_args(argv)
+
+    original = qa_handler.QA_PROXIMITY_SCORING
+    queries = generate_queries(args.queries)
+    phrase_queries = [quote_first_phrase(query) for query in queries]
+    try:
+        for size in (int(size) for size in args.sizes.split(",")):
+            lines = synthetic_corpora.generate_kb_lines(size)
+            for indexed in (False, True):
+                kb = CompactKnowledgeBase(lines)
+                if indexed:
+                    kb.build_word_index()
+                kb.vocabulary_filter()
+                print(f"{size} lines, {'with' if indexed else 'without'} word index:")
+                keyword_answers = run(kb, queries, proximity=False)
+                proximity_answers = run(kb, queries, proximity=True)
+                changed = sum(a != b for a, b in zip(keyword_answers, proximity_answers))
+                print(f"    proximity changed {changed} of {len(queries)} answers")
+                print("  quoted phrases:")
+                run(kb, phrase_queries, proximity=True)
+    finally:
+        qa_handler.QA_PROXIMITY_SCORING = original
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
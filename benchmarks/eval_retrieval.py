@@ -0,0 +1,259 @@
+"""
+Retrieval evaluation harness: answer quality and latency, side by side.
+
+It runs a labelled query set (see `eval/retrieval_set.json`) through the QA,
+doc link and AlgoKit handlers under several retrieval configurations (score
+thresholds, retrieval modes) and reports, for each configuration:
+- recall@k and MRR: whether (and how high) the expected item appears in the
+  handler's ranking, ignoring thresholds (`rank_kb`, `rank_doc_links`).
+- accuracy: share of answerable queries that got the expected answer.
+- fallback rate: share of all queries that got no answer at all.
+- wrong / false answer rates: answerable queries answered with the wrong item,
+  and unanswerable queries (expected null) that got an answer anyway.
+- latency of the answer call (the code path the bot uses), p50/p95/p99.
+
+This makes threshold tuning reproducible and lets a faster engine be judged
+on both quality and speed before rollout.
+
+Usage (from the project root):
+    python -m benchmarks.eval_retrieval
+    python -m benchmarks.eval_retrieval --handlers qa --output eval.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Make the project root importable when the script is run directly.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import qa_handler, doc_linker, algokit_handler, ann_index
+from benchmarks.bench_handlers import git_commit, percentile, quiet, RESULTS_DIR
+
+# --- Constants ---
+DEFAULT_SET_PATH = os.path.join(os.path.dirname(__file__), 'eval', 'retrieval_set.json')
+HANDLERS = ["qa", "doc_links", "algokit"]
+RECALL_KS = (1, 3, 5)
+
+class Configuration:
+    """A named retrieval configuration: module attributes to override while it is evaluated."""
+
+    def __init__(self, name: str, handler: str, settings: Dict[Tuple[Any, str], Any]):
+        self.name = name
+        self.handler = handler
+        self.settings = settings # {(module, attribute name): value}
+
+def default_configurations() -> List[Configuration]:
+    """The configurations compared by default: the current thresholds and their neighbours."""
+    configurations = [
+        Configuration(f"qa keyword threshold={threshold}", "qa",
+                      {(qa_handler, "QA_RETRIEVAL_MODE"): "keyword", (qa_handler, "MIN_SCORE_THRESHOLD"): threshold})
+        for threshold in (2, 3, 4)
+    ]
+    configurations.append(Configuration("qa keyword no proximity", "qa",
+                                        {(qa_handler, "QA_RETRIEVAL_MODE"): "keyword",
+                                         (qa_handler, "QA_PROXIMITY_SCORING"): False}))
+    if ann_index.NUMPY_AVAILABLE:
+        configurations.extend(
+            Configuration(f"qa ann min_similarity={similarity}", "qa",
+                          {(qa_handler, "QA_RETRIEVAL_MODE"): "ann", (qa_handler, "ANN_MIN_SIMILARITY"): similarity})
+            for similarity in (0.3, 0.4, 0.5)
+        )
+    configurations.extend(
+        Configuration(f"doc_links threshold={threshold}", "doc_links", {(doc_linker, "MIN_SCORE_THRESHOLD"): threshold})
+        for threshold in (1, 2)
+    )
+    configurations.append(Configuration("algokit default", "algokit", {}))
+    return configurations
+
+@contextlib.contextmanager
+def applied(settings: Dict[Tuple[Any, str], Any]) -> Iterator[None]:
+    """Temporarily sets the given module attributes."""
+    originals = {key: getattr(key[0], key[1]) for key in settings}
+    try:
+        for (module, attribute), value in settings.items():
+            setattr(module, attribute, value)
+        yield
+    finally:
+        for (module, attribute), value in originals.items():
+            setattr(module, attribute, value)
+
+# --- Handler Adapters ---
+# Each adapter gives the harness the same view of a handler:
+# - cases: (query, expected) pairs, where expected is None for unanswerable queries
+# - rank(query, k): the handler's top-k items, best first
+# - item_matches(item, expected) / answer_matches(answer, expected): correctness checks
+# - answer(query): the production answer call, which is what gets timed
+class HandlerAdapter:
+    def __init__(self, cases: List[Tuple[str, Optional[str]]], rank: Callable[[str, int], List[Any]],
+                 item_matches: Callable[[Any, str], bool], answer: Callable[[str], Optional[str]],
+                 answer_matches: Callable[[str, str], bool]):
+        self.cases = cases
+        self.rank = rank
+        self.item_matches = item_matches
+        self.answer = answer
+        self.answer_matches = answer_matches
+
+def qa_adapter(eval_set: Dict[str, Any], set_dir: str) -> HandlerAdapter:
+    """Points the QA handler at the evaluation knowledge base and describes how to score it."""
+    qa_handler._knowledge_base_lines = None
+    with quiet():
+        kb_lines = qa_handler.load_knowledge_base(os.path.join(set_dir, eval_set["knowledge_base"]))
+    return HandlerAdapter(
+        cases=[(case["query"], case["expected"]) for case in eval_set["qa"]],
+        rank=qa_handler.rank_kb,
+        item_matches=lambda i, expected: expected.lower() in kb_lines.line(i).lower(),
+        answer=qa_handler.get_answer_from_kb,
+        answer_matches=lambda answer, expected: expected.lower() in answer.lower(),
+    )
+
+def doc_links_adapter(eval_set: Dict[str, Any], set_dir: str) -> HandlerAdapter:
+    """Uses the real documentation link catalogue (data/new_doc_links.json)."""
+    with quiet():
+        doc_links = doc_linker.load_doc_links()
+    return HandlerAdapter(
+        cases=[(case["query"], case["expected_url"]) for case in eval_set["doc_links"]],
+        rank=doc_linker.rank_doc_links,
+        item_matches=lambda key, expected: doc_links[key].get('url') == expected,
+        answer=doc_linker.get_doc_link,
+        answer_matches=lambda answer, expected: f"<{expected}>" in answer,
+    )
+
+def algokit_adapter(eval_set: Dict[str, Any], set_dir: str) -> HandlerAdapter:
+    """Uses the real AlgoKit command catalogue (data/algokit_commands.json)."""
+    algokit_handler._algokit_commands_data = None
+    with quiet():
+        commands_data = algokit_handler.load_algokit_commands()
+
+    def rank(query: str, k: int) -> List[str]:
+        command = algokit_handler.find_command(query, commands_data)
+        return [command] if command else [] # The handler only ever finds one command
+
+    return HandlerAdapter(
+        cases=[(case["query"], case["expected_command"]) for case in eval_set["algokit"]],
+        rank=rank,
+        item_matches=lambda command, expected: command == expected,
+        answer=algokit_handler.get_algokit_help,
+        answer_matches=lambda answer, expected: answer.startswith(f"**`algokit {expected}`**"),
+    )
+
+ADAPTERS = {"qa": qa_adapter, "doc_links": doc_links_adapter, "algokit": algokit_adapter}
+
+# --- Evaluation ---
+def evaluate(adapter: HandlerAdapter, repeats: int) -> Dict[str, Any]:
+    """Scores one handler under the currently applied configuration."""
+    max_k = max(RECALL_KS)
+    hits = {k: 0 for k in RECALL_KS}
+    reciprocal_ranks = 0.0
+    positives = negatives = correct = wrong = false_answers = fallbacks = 0
+    latencies: List[float] = []
+    misses: List[str] = []
+
+    with quiet():
+        for query, expected in adapter.cases:
+            # Untimed warm-up, so one-off costs (e.g. building an index) don't count as query latency.
+            answer = adapter.answer(query)
+            for _ in range(repeats):
+                start = time.perf_counter()
+                adapter.answer(query)
+                latencies.append(time.perf_counter() - start)
+
+            if answer is None:
+                fallbacks += 1
+            if expected is None:
+                negatives += 1
+                if answer is not None:
+                    false_answers += 1
+                    misses.append(query)
+                continue
+
+            positives += 1
+            ranking = adapter.rank(query, max_k)
+            rank = next((position for position, item in enumerate(ranking, 1)
+                         if adapter.item_matches(item, expected)), None)
+            if rank is not None:
+                reciprocal_ranks += 1.0 / rank
+                for k in RECALL_KS:
+                    hits[k] += rank <= k
+            if answer is not None and adapter.answer_matches(answer, expected):
+                correct += 1
+            else:
+                wrong += answer is not None
+                misses.append(query)
+
+    latencies_ms = sorted(latency * 1000.0 for latency in latencies)
+    return {
+        "queries": positives + negatives,
+        "answerable": positives,
+        **{f"recall@{k}": hits[k] / positives if positives else 0.0 for k in RECALL_KS},
+        "mrr": reciprocal_ranks / positives if positives else 0.0,
+        "accuracy": correct / positives if positives else 0.0,
+        "fallback_rate": fallbacks / (positives + negatives) if adapter.cases else 0.0,
+        "wrong_answer_rate": wrong / positives if positives else 0.0,
+        "false_answer_rate": false_answers / negatives if negatives else 0.0,
+        "latency_ms": {
+            "mean": sum(latencies_ms) / len(latencies_ms) if latencies_ms else 0.0,
+            "p50": percentile(latencies_ms, 50),
+            "p95": percentile(latencies_ms, 95),
+            "p99": percentile(latencies_ms, 99),
+        },
+        "misses": misses,
+    }
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    """Prints one row per configuration with the quality and latency columns."""
+    header = (f"{'configuration':<32} {'R@1':>5} {'R@3':>5} {'R@5':>5} {'MRR':>5} {'acc':>5} "
+              f"{'fallbk':>6} {'wrong':>5} {'false':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        metrics, latency = result["metrics"], result["metrics"]["latency_ms"]
+        print(f"{result['configuration']:<32} {metrics['recall@1']:5.2f} {metrics['recall@3']:5.2f} "
+              f"{metrics['recall@5']:5.2f} {metrics['mrr']:5.2f} {metrics['accuracy']:5.2f} "
+              f"{metrics['fallback_rate']:6.2f} {metrics['wrong_answer_rate']:5.2f} "
+              f"{metrics['false_answer_rate']:5.2f} {latency['p50']:8.3f} {latency['p95']:8.3f} {latency['p99']:8.3f}")
+
+# --- Entry Point ---
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality and latency per configuration.")
+    parser.add_argument('--set', default=DEFAULT_SET_PATH, help="Labelled query set (JSON).")
+    parser.add_argument('--handlers', default=",".join(HANDLERS),
+                        help=f"Comma-separated handlers to evaluate ({', '.join(HANDLERS)}).")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed answer calls per query.")
+    parser.add_argument('--output', default=None, help="Where to save the JSON results.")
+    args = parser.parse_args(argv)
+
+    with open(args.set, 'r', encoding='utf-8') as f:
+        eval_set = json.load(f)
+    set_dir = os.path.dirname(os.path.abspath(args.set))
+    handlers = [handler for handler in args.handlers.split(",") if handler]
+
+    results = []
+    for configuration in default_configurations():
+        if configuration.handler not in handlers:
+            continue
+        with applied(configuration.settings):
+            adapter = ADAPTERS[configuration.handler](eval_set, set_dir)
+            metrics = evaluate(adapter, args.repeats)
+        results.append({"configuration": configuration.name, "handler": configuration.handler,
+                        "settings": {attribute: value for (_, attribute), value in configuration.settings.items()},
+                        "metrics": metrics})
+    qa_handler._knowledge_base_lines = None # Don't leave the evaluation knowledge base cached
+    algokit_handler._algokit_commands_data = None
+
+    print_table(results)
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"eval-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({"meta": {"commit": commit, "set": args.set, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                            "repeats": args.repeats},
+                   "results": results}, f, indent=2)
+    print(f"\nResults saved to {output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,308 @@
+"""
+Offline replay load-tester for the bot's `on_message` coroutine.
+
+It feeds a recorded (or synthetic) query log through the real `on_message`
+handler from `bot.py`, using small fake stand-ins for `discord.Message`, its
+author and its channel, and a local stub algod server instead of AlgoNode.
+Messages are injected at a configurable arrival rate (open loop), so a slow bot
+builds up a backlog exactly as it would on a busy Discord guild.
+
+For every stage it reports throughput, p50/p95/p99 latency (message arrival to
+reply), event-loop lag and error counts. Passing several rates with `--rates`
+ramps the load up and marks the first stage where the bot can no longer keep up.
+
+Requires the packages from `requirements.txt` (bot.py imports discord.py and algosdk).
+
+Usage (from the project root):
+    python -m benchmarks.replay_load --rates 5,10,20,50 --duration 10
+    python -m benchmarks.replay_load --log queries.txt --rates 20 --output replay.json
+    WARM_CACHE_PATH=/tmp/warm.sqlite3 python -m benchmarks.replay_load --answer-cache --rates 20
+"""
+import argparse
+import asyncio
+import http.server
+import json
+import os
+import random
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional
+
+# Make the project root importable when the script is run directly.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks import synthetic_corpora
+from benchmarks.bench_handlers import summarize, percentile
+
+# --- Constants ---
+# Reply sent by on_message when routing raises; counted as an error.
+ERROR_REPLY_PREFIX = "An error occurred while processing your request"
+# Reply sent when admission control sheds a message (see modules/admission.py); counted as busy.
+BUSY_REPLY_PREFIX = "I'm handling a lot of questions right now"
+# Network queries are part of the default synthetic log so the algod path is exercised too.
+NETWORK_QUERIES = ["mainnet round", "testnet round", "network status"]
+# How often the event-loop lag monitor wakes up.
+LAG_PROBE_INTERVAL = 0.01
+
+# --- Stub Algod Server ---
+class StubAlgodHandler(http.server.BaseHTTPRequestHandler):
+    """Answers the algod REST endpoints the bot uses with canned JSON."""
+
+    # Set by start_stub_algod(); shared by all handler instances.
+    delay_seconds = 0.0
+    started_at = time.time()
+
+    def do_GET(self):
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds) # Simulate network/node latency
+        if self.path.startswith('/v2/status'):
+            # Advance roughly one round every 3 seconds, like the real network.
+            body = {"last-round": 1000 + int((time.time() - self.started_at) / 3)}
+        else:
+            body = {}
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass # Keep the report readable
+
+def start_stub_algod(delay_seconds: float = 0.0) -> http.server.ThreadingHTTPServer:
+    """Starts the stub algod server on a free local port in a background thread."""
+    StubAlgodHandler.delay_seconds = delay_seconds
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubAlgodHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# --- Fake Discord Objects ---
+class FakeAuthor:
+    """Stands in for `discord.User`/`discord.Member`."""
+
+    def __init__(self, user_id: int, name: str):
+        self.id = user_id
+        self.name = name
+        self.bot = False
+
+class FakeChannel:
+    """Stands in for a text channel; records replies instead of sending them."""
+
+    def __init__(self, on_send):
+        self._on_send = on_send
+
+    async def send(self, content: Optional[str] = None, **kwargs):
+        self._on_send(content)
+
+class FakeMessage:
+    """Stands in for `discord.Message` with the attributes on_message reads."""
+
+    def __init__(self, message_id: int, content: str, author: FakeAuthor, channel: FakeChannel):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = None
+
+# --- Query Log ---
+def load_query_log(path: Optional[str]) -> List[str]:
+    """
+    Loads the queries to replay.
+
+    The log can be plain text (one query per line) or JSONL with a "content" or
+    "query" field per line. Without a log, a synthetic mix is used.
+    """
+    if not path:
+        return synthetic_corpora.ROUTER_QUERIES + NETWORK_QUERIES
+    queries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('{'):
+                record = json.loads(line)
+                line = record.get('content') or record.get('query') or ''
+            queries.append(line)
+    return queries
+
+# --- Load Generation ---
+async def monitor_loop_lag(samples: List[float], stop: asyncio.Event) -> None:
+    """Measures how late the event loop wakes up a sleeping task (scheduling lag)."""
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + LAG_PROBE_INTERVAL
+        await asyncio.sleep(LAG_PROBE_INTERVAL)
+        samples.append(max(0.0, loop.time() - expected))
+
+async def run_stage(on_message, prefix: str, queries: List[str], rate: float, duration: float,
+                    poisson: bool, seed: int) -> Dict[str, Any]:
+    """Replays the query log at `rate` messages per second for `duration` seconds."""
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    lag_samples: List[float] = []
+    counts = {"sent": 0, "replied": 0, "errors": 0, "exceptions": 0, "no_reply": 0, "busy": 0}
+    stop_monitor = asyncio.Event()
+    monitor = asyncio.create_task(monitor_loop_lag(lag_samples, stop_monitor))
+
+    async def deliver(message_id: int, query: str, arrival: float) -> None:
+        replied = False
+
+        def on_send(content: Optional[str]) -> None:
+            nonlocal replied
+            if not replied:
+                latencies.append(loop.time() - arrival) # Time to the first reply
+                replied = True
+                counts["replied"] += 1
+            if content and content.startswith(ERROR_REPLY_PREFIX):
+                counts["errors"] += 1
+            if content and content.startswith(BUSY_REPLY_PREFIX):
+                counts["busy"] += 1
+
+        author = FakeAuthor(100000 + message_id % 50, f"replay-user-{message_id % 50}")
+        content = query if query.startswith(prefix) else prefix + query
+        message = FakeMessage(message_id, content, author, FakeChannel(on_send))
+        try:
+            await on_message(message)
+        except Exception:
+            counts["exceptions"] += 1
+        if not replied:
+            counts["no_reply"] += 1
+
+    tasks = []
+    start = loop.time()
+    next_arrival = start
+    message_id = 0
+    while next_arrival - start < duration:
+        delay = next_arrival - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        query = queries[message_id % len(queries)]
+        # Latency is measured from the *scheduled* arrival, so queueing delay caused
+        # by a blocked event loop is included (no coordinated omission).
+        tasks.append(asyncio.create_task(deliver(message_id, query, next_arrival)))
+        counts["sent"] += 1
+        message_id += 1
+        next_arrival += rng.expovariate(rate) if poisson else 1.0 / rate
+
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+    stop_monitor.set()
+    await monitor
+
+    return {
+        "rate": rate,
+        "offered_per_second": counts["sent"] / duration,
+        "duration_seconds": elapsed,
+        "throughput_per_second": counts["replied"] / elapsed if elapsed else 0.0,
+        "counts": counts,
+        "latency": summarize_with_p95(latencies),
+        "loop_lag": summarize_with_p95(lag_samples),
+    }
+
+def summarize_with_p95(values: List[float]) -> Dict[str, float]:
+    """Like bench_handlers.summarize, plus the p95 the load report asks for."""
+    summary = summarize(values)
+    if summary.get("calls"):
+        summary["p95_ms"] = percentile(sorted(v * 1000.0 for v in values), 95)
+    return summary
+
+def is_saturated(stage: Dict[str, Any], slo_ms: float) -> bool:
+    """A stage is saturated when the bot fails, falls behind, or misses the latency SLO."""
+    counts = stage["counts"]
+    if counts["errors"] or counts["exceptions"]:
+        return True
+    # Messages shed by admission control: the bot stays responsive but can't serve everyone.
+    if counts["busy"]:
+        return True
+    # Replies taking much longer than the injection window means a backlog built up.
+    if stage["throughput_per_second"] < 0.9 * stage["offered_per_second"]:
+        return True
+    return stage["latency"].get("p99_ms", 0.0) > slo_ms
+
+# --- Entry Point ---
+async def replay(args: argparse.Namespace) -> Dict[str, Any]:
+    server = start_stub_algod(args.algod_delay_ms / 1000.0)
+    stub_url = f"http://127.0.0.1:{server.server_address[1]}"
+    # bot.py reads its configuration at import time, so set it up first.
+    # python-dotenv does not override variables that are already set.
+    os.environ.setdefault('DISCORD_BOT_TOKEN', 'replay-harness')
+    os.environ['ALGOD_MAINNET_URL'] = stub_url
+    os.environ['ALGOD_TESTNET_URL'] = stub_url
+    import dotenv
+    dotenv.load_dotenv() # As bot.py does when run
+    import bot
+    bot.setup() # Logging, tracing, the client and its queues, as when bot.py is run
+    from modules import qa_handler, doc_linker, algokit_handler
+
+    if not args.no_preload:
+        # Mirror what on_ready does before real traffic arrives.
+        qa_handler.load_knowledge_base()
+        doc_linker.load_doc_links()
+        algokit_handler.load_algokit_commands()
+    if args.answer_cache:
+        # Enable the answer cache as on_ready does, warmed from WARM_CACHE_PATH
+        await bot.start_answer_cache()
+
+    queries = load_query_log(args.log)
+    stages = []
+    saturation_rate = None
+    for i, rate in enumerate(args.rates):
+        print(f"Replaying {len(queries)} distinct queries at {rate} msg/s for {args.duration}s...")
+        stage = await run_stage(bot.on_message, bot.BOT_PREFIX, queries, rate, args.duration,
+                                args.poisson, args.seed + i)
+        stage["saturated"] = is_saturated(stage, args.slo_ms)
+        stages.append(stage)
+        latency, lag = stage["latency"], stage["loop_lag"]
+        print(f"  throughput {stage['throughput_per_second']:8.1f}/s | p50 {latency.get('p50_ms', 0):8.1f} ms | "
+              f"p95 {latency.get('p95_ms', 0):8.1f} ms | p99 {latency.get('p99_ms', 0):8.1f} ms | "
+              f"loop lag p99 {lag.get('p99_ms', 0):7.1f} ms | errors {stage['counts']['errors'] + stage['counts']['exceptions']} | "
+              f"busy {stage['counts']['busy']}"
+              f"{' | SATURATED' if stage['saturated'] else ''}")
+        if stage["saturated"] and saturation_rate is None:
+            saturation_rate = rate
+            if not args.keep_going:
+                break
+
+    if args.answer_cache and bot._warm_cache_task is not None:
+        # Save as on shutdown, so the next run with --answer-cache starts warm (like a redeploy)
+        bot._warm_cache_task.cancel()
+        await asyncio.to_thread(bot.query_router.get_answer_cache().save)
+    server.shutdown()
+    return {"saturation_rate": saturation_rate, "slo_ms": args.slo_ms, "stages": stages}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a query log through bot.on_message.")
+    parser.add_argument('--log', default=None, help="Query log (text or JSONL). Defaults to a synthetic mix.")
+    parser.add_argument('--rates', default="5,10,20,50,100",
+                        help="Comma-separated arrival rates (messages/second), run in order.")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per rate stage.")
+    parser.add_argument('--poisson', action='store_true', help="Use Poisson arrivals instead of a fixed interval.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for Poisson arrivals.")
+    parser.add_argument('--algod-delay-ms', type=float, default=20.0, help="Latency added by the stub algod server.")
+    parser.add_argument('--slo-ms', type=float, default=1000.0, help="p99 latency above which a stage counts as saturated.")
+    parser.add_argument('--keep-going', action='store_true', help="Run every stage even after saturation.")
+    parser.add_argument('--no-preload', action='store_true', help="Skip loading the data files before replaying.")
+    parser.add_argument('--answer-cache', action='store_true',
+                        help="Enable the answer cache, loading and saving the warm cache (WARM_CACHE_PATH); "
+                             "run twice to compare a cold start with a warm restart.")
+    parser.add_argument('--output', default=None, help="Where to save the JSON report.")
+    args = parser.parse_args(argv)
+    args.rates = [float(rate) for rate in args.rates.split(",") if rate]
+
+    report = asyncio.run(replay(args))
+    if report["saturation_rate"] is not None:
+        print(f"\nThe bot stopped keeping up at {report['saturation_rate']} msg/s.")
+    else:
+        print("\nThe bot kept up at every tested rate.")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+Generates synthetic knowledge bases and catalogues for benchmarking.
+
+The generated data mimics the shape of the real files in `data/`:
+- A plain-text knowledge base with one paragraph per line (like `llms-small.txt`).
+- A documentation link catalogue (like `new_doc_links.json`).
+- An AlgoKit command catalogue (like `algokit_commands.json`).
+
+All generators are deterministic for a given seed, so results from different
+commits are measured against identical inputs.
+"""
+import json
+import os
+import random
+from typing import Dict, Any, List
+
+# --- Vocabulary ---
+# Domain terms that real queries tend to contain. Mixing them into the synthetic
+# lines makes the keyword matchers do realistic amounts of work.
+DOMAIN_TERMS = [
+    "algorand", "asa", "asset", "arc", "teal", "avm", "algokit", "localnet", "deploy",
+    "bootstrap", "generate", "init", "smart", "contract", "transaction", "fee", "round",
+    "block", "consensus", "sortition", "state", "proof", "stake", "account", "rekey",
+    "atomic", "transfer", "box", "storage", "opcode", "python", "sdk", "algod", "indexer",
+    "node", "governance", "application", "client", "template", "project", "wallet", "kmd",
+    "logicsig", "signature", "mainnet", "testnet", "participation", "key", "group", "budget",
+]
+# Filler words make the lines look like prose and dilute the domain terms.
+FILLER_WORDS = [
+    "this", "section", "describes", "how", "the", "network", "handles", "data", "using",
+    "simple", "steps", "example", "developers", "should", "note", "that", "each", "value",
+    "must", "be", "set", "before", "after", "when", "calling", "returns", "information",
+    "about", "current", "details", "reference", "guide", "overview", "concept", "common",
+]
+
+# Representative queries, one list per handler. They include hits, near misses
+# and queries that match nothing, so both the success and failure paths are timed.
+QA_QUERIES = [
+    "What is an Algorand Standard Asset?",
+    "explain state proofs and consensus",
+    "how do atomic transfer groups work",
+    "tell me about box storage for smart contracts",
+    "what is the avm opcode budget",
+    "how do I rekey an account",
+    "information about blockchain explorers",
+    "hello there",
+]
+DOC_QUERIES = [
+    "docs for algokit install guide",
+    "link for create asa tutorial",
+    "documentation for teal language spec",
+    "url for rest api reference",
+    "docs for something unrelated",
+]
+ALGOKIT_QUERIES = [
+    "tell me about algokit deploy",
+    "how to use algokit init command",
+    "what is bootstrap",
+    "algokit localnet",
+    "how to compile?",
+]
+# Queries for the full routing path. Network-status queries are left out on
+# purpose: they depend on a remote node and would measure the network instead.
+ROUTER_QUERIES = ALGOKIT_QUERIES + DOC_QUERIES + QA_QUERIES
+
+# --- Generators ---
+def generate_kb_lines(num_lines: int, seed: int = 0, words_per_line: int = 30) -> List[str]:
+    """
+    Generates synthetic knowledge base paragraphs.
+
+    Args:
+        num_lines (int): How many lines (paragraphs) to generate.
+        seed (int): Seed for the random generator.
+        words_per_line (int): Average number of words per line.
+
+    Returns:
+        List[str]: The generated lines.
+    """
+    rng = random.Random(seed)
+    lines = []
+    for _ in range(num_lines):
+        length = rng.randint(words_per_line // 2, words_per_line * 3 // 2)
+        # Roughly one word in five is a domain term.
+        words = [rng.choice(DOMAIN_TERMS) if rng.random() < 0.2 else rng.choice(FILLER_WORDS)
+                 for _ in range(length)]
+        lines.append(" ".join(words).capitalize() + ".")
+    return lines
+
+def generate_doc_links(num_entries: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Generates a synthetic documentation link catalogue.
+
+    Args:
+        num_entries (int): How many entries to generate.
+        seed (int): Seed for the random generator.
+
+    Returns:
+        Dict[str, Any]: A catalogue shaped like `new_doc_links.json`.
+    """
+    rng = random.Random(seed)
+    catalogue: Dict[str, Any] = {}
+    i = 0
+    while len(catalogue) < num_entries:
+        words = rng.sample(DOMAIN_TERMS, 3)
+        # Append a counter so keys stay unique even for very large catalogues.
+        key = f"{' '.join(words)} {i}"
+        catalogue[key] = {
+            "topic": " ".join(word.capitalize() for word in words),
+            "url": f"https://dev.algorand.co/synthetic/{'-'.join(words)}-{i}/",
+        }
+        i += 1
+    return catalogue
+
+def generate_algokit_commands(num_entries: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Generates a synthetic AlgoKit command catalogue.
+
+    The five real command names are always included so the representative
+    queries still find matches at every scale.
+
+    Args:
+        num_entries (int): How many commands to generate (including the real ones).
+        seed (int): Seed for the random generator.
+
+    Returns:
+        Dict[str, Any]: A catalogue shaped like `algokit_commands.json`.
+    """
+    rng = random.Random(seed)
+    catalogue: Dict[str, Any] = {}
+    names = ["bootstrap", "deploy", "generate", "init", "localnet"]
+    names += [f"cmd{i}" for i in range(max(0, num_entries - len(names)))]
+    for name in names[:num_entries]:
+        catalogue[name] = {
+            "keywords": [name] + rng.sample(DOMAIN_TERMS, 3),
+            "summary": " ".join(rng.choice(FILLER_WORDS) for _ in range(12)).capitalize() + ".",
+            "url": f"https://dev.algorand.co/algokit/cli/{name}/",
+        }
+    return catalogue
+
+# --- File Writers ---
+def write_corpora(directory: str, num_lines: int, seed: int = 0) -> Dict[str, str]:
+    """
+    Writes a full set of synthetic data files of the given size to a directory.
+
+    Args:
+        directory (str): Directory to write the files to (must exist).
+        num_lines (int): Size of each corpus (KB lines / catalogue entries).
+        seed (int): Seed for the random generators.
+
+    Returns:
+        Dict[str, str]: Paths of the written files, keyed by 'kb', 'doc_links' and 'algokit_commands'.
+    """
+    paths = {
+        "kb": os.path.join(directory, f"kb_{num_lines}.txt"),
+        "doc_links": os.path.join(directory, f"doc_links_{num_lines}.json"),
+        "algokit_commands": os.path.join(directory, f"algokit_commands_{num_lines}.json"),
+    }
+    with open(paths["kb"], 'w', encoding='utf-8') as f:
+        for line in generate_kb_lines(num_lines, seed):
+            f.write(line + "\n")
+    with open(paths["doc_links"], 'w', encoding='utf-8') as f:
+        json.dump(generate_doc_links(num_lines, seed), f)
+    with open(paths["algokit_commands"], 'w', encoding='utf-8') as f:
+        json.dump(generate_algokit_commands(num_lines, seed), f)
+    return paths
@@ -1,186 +1,533 @@
 # --- Standard Library Imports ---
 import os  # For accessing environment variables
+import logging  # Structured logging (configured by modules.logging_setup)
+import asyncio  # For background tasks on the bot's event loop
+import time  # For measuring request latency
+import random  # For sampled profiling
 import dotenv  # For loading variables from .env file
 
 # --- Discord Imports ---
 import discord  # Core discord.py library
+from discord import app_commands  # Slash (application) commands
 from discord.ext import commands  # Bot commands extension
 
 # --- Type Hinting Imports ---
-from typing import Optional  # For type hinting optional return values
+from typing import Literal, Optional, Tuple  # For type hinting optional return values and slash command choices
 
 # --- Custom Module Imports ---
 # These modules contain the specific logic for handling different types of user queries
-from modules import network_info, qa_handler, doc_linker, algokit_handler
+from modules import query_router, metrics, logging_setup, profiler, answer_cache, data_preload, autocomplete, result_pages
+from modules import link_health, doc_linker, algokit_handler, tracing, admission, qa_handler
 
 # Load environment variables from .env file
 # This allows sensitive info like the bot token to be kept out of version control
-dotenv.load_dotenv()
+# (Only when run as the bot: see setup() for why importing this file has no side effects.)
+if __name__ == "__main__":
+    dotenv.load_dotenv()
 
 # Get configuration from environment variables
 DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN') # The secret token for your Discord bot
 BOT_PREFIX = os.getenv('BOT_PREFIX', '!algohelp ') # The prefix users type to invoke the bot
+METRICS_PORT = os.getenv('METRICS_PORT') # Port for the local Prometheus metrics endpoint (disabled if unset)
+LOG_LEVEL = os.getenv('LOG_LEVEL', logging_setup.DEFAULT_LEVEL) # Minimum log level
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', logging_setup.DEFAULT_DEBUG_SAMPLE_RATE)) # Fraction of DEBUG lines kept
+# Discord user IDs allowed to use admin commands (comma-separated), in addition to server administrators
+ADMIN_USER_IDS = {int(user_id) for user_id in os.getenv('ADMIN_USER_IDS', '').split(',') if user_id.strip().isdigit()}
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0')) # Fraction of queries profiled in the background
+PROFILE_OUTPUT_DIR = os.getenv('PROFILE_OUTPUT_DIR', profiler.PROFILE_OUTPUT_DIR) # Where profile dumps are written
+PROFILE_COMMAND = "profile " # Admin command: '<prefix>profile <query>'
+ANSWER_CACHE_SIZE = int(os.getenv('ANSWER_CACHE_SIZE', answer_cache.DEFAULT_MAX_ENTRIES)) # Responses cached in memory (0 disables)
+WARM_CACHE_PATH = os.getenv('WARM_CACHE_PATH', answer_cache.WARM_CACHE_PATH) # SQLite file of the warm cache ('' disables)
+WARM_CACHE_TOP_N = int(os.getenv('WARM_CACHE_TOP_N', answer_cache.DEFAULT_TOP_N)) # Most frequent queries persisted
+WARM_CACHE_SAVE_INTERVAL = float(os.getenv('WARM_CACHE_SAVE_INTERVAL', '300')) # Seconds between warm cache writes
+PRELOAD_MAX_WAITING = int(os.getenv('PRELOAD_MAX_WAITING', data_preload.DEFAULT_MAX_WAITING)) # Queries held while data loads
+# Whether '<prefix> <query>' messages are answered. They need the privileged message content
+# intent, which makes Discord send the bot every message; slash commands work without it.
+ENABLE_PREFIX_COMMANDS = os.getenv('ENABLE_PREFIX_COMMANDS', 'true').strip().lower() not in ('0', 'false', 'no')
+# Guild to register the slash commands in for testing (instant); unset registers them globally.
+SLASH_COMMANDS_GUILD_ID = os.getenv('SLASH_COMMANDS_GUILD_ID')
+# Seconds a slash command may take before it is acknowledged with a deferred ("thinking...") response.
+SLASH_DEFER_AFTER = float(os.getenv('SLASH_DEFER_AFTER', '0.5'))
+# Seconds the result page buttons of a reply stay active (its result set is kept that long).
+RESULT_PAGES_TIMEOUT = float(os.getenv('RESULT_PAGES_TIMEOUT', '300'))
+PRELOAD_WAIT_TIMEOUT = float(os.getenv('PRELOAD_WAIT_TIMEOUT', data_preload.DEFAULT_WAIT_TIMEOUT)) # Seconds a held query waits
+LINK_CHECK_INTERVAL = float(os.getenv('LINK_CHECK_INTERVAL', link_health.DEFAULT_TTL)) # Seconds between catalogue link checks (0 disables)
+KB_REFRESH_INTERVAL = float(os.getenv('KB_REFRESH_INTERVAL', '60')) # Seconds between knowledge base source checks (0 disables)
+QUERY_WORKERS = int(os.getenv('QUERY_WORKERS', admission.DEFAULT_WORKERS)) # Queries processed at the same time
+QUERY_QUEUE_DEPTH = int(os.getenv('QUERY_QUEUE_DEPTH', admission.DEFAULT_MAX_DEPTH)) # Queries that may wait for a worker
+QUERY_QUEUE_MAX_AGE = float(os.getenv('QUERY_QUEUE_MAX_AGE', admission.DEFAULT_MAX_AGE)) # Seconds a query may wait
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0')) # Fraction of messages traced
+TRACE_SLOW_THRESHOLD = float(os.getenv('TRACE_SLOW_THRESHOLD', '0')) # Seconds after which a message is always traced (0 disables)
+TRACE_FILE = os.getenv('TRACE_FILE', tracing.TRACE_FILE_PATH) # Rotating JSONL file the traces are written to
+
+# --- Logging ---
+# Configured by setup(): all logging (ours and discord.py's) goes through a
+# background thread as JSON lines, so writing logs never blocks the event loop.
+logger = logging.getLogger("bot")
+
+# --- Discord Bot ---
+# The commands.Bot client, created by setup() (see there for the intents).
+bot: Optional[commands.Bot] = None
+
+# --- Metrics ---
+# The metrics endpoint and event-loop lag monitor are started from on_ready.
+# on_ready can fire again after a reconnect, so keep track of whether they already run.
+_metrics_server = None
+_loop_lag_task: Optional[asyncio.Task] = None
+
+def start_metrics():
+    """Starts the metrics endpoint and event-loop lag monitor once, if METRICS_PORT is set."""
+    global _metrics_server, _loop_lag_task
+    if not METRICS_PORT or _metrics_server is not None:
+        return
+    try:
+        _metrics_server = metrics.start_metrics_server(int(METRICS_PORT))
+    except (ValueError, OSError) as e:
+        logger.error("Could not start metrics endpoint", extra={"port": METRICS_PORT, "error": str(e)})
+        return
+    _loop_lag_task = asyncio.create_task(metrics.monitor_event_loop_lag())
+
+# --- Data Preload ---
+# The data files are loaded once per process, concurrently in worker threads (see
+# modules/data_preload.py). Queries arriving meanwhile wait in a bounded line or
+# get a "warming up" reply. Created by setup().
+preloader: Optional[data_preload.DataPreloader] = None
+
+# --- Admission Control ---
+# Queries (prefix messages and slash commands) wait in one bounded queue for one
+# of QUERY_WORKERS workers; when it is full, or a query waits too long, the user
+# gets a short "busy" reply instead (see modules/admission.py). Created by setup().
+admission_queue: Optional[admission.AdmissionQueue] = None
+
+# --- Answer Cache ---
+# Responses are cached by normalized query; the most frequent ones are written to
+# WARM_CACHE_PATH every WARM_CACHE_SAVE_INTERVAL seconds and reloaded on startup,
+# so the first queries after a restart are answered from the cache.
+_warm_cache_task: Optional[asyncio.Task] = None
+
+async def save_warm_cache_periodically(cache: answer_cache.AnswerCache) -> None:
+    """Writes the warm cache every WARM_CACHE_SAVE_INTERVAL seconds until cancelled."""
+    while True:
+        await asyncio.sleep(WARM_CACHE_SAVE_INTERVAL)
+        try:
+            await asyncio.to_thread(cache.save) # SQLite I/O stays off the event loop
+        except Exception:
+            logger.exception("Could not save warm cache", extra={"path": cache.path})
+
+async def start_answer_cache():
+    """Enables the answer cache, warms it from the previous run and starts the periodic writer, once."""
+    global _warm_cache_task
+    if ANSWER_CACHE_SIZE <= 0 or query_router.get_answer_cache() is not None:
+        return
+    cache = answer_cache.AnswerCache(query_router.data_generation, WARM_CACHE_PATH or None,
+                                     ANSWER_CACHE_SIZE, WARM_CACHE_TOP_N)
+    query_router.enable_answer_cache(cache)
+    try:
+        await query_router.warm_answer_cache()
+    except Exception:
+        logger.exception("Could not warm answer cache", extra={"path": WARM_CACHE_PATH})
+    if cache.path:
+        _warm_cache_task = asyncio.create_task(save_warm_cache_periodically(cache))
+
+# --- Link Health ---
+# The doc link and AlgoKit command URLs are checked in the background (see
+# modules/link_health.py); links found broken are no longer handed out.
+_link_check_task: Optional[asyncio.Task] = None
+
+async def check_links_periodically() -> None:
+    """Checks the catalogue URLs now and then every LINK_CHECK_INTERVAL seconds, until cancelled."""
+    while True:
+        urls = link_health.catalogue_urls(doc_linker.load_doc_links(), algokit_handler.load_algokit_commands())
+        try:
+            await link_health.check_links(urls)
+        except Exception:
+            logger.exception("Link check failed", extra={"urls": len(urls)})
+        await asyncio.sleep(LINK_CHECK_INTERVAL)
+
+def start_link_checks():
+    """Starts the periodic link checks once, if enabled and aiohttp is installed."""
+    global _link_check_task
+    if LINK_CHECK_INTERVAL <= 0 or _link_check_task is not None:
+        return
+    if not link_health.AIOHTTP_AVAILABLE:
+        logger.warning("LINK_CHECK_INTERVAL is set but aiohttp is not installed; links are not checked")
+        return
+    _link_check_task = asyncio.create_task(check_links_periodically())
+
+# --- Knowledge Base Refresh ---
+# Source files of the knowledge base that changed on disk are applied as incremental
+# updates: only those files are re-read and indexed (see qa_handler.refresh_sources).
+_kb_refresh_task: Optional[asyncio.Task] = None
+
+async def refresh_knowledge_base_periodically() -> None:
+    """Applies changed knowledge base source files every KB_REFRESH_INTERVAL seconds, until cancelled."""
+    while True:
+        await asyncio.sleep(KB_REFRESH_INTERVAL)
+        try:
+            await asyncio.to_thread(qa_handler.refresh_sources) # File reads and indexing stay off the event loop
+        except Exception:
+            logger.exception("Knowledge base refresh failed")
+
+def start_kb_refresh():
+    """Starts the periodic knowledge base refresh once, if enabled."""
+    global _kb_refresh_task
+    if KB_REFRESH_INTERVAL <= 0 or _kb_refresh_task is not None:
+        return
+    _kb_refresh_task = asyncio.create_task(refresh_knowledge_base_periodically())
+
+# --- Result Pages ---
+# Q&A and doc link replies get buttons to page through the next best matches.
+# The view belongs to one reply and keeps its result set (see modules/result_pages.py),
+# so only the first page turn runs a search.
+class ResultPagesView(discord.ui.View):
+    """Previous / next buttons over the ranked answers of one reply."""
+
+    def __init__(self, query: str, route: str, guild_id: Optional[int], first: str):
+        super().__init__(timeout=RESULT_PAGES_TIMEOUT)
+        self.pages = result_pages.ResultPages(first, lambda: query_router.ranked_results(query, route, guild_id))
+        self._sync_buttons()
+
+    def _sync_buttons(self):
+        self.previous_page.disabled = not self.pages.has_previous()
+        self.next_page.disabled = not self.pages.has_next()
+
+    async def _turn(self, interaction: discord.Interaction, step: int):
+        content = await self.pages.turn(step)
+        self._sync_buttons()
+        await interaction.response.edit_message(content=content, view=self)
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._turn(interaction, -1)
+
+    @discord.ui.button(label="More results", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._turn(interaction, 1)
+
+def result_pages_view(query: str, route: str, guild_id: Optional[int], response: Optional[str]) -> dict:
+    """Keyword arguments adding page buttons to a reply, if its route has alternatives."""
+    if not response or route not in query_router.PAGED_ROUTES:
+        return {}
+    return {"view": ResultPagesView(query, route, guild_id, response)}
+
+# --- Slash Commands ---
+# '/algohelp ask|docs|algokit|network' go through the same router as prefix
+# messages. Discord requires an acknowledgement within 3 seconds: answers ready
+# within SLASH_DEFER_AFTER are sent directly, slower ones are deferred first and
+# sent as a follow-up when done.
+algohelp_commands = app_commands.Group(name="algohelp", description="Algorand developer help")
+_slash_commands_synced = False
+
+async def answer_interaction(interaction: discord.Interaction, query: str, handler: Optional[str] = None):
+    """Answers a slash command with the router (or only `handler`), deferring if it takes a while."""
+    logger.info("Received slash command", extra={"query": query, "handler": handler, "user": interaction.user.name})
+    metrics.REQUESTS.inc()
+    start = time.perf_counter()
+
+    async def answer() -> Tuple[str, dict]:
+        """Returns the reply and its extra send arguments (page buttons)."""
+        # Queries before the startup data load is done wait for it, like prefix messages.
+        if not await preloader.wait_until_ready():
+            return data_preload.WARMING_UP_MESSAGE, {}
+        async with admission_queue.admit() as admitted:
+            if not admitted:
+                return admission.BUSY_MESSAGE, {}
+            response, route = await query_router.route_query_with_route(query, interaction.guild_id, handler)
+        if not response:
+            metrics.FALLBACKS.inc()
+            return query_router.FALLBACK_MESSAGE, {}
+        return response, result_pages_view(query, route, interaction.guild_id, response)
+
+    task = asyncio.create_task(answer())
+    try:
+        try:
+            # Shielded: the answer keeps running if it isn't ready in time
+            reply, extras = await asyncio.wait_for(asyncio.shield(task), SLASH_DEFER_AFTER)
+        except asyncio.TimeoutError:
+            await interaction.response.defer(thinking=True)
+            reply, extras = await task
+            await interaction.followup.send(reply, **extras)
+        else:
+            await interaction.response.send_message(reply, **extras)
+    except Exception:
+        logger.exception("Error processing slash command", extra={"user": interaction.user.name})
+        error_message = "An error occurred while processing your request. Please try again later."
+        if interaction.response.is_done():
+            await interaction.followup.send(error_message)
+        else:
+            await interaction.response.send_message(error_message)
+    finally:
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start)
+
+@algohelp_commands.command(name="ask", description="Ask a question about Algorand development")
+@app_commands.describe(question="Your question")
+async def slash_ask(interaction: discord.Interaction, question: str):
+    await answer_interaction(interaction, question)
+
+@algohelp_commands.command(name="docs", description="Find a link to the Algorand developer documentation")
+@app_commands.describe(topic="What to find documentation for")
+async def slash_docs(interaction: discord.Interaction, topic: str):
+    autocomplete.record_use("docs", topic)
+    await answer_interaction(interaction, topic, "docs")
+
+@algohelp_commands.command(name="algokit", description="Get help for an AlgoKit CLI command")
+@app_commands.describe(command="The AlgoKit command, e.g. 'init' or 'deploy'")
+async def slash_algokit(interaction: discord.Interaction, command: str):
+    autocomplete.record_use("algokit", command)
+    await answer_interaction(interaction, command, "algokit")
 
-# --- Basic Input Validation ---
-# Ensure the bot token is actually set
-if not DISCORD_BOT_TOKEN:
-    print("Error: DISCORD_BOT_TOKEN not found in .env file.")
-    exit(1)
-
-# --- Discord Bot Setup ---
-# Define necessary intents for the bot to function
-# Intents determine which events the bot receives from Discord.
-# Without the correct intents, the bot won't receive certain events.
-intents = discord.Intents.default()  # Start with default intents (presence, server members excluded)
-intents.messages = True              # Need to receive message events (e.g., when a message is sent)
-intents.message_content = True       # CRUCIAL: Need permission to read the *content* of messages.
-                                     # This requires enabling the intent in the Discord Developer Portal.
-
-# Initialize the bot client using commands.Bot
-# commands.Bot is a subclass of discord.Client that adds command handling functionality.
-# We pass the command prefix and the enabled intents.
-bot = commands.Bot(command_prefix=BOT_PREFIX, intents=intents)
+# Choices are computed from in-memory indexes on every keystroke (see modules/autocomplete.py).
+@slash_docs.autocomplete("topic")
+async def complete_doc_topic(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=label, value=value) for label, value in autocomplete.complete("docs", current)]
+
+@slash_algokit.autocomplete("command")
+async def complete_algokit_command(interaction: discord.Interaction, current: str):
+    return [app_commands.Choice(name=label, value=value) for label, value in autocomplete.complete("algokit", current)]
+
+@algohelp_commands.command(name="network", description="Show the current round of an Algorand network")
+async def slash_network(interaction: discord.Interaction, network: Literal["mainnet", "testnet"] = "mainnet"):
+    await answer_interaction(interaction, network, "network")
+
+async def sync_slash_commands():
+    """Registers the slash commands with Discord, once per process."""
+    global _slash_commands_synced
+    if _slash_commands_synced:
+        return
+    _slash_commands_synced = True
+    try:
+        if SLASH_COMMANDS_GUILD_ID:
+            guild = discord.Object(id=int(SLASH_COMMANDS_GUILD_ID))
+            bot.tree.copy_global_to(guild=guild)
+            synced = await bot.tree.sync(guild=guild)
+        else:
+            synced = await bot.tree.sync() # Global commands can take a while to show up everywhere
+        logger.info("Slash commands synced", extra={"commands": len(synced), "guild_id": SLASH_COMMANDS_GUILD_ID})
+    except (discord.HTTPException, ValueError) as e:
+        _slash_commands_synced = False # Retried on the next on_ready
+        logger.error("Could not sync slash commands", extra={"error": str(e)})
+
+# --- Admin Helpers ---
+def is_admin(user) -> bool:
+    """Returns True if the user may run admin commands (listed in ADMIN_USER_IDS or a server administrator)."""
+    if user.id in ADMIN_USER_IDS:
+        return True
+    # guild_permissions only exists for members of a server (not in DMs)
+    permissions = getattr(user, 'guild_permissions', None)
+    return bool(permissions and permissions.administrator)
 
 # --- Event Handlers ---
-@bot.event
+# Registered on the bot by setup().
 async def on_ready():
     """
-    Called once when the bot is fully connected to Discord and ready to operate.
-    This is typically used for setup tasks.
+    Called when the bot is fully connected to Discord and ready to operate,
+    and again after every gateway reconnect. Every setup step here runs only
+    once per process.
     """
-    print(f'Logged in as {bot.user.name} (ID: {bot.user.id})')
-    print('------')
+    logger.info("Logged in", extra={"user": bot.user.name, "user_id": bot.user.id})
+    start_metrics()
+    await sync_slash_commands()
     # Pre-load data from files on startup.
     # This improves performance by avoiding file I/O on every message.
     # It assumes the data files don't change while the bot is running.
-    print("Pre-loading data...")
-    try:
-        qa_handler.load_knowledge_base()
-        print("  - Knowledge base loaded.")
-        doc_linker.load_doc_links()
-        print("  - Document links loaded.")
-        algokit_handler.load_algokit_commands()
-        print("  - AlgoKit commands loaded.")
-        print("Data pre-loading complete.")
-    except FileNotFoundError as e:
-        print(f"Error loading data file: {e}. Please ensure all data files exist.")
-        # Depending on severity, you might want to exit or disable features.
-    except Exception as e:
-        print(f"An unexpected error occurred during data loading: {e}")
-
-@bot.event
+    # The load runs in worker threads, so heartbeats keep flowing; after a
+    # reconnect this just awaits the load that already ran.
+    await preloader.preload()
+    # With the data loaded, serve the most frequent questions of the previous run from the cache.
+    await start_answer_cache()
+    # Check the catalogue links in the background (results from the last run are already loaded).
+    start_link_checks()
+    # Pick up edits to the knowledge base files without a restart.
+    start_kb_refresh()
+
+async def send_reply(channel: discord.abc.Messageable, content: str, **kwargs) -> discord.Message:
+    """Sends a message, timed as a span of the current trace."""
+    with tracing.span("discord.send", tracing.KIND_CLIENT):
+        return await channel.send(content, **kwargs)
+
+async def answer_message(message: discord.Message, query: str):
+    """Answers a prefix command query (the part of on_message that is traced)."""
+    logger.info("Received query", extra={"query": query, "user": message.author.name,
+                                         "trace_id": tracing.current_trace_id()})
+    metrics.REQUESTS.inc()
+    start = time.perf_counter() # End-to-end latency includes sending the reply
+
+    # --- Readiness Gate ---
+    # Until the startup data load is done, hold the query (in a bounded line)
+    # rather than letting the handlers load the files lazily on the event loop.
+    with tracing.span("preload.wait") as span:
+        ready = await preloader.wait_until_ready()
+        span.set_attribute("ready", ready)
+    if not ready:
+        await send_reply(message.channel, data_preload.WARMING_UP_MESSAGE)
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start)
+        return
+
+    # --- Admin Profiling Command ---
+    # '<prefix>profile <query>' answers the query as usual, but under cProfile and
+    # tracemalloc, and replies with a summary of where the time and memory went.
+    profile_requested = query.lower().startswith(PROFILE_COMMAND)
+    if profile_requested:
+        if not is_admin(message.author):
+            await send_reply(message.channel, "The profile command is restricted to bot administrators.")
+            metrics.REQUEST_LATENCY.observe(time.perf_counter() - start)
+            return
+        query = query[len(PROFILE_COMMAND):].strip()
+
+    async def answer() -> Optional[str]:
+        """Routes the query and sends the reply (the part of the pipeline that gets profiled)."""
+        # --- Routing Logic ---
+        # Determine the user's intent and route the request to the appropriate
+        # handler module. The priority rules live in modules/query_router.py so
+        # they can be exercised without a Discord connection.
+        guild_id = message.guild.id if message.guild else None
+        # The profile command skips the answer cache, so the handlers it is meant
+        # to diagnose run even for a query that was answered before
+        response, route = await query_router.route_query_with_route(query, guild_id,
+                                                                    use_cache=not profile_requested)
+
+        # --- Handle Response / Fallback ---
+        # If any handler successfully generated a response string, send it
+        # (with page buttons for answers that have alternatives).
+        if response:
+            await send_reply(message.channel, response, **result_pages_view(query, route, guild_id, response))
+        # If no handler provided a response, but the user *did* type a query
+        # (i.e., not just the prefix), send a helpful fallback message.
+        elif query: # Check if query was non-empty after stripping prefix
+            logger.debug("No specific handler response; sending fallback", extra={"query": query})
+            metrics.FALLBACKS.inc()
+            await send_reply(message.channel, query_router.FALLBACK_MESSAGE)
+        # If the query was empty after the prefix (e.g., user typed just "!algohelp"),
+        # we intentionally do nothing.
+        return response
+
+    # --- Admission Control ---
+    # Handler work waits for a query worker; under overload the user gets a short
+    # "busy" reply at once instead of every query slowing down together.
+    async with admission_queue.admit() as admitted:
+        if not admitted:
+            await send_reply(message.channel, admission.BUSY_MESSAGE)
+            metrics.REQUEST_LATENCY.observe(time.perf_counter() - start)
+            return
+        try:
+            # Sampled profiling writes a dump for a small fraction of normal queries
+            # without changing the reply; the admin command also replies with a summary.
+            # One call is profiled at a time: the admin command waits its turn, while a
+            # sampled query that lands during another profile is simply not profiled.
+            if profile_requested:
+                report = await profiler.profile_call(answer, query, PROFILE_OUTPUT_DIR)
+                await send_reply(message.channel, report.summary)
+            elif (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE
+                  and not profiler.is_profiling()):
+                await profiler.profile_call(answer, query, PROFILE_OUTPUT_DIR)
+            else:
+                await answer()
+
+        except Exception:
+            # General error handling for unexpected issues within the routing logic.
+            # Log the error server-side (with the trace ID, if traced, to find its spans).
+            logger.exception("Error processing message", extra={"user": message.author.name,
+                                                                "trace_id": tracing.current_trace_id()})
+            # Send a generic error message to the user to inform them something went wrong.
+            await send_reply(message.channel, "An error occurred while processing your request. Please try again later.")
+        finally:
+            metrics.REQUEST_LATENCY.observe(time.perf_counter() - start)
+
 async def on_message(message: discord.Message): # Added type hint for clarity
     """Called when a message is sent to any channel the bot can see."""
     # 1. Ignore messages from the bot itself to prevent feedback loops
     if message.author == bot.user:
         return
 
+    # Only reachable with the message intents, i.e. when prefix commands are enabled.
     # 2. Check if the message starts with the defined prefix.
     #    We are manually checking the prefix here instead of using the
     #    commands.Bot command system for simplicity in this MVP phase.
     if message.content.startswith(BOT_PREFIX):
         # Extract the query part by removing the prefix and stripping whitespace
         query = message.content[len(BOT_PREFIX):].strip()
-        query_lower = query.lower() # Use lowercase for case-insensitive matching
-        print(f"Received query: '{query}' from {message.author.name}")
-
-        response: Optional[str] = None # Initialize response variable with type hint
-
-        # --- Routing Logic ---
-        # Determine the user's intent based on keywords in their query and route
-        # the request to the appropriate handler module.
-        # The order of these 'if/elif' checks defines the priority:
-        # 1. AlgoKit Command Help (most specific keywords)
-        # 2. Documentation Link Request
-        # 3. Network Status Request
-        # 4. General Q&A (least specific, acts as a fallback)
-        try:
-            # --- Priority 1: AlgoKit Command Help Request ---
-            # print("[DEBUG] Checking AlgoKit Handler...") # DEBUG LOG
-            algokit_keywords = ["algokit", "command"]
-            known_commands = algokit_handler.load_algokit_commands().keys() # Get known commands
-            # Check if query contains 'algokit', 'command', or a known command name
-            if any(keyword in query_lower for keyword in algokit_keywords) or any(cmd in query_lower for cmd in known_commands):
-                 # print("[DEBUG] Attempting AlgoKit command lookup...") # DEBUG LOG
-                 response = algokit_handler.get_algokit_help(query)
-                 # print(f"[DEBUG] AlgoKit handler response: {response}") # DEBUG LOG
-                 # If response is still None here, it means keywords like 'algokit' might
-                 # have matched, but no specific command was identified by the handler.
-                 # We allow it to fall through to the next checks.
-
-            # --- Priority 2: Documentation Link Request ---
-            # print(f"[DEBUG] Checking Docs Link... (response is None: {response is None})") # DEBUG LOG
-            # Use 'elif' to ensure this only runs if the AlgoKit handler didn't provide a response.
-            if response is None:
-                doc_keywords = ["doc", "link for", "documentation", "url for"]
-                # Check if query contains specific keywords indicating a doc link request
-                if any(keyword in query_lower for keyword in doc_keywords):
-                    # print("[DEBUG] Attempting doc link lookup...") # DEBUG LOG
-                    response = doc_linker.get_doc_link(query)
-                    # print(f"[DEBUG] Doc Linker response: {response}") # DEBUG LOG
-
-            # --- Priority 3: Network Status Request ---
-            # print(f"[DEBUG] Checking Network Status... (response is None: {response is None})") # DEBUG LOG
-            # Use 'elif' to ensure this only runs if previous handlers didn't respond.
-            # Check for keywords related to network status.
-            if response is None and ("round" in query_lower or "network status" in query_lower or "block" in query_lower):
-                # print("[DEBUG] Attempting network status lookup...") # DEBUG LOG
-                # Determine preferred network (default to mainnet if not specified)
-                network_pref = "testnet" if "testnet" in query_lower else "mainnet"
-                response = await network_info.get_network_status_message(network_pref) # network_info is async
-                # print(f"[DEBUG] Network Status response: {response}") # DEBUG LOG
-
-            # --- Priority 4: General Q&A Fallback ---
-            # print(f"[DEBUG] Checking Q&A... (response is None: {response is None}, query: '{query}')") # DEBUG LOG
-            # This is the final fallback if no specific keywords were matched above.
-            # Only attempt if the query is not empty (i.e., user typed something after the prefix).
-            if response is None and query:
-                # print("[DEBUG] Attempting KB lookup...") # DEBUG LOG
-                # Pass the original query (preserving case might be useful for some Q&A models/logic)
-                response = qa_handler.get_answer_from_kb(query)
-                # print(f"[DEBUG] Q&A response: {response}") # DEBUG LOG
-
-            # --- Handle Response / Fallback ---
-            # print(f"[DEBUG] Final response before sending: {response}") # DEBUG LOG
-
-            # If any handler successfully generated a response string, send it.
-            if response:
-                await message.channel.send(response)
-            # If no handler provided a response, but the user *did* type a query
-            # (i.e., not just the prefix), send a helpful fallback message.
-            elif query: # Check if query was non-empty after stripping prefix
-                fallback_message = "Sorry, I couldn't find specific information for that query. Try asking differently, or check the Algorand Developer Portal: https://dev.algorand.co/"
-                print(f"[DEBUG] No specific handler response for: '{query}'. Sending fallback.")
-                await message.channel.send(fallback_message)
-            # If the query was empty after the prefix (e.g., user typed just "!algohelp"),
-            # we intentionally do nothing.
-
-        except Exception as e:
-            # General error handling for unexpected issues within the routing logic.
-            print(f"Error processing message from {message.author.name}: {e}") # Log the error server-side.
-            # Send a generic error message to the user to inform them something went wrong.
-            await message.channel.send("An error occurred while processing your request. Please try again later.")
+        # Each answered message is one trace (if sampled), with a span per stage
+        with tracing.start_trace("on_message", guild_id=message.guild.id if message.guild else 0,
+                                 query_length=len(query)):
+            await answer_message(message, query)
 
     # Note: commands.Bot has its own command processing. If we define commands
     # using @bot.command(), this on_message might interfere or be redundant
     # for those commands. For now, we stick to manual parsing in on_message.
 
+# --- Process Setup ---
+# Importing this file has no side effects; everything that starts threads, opens
+# files or creates the client happens here, when the bot is run. The knowledge base
+# ingestion pool starts its workers with "spawn", which re-imports the main script
+# (this file, as '__mp_main__') in every worker, and those must not set up a bot.
+def setup():
+    """Configures logging and tracing, checks the token and creates the bot and its queues."""
+    global bot, preloader, admission_queue
+    # All logging (ours and discord.py's) goes through a background thread as JSON lines.
+    logging_setup.configure_logging(LOG_LEVEL, LOG_DEBUG_SAMPLE_RATE)
+
+    # --- Tracing ---
+    # A sample of messages (and, with TRACE_SLOW_THRESHOLD, every slow one) is traced:
+    # each stage gets a timed span, and the traces are written to TRACE_FILE in the
+    # OpenTelemetry JSON layout by a background thread (see modules/tracing.py).
+    tracing.configure_tracing(TRACE_SAMPLE_RATE, TRACE_FILE, TRACE_SLOW_THRESHOLD)
+
+    # --- Basic Input Validation ---
+    # Ensure the bot token is actually set
+    if not DISCORD_BOT_TOKEN:
+        logger.critical("DISCORD_BOT_TOKEN not found in .env file.")
+        logging_setup.shutdown_logging() # Flush the message before exiting
+        exit(1)
+
+    # --- Discord Bot Setup ---
+    # Define necessary intents for the bot to function
+    # Intents determine which events the bot receives from Discord.
+    # Without the correct intents, the bot won't receive certain events.
+    intents = discord.Intents.default()  # Start with default intents (presence, server members excluded)
+    # Slash commands arrive as interactions and need no message intents. The prefix
+    # commands do; without them Discord stops sending the bot every message.
+    intents.messages = ENABLE_PREFIX_COMMANDS        # Need to receive message events (e.g., when a message is sent)
+    intents.message_content = ENABLE_PREFIX_COMMANDS # CRUCIAL for prefix commands: permission to read the *content* of messages.
+                                                     # This requires enabling the intent in the Discord Developer Portal.
+
+    # Initialize the bot client using commands.Bot
+    # commands.Bot is a subclass of discord.Client that adds command handling functionality.
+    # We pass the command prefix and the enabled intents.
+    bot = commands.Bot(command_prefix=BOT_PREFIX, intents=intents)
+    bot.event(on_ready)
+    bot.event(on_message)
+    bot.tree.add_command(algohelp_commands)
+
+    preloader = data_preload.DataPreloader(max_waiting=PRELOAD_MAX_WAITING, wait_timeout=PRELOAD_WAIT_TIMEOUT)
+    admission_queue = admission.AdmissionQueue(QUERY_WORKERS, QUERY_QUEUE_DEPTH, QUERY_QUEUE_MAX_AGE)
+
 # --- Run the Bot ---
 # This is the standard Python entry point.
 # The code inside this block will only run when the script is executed directly
 # (not when it's imported as a module).
 if __name__ == "__main__":
-    print("Attempting to start the bot...")
+    setup()
+    logger.info("Attempting to start the bot...")
     try:
         # Start the bot's connection to Discord using the token.
         # This is a blocking call, meaning the script will stay running here
         # listening for events until the bot is stopped (e.g., Ctrl+C).
-        bot.run(DISCORD_BOT_TOKEN)
+        # log_handler=None keeps discord.py from installing its own handler, so its
+        # logs go through the same queue-backed JSON pipeline as ours.
+        bot.run(DISCORD_BOT_TOKEN, log_handler=None)
     except discord.LoginFailure:
         # Handle the specific error when the token is invalid.
-        print("\nError: Invalid Discord Bot Token.")
-        print("Please check the DISCORD_BOT_TOKEN in your .env file and ensure it's correct.")
-        print("Make sure you haven't accidentally revoked or regenerated the token.")
-    except Exception as e:
+        logger.critical("Invalid Discord Bot Token. Please check the DISCORD_BOT_TOKEN in your .env file and ensure it's correct. "
+                        "Make sure you haven't accidentally revoked or regenerated the token.")
+    except Exception:
         # Catch any other exceptions that might occur during bot startup.
-        print(f"\nAn unexpected error occurred during bot startup: {e}")
+        logger.exception("An unexpected error occurred during bot startup")
+    finally:
+        tracing.shutdown_tracing() # Write the traces still queued
+        # Keep the latest top queries for the next start (the periodic writer may be minutes behind).
+        cache = query_router.get_answer_cache()
+        if cache is not None and cache.path:
+            try:
+                cache.save()
+            except Exception:
+                logger.exception("Could not save warm cache", extra={"path": cache.path})
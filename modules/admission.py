@@ -0,0 +1,150 @@
+"""
+Admission control: a bounded queue in front of query processing.
+
+Every message used to start handler work as soon as it arrived, so a surge
+made every query slow at once. Queries now go through an `AdmissionQueue`:
+- A fixed pool of `workers` worker tasks takes queries from a FIFO queue, one
+  at a time each, so at most `workers` queries run handler work at once.
+- At most `max_depth` queries wait in the queue. A query arriving when it is
+  full is refused at once (the caller replies BUSY_MESSAGE) instead of piling up.
+- A query that waits more than `max_age` seconds is refused (and skipped by
+  the workers): its user has likely given up, and answering it would only
+  delay the queries behind it.
+
+A worker grants a query its turn and waits until the query is done; the query's
+work runs in its own task (the message event), which keeps its trace context
+(see tracing.py) and its error handling. This bounds the whole process and is
+independent of any per-user limits.
+
+Usage:
+    async with admission_queue.admit() as admitted:
+        if not admitted:
+            ... reply BUSY_MESSAGE ...
+        else:
+            ... route the query and send the reply ...
+"""
+import asyncio
+import contextlib
+import logging
+import time
+from typing import AsyncIterator, List, Optional
+
+from modules import metrics, tracing
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Queries processed at the same time.
+DEFAULT_WORKERS = 8
+# Queries that may wait for a worker.
+DEFAULT_MAX_DEPTH = 200
+# Seconds a query may wait for a worker before it is refused.
+DEFAULT_MAX_AGE = 10.0
+BUSY_MESSAGE = "I'm handling a lot of questions right now. Please try again in a moment."
+
+class _Ticket:
+    """A query waiting in the queue: when it arrived, and the futures of its turn and of its end."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.enqueued_at = time.monotonic()
+        self.turn: "asyncio.Future[bool]" = loop.create_future() # Set by the worker that takes the query
+        self.done: "asyncio.Future[None]" = loop.create_future()
+
+class AdmissionQueue:
+    """A bounded FIFO queue of queries served by a fixed pool of worker tasks."""
+
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_depth: int = DEFAULT_MAX_DEPTH,
+                 max_age: float = DEFAULT_MAX_AGE):
+        """
+        Args:
+            workers (int): Queries processed at the same time.
+            max_depth (int): Queries that may wait; more are refused at once.
+            max_age (float): Seconds a query may wait before it is refused.
+        """
+        self.workers = max(1, workers)
+        self.max_depth = max(1, max_depth)
+        self.max_age = max_age
+        self._queue: Optional["asyncio.Queue[_Ticket]"] = None
+        self._tasks: List[asyncio.Task] = []
+        self._busy = 0
+
+    def depth(self) -> int:
+        """Queries waiting for a worker."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def busy_workers(self) -> int:
+        """Workers currently processing a query."""
+        return self._busy
+
+    def start(self) -> None:
+        """Starts the worker tasks on the running event loop, once (`admit` calls it on first use)."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(self.max_depth)
+        self._tasks = [asyncio.create_task(self._work(), name=f"query-worker-{number}")
+                       for number in range(self.workers)]
+        metrics.ADMISSION_QUEUE_DEPTH.set_callback(self.depth)
+        metrics.ADMISSION_BUSY_WORKERS.set_callback(self.busy_workers)
+        logger.info("Query workers started", extra={"workers": self.workers, "max_depth": self.max_depth,
+                                                    "max_age": self.max_age})
+
+    async def stop(self) -> None:
+        """Stops the workers; queries still waiting are refused."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        while self._queue is not None and not self._queue.empty():
+            ticket = self._queue.get_nowait()
+            if not ticket.turn.done():
+                ticket.turn.set_result(False)
+        self._queue = None
+
+    @contextlib.asynccontextmanager
+    async def admit(self) -> AsyncIterator[bool]:
+        """
+        Waits for a worker to take this query; the worker is held until the block exits.
+
+        Yields:
+            bool: True if the query may run now; False if it was refused (queue
+                  full, or no worker took it within max_age): reply BUSY_MESSAGE.
+        """
+        self.start()
+        ticket = _Ticket(asyncio.get_running_loop())
+        try:
+            self._queue.put_nowait(ticket)
+        except asyncio.QueueFull:
+            metrics.ADMISSION_REJECTIONS.inc("full")
+            logger.debug("Query refused: queue full", extra={"depth": self.depth()})
+            yield False
+            return
+        try:
+            with tracing.span("admission.wait", depth=self.depth()) as span:
+                try:
+                    # On a timeout (or if this caller is cancelled) the turn is cancelled
+                    # and the workers skip the ticket
+                    admitted = await asyncio.wait_for(ticket.turn, self.max_age)
+                except asyncio.TimeoutError:
+                    metrics.ADMISSION_REJECTIONS.inc("expired")
+                    logger.debug("Query refused: waited too long", extra={"max_age": self.max_age})
+                    admitted = False
+                span.set_attribute("admitted", admitted)
+            yield admitted
+        finally:
+            if not ticket.done.done():
+                ticket.done.set_result(None) # Frees the worker
+
+    async def _work(self) -> None:
+        """One worker: grants the oldest waiting query its turn and waits until it is done."""
+        while True:
+            ticket = await self._queue.get()
+            if ticket.turn.done(): # Its caller stopped waiting (too old, or cancelled)
+                continue
+            metrics.ADMISSION_WAIT.observe(time.monotonic() - ticket.enqueued_at)
+            ticket.turn.set_result(True)
+            self._busy += 1
+            try:
+                await ticket.done
+            finally:
+                self._busy -= 1
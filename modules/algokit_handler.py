@@ -6,9 +6,15 @@ This module is responsible for:
 - Providing a function to search user queries for known AlgoKit command names.
 - Returning formatted help text for matched commands.
 """
+import logging
 import os
 import json
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Mapping, Sequence
+
+from modules import metrics, link_health, data_snapshots
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
 
 # --- Constants ---
 # Define the path to the JSON file containing AlgoKit command details.
@@ -44,61 +50,66 @@ def load_algokit_commands(filepath: str = COMMANDS_FILE_PATH) -> Dict[str, Any]:
     # Return cached data if available
     if _algokit_commands_data is not None:
         # print("Returning cached AlgoKit commands.") # Debugging cache hit
+        metrics.CACHE_LOOKUPS.inc("algokit_commands", "hit")
         return _algokit_commands_data
+    metrics.CACHE_LOOKUPS.inc("algokit_commands", "miss")
 
     try:
-        # Open and load the JSON file
-        with open(filepath, 'r', encoding='utf-8') as f:
-            loaded_data = json.load(f)
+        # Use the compiled snapshot if it is current (see data_snapshots.py),
+        # otherwise open and load the JSON file
+        loaded_data = data_snapshots.load_snapshot(data_snapshots.KIND_JSON, filepath)
+        if loaded_data is None:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                loaded_data = json.load(f)
 
         # Basic validation (ensure it's a dictionary)
         if not isinstance(loaded_data, dict):
-             print(f"Error: AlgoKit commands file at {filepath} does not contain a valid JSON dictionary.")
+             logger.error("AlgoKit commands file does not contain a valid JSON dictionary", extra={"path": filepath})
              _algokit_commands_data = {} # Ensure cache is empty on error
              return {}
 
         # Update the global cache
         _algokit_commands_data = loaded_data
-        print(f"AlgoKit commands loaded successfully from {filepath}. Entries: {len(_algokit_commands_data)}")
+        logger.info("AlgoKit commands loaded", extra={"path": filepath, "entries": len(_algokit_commands_data)})
         return _algokit_commands_data
     except FileNotFoundError:
         # Handle case where the file doesn't exist
-        print(f"Error: AlgoKit commands file not found at {filepath}")
+        logger.error("AlgoKit commands file not found", extra={"path": filepath})
         _algokit_commands_data = {} # Ensure cache is empty on error
         return {}
     except json.JSONDecodeError as e:
         # Handle invalid JSON format
-        print(f"Error: Could not decode JSON from {filepath}. Error: {e}")
+        logger.error("Could not decode AlgoKit commands JSON", extra={"path": filepath, "error": str(e)})
         _algokit_commands_data = {} # Ensure cache is empty on error
         return {}
     except Exception as e:
         # Handle other potential file reading errors
-        print(f"Error loading AlgoKit commands from {filepath}: {e}")
+        logger.exception("Error loading AlgoKit commands", extra={"path": filepath})
         _algokit_commands_data = {} # Ensure cache is empty on error
         return {}
 
-def get_algokit_help(query: str) -> Optional[str]:
+def _format_help(commands_data: Mapping[str, Any], command_name: str) -> str:
+    """Formats the help reply for a known command."""
+    command_info = commands_data[command_name]
+    # Retrieve summary and URL, providing defaults if they are missing
+    summary = command_info.get('summary', 'No summary available.')
+    url = command_info.get('url', 'No documentation URL available.')
+
+    # TODO: Consider using Discord embeds for richer formatting.
+    # Format the response string for Discord. Using < > around URL prevents auto-embed.
+    if link_health.is_broken(url):
+        # The link checker found the page gone (see link_health.py); the summary is still useful.
+        return f"**`algokit {command_name}`**: {summary}"
+    return f"**`algokit {command_name}`**: {summary}\nDocs: <{url}>"
+
+def find_command(query: str, commands_data: Mapping[str, Any]) -> Optional[str]:
     """
-    Searches the user's query string for a known AlgoKit command name.
-
-    It iterates through the command names loaded from `algokit_commands.json`.
-    If a known command name is detected within the query (using specific patterns
-    like "algokit [command]", "command [command]", or the command name as a distinct word),
-    it retrieves the command's summary and documentation URL.
-    Finally, it returns a formatted string suitable for display in Discord.
+    Returns the first known command name (in file order) mentioned in the query, or None.
 
     Args:
         query (str): The user's query string.
-
-    Returns:
-        Optional[str]: A formatted help string for the found command,
-                       or None if no known command name is detected in the query.
+        commands_data (Mapping[str, Any]): The loaded commands, keyed by command name.
     """
-    commands_data = load_algokit_commands() # Ensure commands are loaded
-    if not commands_data:
-        print("AlgoKit commands data is empty, cannot provide help.")
-        return None # Return early if no command data is available
-
     query_lower = query.lower() # Use lowercase for case-insensitive matching
 
     # --- Command Matching Logic ---
@@ -117,25 +128,89 @@ def get_algokit_help(query: str) -> Optional[str]:
             command_name in query_lower.split()):       # e.g., "what is deploy" (checks if 'deploy' is a whole word)
             found_command = command_name
             break # Stop searching once the first matching command is found
+    return found_command
+
+def get_algokit_help(query: str, commands_data: Optional[Mapping[str, Any]] = None) -> Optional[str]:
+    """
+    Searches the user's query string for a known AlgoKit command name.
+
+    It iterates through the command names loaded from `algokit_commands.json`.
+    If a known command name is detected within the query (using specific patterns
+    like "algokit [command]", "command [command]", or the command name as a distinct word),
+    it retrieves the command's summary and documentation URL.
+    Finally, it returns a formatted string suitable for display in Discord.
+
+    Args:
+        query (str): The user's query string.
+        commands_data (Optional[Mapping[str, Any]]): Commands to search instead of the
+            shared ones, e.g. a guild's layered commands (see guild_data.py).
+
+    Returns:
+        Optional[str]: A formatted help string for the found command,
+                       or None if no known command name is detected in the query.
+    """
+    if commands_data is None:
+        commands_data = load_algokit_commands() # Ensure commands are loaded
+    if not commands_data:
+        logger.warning("AlgoKit commands data is empty, cannot provide help.")
+        return None # Return early if no command data is available
+
+    found_command = find_command(query, commands_data)
 
     # --- Response Formatting ---
     # If a known command was found in the query
     if found_command and found_command in commands_data:
-        command_info = commands_data[found_command]
-        # Retrieve summary and URL, providing defaults if they are missing
-        summary = command_info.get('summary', 'No summary available.')
-        url = command_info.get('url', 'No documentation URL available.')
-
-        # TODO: Consider using Discord embeds for richer formatting.
-        # Format the response string for Discord. Using < > around URL prevents auto-embed.
-        return f"**`algokit {found_command}`**: {summary}\nDocs: <{url}>"
+        return _format_help(commands_data, found_command)
     else:
         # If no known command name was detected in the query
         # Note: The routing logic in bot.py might still send the query to other handlers (like Q&A)
         # if this function returns None.
-        print(f"No specific AlgoKit command found in query: '{query}'")
+        logger.debug("No specific AlgoKit command found in query", extra={"query": query})
         return None
 
+def get_algokit_help_batch(queries: Sequence[str]) -> List[Optional[str]]:
+    """
+    Finds AlgoKit command help for many queries at once.
+
+    Results are the same as calling `get_algokit_help` on each query (the first
+    matching command in file order wins), but the commands are loaded once and
+    each query is checked against them with set and prefix lookups instead of
+    one substring search per command and pattern. Identical queries (ignoring
+    case) are matched once.
+
+    Args:
+        queries (Sequence[str]): The query strings.
+
+    Returns:
+        List[Optional[str]]: One formatted help string (or None) per query, in input order.
+    """
+    commands_data = load_algokit_commands() # Loaded once for the whole batch
+    if not commands_data:
+        logger.warning("AlgoKit commands data is empty, cannot provide help.", extra={"queries": len(queries)})
+        return [None] * len(queries)
+
+    # Position of each command in file order (lower positions win, like the loop in get_algokit_help).
+    command_positions = {command_name: position for position, command_name in enumerate(commands_data)}
+    command_names = list(commands_data)
+    helps: Dict[str, Optional[str]] = {}
+    results: List[Optional[str]] = []
+    for query in queries:
+        query_lower = query.lower()
+        if query_lower not in helps:
+            # Commands appearing as distinct words...
+            matched = [command_positions[word] for word in query_lower.split() if word in command_positions]
+            # ...or right after "algokit " / "command " (as a prefix, like the substring check).
+            for pattern in ("algokit ", "command "):
+                start = query_lower.find(pattern)
+                while start != -1:
+                    after = start + len(pattern)
+                    matched.extend(position for position, command_name in enumerate(command_names)
+                                   if query_lower.startswith(command_name, after))
+                    start = query_lower.find(pattern, start + 1)
+            helps[query_lower] = _format_help(commands_data, command_names[min(matched)]) if matched else None
+        results.append(helps[query_lower])
+    return results
+
 # --- Example Usage / Direct Execution ---
 if __name__ == '__main__':
     # This block allows the script to be run directly for testing purposes
@@ -0,0 +1,349 @@
+"""
+Approximate nearest-neighbour (ANN) retrieval over hashed feature vectors.
+
+This module provides an optional retrieval mode for the knowledge base that
+does not depend on exact keyword overlap. It runs fully offline on the CPU
+using NumPy (an optional dependency; `NUMPY_AVAILABLE` is False without it):
+
+1. Feature hashing: every word is turned into hashed features (the word itself
+   plus its character trigrams, e.g. 'tokens' -> '<to', 'tok', ..., 'ns>').
+   Trigrams let related word forms ('token'/'tokens', 'create'/'creating')
+   share most of their features.
+2. Random projection: each hashed feature owns a fixed random vector, so a
+   word's vector is the sum of its features' vectors, and a line's vector is
+   the IDF-weighted sum of its words' vectors, normalized to unit length.
+   Cosine similarity between these short dense vectors approximates the
+   similarity of the much larger hashed feature vectors.
+3. Locality-sensitive hashing (LSH): random hyperplanes turn each line vector
+   into a few short bit signatures (one per table). Similar vectors tend to
+   share signatures, so a query only scores the lines in its own buckets
+   (plus the buckets one bit away), instead of every line.
+
+Bucket lookups use sorted NumPy arrays and `searchsorted`, and the number of
+signature bits grows with the size of the knowledge base so buckets stay
+small; query time therefore grows much more slowly than the number of lines.
+
+Indexes built with the same seed share one projection matrix, so their vectors
+live in the same space: `CombinedAnnIndex` queries several of them (e.g. one per
+knowledge base segment) as one index.
+
+Note that this captures surface similarity (shared words and word parts),
+not meaning: pure synonyms with no shared word parts are still not matched.
+"""
+import functools
+import logging
+import math
+import re
+import zlib
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional; the keyword retrieval mode does not need it
+    np = None
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+NUMPY_AVAILABLE = np is not None
+
+# --- Constants ---
+# Size of the hashed feature space. Each feature owns one row of the random
+# projection matrix (FEATURE_DIM x PROJECTION_DIM float32 values, 16 MiB).
+FEATURE_DIM = 2 ** 15
+# Length of the dense vectors that lines and queries are projected to. Projection
+# noise in cosine similarities shrinks with 1/sqrt(PROJECTION_DIM).
+PROJECTION_DIM = 128
+# Number of LSH tables; more tables improve recall at the cost of memory and candidates.
+NUM_TABLES = 24
+# Signature bits per table are chosen so buckets hold about this many lines on average.
+TARGET_BUCKET_SIZE = 32
+MIN_BITS_PER_TABLE = 4
+MAX_BITS_PER_TABLE = 20
+# Fixed seed, so an index built twice from the same lines gives the same answers.
+DEFAULT_SEED = 1729
+# Lines are projected in chunks of this many feature rows to bound temporary memory.
+_CHUNK_ROWS = 65536
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into lowercase words, dropping words of two characters or fewer."""
+    return [word for word in re.findall(r'\w+', text.lower()) if len(word) > 2]
+
+def _hash_feature(feature: str) -> int:
+    """Stable 32-bit hash of a feature (Python's `hash` is salted per process)."""
+    return zlib.crc32(feature.encode('utf-8'))
+
+def word_features(word: str) -> List[Tuple[int, float]]:
+    """
+    Returns the hashed features of one word as (signed feature index, weight) pairs.
+
+    The whole word and its character trigrams each contribute half of the
+    word's (L2) length, so two forms of a word that share most trigrams are
+    similar, and longer words do not dominate just by having more trigrams.
+    The sign (+1/-1, taken from one hash bit) makes colliding features cancel
+    out on average instead of always adding up.
+    """
+    padded = f"<{word}>"
+    trigrams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+    trigram_weight = 1.0 / math.sqrt(len(trigrams))
+    features = [("w:" + word, 1.0)]
+    features.extend(("t:" + trigram, trigram_weight) for trigram in trigrams)
+    result = []
+    for feature, weight in features:
+        hashed = _hash_feature(feature)
+        sign = -1.0 if hashed & 0x80000000 else 1.0
+        result.append((hashed % FEATURE_DIM, sign * weight))
+    return result
+
+def _segment_sums(matrix, rows, weights, offsets):
+    """
+    Sums weighted rows of `matrix` per segment: out[i] = sum(weights[j] * matrix[rows[j]])
+    for j in offsets[i]:offsets[i+1]. Empty segments give zero rows.
+    """
+    count = len(offsets) - 1
+    out = np.zeros((count, matrix.shape[1]), dtype=np.float32)
+    non_empty = np.flatnonzero(np.diff(offsets))
+    segment_ends = offsets[non_empty + 1]
+    start_segment = 0
+    while start_segment < len(non_empty):
+        # Take as many segments as fit in one chunk (always at least one)
+        first = offsets[non_empty[start_segment]]
+        end_segment = int(np.searchsorted(segment_ends, first + _CHUNK_ROWS, side='right'))
+        end_segment = max(end_segment, start_segment + 1)
+        segments = non_empty[start_segment:end_segment]
+        last = offsets[segments[-1] + 1]
+        gathered = matrix[rows[first:last]] * weights[first:last, None]
+        # Empty segments between the chosen ones contribute no rows, so the
+        # chosen segments' start offsets split `gathered` exactly.
+        out[segments] = np.add.reduceat(gathered, offsets[segments] - first, axis=0)
+        start_segment = end_segment
+    return out
+
+@functools.lru_cache(maxsize=None)
+def _random_projection(seed: int):
+    """
+    The projection matrix of `seed` (read-only, shared by every index built with
+    that seed), and the state of the random generator after drawing it.
+    """
+    rng = np.random.default_rng(seed)
+    projection = rng.standard_normal((FEATURE_DIM, PROJECTION_DIM), dtype=np.float32)
+    projection.flags.writeable = False
+    return projection, rng.bit_generator.state
+
+def _normalize_rows(vectors):
+    """Scales each row to unit length (zero rows stay zero) in place and returns the norms."""
+    norms = np.linalg.norm(vectors, axis=1)
+    nonzero = norms > 0
+    vectors[nonzero] /= norms[nonzero, None]
+    return norms
+
+class AnnIndex:
+    """
+    A random-projection LSH index over a fixed list of texts (e.g. knowledge base lines).
+
+    Build it once with `AnnIndex(texts)`, then call `query(text, top_k)` to get the
+    most similar texts' indices and cosine similarities.
+    """
+
+    def __init__(self, texts: Iterable[str], num_tables: int = NUM_TABLES,
+                 bits_per_table: Optional[int] = None, seed: int = DEFAULT_SEED):
+        """
+        Builds the index.
+
+        Args:
+            texts (Iterable[str]): The texts to index, in order; results refer to their positions.
+            num_tables (int): Number of LSH tables.
+            bits_per_table (Optional[int]): Signature bits per table. Defaults to a value
+                                            derived from the number of texts (see TARGET_BUCKET_SIZE).
+            seed (int): Seed for the random projection and hyperplanes.
+
+        Raises:
+            RuntimeError: If NumPy is not installed.
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("The ANN index requires NumPy (pip install numpy).")
+        # The projection matrix is drawn once per seed; the generator continues from
+        # where it left off, so the hyperplanes are the same as if drawn right after it
+        self._projection, state = _random_projection(seed)
+        rng = np.random.default_rng(seed)
+        rng.bit_generator.state = state
+
+        # --- Vocabulary and Document Frequencies ---
+        # Each text becomes the ids of its distinct words, stored back to back.
+        self._vocabulary: Dict[str, int] = {}
+        text_words: List[int] = []
+        text_offsets = [0]
+        for text in texts:
+            for word in set(tokenize(text)):
+                word_id = self._vocabulary.get(word)
+                if word_id is None:
+                    word_id = self._vocabulary[word] = len(self._vocabulary)
+                text_words.append(word_id)
+            text_offsets.append(len(text_words))
+        self.size = len(text_offsets) - 1
+        word_ids = np.asarray(text_words, dtype=np.int64)
+        offsets = np.asarray(text_offsets, dtype=np.int64)
+
+        # Inverse document frequency: rare words weigh more than common ones.
+        document_frequency = np.bincount(word_ids, minlength=len(self._vocabulary))
+        self._idf = (np.log((self.size + 1) / (document_frequency + 1)) + 1.0).astype(np.float32)
+        # Words never seen at build time get the highest weight (they are the rarest).
+        self._unknown_idf = float(np.log(self.size + 1) + 1.0)
+
+        # --- Word and Text Vectors ---
+        self._word_vectors = self._project_words(list(self._vocabulary))
+        self._vectors = _segment_sums(self._word_vectors, word_ids, self._idf[word_ids], offsets)
+        norms = _normalize_rows(self._vectors)
+
+        # --- LSH Tables ---
+        if bits_per_table is None:
+            bits_per_table = round(math.log2(max(self.size, 1) / TARGET_BUCKET_SIZE))
+            bits_per_table = min(max(bits_per_table, MIN_BITS_PER_TABLE), MAX_BITS_PER_TABLE)
+        self.num_tables = num_tables
+        self.bits_per_table = bits_per_table
+        self._hyperplanes = rng.standard_normal((PROJECTION_DIM, num_tables * bits_per_table), dtype=np.float32)
+        self._bit_values = (1 << np.arange(bits_per_table, dtype=np.int64))
+        # Texts without any words have no direction and are left out of the tables.
+        indexed = np.flatnonzero(norms > 0)
+        keys = self._signatures(self._vectors[indexed])
+        # All tables share one sorted array of bucket keys, where a bucket key is
+        # (table number << bits_per_table) | signature, so every probe of every
+        # table is answered by one vectorized `searchsorted`. `_bucket_ids` holds
+        # the text index for each entry of `_bucket_keys`.
+        bucket_keys = (np.arange(num_tables, dtype=np.int64) << bits_per_table) | keys
+        order = np.argsort(bucket_keys, axis=None, kind='stable')
+        self._bucket_keys = bucket_keys.ravel()[order]
+        # Keys are laid out one row per text, so entry `position` belongs to text row position // num_tables.
+        self._bucket_ids = indexed[order // num_tables].astype(np.int32)
+        logger.info("ANN index built", extra={"texts": self.size, "vocabulary": len(self._vocabulary),
+                                              "tables": num_tables, "bits_per_table": bits_per_table})
+
+    def _project_words(self, words: List[str]):
+        """Returns the (unnormalized) projected vector of each word, one row per word."""
+        rows, weights, offsets = [], [], [0]
+        for word in words:
+            for feature, weight in word_features(word):
+                rows.append(feature)
+                weights.append(weight)
+            offsets.append(len(rows))
+        return _segment_sums(self._projection, np.asarray(rows, dtype=np.int64),
+                             np.asarray(weights, dtype=np.float32), np.asarray(offsets, dtype=np.int64))
+
+    def _signatures(self, vectors):
+        """Returns one integer signature per (vector, table): the signs of its hyperplane projections."""
+        bits = (vectors @ self._hyperplanes) > 0
+        bits = bits.reshape(len(vectors), self.num_tables, self.bits_per_table)
+        return bits.astype(np.int64) @ self._bit_values
+
+    def embed(self, text: str):
+        """Returns the normalized vector of `text` (all zeros if it has no usable words)."""
+        words = set(tokenize(text))
+        known = [self._vocabulary[word] for word in words if word in self._vocabulary]
+        unknown = [word for word in words if word not in self._vocabulary]
+        vector = np.zeros(PROJECTION_DIM, dtype=np.float32)
+        if known:
+            vector += self._idf[known] @ self._word_vectors[known]
+        if unknown:
+            vector += self._unknown_idf * self._project_words(unknown).sum(axis=0)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def candidates(self, vector):
+        """
+        Returns the indices of texts sharing an LSH bucket with `vector`.
+
+        Besides the vector's own bucket, each table is also probed at the
+        buckets whose signature differs in exactly one bit (multi-probe LSH),
+        which raises recall without adding tables.
+        """
+        keys = self._signatures(vector[None, :])[0]
+        flips = np.concatenate(([0], self._bit_values))
+        tables = np.arange(self.num_tables, dtype=np.int64)
+        probes = ((tables << self.bits_per_table)[:, None] | (keys[:, None] ^ flips)).ravel()
+        starts = np.searchsorted(self._bucket_keys, probes, side='left')
+        ends = np.searchsorted(self._bucket_keys, probes, side='right')
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.empty(0, dtype=np.int32)
+        # Positions of all entries in the probed buckets: each bucket's start,
+        # repeated once per entry, plus the entry's offset within the bucket.
+        bucket_starts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return np.unique(self._bucket_ids[bucket_starts + np.arange(total)])
+
+    def query(self, text: str, top_k: int = 10, excluded=None) -> List[Tuple[int, float]]:
+        """
+        Finds the texts most similar to `text` among its LSH candidates.
+
+        Args:
+            text (str): The query text.
+            top_k (int): Maximum number of results.
+            excluded (Optional[np.ndarray]): Boolean mask with one entry per text; texts
+                                             marked True (e.g. deleted ones) are left out
+                                             before the `top_k` best are picked.
+
+        Returns:
+            List[Tuple[int, float]]: (text index, cosine similarity) pairs, most similar
+                                     first (lower index first on ties). Empty if the
+                                     query has no usable words or no candidates.
+        """
+        vector = self.embed(text)
+        if not vector.any():
+            return []
+        candidates = self.candidates(vector)
+        if excluded is not None:
+            candidates = candidates[~excluded[candidates]]
+        if len(candidates) == 0:
+            return []
+        similarities = self._vectors[candidates] @ vector
+        if len(candidates) > top_k:
+            best = np.argpartition(-similarities, top_k - 1)[:top_k]
+            candidates, similarities = candidates[best], similarities[best]
+        order = np.lexsort((candidates, -similarities))
+        return [(int(candidates[i]), float(similarities[i])) for i in order]
+
+    def exact_query(self, text: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """Like `query`, but scores every text (brute force). Used to measure LSH recall."""
+        vector = self.embed(text)
+        if not vector.any() or self.size == 0:
+            return []
+        similarities = self._vectors @ vector
+        top_k = min(top_k, self.size)
+        best = np.argpartition(-similarities, top_k - 1)[:top_k]
+        order = np.lexsort((best, -similarities[best]))
+        return [(int(best[i]), float(similarities[best[i]])) for i in order]
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the index arrays (excluding the vocabulary dict; the projection is shared)."""
+        arrays = (self._projection, self._idf, self._word_vectors, self._vectors,
+                  self._hyperplanes, self._bucket_keys, self._bucket_ids)
+        return sum(array.nbytes for array in arrays)
+
+class CombinedAnnIndex:
+    """
+    Several indexes queried as one, e.g. one per knowledge base segment.
+
+    Each part covers a consecutive range of texts starting at its `offset`, and
+    may exclude some of its texts (e.g. deleted documents). A query asks every
+    part for its `top_k` best remaining texts and keeps the overall best. The parts must
+    be built with the same seed (so their vectors are comparable); each computes
+    its own word weights, so similarities across parts are close but not exact.
+    """
+
+    def __init__(self, parts: Sequence[Tuple[AnnIndex, int, Optional["np.ndarray"]]]):
+        """
+        Args:
+            parts (Sequence[Tuple[AnnIndex, int, Optional[np.ndarray]]]):
+                (index, offset of its first text, boolean mask of the index's texts
+                to leave out, or None; see `AnnIndex.query`) per part.
+        """
+        self.parts = list(parts)
+        self.size = sum(index.size for index, _, _ in self.parts)
+
+    def query(self, text: str, top_k: int = 10) -> List[Tuple[int, float]]:
+        """Like `AnnIndex.query`, with text indices counted across the parts."""
+        results = []
+        for index, offset, excluded in self.parts:
+            results.extend((offset + i, similarity) for i, similarity in index.query(text, top_k, excluded))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:top_k]
@@ -0,0 +1,199 @@
+"""
+In-memory answer cache with query-frequency tracking and a persistent warm cache.
+
+The bot answers the same top questions many times a day. This module:
+- Keeps recent responses in memory (LRU), keyed by the normalized query, so a
+  repeated question skips the handlers entirely.
+- Counts how often each normalized query is asked.
+- Periodically writes the most frequent queries and their responses to a local
+  SQLite file (`save`, which also halves the counts so the ranking follows
+  recent traffic), and reads them back on startup (`load`), so the first
+  users after a restart or redeploy get cached answers instead of paying the
+  full cost.
+
+Every entry is tagged with the data generation it was computed from: a
+fingerprint of the data files and handler code, supplied by the caller (see
+`query_router.data_generation`). An entry from another generation is never
+served; on startup such entries are returned by `load` so the caller can
+recompute them.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, List, Optional, Tuple
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Default location of the warm cache (ignored by git).
+WARM_CACHE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'warm_cache.sqlite3')
+# Responses kept in memory.
+DEFAULT_MAX_ENTRIES = 2048
+# Most frequent queries written to the warm cache.
+DEFAULT_TOP_N = 500
+# Distinct queries whose frequency is tracked; beyond this the rarest are dropped.
+MAX_TRACKED_QUERIES = 50000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS warm_cache (
+    query TEXT PRIMARY KEY,
+    response TEXT,
+    route TEXT NOT NULL,
+    hits INTEGER NOT NULL,
+    generation TEXT NOT NULL,
+    saved_at REAL NOT NULL
+)
+"""
+
+# A cache entry: (response, route that produced it, data generation).
+Entry = Tuple[Optional[str], str, str]
+
+def normalize_query(query: str) -> str:
+    """
+    Returns the cache key of a query: lowercased, without surrounding whitespace.
+
+    Every handler matches queries case-insensitively, so queries differing only
+    in case get the same response. Punctuation and inner whitespace are kept:
+    the AlgoKit and doc link routes match substrings (e.g. "link for",
+    "deploy" as a whole word), so removing them could change the response.
+    """
+    return query.strip().lower()
+
+class AnswerCache:
+    """An LRU cache of responses plus query frequencies, persisted to SQLite on request."""
+
+    def __init__(self, generation: Callable[[], str], path: Optional[str] = WARM_CACHE_PATH,
+                 max_entries: int = DEFAULT_MAX_ENTRIES, top_n: int = DEFAULT_TOP_N):
+        """
+        Args:
+            generation (Callable[[], str]): Returns the current data generation.
+            path (Optional[str]): SQLite file of the warm cache (None: memory only).
+            max_entries (int): Responses kept in memory.
+            top_n (int): Queries written by `save`.
+        """
+        self._generation = generation
+        self.path = path
+        self.max_entries = max_entries
+        self.top_n = top_n
+        self._entries: "OrderedDict[str, Entry]" = OrderedDict()
+        self._frequencies: Counter = Counter()
+        # Entries are read and written on the event loop, but `save` runs in a worker thread.
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # --- Lookups ---
+    def record(self, key: str) -> None:
+        """Counts one occurrence of a normalized query."""
+        with self._lock:
+            self._frequencies[key] += 1
+            if len(self._frequencies) > MAX_TRACKED_QUERIES:
+                # Keep the most frequent half; one-off queries are the ones dropped.
+                self._frequencies = Counter(dict(self._frequencies.most_common(MAX_TRACKED_QUERIES // 2)))
+
+    def get(self, key: str) -> Optional[Tuple[Optional[str], str]]:
+        """
+        Returns (response, route) for a normalized query, or None on a miss.
+
+        Entries of another data generation are dropped instead of served.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            response, route, generation = entry
+            if generation != self._generation():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response, route
+
+    def put(self, key: str, response: Optional[str], route: str) -> None:
+        """Stores the response (None for a fallback) produced by `route` for a normalized query."""
+        with self._lock:
+            self._entries[key] = (response, route, self._generation())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    # --- Persistence ---
+    def save(self) -> int:
+        """
+        Writes the `top_n` most frequent queries that have a current cached response
+        to the warm cache, replacing its previous content. Blocking (run it in a thread).
+
+        Returns:
+            int: Number of entries written.
+        """
+        if not self.path:
+            return 0
+        started = time.perf_counter()
+        generation = self._generation()
+        with self._lock:
+            rows = []
+            for key, hits in self._frequencies.most_common():
+                entry = self._entries.get(key)
+                if entry is not None and entry[2] == generation:
+                    rows.append((key, entry[0], entry[1], hits, generation, time.time()))
+                    if len(rows) >= self.top_n:
+                        break
+            # Halve every count, so the ranking follows recent traffic rather than all-time totals.
+            self._frequencies = Counter({key: hits // 2 for key, hits in self._frequencies.items() if hits > 1})
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection: # One transaction: a crash leaves the previous content intact
+                connection.execute(_SCHEMA)
+                connection.execute("DELETE FROM warm_cache")
+                connection.executemany("INSERT INTO warm_cache VALUES (?, ?, ?, ?, ?, ?)", rows)
+        finally:
+            connection.close()
+        logger.info("Warm cache saved", extra={"path": self.path, "entries": len(rows),
+                                               "elapsed_ms": (time.perf_counter() - started) * 1000})
+        return len(rows)
+
+    def load(self) -> List[str]:
+        """
+        Reads the warm cache back. Blocking (run it in a thread).
+
+        Frequencies are restored for every saved query. Entries of the current
+        data generation go straight into memory; the others are returned, most
+        frequent first, so the caller can recompute (and re-cache) their responses.
+
+        Returns:
+            List[str]: Normalized queries whose saved response is stale.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return []
+        generation = self._generation()
+        connection = sqlite3.connect(self.path)
+        try:
+            connection.execute(_SCHEMA)
+            rows = connection.execute(
+                "SELECT query, response, route, hits, generation FROM warm_cache ORDER BY hits DESC").fetchall()
+        except sqlite3.DatabaseError:
+            logger.exception("Could not read warm cache", extra={"path": self.path})
+            return []
+        finally:
+            connection.close()
+
+        stale: List[str] = []
+        with self._lock:
+            # Least frequent first, so the most frequent end up most recently used.
+            for key, response, route, hits, saved_generation in reversed(rows):
+                self._frequencies[key] = max(self._frequencies[key], hits)
+                if saved_generation == generation:
+                    self._entries[key] = (response, route, generation)
+                    self._entries.move_to_end(key)
+                else:
+                    stale.append(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        stale.reverse()
+        logger.info("Warm cache loaded", extra={"path": self.path, "entries": len(rows), "stale": len(stale)})
+        return stale
@@ -0,0 +1,150 @@
+"""
+Autocomplete for the slash command options: AlgoKit commands and doc topics.
+
+Discord asks for choices on every keystroke and drops answers that come late,
+so completion must be fast and must never touch disk. Each data set is
+indexed once into a sorted array of search terms, searched with `bisect`:
+- AlgoKit commands (algokit_commands.json): the command name and its keywords.
+- Doc topics (new_doc_links.json): the topic title and the entry key.
+Every word position of a term is indexed too ("creation tutorial" and
+"tutorial" for "ASA Creation Tutorial"), so typing any word of a topic finds it.
+
+Matches are ranked by popularity: how often each choice was picked in this
+process (`record_use`), then alphabetically. An index is rebuilt when its
+loader returns a different object (i.e. the data was reloaded); the loaders
+return their cached data, so lookups after the startup preload read memory only.
+Guild-specific data (guild_data.py) is not offered as choices, but can still be typed.
+"""
+import bisect
+import heapq
+import logging
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from modules import algokit_handler, doc_linker
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Discord shows at most 25 choices, with names and values of at most 100 characters.
+MAX_CHOICES = 25
+MAX_CHOICE_LENGTH = 100
+
+# A completion: (label shown to the user, value passed to the command).
+Choice = Tuple[str, str]
+
+class CompletionIndex:
+    """Prefix search over the terms of a set of choices (sorted array + bisect)."""
+
+    def __init__(self, choices: Iterable[Tuple[str, str, Iterable[str]]]):
+        """
+        Args:
+            choices (Iterable[Tuple[str, str, Iterable[str]]]): (label, value, search terms)
+                per choice; the label is searched as well.
+        """
+        self.choices: List[Choice] = []
+        pairs = set()
+        for label, value, terms in choices:
+            choice_id = len(self.choices)
+            self.choices.append((label[:MAX_CHOICE_LENGTH], value[:MAX_CHOICE_LENGTH]))
+            for term in (label, *terms):
+                words = term.lower().split()
+                for start in range(len(words)): # Every word position, so any word can be typed first
+                    pairs.add((" ".join(words[start:]), choice_id))
+        pairs = sorted(pairs)
+        self._terms = [term for term, _ in pairs]
+        self._choice_ids = [choice_id for _, choice_id in pairs]
+        self.values = frozenset(value.lower() for _, value in self.choices)
+
+    def __len__(self) -> int:
+        return len(self.choices)
+
+    def complete(self, prefix: str, popularity: Mapping[str, int], limit: int = MAX_CHOICES) -> List[Choice]:
+        """
+        Returns the choices with a term starting with `prefix`, most popular first.
+
+        Args:
+            prefix (str): What the user typed so far (case-insensitive; empty matches everything).
+            popularity (Mapping[str, int]): Uses per (lowercased) choice value.
+            limit (int): Maximum number of choices returned.
+
+        Returns:
+            List[Choice]: (label, value) pairs.
+        """
+        prefix = " ".join(prefix.lower().split())
+        start = bisect.bisect_left(self._terms, prefix)
+        # Terms starting with the prefix sort right after it, up to prefix + the highest character
+        end = bisect.bisect_left(self._terms, prefix + "\U0010ffff", start)
+        matched = set(self._choice_ids[start:end])
+        def rank(choice_id: int) -> Tuple[int, str]:
+            label, value = self.choices[choice_id]
+            return -popularity.get(value.lower(), 0), label.lower()
+
+        best = heapq.nsmallest(limit, matched, key=rank)
+        return [self.choices[choice_id] for choice_id in best]
+
+def _command_choices(commands_data: Mapping[str, Any]) -> Iterable[Tuple[str, str, Iterable[str]]]:
+    """AlgoKit commands: labelled by name, searchable by their keywords."""
+    for name, info in commands_data.items():
+        keywords = info.get("keywords", []) if isinstance(info, dict) else []
+        yield name, name, [keyword for keyword in keywords if isinstance(keyword, str)]
+
+def _doc_topic_choices(doc_links: Mapping[str, Any]) -> Iterable[Tuple[str, str, Iterable[str]]]:
+    """Doc links: labelled by topic (or key), with the key as the value passed to the docs command."""
+    for key, info in doc_links.items():
+        topic = info.get("topic") if isinstance(info, dict) else None
+        yield topic or key, key, [key]
+
+class _IndexSource:
+    """An index over one loader's data, rebuilt when the loader returns a different object."""
+
+    def __init__(self, name: str, loader: Callable[[], Mapping[str, Any]],
+                 choices: Callable[[Mapping[str, Any]], Iterable[Tuple[str, str, Iterable[str]]]]):
+        self.name = name
+        self._loader = loader
+        self._choices = choices
+        self._data: Optional[Mapping[str, Any]] = None
+        self._index: Optional[CompletionIndex] = None
+        self.popularity: Counter = Counter()
+
+    def index(self) -> CompletionIndex:
+        data = self._loader()
+        if self._index is None or data is not self._data:
+            started = time.perf_counter()
+            self._index, self._data = CompletionIndex(self._choices(data)), data
+            logger.info("Autocomplete index built", extra={"source": self.name, "choices": len(self._index),
+                                                           "elapsed_ms": (time.perf_counter() - started) * 1000})
+        return self._index
+
+    def complete(self, prefix: str, limit: int = MAX_CHOICES) -> List[Choice]:
+        return self.index().complete(prefix, self.popularity, limit)
+
+# --- Default Sources ---
+# The loaders are looked up when called, so they can be replaced.
+_sources: Dict[str, _IndexSource] = {
+    "algokit": _IndexSource("algokit", lambda: algokit_handler.load_algokit_commands(), _command_choices),
+    "docs": _IndexSource("docs", lambda: doc_linker.load_doc_links(), _doc_topic_choices),
+}
+
+def complete(source: str, prefix: str, limit: int = MAX_CHOICES) -> List[Choice]:
+    """
+    Returns autocomplete choices for a slash command option.
+
+    Args:
+        source (str): 'algokit' (command names) or 'docs' (doc topics).
+        prefix (str): What the user typed so far.
+        limit (int): Maximum number of choices.
+
+    Returns:
+        List[Choice]: (label, value) pairs, most popular first.
+    """
+    return _sources[source].complete(prefix, limit)
+
+def record_use(source: str, value: str) -> None:
+    """Counts one use of a choice value (e.g. a command someone asked about), for the ranking; free text is ignored."""
+    index_source = _sources[source]
+    key = value.strip().lower()
+    if key in index_source.index().values:
+        index_source.popularity[key] += 1
@@ -0,0 +1,76 @@
+"""
+A small Bloom filter: a compact set that can answer "definitely not present".
+
+Used as a vocabulary pre-check for the knowledge base (see
+`CompactKnowledgeBase.might_contain`): a query whose keywords are all absent
+from the filter cannot match any line, so it is rejected after a few hash
+lookups instead of a search. False positives (a word reported as possibly
+present although it is not) only cost the search that would have run anyway;
+there are no false negatives.
+
+Positions are derived from Python's built-in `hash()` with double hashing, so
+a filter is only valid within the process that built it (string hashes are
+randomized per process). It is rebuilt with the knowledge base, never saved.
+"""
+import math
+from typing import Iterable
+
+# --- Constants ---
+# Share of absent words reported as possibly present. At 1%, the filter takes
+# about 10 bits per word, a fraction of the memory of a set of the words.
+DEFAULT_ERROR_RATE = 0.01
+
+_HASH_MASK = (1 << 64) - 1
+
+class BloomFilter:
+    """A fixed-size Bloom filter over strings."""
+
+    def __init__(self, capacity: int, error_rate: float = DEFAULT_ERROR_RATE):
+        """
+        Sizes the filter for `capacity` items at the given false positive rate.
+
+        Args:
+            capacity (int): Expected number of distinct items.
+            error_rate (float): Target false positive rate once `capacity` items are added.
+        """
+        capacity = max(capacity, 1)
+        # Standard sizing: m = -n ln(p) / ln(2)^2 bits and k = (m / n) ln(2) hash functions.
+        self.num_bits = max(64, math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str) -> Iterable[int]:
+        """The `num_hashes` bit positions of an item (Kirsch-Mitzenmacher double hashing)."""
+        value = hash(item) & _HASH_MASK
+        first, second = value & 0xFFFFFFFF, (value >> 32) | 1 # Odd step, so positions don't repeat early
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, item: str) -> None:
+        """Adds an item to the filter."""
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]) -> None:
+        """Adds several items (same as `add` in a loop, with the hashing inlined for bulk loads)."""
+        bits, num_bits, hash_range = self._bits, self.num_bits, range(self.num_hashes)
+        added = 0
+        for item in items:
+            value = hash(item) & _HASH_MASK
+            first, second = value & 0xFFFFFFFF, (value >> 32) | 1
+            for i in hash_range:
+                position = (first + i * second) % num_bits
+                bits[position >> 3] |= 1 << (position & 7)
+            added += 1
+        self.count += added
+
+    def __contains__(self, item: str) -> bool:
+        """False if the item was definitely never added; True if it probably was."""
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def memory_bytes(self) -> int:
+        """Size of the bit array."""
+        return len(self._bits)
@@ -0,0 +1,129 @@
+"""
+Loads the bot's data sources once per process, concurrently, off the event loop.
+
+`on_ready` fires on the first connection and again after every gateway
+reconnect, so loading data there directly would repeat the full load on each
+reconnect, and would run the file parsing on the event loop (delaying
+heartbeats). Instead:
+- `DataPreloader.preload` runs every loader at the same time in worker
+  threads. The first call starts the load and every later call (from a
+  reconnect, or concurrently) awaits that same load, so it runs exactly once.
+- Messages that arrive before the load has finished wait for it through
+  `DataPreloader.wait_until_ready`, which admits at most `max_waiting`
+  messages at a time for at most `wait_timeout` seconds. Anything beyond that
+  gets a quick "warming up" reply instead of triggering lazy loads of its own.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from modules import qa_handler, doc_linker, algokit_handler, link_health, metrics
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Messages that may wait for the preload at the same time.
+DEFAULT_MAX_WAITING = 100
+# Seconds a message waits for the preload before getting the warming up reply.
+DEFAULT_WAIT_TIMEOUT = 10.0
+WARMING_UP_MESSAGE = "I'm still warming up (loading the documentation data). Please try again in a few seconds."
+
+# Data sources loaded at startup. The loaders are looked up when called, so they can be replaced.
+DEFAULT_LOADERS: Dict[str, Callable[[], object]] = {
+    "knowledge_base": lambda: qa_handler.load_knowledge_base(),
+    "doc_links": lambda: doc_linker.load_doc_links(),
+    "algokit_commands": lambda: algokit_handler.load_algokit_commands(),
+    "link_health": lambda: link_health.load_results(),
+}
+
+class DataPreloader:
+    """Runs a set of blocking loaders once, concurrently, and gates queries until they're done."""
+
+    def __init__(self, loaders: Optional[Dict[str, Callable[[], object]]] = None,
+                 max_waiting: int = DEFAULT_MAX_WAITING, wait_timeout: float = DEFAULT_WAIT_TIMEOUT):
+        """
+        Args:
+            loaders (Optional[Dict[str, Callable[[], object]]]): Source name -> blocking loader
+                (defaults to DEFAULT_LOADERS).
+            max_waiting (int): Messages that may wait for the preload at the same time.
+            wait_timeout (float): Seconds a message waits before giving up.
+        """
+        self.loaders = DEFAULT_LOADERS if loaders is None else loaders
+        self.max_waiting = max_waiting
+        self.wait_timeout = wait_timeout
+        self._task: Optional[asyncio.Task] = None
+        self._ready = False
+        self._waiting = 0
+
+    def is_ready(self) -> bool:
+        """True once every loader has finished (successfully or not)."""
+        return self._ready
+
+    async def preload(self) -> Dict[str, float]:
+        """
+        Loads every data source, the first time it is called; later calls await the same load.
+
+        Returns:
+            Dict[str, float]: Seconds each source took to load (failed sources are logged and omitted).
+        """
+        # Shielded: a cancelled caller (e.g. on_ready during a disconnect) must not cancel the load.
+        return await asyncio.shield(self._start())
+
+    def _start(self) -> asyncio.Task:
+        """Returns the load task, starting it on first use."""
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._load_all())
+        return self._task
+
+    async def _load_all(self) -> Dict[str, float]:
+        """Runs the loaders concurrently in worker threads, leaving the event loop free."""
+        started = time.perf_counter()
+        logger.info("Pre-loading data...", extra={"sources": list(self.loaders)})
+        results = await asyncio.gather(*(asyncio.to_thread(self._load, name, loader)
+                                         for name, loader in self.loaders.items()))
+        durations = {name: elapsed for name, elapsed in zip(self.loaders, results) if elapsed is not None}
+        self._ready = True
+        logger.info("Data pre-loading complete.", extra={"elapsed_ms": (time.perf_counter() - started) * 1000,
+                                                         "sources_ms": {name: elapsed * 1000
+                                                                        for name, elapsed in durations.items()}})
+        return durations
+
+    @staticmethod
+    def _load(name: str, loader: Callable[[], object]) -> Optional[float]:
+        """Runs one loader; returns its duration, or None if it failed (the handlers then load lazily)."""
+        started = time.perf_counter()
+        try:
+            loader()
+        except FileNotFoundError as e:
+            logger.error("Error loading data file. Please ensure all data files exist.",
+                         extra={"source": name, "error": str(e)})
+            return None
+        except Exception:
+            logger.exception("An unexpected error occurred during data loading", extra={"source": name})
+            return None
+        return time.perf_counter() - started
+
+    async def wait_until_ready(self) -> bool:
+        """
+        Waits for the preload to finish, if there is room among the waiting messages.
+
+        Returns:
+            bool: True if the data is loaded; False if too many messages are already
+                  waiting or the wait timed out (the caller should reply WARMING_UP_MESSAGE).
+        """
+        if self._ready:
+            return True
+        if self._waiting >= self.max_waiting:
+            metrics.WARMING_UP_REPLIES.inc()
+            return False
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(asyncio.shield(self._start()), self.wait_timeout)
+            return True
+        except asyncio.TimeoutError:
+            metrics.WARMING_UP_REPLIES.inc()
+            return False
+        finally:
+            self._waiting -= 1
@@ -0,0 +1,207 @@
+"""
+Compiled msgpack snapshots of the data files, for fast loading.
+
+Parsing the data files at startup costs time and memory: JSON catalogues are
+parsed into dictionaries token by token, and the knowledge base text is split,
+lowercased and indexed line by line. A compile step (`compile_all`, or
+`python -m modules.data_snapshots`) writes each source once to a msgpack
+snapshot in SNAPSHOT_DIR:
+- `algokit_commands.json` and `new_doc_links.json`: the parsed dictionaries.
+- The knowledge base: its compact buffers plus the prebuilt word index and
+  positional postings (see `CompactKnowledgeBase.to_state`), so loading it
+  reads a few large byte strings instead of tokenizing every line.
+
+A snapshot starts with a small header (format version, kind, and the source's
+size, modification time and SHA-256 checksum), followed by the payload. The
+loaders ask for a snapshot first (`load_snapshot`, `load_knowledge_base`); it
+is used only if the header matches the current source file: same size, and
+same modification time or (after e.g. a fresh checkout) same checksum. A stale,
+missing or unreadable snapshot, or a missing msgpack package, makes the loader
+parse the source file as before, so snapshots are never required.
+"""
+import contextlib
+import gc
+import hashlib
+import json
+import logging
+import mmap
+import os
+import time
+from typing import Any, List, Optional
+
+from modules import metrics
+from modules.kb_store import CompactKnowledgeBase
+
+try:
+    import msgpack
+except ImportError: # Optional; without it the loaders always parse the source files
+    msgpack = None
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Directory of the compiled snapshots (one '<source file name>.msgpack' per source).
+SNAPSHOT_DIR = os.getenv('DATA_SNAPSHOT_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'compiled'))
+# Bumped whenever the layout of a snapshot changes; snapshots of another version are ignored.
+SNAPSHOT_FORMAT_VERSION = 1
+# Snapshot kinds: the JSON catalogues and the knowledge base.
+KIND_JSON = "json"
+KIND_KNOWLEDGE_BASE = "knowledge_base"
+# Bytes read from a snapshot file to decode its header.
+HEADER_READ_SIZE = 4096
+
+def snapshot_path(source_path: str) -> str:
+    """Where the snapshot of `source_path` is written."""
+    return os.path.join(SNAPSHOT_DIR, os.path.basename(source_path) + ".msgpack")
+
+def _checksum(path: str) -> str:
+    """SHA-256 of a file, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# --- Compiling ---
+def compile_snapshot(kind: str, source_path: str, payload: Any) -> str:
+    """
+    Writes `payload` as the snapshot of `source_path`, with the source's fingerprint in the header.
+
+    Args:
+        kind (str): KIND_JSON or KIND_KNOWLEDGE_BASE.
+        source_path (str): The data file the payload was built from.
+        payload (Any): msgpack-serializable data.
+
+    Returns:
+        str: The snapshot path.
+    """
+    if msgpack is None:
+        raise RuntimeError("Compiling snapshots requires msgpack (pip install msgpack)")
+    stat = os.stat(source_path)
+    header = {"format": SNAPSHOT_FORMAT_VERSION, "kind": kind, "source": os.path.basename(source_path),
+              "source_size": stat.st_size, "source_mtime_ns": stat.st_mtime_ns,
+              "source_sha256": _checksum(source_path), "compiled_at": time.time()}
+    path = snapshot_path(source_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = path + ".tmp"
+    with open(temporary, 'wb') as f:
+        packer = msgpack.Packer(use_bin_type=True)
+        f.write(packer.pack(header))
+        f.write(packer.pack(payload))
+    os.replace(temporary, path) # Readers see the old snapshot or the new one, never half a file
+    logger.info("Snapshot compiled", extra={"source": source_path, "snapshot": path, "bytes": os.path.getsize(path)})
+    return path
+
+def compile_json(source_path: str) -> str:
+    """Compiles a JSON catalogue (e.g. new_doc_links.json) to a snapshot of the parsed data."""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        return compile_snapshot(KIND_JSON, source_path, json.load(f))
+
+def compile_knowledge_base(source_path: str) -> str:
+    """Compiles a knowledge base text file, with its word index, to a snapshot."""
+    kb = CompactKnowledgeBase.from_file(source_path)
+    kb.build_word_index()
+    return compile_snapshot(KIND_KNOWLEDGE_BASE, source_path, kb.to_state())
+
+def compile_all() -> List[str]:
+    """Compiles the default data files: the AlgoKit commands, the doc links and the knowledge base file."""
+    # Imported here: the handlers import this module for their loaders.
+    from modules import algokit_handler, doc_linker, qa_handler
+    return [compile_json(algokit_handler.COMMANDS_FILE_PATH), compile_json(doc_linker.DOC_LINKS_FILE_PATH),
+            compile_knowledge_base(qa_handler.KB_FILE_PATH)]
+
+# --- Loading ---
+def _is_current(header: Any, kind: str, source_path: str) -> bool:
+    """True if the snapshot header describes the current content of `source_path`."""
+    if not isinstance(header, dict) or header.get("format") != SNAPSHOT_FORMAT_VERSION or header.get("kind") != kind:
+        return False
+    stat = os.stat(source_path)
+    if header.get("source_size") != stat.st_size:
+        return False
+    # Same size and modification time: unchanged. Otherwise (e.g. a fresh checkout) compare the content.
+    return header.get("source_mtime_ns") == stat.st_mtime_ns or header.get("source_sha256") == _checksum(source_path)
+
+@contextlib.contextmanager
+def _collector_paused():
+    """
+    Pauses the cyclic garbage collector while a payload is unpacked: the payload
+    creates hundreds of thousands of containers but no reference cycles, and
+    without the pause the collector scans them over and over as they are created.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+def load_snapshot(kind: str, source_path: str) -> Optional[Any]:
+    """
+    Returns the payload of the snapshot of `source_path` if it is current, else None.
+
+    The header is read and checked before the payload is unpacked, so a stale
+    snapshot costs a stat (and at most a checksum of the source), not a full load.
+
+    Args:
+        kind (str): KIND_JSON or KIND_KNOWLEDGE_BASE.
+        source_path (str): The data file the caller would otherwise parse.
+
+    Returns:
+        Optional[Any]: The snapshot payload, or None (the caller parses the source).
+    """
+    source = os.path.basename(source_path)
+    if msgpack is None:
+        return None
+    path = snapshot_path(source_path)
+    try:
+        os.stat(path)
+    except OSError: # No snapshot: the usual case until the compile step has been run
+        metrics.SNAPSHOT_LOADS.inc(source, "missing")
+        return None
+    started = time.perf_counter()
+    try:
+        with open(path, 'rb') as f:
+            header_reader = msgpack.Unpacker(f, raw=False, read_size=HEADER_READ_SIZE)
+            if not _is_current(next(header_reader), kind, source_path):
+                metrics.SNAPSHOT_LOADS.inc(source, "stale")
+                logger.info("Snapshot is stale; parsing the source file", extra={"source": source_path})
+                return None
+            # The payload is unpacked straight from the memory-mapped file, so the
+            # snapshot bytes are never copied into a buffer on the heap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped)[header_reader.tell():] as view, _collector_paused():
+                    payload = msgpack.unpackb(view, raw=False)
+    except FileNotFoundError:
+        metrics.SNAPSHOT_LOADS.inc(source, "missing")
+        return None
+    except Exception as e: # Truncated, corrupted or unreadable: never fatal
+        metrics.SNAPSHOT_LOADS.inc(source, "invalid")
+        logger.warning("Could not read snapshot; parsing the source file",
+                       extra={"source": source_path, "error": str(e) or type(e).__name__})
+        return None
+    metrics.SNAPSHOT_LOADS.inc(source, "hit")
+    logger.info("Loaded from snapshot", extra={"source": source_path,
+                                               "elapsed_ms": (time.perf_counter() - started) * 1000})
+    return payload
+
+def load_knowledge_base(source_path: str) -> Optional[CompactKnowledgeBase]:
+    """Returns the knowledge base (with its word index) from a current snapshot of `source_path`, else None."""
+    state = load_snapshot(KIND_KNOWLEDGE_BASE, source_path)
+    if state is None:
+        return None
+    try:
+        return CompactKnowledgeBase.from_state(state)
+    except (ValueError, KeyError, TypeError) as e: # Written on another platform, or an unexpected layout
+        metrics.SNAPSHOT_LOADS.inc(os.path.basename(source_path), "invalid")
+        logger.warning("Unusable knowledge base snapshot; parsing the source file",
+                       extra={"source": source_path, "error": str(e)})
+        return None
+
+# --- Direct Execution ---
+if __name__ == '__main__':
+    # The compile step: `python -m modules.data_snapshots` (rerun after editing the data files;
+    # until then the loaders see the snapshots are stale and parse the files).
+    for compiled in compile_all():
+        print(f"Compiled {compiled} ({os.path.getsize(compiled)} bytes)")
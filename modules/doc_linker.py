@@ -5,11 +5,18 @@ This module is responsible for:
 - Loading documentation link mappings (topic, URL) from a JSON file.
 - Matching user queries against keywords associated with these links.
 - Returning a formatted string containing the best matching documentation link.
+Entries whose URL the link checker flagged as broken (see link_health.py) are skipped.
 """
+import logging
 import os
 import json
 import re  # Regular expressions for keyword extraction
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, FrozenSet, List, Mapping, Sequence, Set
+
+from modules import metrics, link_health, data_snapshots
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
 
 # --- Constants ---
 # Define the path to the JSON file containing document link mappings.
@@ -17,12 +24,13 @@ from typing import Optional, Dict, Any
 # is one level up from the 'modules' directory.
 DOC_LINKS_FILE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'new_doc_links.json')
 
+# Minimum number of keywords a query must share with an entry's key for the entry to match.
+MIN_SCORE_THRESHOLD = 1 # Requires at least one keyword to overlap. Adjust as needed.
+
 # --- Caching ---
 # Global variable to cache the loaded document links data in memory.
 # This avoids redundant file I/O by storing the data after the first load.
 # Initialized to None; will hold the dictionary once loaded.
-# NOTE: Caching check is currently commented out in the load function, meaning
-# the file is reloaded every time load_doc_links is called (e.g., during on_ready).
 _doc_links_data: Optional[Dict[str, Any]] = None
 
 # --- Core Functions ---
@@ -30,8 +38,10 @@ def load_doc_links(filepath: str = DOC_LINKS_FILE_PATH) -> Dict[str, Any]:
     """
     Loads the document links data from a JSON file into memory.
 
-    Includes basic caching (currently disabled by commenting out the check)
-    and handles file not found or JSON decoding errors gracefully.
+    Includes basic caching: if the links have already been loaded, it returns
+    the cached dictionary instead of reading the file again (the bot preloads
+    them once per process, see data_preload.py). Handles file not found or
+    JSON decoding errors gracefully.
 
     Args:
         filepath (str): The path to the JSON file. Defaults to DOC_LINKS_FILE_PATH.
@@ -42,46 +52,82 @@ def load_doc_links(filepath: str = DOC_LINKS_FILE_PATH) -> Dict[str, Any]:
                         Expected structure: {"keyword_combo": {"topic": "...", "url": "..."}, ...}
     """
     global _doc_links_data
-    # Caching check (currently disabled to ensure reload during on_ready)
-    # if _doc_links_data is not None:
-    #     print("Returning cached doc links.") # Debugging cache hit
-    #     return _doc_links_data
+    # Return cached data if available
+    if _doc_links_data is not None:
+        metrics.CACHE_LOOKUPS.inc("doc_links", "hit")
+        return _doc_links_data
+    metrics.CACHE_LOOKUPS.inc("doc_links", "miss")
 
-    # Reset cache variable at the start of each load attempt (when caching is disabled)
+    # Cache the empty result if loading fails, so a missing file isn't retried on every query
     _doc_links_data = {} # Default to empty dict
 
     try:
         # Check if file exists and is not empty
         # Check if file exists and is not empty before attempting to read
         if not os.path.exists(filepath) or os.path.getsize(filepath) == 0:
-            print(f"Warning: Document links file is missing or empty at {filepath}. Linker will not find matches.")
+            logger.warning("Document links file is missing or empty; linker will not find matches", extra={"path": filepath})
             return {} # Return the empty dict
 
-        # Open and read the JSON file
-        with open(filepath, 'r', encoding='utf-8') as f:
-            loaded_data = json.load(f) # Load data
+        # Use the compiled snapshot if it is current (see data_snapshots.py),
+        # otherwise open and read the JSON file
+        loaded_data = data_snapshots.load_snapshot(data_snapshots.KIND_JSON, filepath)
+        if loaded_data is None:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                loaded_data = json.load(f) # Load data
 
         # Validate that the loaded data is a dictionary
         if not isinstance(loaded_data, dict):
-            print(f"Error: Document links file at {filepath} does not contain a valid JSON dictionary.")
+            logger.error("Document links file does not contain a valid JSON dictionary", extra={"path": filepath})
             return {} # Return the empty dict
 
         # If loading and validation are successful, update the global cache and return the data
         _doc_links_data = loaded_data
-        print(f"Document links loaded successfully from {filepath}. Entries: {len(_doc_links_data)}")
+        logger.info("Document links loaded", extra={"path": filepath, "entries": len(_doc_links_data)})
         return _doc_links_data
     except FileNotFoundError:
-        print(f"Warning: Document links file not found at {filepath}. Linker will not find matches.")
+        logger.warning("Document links file not found; linker will not find matches", extra={"path": filepath})
         return {} # Return the empty dict set above
     except json.JSONDecodeError as e: # Added exception variable
-        print(f"Error: Could not decode JSON from document links file at {filepath}. Error: {e}")
+        logger.error("Could not decode document links JSON", extra={"path": filepath, "error": str(e)})
         return {} # Return the empty dict set above
     except Exception as e:
-        print(f"Error loading document links from {filepath}: {e}")
+        logger.exception("Error loading document links", extra={"path": filepath})
         _doc_links_data = {}
         return {}
 
-def get_doc_link(query: str) -> Optional[str]:
+def _extract_keywords(text: str) -> Set[str]:
+    """
+    Extracts the matching keywords of a query or entry key.
+
+    - Convert to lowercase for case-insensitive matching.
+    - Use regex `\\b\\w+\\b` to find whole words.
+    - Filter out short words (<= 2 characters) as they are often less meaningful.
+    - Return keywords as a set for efficient intersection calculation.
+    """
+    return set(word for word in re.findall(r'\b\w+\b', text.lower()) if len(word) > 2)
+
+def _link_is_broken(entry: Any) -> bool:
+    """True if the entry's URL was flagged as broken by the link checker (see link_health.py)."""
+    return isinstance(entry, dict) and link_health.is_broken(entry.get('url'))
+
+def _format_link(doc_links: Mapping[str, Any], key: str) -> Optional[str]:
+    """Formats the reply for the entry under `key`, or returns None if it lacks a topic or URL."""
+    # Retrieve the data (topic, url) for the best matching key.
+    match_data = doc_links[key]
+    # Get the topic, using the key itself as a fallback if 'topic' is missing.
+    topic = match_data.get('topic', key)
+    url = match_data.get('url') # Get the URL.
+
+    # Ensure both topic and URL exist before formatting the response
+    if topic and url:
+        # Format the response string for Discord
+        # Using angle brackets < > around the URL prevents Discord from auto-generating a large embed
+        return f"Here's the documentation for **{topic}**: <{url}>"
+    # Log a warning if a matched entry is missing required data
+    logger.warning("Matched doc link entry is missing 'topic' or 'url'", extra={"key": key})
+    return None # Treat as no match if data is incomplete
+
+def get_doc_link(query: str, doc_links: Optional[Mapping[str, Any]] = None) -> Optional[str]:
     """
     Searches the loaded document links data for the best match based on keywords in the user's query.
 
@@ -91,28 +137,27 @@ def get_doc_link(query: str) -> Optional[str]:
 
     Args:
         query (str): The user's query string.
+        doc_links (Optional[Mapping[str, Any]]): Links to search instead of the shared
+            ones, e.g. a guild's layered links (see guild_data.py).
 
     Returns:
         Optional[str]: A formatted string containing the topic and URL of the best match,
                        suitable for display in Discord (e.g., "Here's the documentation for **Topic**: <URL>").
                        Returns None if no suitable match is found above the minimum threshold.
     """
-    doc_links = load_doc_links() # Ensure links are loaded (reloads file if cache check is disabled)
+    if doc_links is None:
+        doc_links = load_doc_links() # Ensure links are loaded (from the cache after the first load)
     if not doc_links:
         # If the links data couldn't be loaded or is empty, we can't find a link.
-        print("Doc links data is empty, cannot find link.")
+        logger.warning("Doc links data is empty, cannot find link.")
         return None
 
     # --- Keyword Extraction ---
-    # Extract potential keywords from the user's query.
-    # - Convert to lowercase for case-insensitive matching.
-    # - Use regex `\b\w+\b` to find whole words.
-    # - Filter out short words (<= 2 characters) as they are often less meaningful.
-    # - Store keywords in a set for efficient intersection calculation.
-    query_keywords = set(word for word in re.findall(r'\b\w+\b', query.lower()) if len(word) > 2)
+    # Extract potential keywords from the user's query (see _extract_keywords).
+    query_keywords = _extract_keywords(query)
     if not query_keywords:
         # If no suitable keywords are found in the query, matching is impossible.
-        print(f"No useful keywords extracted from query: '{query}'")
+        logger.debug("No useful keywords extracted from query", extra={"query": query})
         return None
 
     best_match_key = None
@@ -124,7 +169,7 @@ def get_doc_link(query: str) -> Optional[str]:
     # The 'data' is a dictionary containing 'topic' and 'url'.
     for key, data in doc_links.items():
         # Extract keywords from the entry's key using the same logic as for the query.
-        entry_keywords = set(word for word in re.findall(r'\b\w+\b', key.lower()) if len(word) > 2)
+        entry_keywords = _extract_keywords(key)
 
         # --- Optional: Enhance matching by including topic keywords ---
         # Uncomment the following lines to also consider keywords from the 'topic' field
@@ -138,36 +183,132 @@ def get_doc_link(query: str) -> Optional[str]:
         match_score = len(query_keywords.intersection(entry_keywords))
 
         # Keep track of the entry with the highest score found so far.
-        if match_score > highest_score:
+        # Entries with a broken URL are passed over, so the next best entry is linked instead.
+        if match_score > highest_score and not _link_is_broken(data):
             highest_score = match_score
             best_match_key = key # Store the key of the best matching entry
 
     # --- Thresholding and Response Formatting ---
-    # Define a minimum score required to consider a match valid.
+    # A minimum score (MIN_SCORE_THRESHOLD) is required to consider a match valid.
     # This prevents returning irrelevant links based on very weak keyword overlap.
-    min_score_threshold = 1 # Requires at least one keyword to overlap. Adjust as needed.
-
-    # Check if the best score found meets the minimum threshold.
-    if highest_score >= min_score_threshold and best_match_key:
-        # Retrieve the data (topic, url) for the best matching key.
-        match_data = doc_links[best_match_key]
-        # Get the topic, using the key itself as a fallback if 'topic' is missing.
-        topic = match_data.get('topic', best_match_key)
-        url = match_data.get('url') # Get the URL.
-
-        # Ensure both topic and URL exist before formatting the response
-        if topic and url:
-            # Format the response string for Discord
-            # Using angle brackets < > around the URL prevents Discord from auto-generating a large embed
-            return f"Here's the documentation for **{topic}**: <{url}>"
-        else:
-            # Log a warning if a matched entry is missing required data
-            print(f"Warning: Found match for key '{best_match_key}' but 'topic' or 'url' is missing in data file.")
-            return None # Treat as no match if data is incomplete
+    if highest_score >= MIN_SCORE_THRESHOLD and best_match_key:
+        return _format_link(doc_links, best_match_key)
     else:
         # No match found meeting the threshold
         return None
 
+def get_doc_links(query: str, top_k: int = 5, doc_links: Optional[Mapping[str, Any]] = None) -> List[str]:
+    """
+    Like `get_doc_link`, but returns up to `top_k` links, best first.
+
+    Every returned entry reaches MIN_SCORE_THRESHOLD (broken links are skipped), and the
+    first one is the entry `get_doc_link` would return (ties go to the earlier entry in the file).
+    Used to page through alternative links (see result_pages.py) with one search.
+
+    Args:
+        query (str): The user's query string.
+        top_k (int): Maximum number of links.
+        doc_links (Optional[Mapping[str, Any]]): Links to search instead of the shared ones.
+
+    Returns:
+        List[str]: Formatted links (see `_format_link`); empty if nothing matches well enough.
+    """
+    if doc_links is None:
+        doc_links = load_doc_links()
+    query_keywords = _extract_keywords(query)
+    if not doc_links or not query_keywords:
+        return []
+    scored = []
+    for position, key in enumerate(doc_links):
+        score = len(query_keywords.intersection(_extract_keywords(key)))
+        if score >= MIN_SCORE_THRESHOLD and not _link_is_broken(doc_links[key]):
+            scored.append((-score, position, key))
+    links = (_format_link(doc_links, key) for _, _, key in sorted(scored))
+    return [link for link in links if link is not None][:top_k]
+
+def rank_doc_links(query: str, top_k: int = 5) -> List[str]:
+    """
+    Ranks documentation link entries for a query, ignoring the score threshold.
+
+    Entries are ordered by keyword overlap with the query (the score used by
+    `get_doc_link`), then by their order in the file. Used e.g. by the retrieval
+    evaluation harness to compute recall@k and MRR.
+
+    Args:
+        query (str): The user's query string.
+        top_k (int): Maximum number of entries to return.
+
+    Returns:
+        List[str]: Keys of the best matching entries, best first. Entries
+                   sharing no keyword with the query are not ranked.
+    """
+    doc_links = load_doc_links()
+    query_keywords = _extract_keywords(query)
+    if not doc_links or not query_keywords:
+        return []
+    scored = []
+    for position, key in enumerate(doc_links):
+        score = len(query_keywords.intersection(_extract_keywords(key)))
+        if score > 0:
+            scored.append((-score, position, key))
+    scored.sort()
+    return [key for _, _, key in scored[:top_k]]
+
+def get_doc_links_batch(queries: Sequence[str]) -> List[Optional[str]]:
+    """
+    Finds documentation links for many queries at once.
+
+    Results are the same as calling `get_doc_link` on each query, but the work
+    is shared across the batch: the links file is loaded once, every entry's
+    keywords are extracted once into an inverted index (keyword -> entries),
+    and each query only scores the entries sharing a keyword with it. Queries
+    with the same keyword set are scored once.
+
+    Args:
+        queries (Sequence[str]): The query strings.
+
+    Returns:
+        List[Optional[str]]: One formatted link (or None) per query, in input order.
+    """
+    doc_links = load_doc_links() # Loaded once for the whole batch
+    if not doc_links:
+        logger.warning("Doc links data is empty, cannot find links.", extra={"queries": len(queries)})
+        return [None] * len(queries)
+
+    # --- Inverted Index ---
+    # Entry positions follow the dictionary order, so the lowest position wins ties
+    # just like the first entry with the highest score wins in get_doc_link.
+    keys = list(doc_links)
+    entries_by_keyword: Dict[str, List[int]] = {}
+    for position, key in enumerate(keys):
+        if _link_is_broken(doc_links[key]):
+            continue # Never linked, as in get_doc_link
+        for keyword in _extract_keywords(key):
+            entries_by_keyword.setdefault(keyword, []).append(position)
+
+    links: Dict[FrozenSet[str], Optional[str]] = {}
+    results: List[Optional[str]] = []
+    for query in queries:
+        query_keywords = frozenset(_extract_keywords(query))
+        if not query_keywords:
+            results.append(None)
+            continue
+        if query_keywords not in links:
+            scores: Dict[int, int] = {}
+            for keyword in query_keywords:
+                for position in entries_by_keyword.get(keyword, ()):
+                    scores[position] = scores.get(position, 0) + 1
+            best_position, highest_score = None, 0
+            for position, score in scores.items():
+                if score > highest_score or (score == highest_score and position < best_position):
+                    best_position, highest_score = position, score
+            if highest_score >= MIN_SCORE_THRESHOLD and best_position is not None:
+                links[query_keywords] = _format_link(doc_links, keys[best_position])
+            else:
+                links[query_keywords] = None
+        results.append(links[query_keywords])
+    return results
+
 # --- Example Usage / Direct Execution ---
 if __name__ == '__main__':
     # This block allows the script to be run directly for testing purposes
@@ -0,0 +1,300 @@
+"""
+Per-guild (multi-tenant) datasets layered on the shared base data.
+
+Communities hosting the bot can add their own knowledge base lines, doc links
+and AlgoKit commands by placing them in a directory named after the guild ID:
+
+    data/guilds/<guild_id>/knowledge_base.txt    (and/or a knowledge_base/ directory of .txt/.md files)
+    data/guilds/<guild_id>/doc_links.json        (same format as data/new_doc_links.json)
+    data/guilds/<guild_id>/algokit_commands.json (same format as data/algokit_commands.json)
+
+Every file is optional. A guild's dataset is layered on the shared base data
+rather than copied from it:
+- Knowledge base: a snapshot made of the base segments plus one segment with
+  the guild's lines (see kb_segments.py), so the base buffers are shared.
+- Doc links / commands: a `ChainMap` in which guild entries override base
+  entries with the same key and add new ones after the base entries.
+
+Datasets are loaded lazily, on a guild's first query, and kept in an LRU.
+When their estimated memory goes over the budget, the least recently used
+guilds are evicted and reloaded on their next query. Guilds without a
+directory use the shared data directly and cost nothing.
+
+Loading a dataset (ingesting the knowledge base, parsing the JSON files) and
+checking a guild's file versions are blocking file work: the event loop uses
+`get_async` / `version_async`, which run it in worker threads. Concurrent
+first queries of a guild share one load, and the registry lock is never held
+while a dataset loads, so other guilds are served meanwhile.
+"""
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import ChainMap, OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from modules import kb_ingest, metrics
+from modules.kb_segments import KnowledgeBaseSnapshot, Segment
+from modules.kb_store import CompactKnowledgeBase
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+GUILD_DATA_DIR = os.getenv('GUILD_DATA_DIR', os.path.join(os.path.dirname(__file__), '..', 'data', 'guilds'))
+# Estimated memory all loaded guild datasets may use before cold guilds are evicted.
+GUILD_MEMORY_BUDGET_BYTES = int(float(os.getenv('GUILD_MEMORY_BUDGET_MB', '256')) * 1024 * 1024)
+# How long a guild's file fingerprint is reused before its files are checked again.
+VERSION_CHECK_INTERVAL = 1.0
+
+KB_FILENAME = 'knowledge_base.txt'
+KB_DIRECTORY = 'knowledge_base'
+DOC_LINKS_FILENAME = 'doc_links.json'
+COMMANDS_FILENAME = 'algokit_commands.json'
+# Parsed JSON takes several times its file size in memory; used for the budget estimate.
+JSON_MEMORY_FACTOR = 4
+
+# A knowledge base the handlers can search: the base one or a layered snapshot.
+KnowledgeBase = Union[CompactKnowledgeBase, KnowledgeBaseSnapshot]
+
+# The base knowledge base wrapped as a segment, shared by every guild's layered view.
+_base_segment: Optional[Tuple[CompactKnowledgeBase, Segment]] = None
+_base_segment_lock = threading.Lock()
+
+def _shared_base_segment(base: CompactKnowledgeBase) -> Segment:
+    """Wraps the base knowledge base as a segment once (its line table is the size of the base)."""
+    global _base_segment
+    with _base_segment_lock:
+        if _base_segment is None or _base_segment[0] is not base:
+            _base_segment = (base, Segment.from_knowledge_base(0, base, "base"))
+        return _base_segment[1]
+
+def _load_json_dict(path: str) -> Optional[Dict[str, Any]]:
+    """Reads an optional JSON object file; None if missing or invalid (invalid files are logged)."""
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            loaded = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.error("Could not load guild data file", extra={"path": path, "error": str(e)})
+        return None
+    if not isinstance(loaded, dict):
+        logger.error("Guild data file does not contain a JSON dictionary", extra={"path": path})
+        return None
+    return loaded
+
+class GuildDataset:
+    """One guild's own data, and its views layered on the shared base data."""
+
+    def __init__(self, guild_id: int, directory: str, version: str):
+        self.guild_id = guild_id
+        self.version = version
+        self.kb: Optional[CompactKnowledgeBase] = None
+        sources = [path for path in (os.path.join(directory, KB_FILENAME), os.path.join(directory, KB_DIRECTORY))
+                   if os.path.exists(path)]
+        if sources:
+            self.kb = kb_ingest.ingest(sources, workers=1) # Small: no process pool
+            self.kb.vocabulary_filter()
+        self.doc_links = _load_json_dict(os.path.join(directory, DOC_LINKS_FILENAME))
+        self.commands = _load_json_dict(os.path.join(directory, COMMANDS_FILENAME))
+        # The guild's lines as one segment (the ingested knowledge base already has its word index)
+        self._guild_segment = (Segment.from_knowledge_base(1, self.kb, f"guild:{guild_id}")
+                               if self.kb is not None else None)
+        self.memory_bytes = (self.kb.memory_bytes() + 4 * len(self.kb) if self.kb is not None else 0) + sum(
+            os.path.getsize(os.path.join(directory, name)) * JSON_MEMORY_FACTOR
+            for name, data in ((DOC_LINKS_FILENAME, self.doc_links), (COMMANDS_FILENAME, self.commands))
+            if data is not None)
+        self._layered: Optional[Tuple[Any, KnowledgeBase]] = None # (base it was built on, view)
+
+    def knowledge_base(self, base: KnowledgeBase) -> KnowledgeBase:
+        """The base knowledge base followed by the guild's lines (the same object while the base is unchanged)."""
+        if self._guild_segment is None:
+            return base
+        layered = self._layered
+        if layered is not None and layered[0] is base:
+            return layered[1]
+        if isinstance(base, KnowledgeBaseSnapshot):
+            view = KnowledgeBaseSnapshot(base.segments + (self._guild_segment,),
+                                         base.tombstones + (frozenset(),), base.dead_lines + (0,))
+        else:
+            view = KnowledgeBaseSnapshot((_shared_base_segment(base), self._guild_segment),
+                                         (frozenset(), frozenset()), (0, 0))
+        self._layered = (base, view)
+        return view
+
+    def doc_links_view(self, base: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Base doc links with the guild's entries layered on top."""
+        return base if self.doc_links is None else ChainMap(self.doc_links, base)
+
+    def commands_view(self, base: Mapping[str, Any]) -> Mapping[str, Any]:
+        """Base AlgoKit commands with the guild's entries layered on top."""
+        return base if self.commands is None else ChainMap(self.commands, base)
+
+class GuildRegistry:
+    """Loads guild datasets lazily and evicts the least recently used ones over a memory budget."""
+
+    def __init__(self, root: str = GUILD_DATA_DIR, memory_budget: int = GUILD_MEMORY_BUDGET_BYTES):
+        self.root = root
+        self.memory_budget = memory_budget
+        self._datasets: "OrderedDict[int, GuildDataset]" = OrderedDict()
+        self._versions: Dict[int, Tuple[float, Optional[str]]] = {} # guild -> (checked at, version)
+        # Loads in progress, by (guild, version); concurrent queries of a guild share one load
+        self._loading: Dict[Tuple[int, str], "concurrent.futures.Future[GuildDataset]"] = {}
+        self._lock = threading.Lock() # Guards the datasets and the loads in progress, never held during a load
+
+    def _directory(self, guild_id: int) -> str:
+        return os.path.join(self.root, str(int(guild_id)))
+
+    def _cached_version(self, guild_id: int) -> Tuple[bool, Optional[str]]:
+        """(True, version) if the guild's version was checked within VERSION_CHECK_INTERVAL, else (False, None)."""
+        checked = self._versions.get(guild_id)
+        if checked is not None and time.monotonic() - checked[0] < VERSION_CHECK_INTERVAL:
+            return True, checked[1]
+        return False, None
+
+    def version(self, guild_id: Optional[int]) -> Optional[str]:
+        """
+        Fingerprint of a guild's data files (sizes and modification times), or
+        None if the guild has no data of its own. Re-checked at most every
+        VERSION_CHECK_INTERVAL seconds; does not load the dataset. Blocking
+        (walks the guild's directory): on the event loop, use `version_async`.
+        """
+        if guild_id is None:
+            return None
+        fresh, version = self._cached_version(guild_id)
+        if fresh:
+            return version
+        now = time.monotonic()
+        directory = self._directory(guild_id)
+        version = None
+        if os.path.isdir(directory):
+            digest = hashlib.sha1()
+            for current, subdirectories, filenames in os.walk(directory):
+                subdirectories.sort()
+                for filename in sorted(filenames):
+                    stat = os.stat(os.path.join(current, filename))
+                    digest.update(f"{os.path.relpath(os.path.join(current, filename), directory)}:"
+                                  f"{stat.st_size}:{stat.st_mtime_ns};".encode())
+            version = digest.hexdigest()[:16]
+        self._versions[guild_id] = (now, version)
+        return version
+
+    async def version_async(self, guild_id: Optional[int]) -> Optional[str]:
+        """`version` for the event loop: unless checked recently, the files are checked in a worker thread."""
+        if guild_id is None:
+            return None
+        fresh, version = self._cached_version(guild_id)
+        if fresh:
+            return version
+        return await asyncio.to_thread(self.version, guild_id)
+
+    def get(self, guild_id: Optional[int]) -> Optional[GuildDataset]:
+        """
+        Returns the guild's dataset, loading it on first use (or after its files
+        changed), or None if the guild has no data of its own. Blocking (for
+        worker threads); on the event loop, use `get_async`.
+        """
+        version = self.version(guild_id)
+        if version is None:
+            return None
+        dataset, loading, owner = self._claim(guild_id, version)
+        if dataset is not None:
+            return dataset
+        if owner:
+            self._load(guild_id, version, loading)
+        return loading.result()
+
+    async def get_async(self, guild_id: Optional[int]) -> Optional[GuildDataset]:
+        """`get` for the event loop: the version check and the load run in worker threads."""
+        version = await self.version_async(guild_id)
+        if version is None:
+            return None
+        dataset, loading, owner = self._claim(guild_id, version)
+        if dataset is not None:
+            return dataset
+        if owner:
+            # Not cancelled with the caller: the thread finishes the load for the other waiters
+            await asyncio.to_thread(self._load, guild_id, version, loading)
+        return await asyncio.wrap_future(loading)
+
+    def _claim(self, guild_id: int, version: str) -> Tuple[Optional[GuildDataset],
+                                                          Optional["concurrent.futures.Future[GuildDataset]"], bool]:
+        """
+        Looks up the loaded dataset of a guild's version. On a miss, returns the
+        future of its load, and True if the caller must run the load (`_load`)
+        because no other caller is already loading that version.
+        """
+        with self._lock:
+            dataset = self._datasets.get(guild_id)
+            if dataset is not None and dataset.version == version:
+                self._datasets.move_to_end(guild_id)
+                metrics.CACHE_LOOKUPS.inc("guild_data", "hit")
+                return dataset, None, False
+            loading = self._loading.get((guild_id, version))
+            if loading is not None: # Another query of this guild is loading it: wait for that load
+                return None, loading, False
+            metrics.CACHE_LOOKUPS.inc("guild_data", "miss")
+            loading = concurrent.futures.Future()
+            self._loading[(guild_id, version)] = loading
+            return None, loading, True
+
+    def _load(self, guild_id: int, version: str, loading: "concurrent.futures.Future[GuildDataset]") -> None:
+        """Loads a guild's dataset without holding the registry lock, then adds it and resolves `loading`."""
+        started = time.perf_counter()
+        try:
+            dataset = GuildDataset(guild_id, self._directory(guild_id), version)
+        except Exception as e:
+            with self._lock:
+                self._loading.pop((guild_id, version), None)
+            loading.set_exception(e)
+            return
+        with self._lock:
+            self._loading.pop((guild_id, version), None)
+            self._datasets[guild_id] = dataset
+            self._datasets.move_to_end(guild_id)
+            evicted = self._evict()
+            loaded = len(self._datasets)
+        loading.set_result(dataset)
+        metrics.GUILD_DATASETS.set(loaded)
+        logger.info("Guild data loaded", extra={"guild_id": guild_id, "memory_bytes": dataset.memory_bytes,
+                                                "evicted": evicted,
+                                                "elapsed_ms": (time.perf_counter() - started) * 1000})
+
+    def _evict(self) -> List[int]:
+        """Drops least recently used datasets until the total fits the budget (keeps the newest one)."""
+        evicted = []
+        while len(self._datasets) > 1 and self.memory_bytes() > self.memory_budget:
+            guild_id, _ = self._datasets.popitem(last=False)
+            evicted.append(guild_id)
+        return evicted
+
+    def memory_bytes(self) -> int:
+        """Estimated memory of the loaded datasets."""
+        return sum(dataset.memory_bytes for dataset in self._datasets.values())
+
+    def loaded_guilds(self) -> List[int]:
+        """Guild IDs with a loaded dataset, least recently used first."""
+        return list(self._datasets)
+
+# --- Default Registry ---
+_registry: Optional[GuildRegistry] = None
+
+def get_registry() -> GuildRegistry:
+    """Returns the process-wide registry (GUILD_DATA_DIR, GUILD_MEMORY_BUDGET_MB)."""
+    global _registry
+    if _registry is None:
+        _registry = GuildRegistry()
+    return _registry
+
+def get_dataset(guild_id: Optional[int]) -> Optional[GuildDataset]:
+    """Shortcut for `get_registry().get(guild_id)` (blocking: for worker threads)."""
+    return get_registry().get(guild_id) if guild_id is not None else None
+
+async def get_dataset_async(guild_id: Optional[int]) -> Optional[GuildDataset]:
+    """Shortcut for `get_registry().get_async(guild_id)` (for the event loop)."""
+    return await get_registry().get_async(guild_id) if guild_id is not None else None
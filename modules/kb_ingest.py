@@ -0,0 +1,245 @@
+"""
+Parallel, multi-source ingestion pipeline for the knowledge base.
+
+The Q&A handler originally read a single text file (`data/llms-small.txt`).
+This module builds one knowledge base from many sources, for example
+`llms-full.txt`, local markdown mirrors of the developer portal and AlgoKit
+READMEs, in map-reduce style:
+
+1. Discover: expand the configured paths (files or directories, searched
+   recursively) into source files with a supported extension.
+2. Split: cut large line-based text files into byte ranges aligned to line
+   starts, so one big file is spread over several workers. Markdown files
+   are small and are processed whole.
+3. Map (in a process pool): each worker streams its range line by line,
+   chunks it (one chunk per line for text, one per paragraph for markdown),
+   and builds a CompactKnowledgeBase part with its own word index.
+4. Reduce: the parts are concatenated in source order into a single
+   CompactKnowledgeBase. Word indexes are kept per part, so this step only
+   copies buffers and does not depend on the number of words.
+
+With `workers=1` everything runs in the calling process (no pool). The pool's
+workers are started with the "spawn" method, not forked: the bot ingests from
+a worker thread while other threads (logging, metrics, tracing) run, and a
+forked child could inherit a lock one of them held and deadlock. Spawned
+workers re-import the main script, so a script starting a pool must keep its
+own setup under `if __name__ == "__main__"` (bot.py does, see its `setup`).
+"""
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from modules.kb_store import CompactKnowledgeBase
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Line-based sources: every non-empty line is one chunk (the format of llms-small.txt / llms-full.txt).
+TEXT_EXTENSIONS = ('.txt',)
+# Markdown sources: chunked by paragraph, with the current heading as context.
+MARKDOWN_EXTENSIONS = ('.md', '.markdown')
+# Line-based files bigger than this are split into several work units.
+SPLIT_BYTES = 4 * 1024 * 1024
+# Paragraphs longer than this are split at line boundaries (the bot truncates answers anyway).
+MAX_CHUNK_CHARS = 2000
+
+# How the pool's worker processes are started (fresh interpreters; see the module docstring).
+WORKER_START_METHOD = "spawn"
+
+# A unit of work: (path, first byte, end byte). end == -1 means "to the end of the file".
+WorkUnit = Tuple[str, int, int]
+
+# --- Discovery ---
+def discover_sources(paths: Iterable[str]) -> List[str]:
+    """
+    Expands files and directories into the list of source files to ingest.
+
+    Directories are searched recursively (in sorted order, so the result is
+    stable); only files with a supported extension are kept. Explicitly listed
+    files are kept whatever their extension. Missing paths are logged and skipped.
+
+    Args:
+        paths (Iterable[str]): Files and/or directories.
+
+    Returns:
+        List[str]: Source file paths, in a stable order, without duplicates.
+    """
+    sources: List[str] = []
+    seen = set()
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for directory, subdirectories, filenames in os.walk(path):
+                subdirectories.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(TEXT_EXTENSIONS + MARKDOWN_EXTENSIONS):
+                        found.append(os.path.join(directory, filename))
+        elif os.path.isfile(path):
+            found = [path]
+        else:
+            logger.warning("Knowledge base source not found", extra={"path": path})
+            continue
+        for source in found:
+            real_path = os.path.realpath(source)
+            if real_path not in seen:
+                seen.add(real_path)
+                sources.append(source)
+    return sources
+
+def _is_markdown(path: str) -> bool:
+    return path.lower().endswith(MARKDOWN_EXTENSIONS)
+
+def split_sources(sources: Sequence[str], split_bytes: int = SPLIT_BYTES) -> List[WorkUnit]:
+    """Cuts large line-based files into byte ranges; every other file is one unit."""
+    units: List[WorkUnit] = []
+    for source in sources:
+        size = os.path.getsize(source)
+        if _is_markdown(source) or size <= split_bytes:
+            units.append((source, 0, -1))
+            continue
+        for start in range(0, size, split_bytes):
+            units.append((source, start, min(start + split_bytes, size)))
+    return units
+
+# --- Chunking ---
+def _read_lines(path: str, start: int, end: int) -> Iterator[str]:
+    """
+    Streams the lines of a file that start inside the byte range [start, end).
+
+    A line crossing `end` belongs to this range; a line crossing `start` belongs
+    to the previous one. Consecutive ranges therefore yield every line exactly once.
+    """
+    with open(path, 'rb') as f:
+        if start > 0:
+            f.seek(start - 1)
+            f.readline() # Skip the rest of the line that started before this range
+        position = f.tell()
+        while end == -1 or position < end:
+            raw_line = f.readline()
+            if not raw_line:
+                break
+            position += len(raw_line)
+            yield raw_line.decode('utf-8', errors='replace')
+
+def chunk_text_lines(lines: Iterable[str]) -> Iterator[str]:
+    """One chunk per non-empty line, whitespace stripped (same as the original loader)."""
+    for line in lines:
+        stripped = line.strip()
+        if stripped:
+            yield stripped
+
+def chunk_markdown(lines: Iterable[str], max_chars: int = MAX_CHUNK_CHARS) -> Iterator[str]:
+    """
+    One chunk per markdown paragraph, prefixed with the heading it belongs to.
+
+    Paragraphs are separated by blank lines and headings; their lines are joined
+    with spaces. Fenced code blocks are kept together as one chunk. Paragraphs
+    longer than `max_chars` are split at line boundaries.
+    """
+    heading = ""
+    paragraph: List[str] = []
+    in_code_block = False
+
+    def flush() -> Iterator[str]:
+        text = ""
+        for part in paragraph:
+            if text and len(text) + len(part) + 1 > max_chars:
+                yield f"{heading}: {text}" if heading else text
+                text = ""
+            text = f"{text} {part}" if text else part
+        if text:
+            yield f"{heading}: {text}" if heading else text
+        paragraph.clear()
+
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("```"):
+            yield from flush() # A code block starts or ends a paragraph
+            in_code_block = not in_code_block
+            continue
+        if in_code_block:
+            if stripped:
+                paragraph.append(stripped)
+        elif stripped.startswith("#"):
+            yield from flush()
+            heading = stripped.lstrip("#").strip()
+        elif not stripped:
+            yield from flush()
+        else:
+            paragraph.append(stripped)
+    yield from flush()
+
+# --- Map / Reduce ---
+def process_unit(unit: WorkUnit) -> CompactKnowledgeBase:
+    """
+    Map step: chunks one work unit and builds its knowledge base part with a word index.
+
+    Runs in a worker process, so it must stay a module-level function.
+    """
+    path, start, end = unit
+    part = CompactKnowledgeBase(_unit_chunks(path, start, end))
+    part.build_word_index()
+    return part
+
+def _unit_chunks(path: str, start: int, end: int) -> Iterator[str]:
+    lines = _read_lines(path, start, end)
+    return chunk_markdown(lines) if _is_markdown(path) else chunk_text_lines(lines)
+
+def source_chunks(path: str) -> List[str]:
+    """The chunks of one whole source file, as `ingest` makes them (e.g. to re-read a changed file)."""
+    return list(_unit_chunks(path, 0, -1))
+
+def ingest(paths: Iterable[str], workers: Optional[int] = None,
+           split_bytes: int = SPLIT_BYTES) -> CompactKnowledgeBase:
+    """
+    Builds one knowledge base from all sources found under `paths`.
+
+    Args:
+        paths (Iterable[str]): Files and/or directories to ingest.
+        workers (Optional[int]): Worker processes. Defaults to the number of CPU
+                                 cores; 1 runs everything in this process.
+        split_bytes (int): Line-based files larger than this are split across workers.
+
+    Returns:
+        CompactKnowledgeBase: The chunks of every source, in source order, with a word index.
+    """
+    return ingest_documents(paths, workers, split_bytes)[0]
+
+def ingest_documents(paths: Iterable[str], workers: Optional[int] = None,
+                     split_bytes: int = SPLIT_BYTES) -> Tuple[CompactKnowledgeBase, List[Tuple[str, int, int]]]:
+    """
+    Like `ingest`, also returning where each source file's chunks are.
+
+    Returns:
+        Tuple[CompactKnowledgeBase, List[Tuple[str, int, int]]]: The knowledge base,
+            and (source path, first line, end line) per source, in source order.
+    """
+    started = time.perf_counter()
+    sources = discover_sources(paths)
+    units = split_sources(sources, split_bytes)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(units) or 1))
+    if workers == 1:
+        parts = [process_unit(unit) for unit in units]
+    else:
+        with ProcessPoolExecutor(max_workers=workers,
+                                 mp_context=multiprocessing.get_context(WORKER_START_METHOD)) as executor:
+            # map() keeps the unit order, so the result does not depend on scheduling
+            parts = list(executor.map(process_unit, units))
+    knowledge_base = CompactKnowledgeBase.concatenate(parts)
+    # The units of a source are consecutive, so each source's chunks are too
+    documents: List[Tuple[str, int, int]] = []
+    line = 0
+    for (path, _, _), part in zip(units, parts):
+        if documents and documents[-1][0] == path:
+            documents[-1] = (path, documents[-1][1], line + len(part))
+        else:
+            documents.append((path, line, line + len(part)))
+        line += len(part)
+    logger.info("Knowledge base ingested", extra={"sources": len(sources), "units": len(units),
+                                                  "workers": workers, "chunks": len(knowledge_base),
+                                                  "elapsed_ms": (time.perf_counter() - started) * 1000})
+    return knowledge_base, documents
@@ -0,0 +1,452 @@
+"""
+Segment-based knowledge base with incremental updates, in the style of an LSM tree.
+
+Reloading the whole knowledge base file for every change costs time
+proportional to the size of the knowledge base. Here the knowledge base is
+made of immutable segments instead:
+- Adding or changing documents writes them into a new, small segment (with its
+  own word index), so an update costs time proportional to the size of the change.
+- The previous copy of a changed document, and any deleted document, is not
+  removed from its segment but recorded as a tombstone. Searches skip
+  tombstoned lines.
+- A background merge compacts segments: it copies the live documents of
+  several segments into one new segment and swaps it in. Segments of similar
+  size are merged together (size-tiered), so every line is copied a
+  logarithmic number of times; a segment that is mostly tombstones is
+  rewritten on its own.
+
+Readers never see a half-applied change: every update or merge publishes a new
+immutable `KnowledgeBaseSnapshot`. A query keeps using the snapshot it started
+with, even if a merge swaps segments in the meantime. A snapshot offers the
+search interface of `CompactKnowledgeBase` (`matching_lines`, `line`,
+`lower_line`, `len()`), with line indices that are stable for that snapshot.
+"""
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import Callable, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from modules import metrics
+from modules.kb_store import CompactKnowledgeBase
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Size-tiered merging: the newest segments are merged with an older neighbour
+# while that neighbour holds at most MERGE_FACTOR times as many live lines.
+MERGE_FACTOR = 4
+# Upper bound on the number of segments; beyond it the newest ones are merged regardless of size.
+MAX_SEGMENTS = 16
+# A segment in which more than this share of the lines is tombstoned is rewritten.
+MAX_DEAD_RATIO = 0.5
+
+class Segment:
+    """An immutable group of documents, stored as one CompactKnowledgeBase."""
+
+    def __init__(self, segment_id: int, kb: CompactKnowledgeBase, doc_ids: List[str],
+                 spans: List[Tuple[int, int]], line_docs: array):
+        self.segment_id = segment_id
+        self.kb = kb
+        self.doc_ids = doc_ids       # Document ordinal -> document id
+        self.spans = spans           # Document ordinal -> (first line, end line) in this segment
+        self.line_docs = line_docs   # Line -> document ordinal
+        self.ordinals = {doc_id: ordinal for ordinal, doc_id in enumerate(doc_ids)}
+
+    @classmethod
+    def build(cls, segment_id: int, documents: Iterable[Tuple[str, Iterable[str]]]) -> "Segment":
+        """
+        Builds a segment (with a word index) from (document id, lines) pairs.
+
+        Whitespace is stripped from every line and empty lines are skipped,
+        as when the knowledge base file is loaded.
+        """
+        lines: List[str] = []
+        doc_ids: List[str] = []
+        spans: List[Tuple[int, int]] = []
+        line_docs = array('i')
+        for doc_id, doc_lines in documents:
+            start = len(lines)
+            lines.extend(stripped for stripped in (line.strip() for line in doc_lines) if stripped)
+            line_docs.extend([len(doc_ids)] * (len(lines) - start))
+            spans.append((start, len(lines)))
+            doc_ids.append(doc_id)
+        kb = CompactKnowledgeBase(lines)
+        kb.build_word_index()
+        return cls(segment_id, kb, doc_ids, spans, line_docs)
+
+    @classmethod
+    def from_knowledge_base(cls, segment_id: int, kb: CompactKnowledgeBase, doc_id: str,
+                            documents: Optional[Sequence[Tuple[str, int, int]]] = None) -> "Segment":
+        """
+        Wraps an already loaded knowledge base as a segment.
+
+        It holds the documents `documents`, given as (document id, first line,
+        end line) covering `kb` in order, or else a single document, `doc_id`.
+        """
+        if documents is None:
+            documents = [(doc_id, 0, len(kb))]
+        line_docs = array('i')
+        for ordinal, (_, start, end) in enumerate(documents):
+            line_docs.extend(array('i', [ordinal]) * (end - start))
+        return cls(segment_id, kb, [doc_id for doc_id, _, _ in documents],
+                   [(start, end) for _, start, end in documents], line_docs)
+
+    def __len__(self) -> int:
+        return len(self.kb)
+
+    def document_lines(self, ordinal: int) -> List[str]:
+        """Materializes the lines of one document."""
+        start, end = self.spans[ordinal]
+        return [self.kb.line(i) for i in range(start, end)]
+
+class KnowledgeBaseSnapshot:
+    """
+    An immutable, consistent view of the segments and their tombstones.
+
+    Lines are numbered across segments in order; tombstoned lines keep their
+    numbers (so `len()` counts them) but never match a search.
+    """
+
+    def __init__(self, segments: Tuple[Segment, ...], tombstones: Tuple[FrozenSet[int], ...],
+                 dead_lines: Tuple[int, ...]):
+        self.segments = segments
+        self.tombstones = tombstones # Per segment: ordinals of its documents that are no longer live
+        self.dead_lines = dead_lines # Per segment: number of lines in tombstoned documents
+        self._starts: List[int] = []
+        total = 0
+        for segment in segments:
+            self._starts.append(total)
+            total += len(segment)
+        self._length = total
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self.live_line_count > 0
+
+    def __repr__(self) -> str:
+        return (f"KnowledgeBaseSnapshot(segments={len(self.segments)}, lines={self._length}, "
+                f"live_lines={self.live_line_count})")
+
+    @property
+    def segment_starts(self) -> List[int]:
+        """Snapshot index of the first line of each segment."""
+        return list(self._starts)
+
+    @property
+    def live_line_count(self) -> int:
+        """Number of lines that are not tombstoned."""
+        return self._length - sum(self.dead_lines)
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """Returns (segment position, line within the segment) for a snapshot line index."""
+        if not 0 <= index < self._length:
+            raise IndexError("knowledge base line index out of range")
+        position = bisect_right(self._starts, index) - 1
+        return position, index - self._starts[position]
+
+    # --- Line Access ---
+    def line(self, index: int) -> str:
+        """Materializes line `index` as a `str`."""
+        position, local = self._locate(index)
+        return self.segments[position].kb.line(local)
+
+    def lower_line(self, index: int) -> str:
+        """Returns the lowercase copy of line `index`."""
+        position, local = self._locate(index)
+        return self.segments[position].kb.lower_line(local)
+
+    def term_positions(self, index: int, term: str) -> Sequence[int]:
+        """Where `term` occurs in line `index` (see `CompactKnowledgeBase.term_positions`)."""
+        position, local = self._locate(index)
+        return self.segments[position].kb.term_positions(local, term)
+
+    def phrase_positions(self, index: int, words: Sequence[str]) -> List[int]:
+        """Where the phrase `words` occurs in line `index` (see `CompactKnowledgeBase.phrase_positions`)."""
+        position, local = self._locate(index)
+        return self.segments[position].kb.phrase_positions(local, words)
+
+    def is_deleted(self, index: int) -> bool:
+        """True if line `index` belongs to a deleted or replaced document."""
+        position, local = self._locate(index)
+        return self.segments[position].line_docs[local] in self.tombstones[position]
+
+    def live_lines(self) -> Iterator[str]:
+        """Yields the live lines, oldest segment first."""
+        for segment, dead in zip(self.segments, self.tombstones):
+            for ordinal in range(len(segment.doc_ids)):
+                if ordinal not in dead:
+                    yield from segment.document_lines(ordinal)
+
+    # --- Search ---
+    def might_contain(self, term: str) -> bool:
+        """
+        False if `term` occurs in no segment (see `CompactKnowledgeBase.might_contain`).
+        Tombstoned documents still count until they are merged away.
+        """
+        return any(segment.kb.might_contain(term) for segment in self.segments)
+
+    def matching_lines(self, term: str) -> List[int]:
+        """
+        Returns the indices of all live lines containing `term` as a whole word,
+        in ascending order (see `CompactKnowledgeBase.matching_lines`).
+        """
+        found: List[int] = []
+        for segment, dead, start in zip(self.segments, self.tombstones, self._starts):
+            lines = segment.kb.matching_lines(term)
+            if dead:
+                line_docs = segment.line_docs
+                lines = [i for i in lines if line_docs[i] not in dead]
+            found.extend(lines if start == 0 else (i + start for i in lines))
+        return found
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the segments' buffers."""
+        return sum(segment.kb.memory_bytes() + segment.line_docs.itemsize * len(segment.line_docs)
+                   for segment in self.segments)
+
+class SegmentedKnowledgeBase:
+    """
+    A knowledge base of documents that can be added, replaced and deleted
+    incrementally. Thread-safe: writes are serialized, reads use `snapshot`.
+    """
+
+    def __init__(self, base: Optional[CompactKnowledgeBase] = None, base_doc_id: str = "base",
+                 on_publish: Optional[Callable[[KnowledgeBaseSnapshot], None]] = None,
+                 auto_merge: bool = True, base_documents: Optional[Sequence[Tuple[str, int, int]]] = None):
+        """
+        Args:
+            base (Optional[CompactKnowledgeBase]): An already loaded knowledge base,
+                used as the first segment (as one document, `base_doc_id`, unless
+                `base_documents` is given).
+            base_doc_id (str): Document id of the base knowledge base.
+            on_publish (Optional[Callable]): Called with every new snapshot, while
+                the write lock is held (so snapshots are published in order).
+            auto_merge (bool): Start a background merge after writes when the
+                merge policy asks for one. If False, call `merge()` explicitly.
+            base_documents (Optional[Sequence[Tuple[str, int, int]]]): The documents
+                of `base` as (document id, first line, end line), covering it in
+                order (e.g. one per source file), so each can be replaced on its own.
+        """
+        self._lock = threading.Lock()       # Serializes writes and snapshot publication
+        self._merge_lock = threading.Lock() # One merge at a time
+        self._merge_thread: Optional[threading.Thread] = None
+        self._on_publish = on_publish
+        self.auto_merge = auto_merge
+        self._next_segment_id = 0
+        # Document id -> id of the segment holding its live copy.
+        self._locations: Dict[str, int] = {}
+        segments: Tuple[Segment, ...] = ()
+        if base is not None and len(base):
+            segments = (Segment.from_knowledge_base(self._new_segment_id(), base, base_doc_id, base_documents),)
+            for doc_id in segments[0].doc_ids:
+                self._locations[doc_id] = segments[0].segment_id
+        self._publish(KnowledgeBaseSnapshot(segments, (frozenset(),) * len(segments), (0,) * len(segments)))
+
+    @property
+    def snapshot(self) -> KnowledgeBaseSnapshot:
+        """The current snapshot. Hold on to it to get a consistent view across several calls."""
+        return self._snapshot
+
+    def _new_segment_id(self) -> int:
+        self._next_segment_id += 1
+        return self._next_segment_id
+
+    def _publish(self, snapshot: KnowledgeBaseSnapshot) -> None:
+        """Makes a snapshot current. Called with the write lock held (or from __init__)."""
+        self._snapshot = snapshot
+        metrics.KB_SEGMENTS.set(len(snapshot.segments))
+        if self._on_publish is not None:
+            self._on_publish(snapshot)
+
+    # --- Writes ---
+    def upsert(self, documents: Dict[str, Sequence[str]]) -> KnowledgeBaseSnapshot:
+        """
+        Adds or replaces documents. Their lines go into one new segment; the
+        previous copy of a replaced document is tombstoned.
+
+        Args:
+            documents (Dict[str, Sequence[str]]): Document id -> lines.
+
+        Returns:
+            KnowledgeBaseSnapshot: The snapshot that includes the change.
+        """
+        started = time.perf_counter()
+        # Built outside the lock: the cost of an update is the cost of indexing the new lines.
+        segment = Segment.build(0, documents.items()) if documents else None
+        with self._lock:
+            if segment is not None:
+                segment.segment_id = self._new_segment_id()
+            snapshot = self._tombstone(documents.keys(), added=segment)
+            self._publish(snapshot)
+        logger.info("Knowledge base documents updated",
+                    extra={"documents": len(documents), "lines": len(segment) if segment else 0,
+                           "segments": len(snapshot.segments),
+                           "elapsed_ms": (time.perf_counter() - started) * 1000})
+        self._maybe_merge()
+        return snapshot
+
+    def delete(self, doc_ids: Iterable[str]) -> KnowledgeBaseSnapshot:
+        """
+        Deletes documents by recording tombstones; unknown ids are ignored.
+
+        Returns:
+            KnowledgeBaseSnapshot: The snapshot without the deleted documents.
+        """
+        doc_ids = list(doc_ids)
+        with self._lock:
+            snapshot = self._tombstone(doc_ids)
+            self._publish(snapshot)
+        logger.info("Knowledge base documents deleted", extra={"documents": len(doc_ids)})
+        self._maybe_merge()
+        return snapshot
+
+    def _tombstone(self, doc_ids: Iterable[str], added: Optional[Segment] = None) -> KnowledgeBaseSnapshot:
+        """
+        Returns the current snapshot with the live copies of `doc_ids` tombstoned
+        and `added` appended. Only the affected segments' tombstone sets are copied.
+        Called with the write lock held.
+        """
+        current = self._snapshot
+        positions = {segment.segment_id: position for position, segment in enumerate(current.segments)}
+        tombstones = list(current.tombstones)
+        dead_lines = list(current.dead_lines)
+        for doc_id in doc_ids:
+            segment_id = self._locations.pop(doc_id, None)
+            if segment_id is None:
+                continue
+            position = positions[segment_id]
+            segment = current.segments[position]
+            ordinal = segment.ordinals[doc_id]
+            tombstones[position] = tombstones[position] | {ordinal}
+            start, end = segment.spans[ordinal]
+            dead_lines[position] += end - start
+        segments = current.segments
+        if added is not None:
+            for doc_id in added.doc_ids:
+                self._locations[doc_id] = added.segment_id
+            segments += (added,)
+            tombstones.append(frozenset())
+            dead_lines.append(0)
+        return KnowledgeBaseSnapshot(segments, tuple(tombstones), tuple(dead_lines))
+
+    # --- Merging ---
+    def _pick_merge(self, snapshot: KnowledgeBaseSnapshot) -> Optional[Tuple[int, int]]:
+        """
+        Chooses the segments to merge next, as a range [start, end) of positions, or None.
+
+        Size-tiered: starting from the newest segment, older neighbours are added
+        while they are at most MERGE_FACTOR times the size gathered so far. If that
+        finds nothing to merge, a segment that is mostly tombstones is rewritten alone.
+        """
+        segments = snapshot.segments
+        count = len(segments)
+        if count == 0:
+            return None
+        live = [len(segment) - dead for segment, dead in zip(segments, snapshot.dead_lines)]
+        start = count - 1
+        total = live[start]
+        while start > 0 and live[start - 1] <= MERGE_FACTOR * max(total, 1):
+            start -= 1
+            total += live[start]
+        if count - start >= 2:
+            return start, count
+        if count > MAX_SEGMENTS:
+            return count - (count - MAX_SEGMENTS + 1), count
+        for position, segment in enumerate(segments):
+            if len(segment) and snapshot.dead_lines[position] > MAX_DEAD_RATIO * len(segment):
+                return position, position + 1
+        return None
+
+    def merge(self) -> int:
+        """
+        Runs merges in the calling thread until the merge policy is satisfied.
+
+        Returns:
+            int: Number of merges performed.
+        """
+        merges = 0
+        with self._merge_lock:
+            while True:
+                chosen = self._pick_merge(self._snapshot)
+                if chosen is None:
+                    return merges
+                self._merge_range(*chosen)
+                merges += 1
+
+    def _merge_range(self, start: int, end: int) -> None:
+        """Merges the live documents of segments [start, end) of the current snapshot into one."""
+        started = time.perf_counter()
+        source = self._snapshot
+        merged_segments = source.segments[start:end]
+        # Copy the live documents, oldest first, outside the write lock: readers and
+        # writers carry on while the merged segment is built.
+        documents: List[Tuple[str, List[str]]] = []
+        for segment, dead in zip(merged_segments, source.tombstones[start:end]):
+            for ordinal, doc_id in enumerate(segment.doc_ids):
+                if ordinal not in dead:
+                    documents.append((doc_id, segment.document_lines(ordinal)))
+        merged = Segment.build(0, documents)
+
+        with self._lock:
+            merged.segment_id = self._new_segment_id()
+            current = self._snapshot
+            merged_ids = [segment.segment_id for segment in merged_segments]
+            # Only merges remove segments and they run one at a time, so the merged
+            # segments are still contiguous; writes may have appended segments after them.
+            position = next(i for i, segment in enumerate(current.segments) if segment.segment_id == merged_ids[0])
+            merged_id_set = set(merged_ids)
+            # Documents replaced or deleted while merging are tombstoned in the merged segment.
+            dead = set()
+            dead_line_count = 0
+            for ordinal, doc_id in enumerate(merged.doc_ids):
+                if self._locations.get(doc_id) in merged_id_set:
+                    self._locations[doc_id] = merged.segment_id
+                else:
+                    dead.add(ordinal)
+                    dead_line_count += merged.spans[ordinal][1] - merged.spans[ordinal][0]
+            after = position + len(merged_ids)
+            snapshot = KnowledgeBaseSnapshot(
+                current.segments[:position] + (merged,) + current.segments[after:],
+                current.tombstones[:position] + (frozenset(dead),) + current.tombstones[after:],
+                current.dead_lines[:position] + (dead_line_count,) + current.dead_lines[after:])
+            self._publish(snapshot)
+        logger.info("Knowledge base segments merged",
+                    extra={"merged_segments": len(merged_ids), "lines": len(merged),
+                           "segments": len(snapshot.segments),
+                           "elapsed_ms": (time.perf_counter() - started) * 1000})
+
+    def _maybe_merge(self) -> None:
+        """Starts a background merge if automatic merging is on and the policy asks for one."""
+        if not self.auto_merge or self._pick_merge(self._snapshot) is None:
+            return
+        with self._lock:
+            if self._merge_thread is not None:
+                return # The running merge re-checks the policy before it stops
+            self._merge_thread = threading.Thread(target=self._background_merge, name='kb-merge', daemon=True)
+            self._merge_thread.start()
+
+    def _background_merge(self) -> None:
+        try:
+            while True:
+                self.merge()
+                # Stop only if no write made a new merge necessary since the last check;
+                # writes check `_merge_thread` under the same lock.
+                with self._lock:
+                    if self._pick_merge(self._snapshot) is None:
+                        self._merge_thread = None
+                        return
+        except Exception:
+            logger.exception("Knowledge base merge failed")
+            with self._lock:
+                self._merge_thread = None
+
+    def wait_for_merges(self, timeout: Optional[float] = None) -> None:
+        """Blocks until the background merge (if any) has finished."""
+        thread = self._merge_thread
+        if thread is not None:
+            thread.join(timeout)
@@ -0,0 +1,431 @@
+"""
+Compact, array-backed in-memory storage for the knowledge base.
+
+Instead of keeping one Python `str` object per knowledge base line, the lines are
+stored in two contiguous buffers built once at load time:
+- The original text as UTF-8 bytes, with an `array` of byte offsets per line.
+  Lines are only decoded (materialized as `str`) when they are returned.
+- A lowercase copy as a single `str`, with an `array` of character offsets per
+  line. Keyword searches run directly over this buffer, so answering a query no
+  longer allocates a lowercased copy of every line.
+
+`CompactKnowledgeBase` behaves like a read-only sequence of lines, so code that
+indexes, iterates or compares the knowledge base like a list keeps working.
+
+Optionally, a knowledge base can carry a word index (word -> lines containing it),
+built with `build_word_index`. Knowledge bases built separately (e.g. by the
+ingestion workers in kb_ingest.py) can be joined with `concatenate`; their word
+indexes are kept as per-part postings with a line offset, so joining them does
+not touch every posting. The word index also records where each word occurs
+within each line (positional postings), so `term_positions` finds a term in a
+line without scanning the line.
+
+A Bloom filter over the vocabulary (`might_contain`) answers "this word occurs
+nowhere in the knowledge base" with a few hash lookups, so queries with no known
+words can be rejected before any search.
+
+`to_state` / `from_state` convert the buffers and word index to plain values
+and back, so a knowledge base can be saved as a compiled snapshot and loaded
+without re-reading or re-indexing its text (see data_snapshots.py).
+"""
+import io
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from modules.bloom_filter import BloomFilter
+
+# Word index postings: word -> ascending line indices (relative to the part's first line).
+Postings = Dict[str, array]
+# Positional postings: word -> (pointers, offsets). For the k-th line of the word's
+# postings, offsets[pointers[k]:pointers[k + 1]] are the word's start positions
+# in that line's lowercase text, ascending.
+PositionPostings = Dict[str, Tuple[array, array]]
+
+def _is_word_char(char: str) -> bool:
+    r"""True if `char` is matched by the regex `\w` (alphanumeric or underscore)."""
+    return char.isalnum() or char == '_'
+
+# Maximal runs of word characters, as matched by the regex `\w+`.
+_WORD_PATTERN = re.compile(r'\w+')
+
+def _word_positions(text: str, term: str) -> List[int]:
+    r"""Start positions of `term` as a whole word in `text` (like `\bterm\b`), found with `str.find`."""
+    found = []
+    position = text.find(term)
+    while position != -1:
+        end = position + len(term)
+        if (not position or not _is_word_char(text[position - 1])) and (end == len(text) or not _is_word_char(text[end])):
+            found.append(position)
+        position = text.find(term, position + 1)
+    return found
+
+class CompactKnowledgeBase(Sequence):
+    """A read-only sequence of knowledge base lines backed by contiguous buffers."""
+
+    def __init__(self, lines: Iterable[str] = ()):
+        """
+        Builds the buffers from already-cleaned lines (see `from_file` for raw files).
+
+        Args:
+            lines (Iterable[str]): The lines to store, in order. They are stored as given.
+        """
+        text = bytearray()
+        lower = io.StringIO()
+        # offsets[i] is where line i starts; offsets[-1] is one past the end of the buffer.
+        # Consecutive lines are separated by a single '\n', hence the +1 below.
+        text_offsets = array('q', [0])
+        lower_offsets = array('q', [0])
+        lower_length = 0
+        for line in lines:
+            encoded = line.encode('utf-8')
+            line_lower = line.lower()
+            text += encoded
+            text += b'\n'
+            lower.write(line_lower)
+            lower.write('\n')
+            lower_length += len(line_lower) + 1
+            text_offsets.append(len(text))
+            lower_offsets.append(lower_length)
+
+        self._text = text # Never modified after construction; kept as-is to avoid a copy
+        self._text_offsets = text_offsets
+        self._lower = lower.getvalue()
+        self._lower_offsets = lower_offsets
+        # Optional word index: (first line of the part, postings) per indexed part,
+        # and the parts' positional postings, in the same order. _word_bases holds
+        # the parts' first lines on their own, to find a line's part by bisection.
+        self._word_index: Optional[List[Tuple[int, Postings]]] = None
+        self._word_bases: Optional[List[int]] = None
+        self._positions: Optional[List[PositionPostings]] = None
+        # Bloom filter over every word of the knowledge base, built on first use.
+        self._vocabulary: Optional[BloomFilter] = None
+
+    @classmethod
+    def from_file(cls, filepath: str) -> "CompactKnowledgeBase":
+        """
+        Streams a text file into a compact knowledge base.
+
+        Leading/trailing whitespace is stripped from every line and empty lines
+        are skipped, matching the original list-based loader.
+
+        Args:
+            filepath (str): Path to the knowledge base text file.
+
+        Raises:
+            FileNotFoundError / OSError: If the file cannot be read.
+        """
+        with open(filepath, 'r', encoding='utf-8') as f:
+            return cls(stripped for stripped in (line.strip() for line in f) if stripped)
+
+    @classmethod
+    def concatenate(cls, parts: Sequence["CompactKnowledgeBase"]) -> "CompactKnowledgeBase":
+        """
+        Joins several knowledge bases into one, keeping their order.
+
+        The buffers are copied once; offsets are shifted by each part's start.
+        If every part has a word index, the result keeps them all (shifted by
+        the part's first line), so `matching_lines` and `term_positions` keep using them.
+        """
+        result = cls()
+        text = bytearray()
+        lower = io.StringIO()
+        lower_length = 0
+        word_index: Optional[List[Tuple[int, Postings]]] = []
+        positions: Optional[List[PositionPostings]] = []
+        for part in parts:
+            first_line = len(result._text_offsets) - 1
+            text_base, lower_base = len(text), lower_length
+            text += part._text
+            lower.write(part._lower)
+            lower_length += len(part._lower)
+            result._text_offsets.extend(offset + text_base for offset in part._text_offsets[1:])
+            result._lower_offsets.extend(offset + lower_base for offset in part._lower_offsets[1:])
+            if word_index is not None and part._word_index is not None:
+                word_index.extend((first_line + base, postings) for base, postings in part._word_index)
+                positions.extend(part._positions)
+            else:
+                word_index = positions = None # One unindexed part means the whole result is searched by scanning
+        result._text = text
+        result._lower = lower.getvalue()
+        result._word_index = word_index if parts else None
+        result._word_bases = [base for base, _ in word_index] if word_index is not None and parts else None
+        result._positions = positions if parts else None
+        return result
+
+    # --- Sequence Interface ---
+    def __len__(self) -> int:
+        return len(self._text_offsets) - 1
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[str, List[str]]:
+        if isinstance(index, slice):
+            return [self.line(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("knowledge base line index out of range")
+        return self.line(index)
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.line(i)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CompactKnowledgeBase):
+            return self._text == other._text
+        if isinstance(other, (list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"CompactKnowledgeBase(lines={len(self)}, bytes={len(self._text)})"
+
+    # --- Line Access ---
+    def line(self, index: int) -> str:
+        """Materializes line `index` as a `str` (without the trailing newline)."""
+        return self._text[self._text_offsets[index]:self._text_offsets[index + 1] - 1].decode('utf-8')
+
+    def lower_line(self, index: int) -> str:
+        """Returns the lowercase copy of line `index`."""
+        return self._lower[self._lower_offsets[index]:self._lower_offsets[index + 1] - 1]
+
+    def line_index_at(self, lower_position: int) -> int:
+        """Returns the index of the line containing the given position of the lowercase buffer."""
+        return bisect_right(self._lower_offsets, lower_position) - 1
+
+    # --- Search ---
+    def build_word_index(self) -> None:
+        """
+        Tokenizes every line into words and indexes the lines each word occurs in.
+
+        With a word index, `matching_lines` is a dictionary lookup instead of a
+        scan of the whole buffer. A line matches a term as a whole word exactly
+        when the term is one of the line's maximal runs of word characters, so
+        both ways of searching give the same result. The start of every
+        occurrence is recorded too (see `term_positions`).
+        """
+        postings: Postings = {}
+        positions: PositionPostings = {}
+        for index in range(len(self)):
+            line_words: Dict[str, List[int]] = {}
+            for match in _WORD_PATTERN.finditer(self.lower_line(index)):
+                line_words.setdefault(match.group(), []).append(match.start())
+            for word, starts in line_words.items():
+                lines = postings.get(word)
+                if lines is None:
+                    lines = postings[word] = array('i')
+                    positions[word] = (array('i', [0]), array('i'))
+                lines.append(index)
+                pointers, offsets = positions[word]
+                offsets.extend(starts)
+                pointers.append(len(offsets))
+        self._word_index = [(0, postings)]
+        self._word_bases = [0]
+        self._positions = [positions]
+
+    @property
+    def has_word_index(self) -> bool:
+        """True if `matching_lines` is answered from a word index."""
+        return self._word_index is not None
+
+    def vocabulary_filter(self) -> BloomFilter:
+        """
+        Returns the Bloom filter of every word in the knowledge base, building it on first use.
+
+        The words are read from the word index if there is one, otherwise the
+        lowercase buffer is tokenized once.
+        """
+        if self._vocabulary is None:
+            if self._word_index is not None:
+                words = set()
+                for _, postings in self._word_index:
+                    words.update(postings)
+            else:
+                words = set(_WORD_PATTERN.findall(self._lower))
+            vocabulary = BloomFilter(len(words))
+            vocabulary.update(words)
+            self._vocabulary = vocabulary
+        return self._vocabulary
+
+    def might_contain(self, term: str) -> bool:
+        """
+        False if `term` (a lowercase word) occurs in no line, so `matching_lines`
+        would return nothing; True if it probably occurs (about 1% false positives).
+        """
+        return term in self.vocabulary_filter()
+
+    def matching_lines(self, term: str) -> List[int]:
+        r"""
+        Returns the indices of all lines containing `term` as a whole word.
+
+        If a word index was built (see `build_word_index`), the lines are read
+        from it. Otherwise the search runs over the single lowercase buffer.
+        After a hit, it jumps straight to the start of the next line, so the
+        cost grows with the number of matching lines rather than the number of
+        occurrences.
+
+        Matching is equivalent to `re.search(r'\b' + re.escape(term) + r'\b', line.lower())`
+        on every line. The leading word boundary is checked by hand because a
+        pattern starting with `\b` disables the regex engine's fast literal-prefix
+        scan, which makes the search about ten times slower.
+
+        Args:
+            term (str): A lowercase term made of word characters (as produced by `\w+`).
+
+        Returns:
+            List[int]: Matching line indices in ascending order.
+        """
+        if self._word_index is not None:
+            found = []
+            for base, postings in self._word_index:
+                lines = postings.get(term)
+                if lines:
+                    found.extend(lines if base == 0 else (index + base for index in lines))
+            return found
+
+        found = []
+        text = self._lower
+        offsets = self._lower_offsets
+        search = re.compile(re.escape(term) + r'\b').search
+        position = 0
+        while True:
+            match = search(text, position)
+            if match is None:
+                return found
+            start = match.start()
+            if start and _is_word_char(text[start - 1]):
+                position = start + 1 # Inside a longer word; keep looking
+                continue
+            index = bisect_right(offsets, start) - 1
+            found.append(index)
+            position = offsets[index + 1]
+
+    def term_positions(self, index: int, term: str) -> Sequence[int]:
+        r"""
+        Returns where `term` occurs as a whole word in line `index`: start
+        positions in the line's lowercase text (see `lower_line`), ascending.
+
+        With a word index, this is a binary search in the term's postings, so
+        the cost depends on the number of occurrences, not on the line length.
+        Otherwise the line is searched with `str.find`.
+
+        Args:
+            index (int): Line index.
+            term (str): A lowercase term made of word characters (as produced by `\w+`).
+        """
+        if self._positions is None:
+            return _word_positions(self.lower_line(index), term)
+        part = bisect_right(self._word_bases, index) - 1
+        base, postings = self._word_index[part]
+        lines = postings.get(term)
+        if lines is None:
+            return ()
+        local = index - base
+        k = bisect_left(lines, local)
+        if k == len(lines) or lines[k] != local:
+            return ()
+        pointers, offsets = self._positions[part][term]
+        return offsets[pointers[k]:pointers[k + 1]]
+
+    def phrase_positions(self, index: int, words: Sequence[str]) -> List[int]:
+        r"""
+        Returns where the phrase `words` occurs in line `index`: start positions
+        in the line's lowercase text, ascending.
+
+        The words must follow each other with only non-word characters in
+        between ("box storage" matches "Box storage" and "box-storage", not
+        "box and storage"). Each word's positions come from `term_positions`;
+        a phrase start survives while the next word starts at the first word
+        start after it.
+
+        Args:
+            index (int): Line index.
+            words (Sequence[str]): Lowercase words (as produced by `\w+`), in phrase order.
+        """
+        if not words:
+            return []
+        line_start = self._lower_offsets[index]
+        # (phrase start, end of the phrase's last matched word) per candidate
+        candidates = [(start, start + len(words[0])) for start in self.term_positions(index, words[0])]
+        for word in words[1:]:
+            if not candidates:
+                break
+            following = self.term_positions(index, word)
+            matched = []
+            for start, end in candidates:
+                k = bisect_left(following, end)
+                if k == len(following):
+                    break # No later occurrence, for this or any later candidate
+                # Another word between the two would start before `following[k]`.
+                if not _WORD_PATTERN.search(self._lower, line_start + end, line_start + following[k]):
+                    matched.append((start, following[k] + len(word)))
+            candidates = matched
+        return [start for start, _ in candidates]
+
+    # --- Snapshots ---
+    def to_state(self) -> Dict[str, Any]:
+        """
+        Returns the buffers and the word index as plain values (bytes, str, lists,
+        dicts), e.g. to be written to a msgpack snapshot (see data_snapshots.py).
+        Arrays are stored as their raw bytes, in this machine's byte order.
+        """
+        state: Dict[str, Any] = {
+            "byteorder": sys.byteorder,
+            "itemsizes": [array('q').itemsize, array('i').itemsize],
+            "text": bytes(self._text), "text_offsets": self._text_offsets.tobytes(),
+            "lower": self._lower, "lower_offsets": self._lower_offsets.tobytes(),
+        }
+        if self._word_index is not None:
+            state["word_index"] = [[base, {word: lines.tobytes() for word, lines in postings.items()}]
+                                   for base, postings in self._word_index]
+            state["positions"] = [{word: [pointers.tobytes(), offsets.tobytes()]
+                                   for word, (pointers, offsets) in positions.items()}
+                                  for positions in self._positions]
+        return state
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "CompactKnowledgeBase":
+        """
+        Rebuilds a knowledge base from `to_state` output without re-tokenizing any line.
+        The state's index dictionaries are reused (and their values replaced), so
+        `state` should not be used afterwards.
+
+        Raises:
+            ValueError: If the state was written on a machine with another byte order or array item sizes.
+        """
+        if state["byteorder"] != sys.byteorder or list(state["itemsizes"]) != [array('q').itemsize,
+                                                                               array('i').itemsize]:
+            raise ValueError("Knowledge base state was written with another byte order or array layout")
+
+        def as_array(typecode: str, data: bytes) -> array:
+            values = array(typecode)
+            values.frombytes(data)
+            return values
+
+        kb = cls()
+        kb._text = state["text"]
+        kb._text_offsets = as_array('q', state["text_offsets"])
+        kb._lower = state["lower"]
+        kb._lower_offsets = as_array('q', state["lower_offsets"])
+        if "word_index" in state:
+            # The index dictionaries are converted in place, so each byte string is
+            # freed as soon as its array exists instead of both copies of the whole
+            # index being held at once
+            for _, postings in state["word_index"]:
+                for word, lines in postings.items():
+                    postings[word] = as_array('i', lines)
+            for positions in state["positions"]:
+                for word, (pointers, offsets) in positions.items():
+                    positions[word] = (as_array('i', pointers), as_array('i', offsets))
+            kb._word_index = [(base, postings) for base, postings in state["word_index"]]
+            kb._word_bases = [base for base, _ in kb._word_index]
+            kb._positions = state["positions"]
+        return kb
+
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the buffers (useful for benchmarks)."""
+        return (sys.getsizeof(self._text) + sys.getsizeof(self._lower)
+                + self._text_offsets.itemsize * len(self._text_offsets)
+                + self._lower_offsets.itemsize * len(self._lower_offsets))
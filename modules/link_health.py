@@ -0,0 +1,268 @@
+"""
+Checks that the documentation URLs the bot hands out still work.
+
+Many catalogue URLs (new_doc_links.json, algokit_commands.json) point at
+developer.algorand.org paths that have moved. `LinkHealthChecker` requests
+every URL concurrently with aiohttp:
+- One client session with a bounded connection pool (`pool_size` connections,
+  at most `per_host` to one host) and a semaphore limiting the requests in flight.
+- HEAD requests (GET when the server doesn't allow HEAD), following redirects,
+  so a moved page that redirects to its new location still counts as working.
+- Results are cached per URL with the response's ETag: a URL checked less than
+  `ttl` seconds ago is not requested again, and after that a conditional
+  request (If-None-Match) lets the server answer 304 Not Modified.
+
+A URL is broken when the server answers that the page is gone (404 Not Found,
+410 Gone), or when it failed BROKEN_AFTER_FAILURES checks in a row (timeouts,
+connection errors, 5xx, and other 4xx such as the 403 that bot protection often
+gives a HEAD request from a non-browser client): a brief outage or a refused
+check doesn't hide a link, a host that is gone does.
+
+The results are saved to LINK_HEALTH_PATH and loaded with the other data at
+startup; `is_broken` (a set lookup) lets doc_linker and algokit_handler skip
+broken links. To check the catalogues by hand: `python -m modules.link_health`.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+from modules import metrics
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError: # Optional; without it links are never checked (and never flagged)
+    aiohttp = None
+    AIOHTTP_AVAILABLE = False
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Where the check results (status, ETag, time) are kept between runs.
+LINK_HEALTH_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'link_health.json')
+# Requests in flight at once, connections in the pool, and connections per host.
+DEFAULT_CONCURRENCY = 64
+DEFAULT_POOL_SIZE = 64
+DEFAULT_PER_HOST = 16
+# Seconds one request may take (connecting, redirects and response headers).
+DEFAULT_TIMEOUT = 10.0
+# Seconds a result is trusted before the URL is requested again (conditionally, with its ETag).
+DEFAULT_TTL = 24 * 3600.0
+# Statuses that flag a URL as broken at once: the page is gone.
+GONE_STATUSES = frozenset([404, 410])
+# Consecutive failed checks (no HTTP answer, a server error, or another client error) after which
+# a URL counts as broken.
+BROKEN_AFTER_FAILURES = 3
+USER_AGENT = "algo-dev-helper-link-checker"
+
+class LinkStatus:
+    """The last check of one URL."""
+
+    def __init__(self, url: str, status: Optional[int] = None, etag: Optional[str] = None,
+                 checked_at: float = 0.0, error: Optional[str] = None, failures: int = 0):
+        """
+        Args:
+            url (str): The checked URL.
+            status (Optional[int]): HTTP status of the last answer (after redirects), None if there was none.
+            etag (Optional[str]): ETag of the last successful answer, sent back in conditional requests.
+            checked_at (float): When the URL was last checked (seconds since the epoch).
+            error (Optional[str]): Why the last check failed, if it did.
+            failures (int): Consecutive failed checks.
+        """
+        self.url = url
+        self.status = status
+        self.etag = etag
+        self.checked_at = checked_at
+        self.error = error
+        self.failures = failures
+
+    @property
+    def broken(self) -> bool:
+        """True if the link should not be handed out (see the module docstring)."""
+        return self.status in GONE_STATUSES or self.failures >= BROKEN_AFTER_FAILURES
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"status": self.status, "etag": self.etag, "checked_at": self.checked_at,
+                "error": self.error, "failures": self.failures}
+
+    @classmethod
+    def from_dict(cls, url: str, data: Mapping[str, Any]) -> "LinkStatus":
+        return cls(url, data.get("status"), data.get("etag"), data.get("checked_at", 0.0),
+                   data.get("error"), data.get("failures", 0))
+
+class LinkHealthChecker:
+    """Checks many URLs concurrently over one bounded connection pool, with a per-URL result cache."""
+
+    def __init__(self, results: Optional[Dict[str, LinkStatus]] = None, concurrency: int = DEFAULT_CONCURRENCY,
+                 pool_size: int = DEFAULT_POOL_SIZE, per_host: int = DEFAULT_PER_HOST,
+                 timeout: float = DEFAULT_TIMEOUT, ttl: float = DEFAULT_TTL):
+        """
+        Args:
+            results (Optional[Dict[str, LinkStatus]]): Previous results (the cache), updated in place.
+            concurrency (int): Requests in flight at once.
+            pool_size (int): Connections kept in the pool.
+            per_host (int): Connections to a single host (0: no limit).
+            timeout (float): Seconds per request.
+            ttl (float): Seconds a result is reused without a request.
+        """
+        self.results = {} if results is None else results
+        self.concurrency = concurrency
+        self.pool_size = pool_size
+        self.per_host = per_host
+        self.timeout = timeout
+        self.ttl = ttl
+
+    async def check(self, urls: Iterable[str]) -> Dict[str, LinkStatus]:
+        """
+        Checks every URL whose cached result is older than the TTL.
+
+        Returns:
+            Dict[str, LinkStatus]: The result for every given URL.
+        """
+        if aiohttp is None:
+            raise RuntimeError("The link checker requires aiohttp (pip install aiohttp)")
+        urls = list(dict.fromkeys(urls)) # Each URL once, in order
+        now = time.time()
+        due = [url for url in urls if url not in self.results or now - self.results[url].checked_at >= self.ttl]
+        started = time.perf_counter()
+        if due:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.per_host)
+            async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout),
+                                             headers={"User-Agent": USER_AGENT}) as session:
+                await asyncio.gather(*(self._check_one(session, semaphore, url) for url in due))
+        logger.info("Links checked", extra={"urls": len(urls), "requested": len(due),
+                                            "broken": sum(1 for url in urls if self.results[url].broken),
+                                            "elapsed_ms": (time.perf_counter() - started) * 1000})
+        return {url: self.results[url] for url in urls}
+
+    async def _check_one(self, session: "aiohttp.ClientSession", semaphore: asyncio.Semaphore, url: str) -> None:
+        """Requests one URL (conditionally if its last answer had an ETag) and records the result."""
+        previous = self.results.get(url)
+        headers = {}
+        if previous is not None and previous.etag and previous.status == 200:
+            headers["If-None-Match"] = previous.etag
+        async with semaphore:
+            try:
+                status, etag = await self._request(session, "HEAD", url, headers)
+                if status in (405, 501): # HEAD not supported; the body of the GET is not read
+                    status, etag = await self._request(session, "GET", url, headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                status, etag, error = None, None, str(e) or type(e).__name__
+            else:
+                error = f"HTTP {status}" if status >= 400 and status not in GONE_STATUSES else None
+                if status == 304 and not headers: # Not Modified, but nothing was asked conditionally
+                    error = "HTTP 304 to an unconditional request"
+        if error is not None:
+            # No answer, a server error, or a refused check: keep the last ETag and count the failure
+            self.results[url] = LinkStatus(url, status, previous.etag if previous else None, time.time(), error,
+                                           previous.failures + 1 if previous is not None else 1)
+            metrics.LINK_CHECKS.inc("error")
+            return
+        if status == 304: # Not Modified: still the page seen last time
+            self.results[url] = LinkStatus(url, previous.status, etag or previous.etag, time.time())
+            metrics.LINK_CHECKS.inc("not_modified")
+            return
+        self.results[url] = LinkStatus(url, status, etag, time.time())
+        metrics.LINK_CHECKS.inc("broken" if self.results[url].broken else "ok")
+
+    @staticmethod
+    async def _request(session: "aiohttp.ClientSession", method: str, url: str,
+                       headers: Dict[str, str]) -> Tuple[int, Optional[str]]:
+        """Returns the final status and ETag of a request, following redirects."""
+        async with session.request(method, url, headers=headers, allow_redirects=True) as response:
+            return response.status, response.headers.get("ETag")
+
+# --- Shared Results ---
+# The results the handlers consult: URL -> last check, and the URLs currently broken.
+_results: Dict[str, LinkStatus] = {}
+_broken: FrozenSet[str] = frozenset()
+# Incremented whenever the set of broken URLs changes (part of the answer cache's data generation).
+_broken_version = 0
+
+def is_broken(url: Optional[str]) -> bool:
+    """True if `url` was flagged as broken by the last check."""
+    return url in _broken
+
+def broken_version() -> int:
+    """Changes whenever the set of broken URLs changes, so cached replies with those links are recomputed."""
+    return _broken_version
+
+def _publish(results: Dict[str, LinkStatus]) -> None:
+    """Makes `results` the shared results and updates the broken set."""
+    global _results, _broken, _broken_version
+    broken = frozenset(url for url, status in results.items() if status.broken)
+    _results = results
+    if broken != _broken:
+        _broken = broken
+        _broken_version += 1
+    metrics.BROKEN_LINKS.set(len(broken))
+
+def load_results(path: str = LINK_HEALTH_PATH) -> Dict[str, LinkStatus]:
+    """
+    Loads the saved check results (a missing or unreadable file means no URL is flagged).
+
+    Returns:
+        Dict[str, LinkStatus]: URL -> last check.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        results = {url: LinkStatus.from_dict(url, entry) for url, entry in data.items()}
+    except FileNotFoundError:
+        results = {}
+    except (ValueError, AttributeError) as e:
+        logger.error("Could not read link health results", extra={"path": path, "error": str(e)})
+        results = {}
+    _publish(results)
+    logger.info("Link health results loaded", extra={"path": path, "urls": len(results), "broken": len(_broken)})
+    return results
+
+def save_results(path: str = LINK_HEALTH_PATH) -> None:
+    """Writes the shared results to `path` (through a temporary file, so readers never see half a file)."""
+    temporary = path + ".tmp"
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump({url: status.to_dict() for url, status in _results.items()}, f, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+def catalogue_urls(*catalogues: Mapping[str, Any]) -> List[str]:
+    """The distinct 'url' values of catalogue entries (doc links, AlgoKit commands), in order."""
+    urls = (entry.get('url') for catalogue in catalogues for entry in catalogue.values() if isinstance(entry, dict))
+    return list(dict.fromkeys(url for url in urls if isinstance(url, str) and url.startswith(('http://', 'https://'))))
+
+async def check_links(urls: Iterable[str], path: Optional[str] = LINK_HEALTH_PATH,
+                      checker: Optional[LinkHealthChecker] = None) -> Dict[str, LinkStatus]:
+    """
+    Checks `urls` (reusing the shared results as the cache), publishes the results and saves them.
+
+    Args:
+        urls (Iterable[str]): URLs to check, e.g. from `catalogue_urls`.
+        path (Optional[str]): Where to save the results (None: not saved).
+        checker (Optional[LinkHealthChecker]): Checker to use (its cache is replaced by the shared results).
+
+    Returns:
+        Dict[str, LinkStatus]: The result for every given URL.
+    """
+    checker = checker or LinkHealthChecker()
+    checker.results = dict(_results)
+    checked = await checker.check(urls)
+    _publish(checker.results)
+    if path:
+        await asyncio.to_thread(save_results, path) # File I/O stays off the event loop
+    return checked
+
+# --- Direct Execution ---
+if __name__ == '__main__':
+    # Checks the doc link and AlgoKit command catalogues and lists the broken URLs.
+    from modules import doc_linker, algokit_handler
+    load_results()
+    catalogue = catalogue_urls(doc_linker.load_doc_links(), algokit_handler.load_algokit_commands())
+    checked = asyncio.run(check_links(catalogue))
+    for url, status in checked.items():
+        if status.broken:
+            print(f"BROKEN {status.status or status.error}: {url}")
+    print(f"{len(checked)} URLs checked, {sum(status.broken for status in checked.values())} broken.")
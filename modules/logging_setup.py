@@ -0,0 +1,127 @@
+"""
+Non-blocking, structured logging for the bot and its modules.
+
+Modules log through the standard `logging` API (`logging.getLogger(__name__)`).
+`configure_logging` installs a queue-backed pipeline on the root logger:
+- The handler on the request path only puts the record on an in-memory queue.
+- A background listener thread formats each record as one JSON object per line
+  and writes it to the output stream, so slow stdout/stderr never blocks the
+  event loop.
+- High-volume DEBUG lines are sampled before they are queued, so dropped lines
+  cost nothing beyond a random number draw.
+
+Structured fields are passed with `extra`, e.g.
+    logger.debug("Best match", extra={"score": 3, "line_index": 42})
+and appear as top-level keys in the JSON record.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from typing import Any, Dict, Optional, TextIO
+
+# --- Constants ---
+# Attributes every LogRecord has; anything else on a record came from `extra`.
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+DEFAULT_LEVEL = 'INFO'
+DEFAULT_DEBUG_SAMPLE_RATE = 0.1
+
+# --- Module State ---
+# The running listener, kept so configure_logging is idempotent and can be shut down.
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# --- Formatting ---
+class JsonFormatter(logging.Formatter):
+    """Formats a log record as a single-line JSON object."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        # Copy structured fields passed through `extra`.
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+# --- Sampling ---
+class DebugSamplingFilter(logging.Filter):
+    """Lets through only a fraction of DEBUG records; other levels always pass."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = max(0.0, min(1.0, sample_rate))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.sample_rate >= 1.0:
+            return True
+        return random.random() < self.sample_rate
+
+# --- Queue Handler ---
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler that enqueues records as they are.
+
+    The standard QueueHandler formats the message in the calling thread before
+    enqueuing it; deferring that to the listener thread keeps formatting cost
+    off the request path. Log arguments in this code base are plain values, so
+    formatting them later is safe.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+# --- Setup ---
+def configure_logging(level: str = DEFAULT_LEVEL, debug_sample_rate: float = DEFAULT_DEBUG_SAMPLE_RATE,
+                      stream: Optional[TextIO] = None) -> logging.handlers.QueueListener:
+    """
+    Routes all logging through a background thread that writes JSON lines.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        level (str): Minimum level to log (e.g. 'DEBUG', 'INFO').
+        debug_sample_rate (float): Fraction of DEBUG records to keep (0.0-1.0).
+        stream (Optional[TextIO]): Where to write the records. Defaults to stdout.
+
+    Returns:
+        QueueListener: The running listener.
+    """
+    global _listener
+    shutdown_logging()
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(debug_sample_rate))
+
+    output_handler = logging.StreamHandler(stream or sys.stdout)
+    output_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+
+    _listener = logging.handlers.QueueListener(log_queue, output_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def shutdown_logging() -> None:
+    """Flushes queued records and stops the background listener, if running."""
+    global _listener
+    if _listener is not None:
+        _listener.stop() # Processes everything still in the queue before returning
+        _listener = None
+
+# Make sure queued records are written when the process exits normally.
+atexit.register(shutdown_logging)
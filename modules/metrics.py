@@ -0,0 +1,290 @@
+"""
+Lightweight in-process metrics with a Prometheus-format HTTP endpoint.
+
+This module provides minimal Counter, Gauge and Histogram types (standard library
+only) and the metric instances used across the bot: per-handler and end-to-end
+latency, route decisions, cache lookups, fallbacks, upstream algod calls and
+event-loop lag. `start_metrics_server` exposes them in the Prometheus text
+exposition format so they can be scraped locally.
+
+The metric types are deliberately simple because they sit on the hottest path
+of the bot: an update is a dictionary lookup plus an addition (histograms add
+one `bisect` call). Updates are not locked; they happen on the event loop
+thread, and a rare lost increment from a worker thread is acceptable for
+monitoring purposes.
+"""
+import asyncio
+import bisect
+import http.server
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Default latency buckets (seconds), from sub-millisecond lookups up to slow network calls.
+DEFAULT_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Content type of the Prometheus text exposition format.
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# --- Registry ---
+# Every metric created through this module registers itself here, in creation order.
+_registry: List["_Metric"] = []
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str], extra: str = "") -> str:
+    """Formats a label set as `{name="value",...}` (escaping values), or '' if there are none."""
+    pairs = []
+    for name, value in zip(label_names, label_values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    """Formats a sample value; integers are written without a trailing '.0'."""
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+class _Metric:
+    """Common base for all metric types: name, help text and label names."""
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        """Returns the exposition-format lines for this metric."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._render_samples())
+        return lines
+
+    def _render_samples(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """A monotonically increasing count, optionally split by label values."""
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        """Increments the counter for the given label values (positional, in label order)."""
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        """Returns the current count for the given label values."""
+        return self._values.get(label_values, 0.0)
+
+    def _render_samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+                for labels, value in list(self._values.items())]
+
+class Gauge(_Metric):
+    """A value that can go up and down, or be computed at scrape time by a callback."""
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 callback: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback = callback
+
+    def set(self, value: float, *label_values: str) -> None:
+        """Sets the gauge for the given label values."""
+        self._values[label_values] = value
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        """Increments the gauge for the given label values."""
+        self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1.0) -> None:
+        """Decrements the gauge for the given label values."""
+        self._values[label_values] = self._values.get(label_values, 0.0) - amount
+
+    def set_callback(self, callback: Optional[Callable[[], float]]) -> None:
+        """Makes the (unlabelled) gauge report `callback()` at scrape time."""
+        self._callback = callback
+
+    def value(self, *label_values: str) -> float:
+        """Returns the current value for the given label values."""
+        if self._callback is not None and not label_values:
+            return float(self._callback())
+        return self._values.get(label_values, 0.0)
+
+    def _render_samples(self) -> List[str]:
+        if self._callback is not None:
+            return [f"{self.name} {_format_value(self.value())}"]
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+                for labels, value in list(self._values.items())]
+
+class Histogram(_Metric):
+    """
+    Counts observations into fixed buckets, optionally split by label values.
+
+    Bucket counts are stored non-cumulatively (one increment per observation)
+    and only made cumulative when rendered.
+    """
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum, count
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        """Records one observation for the given label values."""
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, *label_values: str) -> Iterator[None]:
+        """Context manager that observes the duration (in seconds) of its block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values: str) -> int:
+        """Returns how many observations were recorded for the given label values."""
+        series = self._series.get(label_values)
+        return series[2] if series else 0
+
+    def _render_samples(self) -> List[str]:
+        lines = []
+        for labels, (bucket_counts, total, count) in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), bucket_counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float('inf') else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+def render_prometheus() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+def reset_all() -> None:
+    """Clears all recorded values (used by tests and benchmarks)."""
+    for metric in _registry:
+        if isinstance(metric, Histogram):
+            metric._series.clear()
+        else:
+            metric._values.clear()
+
+# --- Bot Metrics ---
+# End-to-end latency of one query, from receiving the message to sending the reply.
+REQUEST_LATENCY = Histogram('algohelp_request_latency_seconds',
+                            'End-to-end latency of handling one query.')
+# Total queries received (the denominator for the fallback rate).
+REQUESTS = Counter('algohelp_requests_total', 'Queries received.')
+# Latency of each handler attempt made by the router (including attempts that found nothing).
+HANDLER_LATENCY = Histogram('algohelp_handler_latency_seconds',
+                            'Latency of each handler attempt.', ['handler'])
+# Which handler ended up answering each query ('fallback' when none did, 'empty' for a bare prefix).
+ROUTE_DECISIONS = Counter('algohelp_route_decisions_total',
+                          'Queries by the route that produced the response.', ['route'])
+# Queries that arrived before the startup data load finished and got the "warming up" reply.
+WARMING_UP_REPLIES = Counter('algohelp_warming_up_replies_total',
+                             'Queries answered with the warming up message during startup.')
+# Queries answered with the generic fallback message.
+FALLBACKS = Counter('algohelp_fallback_responses_total', 'Queries answered with the fallback message.')
+# Lookups of in-memory data caches, split into hits and misses.
+CACHE_LOOKUPS = Counter('algohelp_cache_lookups_total', 'In-memory cache lookups.', ['cache', 'result'])
+# Q&A queries rejected by the knowledge base vocabulary pre-check (no search was run).
+VOCABULARY_REJECTIONS = Counter('algohelp_vocabulary_rejections_total',
+                                'Q&A queries rejected because their keywords are not in the knowledge base.')
+# Segments in the incrementally updated knowledge base (see kb_segments.py); merges bring it down.
+KB_SEGMENTS = Gauge('algohelp_kb_segments', 'Segments in the knowledge base index.')
+# Guild datasets currently loaded (see guild_data.py); cold guilds are evicted over the memory budget.
+GUILD_DATASETS = Gauge('algohelp_guild_datasets', 'Per-guild datasets loaded in memory.')
+# Calls to the upstream algod nodes.
+ALGOD_LATENCY = Histogram('algohelp_algod_request_latency_seconds',
+                          'Latency of upstream algod API calls.', ['network'])
+ALGOD_ERRORS = Counter('algohelp_algod_errors_total', 'Failed upstream algod API calls.', ['network'])
+# Data loads from compiled snapshots (see data_snapshots.py): 'hit', or why the source file was parsed instead.
+SNAPSHOT_LOADS = Counter('algohelp_snapshot_loads_total',
+                         'Compiled data snapshot lookups by result (hit, missing, stale, invalid).', ['source', 'result'])
+# Catalogue URL checks (see link_health.py) by outcome, and the URLs currently flagged as broken.
+LINK_CHECKS = Counter('algohelp_link_checks_total',
+                      'Documentation URL checks by result (ok, not_modified, broken, error).', ['result'])
+BROKEN_LINKS = Gauge('algohelp_broken_links', 'Catalogue URLs flagged as broken.')
+# Admission control (see admission.py): queries waiting for a worker, workers busy,
+# how long admitted queries waited, and queries refused ('full' queue, or 'expired' while waiting).
+ADMISSION_QUEUE_DEPTH = Gauge('algohelp_admission_queue_depth', 'Queries waiting for a query worker.')
+ADMISSION_BUSY_WORKERS = Gauge('algohelp_admission_busy_workers', 'Query workers processing a query.')
+ADMISSION_WAIT = Histogram('algohelp_admission_wait_seconds', 'Time queries waited for a query worker.')
+ADMISSION_REJECTIONS = Counter('algohelp_admission_rejections_total',
+                               'Queries refused with the busy reply, by reason (full, expired).', ['reason'])
+# How late the event loop runs a task that asked to be woken up (a blocked loop shows up here).
+EVENT_LOOP_LAG = Histogram('algohelp_event_loop_lag_seconds', 'Event loop scheduling lag.')
+
+# --- Event Loop Lag Monitor ---
+async def monitor_event_loop_lag(interval: float = 0.5) -> None:
+    """
+    Periodically measures event-loop lag until cancelled.
+
+    Sleeps for `interval` seconds and records how much later than requested the
+    loop woke the task up. Run it as a background task on the bot's loop.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        EVENT_LOOP_LAG.observe(max(0.0, loop.time() - expected))
+
+# --- HTTP Endpoint ---
+class _MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    """Serves the rendered metrics on GET /metrics."""
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        payload = render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', PROMETHEUS_CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass # Scrapes are frequent; don't log each one
+
+def start_metrics_server(port: int, host: str = '127.0.0.1') -> http.server.ThreadingHTTPServer:
+    """
+    Starts the metrics endpoint (GET /metrics) in a background daemon thread.
+
+    Args:
+        port (int): Port to listen on (0 picks a free port).
+        host (str): Interface to bind to. Defaults to localhost only.
+
+    Returns:
+        ThreadingHTTPServer: The running server (call `shutdown()` to stop it).
+    """
+    server = http.server.ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info("Metrics endpoint listening", extra={"url": f"http://{host}:{server.server_address[1]}/metrics"})
+    return server
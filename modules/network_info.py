@@ -3,24 +3,42 @@ Handles requests for Algorand network status information.
 
 This module uses the `algosdk` library to connect to public Algorand nodes
 (via AlgoNode) and retrieve the current consensus round number for MainNet or TestNet.
+
+It also keeps each network's suggested transaction parameters (fees, validity
+window, genesis) in memory, so answering fee questions, or any feature that
+builds transactions, does not cost an algod call per message. Cached params
+are refreshed once a newer round is seen (from a status call), or after
+SUGGESTED_PARAMS_TTL seconds otherwise; concurrent refreshes are coalesced
+into a single call.
 """
+import asyncio
+import logging
 import os
+import time
+from typing import Any, Dict, Optional
 from algosdk.v2client import algod  # Import the Algod client from the Algorand SDK
 
+from modules import metrics, tracing
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
 # --- Configuration ---
 # Get Algod client URLs from environment variables.
 # If the environment variables are not set, it defaults to using public AlgoNode endpoints.
 ALGOD_MAINNET_URL = os.getenv('ALGOD_MAINNET_URL', 'https://mainnet-api.algonode.cloud')
 ALGOD_TESTNET_URL = os.getenv('ALGOD_TESTNET_URL', 'https://testnet-api.algonode.cloud')
+# Seconds cached suggested params are reused when no newer round has been seen (about one block).
+SUGGESTED_PARAMS_TTL = float(os.getenv('SUGGESTED_PARAMS_TTL', '3'))
 
 # --- Client Initialization ---
 # Initialize Algod clients globally. This allows the clients to be reused across
 # multiple calls to get_network_status_message, avoiding reconnection overhead.
 # The first argument to AlgodClient is the API token, which is empty ("") because
 # public AlgoNode endpoints do not require authentication.
-print(f"Initializing MainNet client for: {ALGOD_MAINNET_URL}")
+logger.info("Initializing MainNet client", extra={"url": ALGOD_MAINNET_URL})
 algod_mainnet_client = algod.AlgodClient("", ALGOD_MAINNET_URL)
-print(f"Initializing TestNet client for: {ALGOD_TESTNET_URL}")
+logger.info("Initializing TestNet client", extra={"url": ALGOD_TESTNET_URL})
 algod_testnet_client = algod.AlgodClient("", ALGOD_TESTNET_URL)
 
 # --- Core Function ---
@@ -51,27 +69,161 @@ async def get_network_status_message(network: str = 'mainnet') -> str:
         return f"Unknown network specified: '{network}'. Please use 'mainnet' or 'testnet'."
 
     # --- API Call and Response Handling ---
+    start = time.perf_counter() # Upstream call latency is recorded whether it succeeds or not
     try:
         # Make the synchronous API call to the selected Algod node to get its status.
         # Note: Although this function is async, client.status() itself might be blocking.
         # For high-concurrency bots, consider running blocking calls in an executor.
-        status = client.status()
+        with tracing.span("algod.status", tracing.KIND_CLIENT, network=network_name):
+            status = client.status()
+        metrics.ALGOD_LATENCY.observe(time.perf_counter() - start, network_name)
 
         # Check if the response is valid and contains the 'last-round' key.
         if status and 'last-round' in status:
             round_num = status['last-round']
+            _params_caches[network_name].observe_round(round_num) # A new round invalidates cached params
             # Format a success message including the network name and round number.
             return f"Algorand **{network_display_name}** is currently at round **{round_num}**."
         else:
             # Handle cases where the status response might be malformed or missing expected data.
-            print(f"Warning: Unexpected status response for {network_display_name}: {status}")
+            logger.warning("Unexpected status response", extra={"network": network_display_name, "status": status})
             return f"Could not retrieve valid status information for Algorand {network_display_name}."
     except Exception as e:
         # Catch potential exceptions during the API call (e.g., network errors, timeouts).
-        print(f"Error fetching network status for {network_display_name}: {e}")
+        metrics.ALGOD_LATENCY.observe(time.perf_counter() - start, network_name)
+        metrics.ALGOD_ERRORS.inc(network_name)
+        logger.error("Error fetching network status", extra={"network": network_display_name, "error": str(e)})
         # Return a user-friendly error message without exposing internal details.
         return f"An error occurred while trying to fetch the status for Algorand {network_display_name}. Please try again later."
 
+# --- Suggested Params Cache ---
+class SuggestedParamsCache:
+    """
+    One network's suggested transaction params, fetched on demand and shared by all callers.
+
+    Params are stale once a round newer than the one they were fetched at has
+    been observed, or SUGGESTED_PARAMS_TTL seconds after they were fetched
+    (rounds are only observed when someone asks for the network status). While
+    a refresh is running, other callers await it instead of starting their own.
+    """
+
+    def __init__(self, network: str, ttl: float = SUGGESTED_PARAMS_TTL):
+        """
+        Args:
+            network (str): 'mainnet' or 'testnet'.
+            ttl (float): Seconds params are reused without newer round information.
+        """
+        self.network = network
+        self.ttl = ttl
+        self._params: Any = None                       # algosdk SuggestedParams
+        self._params_round: Optional[int] = None       # Round the params were fetched at
+        self._fetched_at = float('-inf')               # time.monotonic() of the fetch
+        self._latest_round: Optional[int] = None       # Newest round seen by status calls
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def observe_round(self, round_num: int) -> None:
+        """Records a round seen on the network; params fetched at an older round become stale."""
+        if self._latest_round is None or round_num > self._latest_round:
+            self._latest_round = round_num
+
+    def is_fresh(self) -> bool:
+        """True if the cached params can be served without calling algod."""
+        if self._params is None or time.monotonic() - self._fetched_at >= self.ttl:
+            return False
+        return not (self._latest_round is not None and self._params_round is not None
+                    and self._latest_round > self._params_round)
+
+    async def get(self) -> Any:
+        """
+        Returns the network's suggested params, from memory when fresh.
+
+        Raises:
+            Exception: Whatever the algod call raised (every waiting caller gets it).
+        """
+        with tracing.span("suggested_params_cache.lookup", network=self.network) as span:
+            fresh = self.is_fresh()
+            span.set_attribute("hit", fresh)
+            if fresh:
+                metrics.CACHE_LOOKUPS.inc("suggested_params", "hit")
+                return self._params
+            metrics.CACHE_LOOKUPS.inc("suggested_params", "miss")
+            # A refresh already running is joined, not repeated (its algod span is in the trace that started it)
+            span.set_attribute("joined_refresh", self._refresh_task is not None)
+            if self._refresh_task is None:
+                self._refresh_task = asyncio.ensure_future(self._refresh())
+            # Shielded: a cancelled caller must not cancel the refresh the others are waiting for.
+            return await asyncio.shield(self._refresh_task)
+
+    async def _refresh(self) -> Any:
+        """Fetches new params in a worker thread (the algod client is blocking)."""
+        client = _get_client(self.network)
+        start = time.perf_counter()
+        try:
+            with tracing.span("algod.suggested_params", tracing.KIND_CLIENT, network=self.network):
+                params = await asyncio.to_thread(client.suggested_params)
+        except Exception:
+            metrics.ALGOD_ERRORS.inc(self.network)
+            raise
+        finally:
+            metrics.ALGOD_LATENCY.observe(time.perf_counter() - start, self.network)
+            self._refresh_task = None
+        self._params = params
+        self._params_round = getattr(params, 'first', None)
+        self._fetched_at = time.monotonic()
+        if self._params_round is not None:
+            self.observe_round(self._params_round)
+        return params
+
+def _get_client(network_name: str):
+    """The module-level client of a network (looked up on each call, so it can be replaced)."""
+    return algod_mainnet_client if network_name == 'mainnet' else algod_testnet_client
+
+_params_caches: Dict[str, SuggestedParamsCache] = {name: SuggestedParamsCache(name) for name in ('mainnet', 'testnet')}
+
+async def get_suggested_params(network: str = 'mainnet') -> Any:
+    """
+    Returns the suggested transaction params of a network from the shared cache.
+
+    Args:
+        network (str): 'mainnet' or 'testnet'.
+
+    Returns:
+        Any: The algosdk `SuggestedParams` (do not modify it: it is shared).
+
+    Raises:
+        ValueError: If the network is unknown.
+        Exception: If the params had to be fetched and the algod call failed.
+    """
+    cache = _params_caches.get(network.lower())
+    if cache is None:
+        raise ValueError(f"Unknown network: {network}")
+    return await cache.get()
+
+async def get_suggested_params_message(network: str = 'mainnet') -> str:
+    """
+    Describes the current suggested transaction params (minimum fee, fee per
+    byte, validity window) of a network.
+
+    Args:
+        network (str): The network to check ('mainnet' or 'testnet'). Defaults to 'mainnet'.
+
+    Returns:
+        str: A user-friendly message with the params or an error message.
+    """
+    network_name = network.lower()
+    if network_name not in _params_caches:
+        return f"Unknown network specified: '{network}'. Please use 'mainnet' or 'testnet'."
+    network_display_name = "MainNet" if network_name == 'mainnet' else "TestNet"
+    try:
+        params = await get_suggested_params(network_name)
+    except Exception as e:
+        logger.error("Error fetching suggested params", extra={"network": network_display_name, "error": str(e)})
+        return f"An error occurred while trying to fetch the transaction fees for Algorand {network_display_name}. Please try again later."
+    min_fee = getattr(params, 'min_fee', None) or 1000 # Protocol minimum when the SDK doesn't report it
+    return (f"Algorand **{network_display_name}** suggested transaction params (round **{params.first}**): "
+            f"minimum fee **{min_fee}** microAlgos, fee per byte **{params.fee}** microAlgos, "
+            f"valid through round **{params.last}**.")
+
 # --- Example Usage / Direct Execution ---
 if __name__ == '__main__':
     # This block allows the script to be run directly for testing purposes
@@ -95,5 +247,8 @@ if __name__ == '__main__':
         invalid_status = await get_network_status_message('invalidnet')
         print(invalid_status)
 
+        print("\nFetching MainNet suggested params...")
+        print(await get_suggested_params_message('mainnet'))
+
     # Run the async test function using asyncio.run()
     asyncio.run(test_status())
@@ -0,0 +1,193 @@
+"""
+On-demand profiling of individual queries.
+
+This module runs a coroutine (normally the routing of one query) under `cProfile`
+and `tracemalloc`, writes the results to files for later inspection, and builds
+a short text summary that fits in a Discord reply. The bot uses it for the
+admin-only `profile <query>` command and for optional sampled profiling.
+
+Note that cProfile records everything that runs on the thread while the
+coroutine is awaited, so other queries handled concurrently can show up in the
+profile too.
+"""
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import time
+import tracemalloc
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Default directory for profile dumps (project root / profiles).
+PROFILE_OUTPUT_DIR = os.path.join(os.path.dirname(__file__), '..', 'profiles')
+# How many functions / allocation sites to include in the dump and the summary.
+TOP_N_DUMP = 40
+TOP_N_SUMMARY = 5
+# Number of stack frames tracemalloc keeps per allocation.
+TRACEMALLOC_FRAMES = 5
+# Discord rejects messages longer than 2000 characters.
+MAX_SUMMARY_LENGTH = 1900
+
+class ProfileReport:
+    """Result of a profiled call: the call's return value plus where the dumps were written."""
+
+    def __init__(self, result: Any, summary: str, stats_path: str, report_path: str,
+                 elapsed_seconds: float, peak_memory_bytes: int):
+        self.result = result
+        self.summary = summary
+        self.stats_path = stats_path
+        self.report_path = report_path
+        self.elapsed_seconds = elapsed_seconds
+        self.peak_memory_bytes = peak_memory_bytes
+
+# --- Helpers ---
+def _slug(label: str, max_length: int = 40) -> str:
+    """Turns a free-text label (e.g. the query) into a safe file name fragment."""
+    slug = re.sub(r'[^a-zA-Z0-9]+', '-', label).strip('-').lower()
+    return slug[:max_length] or 'query'
+
+def _top_functions(profile: cProfile.Profile, limit: int) -> List[Tuple[str, int, float, float]]:
+    """Returns (function, calls, own time, cumulative time) for the most expensive functions."""
+    stats = pstats.Stats(profile)
+    rows = []
+    for (filename, lineno, function), (_, calls, own_time, cumulative, _) in stats.stats.items():
+        location = f"{os.path.basename(filename)}:{lineno}({function})" if lineno else function
+        rows.append((location, calls, own_time, cumulative))
+    rows.sort(key=lambda row: row[3], reverse=True)
+    return rows[:limit]
+
+def _top_allocations(snapshot: tracemalloc.Snapshot, limit: int) -> List[Tuple[str, int, int]]:
+    """Returns (source line, total bytes, block count) for the biggest allocation sites."""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    rows = []
+    for stat in snapshot.statistics('lineno')[:limit]:
+        frame = stat.traceback[0]
+        rows.append((f"{os.path.basename(frame.filename)}:{frame.lineno}", stat.size, stat.count))
+    return rows
+
+def _format_bytes(size: int) -> str:
+    """Formats a byte count for humans."""
+    for unit in ("B", "KiB", "MiB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024.0
+    return f"{size:.1f} GiB"
+
+# --- Exclusive Profiling ---
+# cProfile and tracemalloc are process-wide: a second profiled call running at the
+# same time would fail to enable its profiler, and the first one to finish would
+# stop tracemalloc under the other. One lock per event loop makes profiled calls
+# take turns.
+_lock: Optional[asyncio.Lock] = None
+_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def _profiling_lock() -> asyncio.Lock:
+    """The lock held while a call is profiled (created for the running event loop)."""
+    global _lock, _lock_loop
+    loop = asyncio.get_running_loop()
+    if _lock is None or _lock_loop is not loop:
+        _lock, _lock_loop = asyncio.Lock(), loop
+    return _lock
+
+def is_profiling() -> bool:
+    """
+    True while a call is being profiled. Sampled profiling checks this and skips
+    the query instead of waiting; `profile_call` takes the lock without awaiting
+    anything first, so nothing can start profiling between the check and the call.
+    """
+    return _lock is not None and _lock.locked()
+
+def _write_dumps(profile: cProfile.Profile, allocations: List[Tuple[str, int, int]], label: str,
+                 elapsed: float, peak_memory: int, output_dir: str) -> Tuple[str, str]:
+    """Writes the raw stats and the text report; returns their paths. Runs in a worker thread."""
+    os.makedirs(output_dir, exist_ok=True)
+    base_name = f"{time.strftime('%Y%m%d-%H%M%S')}-{_slug(label)}"
+    stats_path = os.path.join(output_dir, base_name + '.prof')
+    report_path = os.path.join(output_dir, base_name + '.txt')
+    profile.dump_stats(stats_path)
+
+    stats_text = io.StringIO()
+    pstats.Stats(profile, stream=stats_text).sort_stats('cumulative').print_stats(TOP_N_DUMP)
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(f"Profile of: {label}\n")
+        f.write(f"Wall time: {elapsed * 1000:.2f} ms | Peak traced memory: {_format_bytes(peak_memory)}\n\n")
+        f.write("=== Top functions (cumulative time) ===\n")
+        f.write(stats_text.getvalue())
+        f.write("\n=== Top allocation sites (memory held at the end of the call) ===\n")
+        for location, size, count in allocations:
+            f.write(f"{location:<50} {_format_bytes(size):>12} in {count} blocks\n")
+    return stats_path, report_path
+
+# --- Core Function ---
+async def profile_call(call: Callable[[], Awaitable[Any]], label: str,
+                       output_dir: str = PROFILE_OUTPUT_DIR) -> ProfileReport:
+    """
+    Awaits `call()` under cProfile and tracemalloc and writes the results to files.
+
+    Only one call is profiled at a time: if another profiled call is running,
+    this one waits for it to finish before starting (see `is_profiling`).
+
+    Two files are written to `output_dir` (from a worker thread):
+    - `<timestamp>-<label>.prof`: raw cProfile stats (open with `pstats` or snakeviz).
+    - `<timestamp>-<label>.txt`: the top functions and allocation sites as text.
+
+    Args:
+        call (Callable[[], Awaitable[Any]]): Creates the coroutine to profile.
+        label (str): Describes what is profiled (e.g. the query); used in file names.
+        output_dir (str): Directory for the dump files (created if missing).
+
+    Returns:
+        ProfileReport: The call's result, a short summary and the dump file paths.
+    """
+    async with _profiling_lock():
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            result = await call()
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - start
+            _, peak_memory = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+
+    functions = _top_functions(profile, TOP_N_DUMP)
+    allocations = _top_allocations(snapshot, TOP_N_DUMP)
+
+    # --- Dump Files ---
+    stats_path, report_path = await asyncio.to_thread(_write_dumps, profile, allocations, label,
+                                                      elapsed, peak_memory, output_dir)
+
+    # --- Summary ---
+    lines = [f"**Profile**: {elapsed * 1000:.1f} ms wall, peak traced memory {_format_bytes(peak_memory)}",
+             "Top functions (cumulative):"]
+    for location, calls, own_time, cumulative in functions[:TOP_N_SUMMARY]:
+        lines.append(f"`{location}` {cumulative * 1000:.2f} ms cum, {own_time * 1000:.2f} ms own, {calls} calls")
+    if allocations:
+        lines.append("Top allocations:")
+        for location, size, count in allocations[:TOP_N_SUMMARY]:
+            lines.append(f"`{location}` {_format_bytes(size)} in {count} blocks")
+    lines.append(f"Full report: `{os.path.relpath(report_path)}`")
+    summary = "\n".join(lines)
+    if len(summary) > MAX_SUMMARY_LENGTH:
+        summary = summary[:MAX_SUMMARY_LENGTH] + "..."
+
+    logger.info("Profiled query", extra={"label": label, "elapsed_ms": elapsed * 1000,
+                                         "peak_memory_bytes": peak_memory, "report": report_path})
+    return ProfileReport(result, summary, stats_path, report_path, elapsed, peak_memory)
@@ -4,9 +4,25 @@ Handles general Question & Answering based on a text knowledge base.
 This module implements a simple keyword-matching approach to find relevant
 information within a pre-defined text file (`llms-small.txt`) based on a user's query.
 """
+import heapq
+import logging
 import os
 import re  # Regular expressions for keyword extraction and matching
-from typing import Optional, List
+import threading
+import weakref
+from typing import Optional, List, Dict, Iterable, Sequence, Tuple, Union
+
+from modules import metrics, ann_index, kb_ingest, data_snapshots
+
+try:
+    import numpy as np
+except ImportError: # Optional; only used to speed up batch scoring (see get_answers_batch)
+    np = None
+from modules.kb_store import CompactKnowledgeBase
+from modules.kb_segments import KnowledgeBaseSnapshot, SegmentedKnowledgeBase
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
 
 # --- Constants ---
 # Define the path to the knowledge base text file.
@@ -14,158 +30,859 @@ from typing import Optional, List
 # is one level up from the 'modules' directory.
 KB_FILE_PATH = os.path.join(os.path.dirname(__file__), '..', 'data', 'llms-small.txt')
 
+# Optional list of knowledge base sources (files or directories, separated like
+# PATH entries, e.g. "data/llms-full.txt:data/portal-mirror:data/algokit-readmes").
+# When set, the default knowledge base is built from all of them by the parallel
+# ingestion pipeline in kb_ingest.py instead of reading KB_FILE_PATH.
+KB_SOURCES = [path for path in os.getenv('KB_SOURCES', '').split(os.pathsep) if path.strip()]
+# Worker processes used for ingestion (0 or unset: one per CPU core).
+KB_INGEST_WORKERS = int(os.getenv('KB_INGEST_WORKERS', '0')) or None
+
+# Minimum number of query keywords a line must contain to be returned as an answer.
+# A match is only considered relevant if its score meets or exceeds this threshold.
+# This helps filter out weak matches. Value was tuned during testing.
+MIN_SCORE_THRESHOLD = 3
+
+# Retrieval mode: 'keyword' (default) scores every line by exact keyword overlap;
+# 'ann' finds candidate lines with the approximate nearest-neighbour index in
+# ann_index.py (requires NumPy) and re-ranks them with the keyword score.
+QA_RETRIEVAL_MODE = os.getenv('QA_RETRIEVAL_MODE', 'keyword').strip().lower()
+# Number of ANN candidates re-ranked per query.
+ANN_CANDIDATES = 20
+# In 'ann' mode, a candidate with too few keyword matches is still accepted if its
+# cosine similarity to the query reaches this value (catches reworded questions).
+ANN_MIN_SIMILARITY = 0.4
+# Lines longer than this are answered with the window of this many characters that
+# contains the most matched keywords (see `_best_snippet`); shorter lines are shown whole.
+ANSWER_SNIPPET_LENGTH = 500
+# Proximity scoring (keyword retrieval): among lines with the same keyword score,
+# lines where the keywords occur close together rank first (see `_proximity`).
+# Set QA_PROXIMITY_SCORING=false for plain keyword overlap.
+QA_PROXIMITY_SCORING = os.getenv('QA_PROXIMITY_SCORING', 'true').strip().lower() not in ('0', 'false', 'no')
+# Weight of the proximity bonus (0-1 per line). Kept below 1, so proximity only
+# orders lines with the same keyword score and never decides the threshold.
+PROXIMITY_WEIGHT = 0.5
+# Number of best-scoring lines whose proximity is computed per query (bounds the cost).
+PROXIMITY_CANDIDATES = 20
+# Query x line scores held at once by batch scoring (2 MiB, so a block stays in cache);
+# longer batches are scored in blocks.
+MAX_BATCH_SCORES = 1 << 18
+if QA_RETRIEVAL_MODE == 'ann' and not ann_index.NUMPY_AVAILABLE:
+    logger.warning("QA_RETRIEVAL_MODE=ann requires NumPy; falling back to keyword retrieval")
+
+# Common English stop words filtered out of queries, as they usually don't
+# contribute much to identifying the topic.
+STOP_WORDS = frozenset([
+    "a", "an", "the", "is", "it", "in", "on", "of", "for", "to", "and", "or", "be", "was", "are",
+    "what", "when", "where", "who", "why", "how", "do", "does", "did", "i", "you", "he", "she",
+    "me", "my", "your", "his", "her", "with", "about", "if", "get", "can", "use", "from", "by",
+    "tell", "about", "explain", "define" # Added some query-specific words
+])
+
 # --- Caching ---
-# Global variable to cache the loaded knowledge base lines in memory.
+# Global variable to cache the loaded knowledge base in memory.
 # This avoids redundant file I/O by storing the lines after the first load.
-# Initialized to None; will hold the list of lines once loaded.
-_knowledge_base_lines: Optional[List[str]] = None
+# Initialized to None; will hold a CompactKnowledgeBase once loaded. The lines are
+# kept in one contiguous buffer (plus a lowercase copy built once), see kb_store.py.
+# A plain list of lines assigned here (e.g. by tests) is converted on first use.
+_knowledge_base_lines: Optional[Sequence[str]] = None
+# ANN indexes built in 'ann' mode, per knowledge base object (the shared one, a
+# segment's, or a snapshot's combined index): id(knowledge base) -> (weak reference
+# to it, index). An index is dropped with its knowledge base, so a reloaded knowledge
+# base gets a new index. (Knowledge bases compare by content and aren't hashable, hence the ids.)
+_ann_indexes: Dict[int, Tuple[weakref.ref, Union["ann_index.AnnIndex", "ann_index.CombinedAnnIndex"]]] = {}
+# Segmented store created by the first incremental update (see update_documents).
+# From then on, _knowledge_base_lines holds its latest snapshot.
+_kb_segments: Optional[SegmentedKnowledgeBase] = None
+_kb_segments_lock = threading.Lock()
+# Document id under which a knowledge base without known source files (e.g. assigned
+# as a list of lines) is kept in the store.
+BASE_DOCUMENT_ID = "base"
+# The source files of the loaded knowledge base, each kept in the store as one document
+# with its path as the document id: (loaded knowledge base, KB_SOURCES paths it was
+# ingested from or None if it was read as a single file, (path, first line, end line)
+# per file, path -> (size, mtime) of each file when last read). refresh_sources
+# applies changed files as incremental updates.
+_kb_sources: Optional[Tuple[CompactKnowledgeBase, Optional[List[str]], List[Tuple[str, int, int]],
+                            Dict[str, Optional[Tuple[int, int]]]]] = None
+_kb_refresh_lock = threading.Lock() # One refresh at a time
+# Number of incremental updates applied in this process (part of the data generation
+# that cached answers are checked against, see query_router.data_generation).
+_kb_update_count = 0
 
 # --- Core Functions ---
-def load_knowledge_base(filepath: str = KB_FILE_PATH) -> List[str]:
+def load_knowledge_base(filepath: str = KB_FILE_PATH) -> CompactKnowledgeBase:
     """
-    Loads the knowledge base text file into memory as a list of lines.
+    Loads the knowledge base text file into memory as a compact sequence of lines.
 
     Includes basic caching: if the knowledge base has already been loaded,
-    it returns the cached list instead of reading the file again.
+    it returns the cached knowledge base instead of reading the file again.
+    If KB_SOURCES is configured, the default knowledge base is built from those
+    sources instead (see kb_ingest.py); an explicit `filepath` is always read
+    as a single file. Each source file becomes one document of the incremental
+    store, so `refresh_sources` can re-read just the files that change. After
+    incremental updates (see `update_documents`), the cached knowledge base is
+    the store's latest snapshot, which supports the same searches.
     Handles file not found and other potential exceptions during file reading.
 
     Args:
         filepath (str): The path to the knowledge base text file. Defaults to KB_FILE_PATH.
 
     Returns:
-        List[str]: A list of strings, where each string is a non-empty line
-                   from the knowledge base file with leading/trailing whitespace stripped.
-                   Returns an empty list if loading fails.
+        CompactKnowledgeBase: A read-only sequence of the non-empty lines of the
+                              knowledge base file, with leading/trailing whitespace
+                              stripped. It is empty if loading fails.
     """
-    global _knowledge_base_lines
+    global _knowledge_base_lines, _kb_sources
     # Return cached data if available
     if _knowledge_base_lines is not None:
         # print("Returning cached knowledge base.") # Debugging cache hit
+        metrics.CACHE_LOOKUPS.inc("knowledge_base", "hit")
+        if not isinstance(_knowledge_base_lines, (CompactKnowledgeBase, KnowledgeBaseSnapshot)):
+            # Lines were assigned directly as a list; build the compact form once.
+            _knowledge_base_lines = CompactKnowledgeBase(_knowledge_base_lines)
         return _knowledge_base_lines
+    metrics.CACHE_LOOKUPS.inc("knowledge_base", "miss")
 
     try:
-        # Open and read the file line by line
-        with open(filepath, 'r', encoding='utf-8') as f:
-            # Create a list of lines, stripping whitespace and skipping empty lines
-            loaded_lines = [line.strip() for line in f if line.strip()]
-
-        # Update the global cache
-        _knowledge_base_lines = loaded_lines
-        print(f"Knowledge base loaded successfully from {filepath}. Lines: {len(_knowledge_base_lines)}")
+        if KB_SOURCES and filepath == KB_FILE_PATH:
+            # Build the default knowledge base from all configured sources in parallel.
+            # The files are stamped first, so a change made while they are read is seen later.
+            stamps = {path: _source_stamp(path) for path in kb_ingest.discover_sources(KB_SOURCES)}
+            _knowledge_base_lines, documents = kb_ingest.ingest_documents(KB_SOURCES, KB_INGEST_WORKERS)
+            _kb_sources = (_knowledge_base_lines, list(KB_SOURCES), documents, stamps)
+            _knowledge_base_lines.vocabulary_filter()
+            return _knowledge_base_lines
+        # Use the compiled snapshot (buffers and word index) if it is current
+        # (see data_snapshots.py); otherwise stream the file line by line into
+        # the compact buffers, stripping whitespace and skipping empty lines
+        stamps = {filepath: _source_stamp(filepath)}
+        _knowledge_base_lines = data_snapshots.load_knowledge_base(filepath)
+        if _knowledge_base_lines is None:
+            _knowledge_base_lines = CompactKnowledgeBase.from_file(filepath)
+        _kb_sources = (_knowledge_base_lines, None, [(filepath, 0, len(_knowledge_base_lines))], stamps)
+        _knowledge_base_lines.vocabulary_filter() # Built now, so the first query doesn't pay for it
+        logger.info("Knowledge base loaded", extra={"path": filepath, "lines": len(_knowledge_base_lines)})
         return _knowledge_base_lines
     except FileNotFoundError:
         # Handle case where the file doesn't exist
-        print(f"Error: Knowledge base file not found at {filepath}")
-        _knowledge_base_lines = [] # Ensure cache is empty on error
-        return []
-    except Exception as e:
+        logger.error("Knowledge base file not found", extra={"path": filepath})
+        _knowledge_base_lines = CompactKnowledgeBase() # Ensure cache is empty on error
+        return _knowledge_base_lines
+    except Exception:
         # Handle other potential file reading errors
-        print(f"Error loading knowledge base from {filepath}: {e}")
-        _knowledge_base_lines = [] # Ensure cache is empty on error
-        return []
+        logger.exception("Error loading knowledge base", extra={"path": filepath})
+        _knowledge_base_lines = CompactKnowledgeBase() # Ensure cache is empty on error
+        return _knowledge_base_lines
+
+# --- Incremental Updates ---
+def _segment_store() -> SegmentedKnowledgeBase:
+    """
+    Returns the segmented store, creating it from the loaded knowledge base on first use
+    (or after the knowledge base was reloaded). Called with _kb_segments_lock held.
+    """
+    global _kb_segments, _kb_sources
+    kb_lines = load_knowledge_base()
+    if _kb_segments is None or isinstance(kb_lines, CompactKnowledgeBase):
+        store = None
+        if _kb_sources is not None and _kb_sources[0] is not kb_lines:
+            _kb_sources = None # Describes a knowledge base that was replaced (e.g. by tests)
+
+        def publish(snapshot: KnowledgeBaseSnapshot) -> None:
+            # Background merges publish here too; a store replaced meanwhile is ignored.
+            global _knowledge_base_lines
+            if _kb_segments is store:
+                _knowledge_base_lines = snapshot
+
+        store = SegmentedKnowledgeBase(kb_lines, BASE_DOCUMENT_ID, on_publish=publish,
+                                       base_documents=_kb_sources[2] if _kb_sources is not None else None)
+        _kb_segments = store
+    return _kb_segments
+
+def update_documents(documents: Dict[str, Sequence[str]]) -> KnowledgeBaseSnapshot:
+    """
+    Adds or replaces knowledge base documents without reloading the knowledge base.
+
+    The documents' lines are indexed into a new, small segment (see kb_segments.py),
+    so the cost depends on the size of the change, not of the knowledge base.
+    Queries running meanwhile keep using the snapshot they started with. Each
+    source file of the loaded knowledge base is a document, with its path as the
+    id (see `refresh_sources`); a knowledge base without known source files is
+    the document BASE_DOCUMENT_ID.
+
+    Args:
+        documents (Dict[str, Sequence[str]]): Document id -> lines of text.
+
+    Returns:
+        KnowledgeBaseSnapshot: The knowledge base including the change.
+    """
+    global _kb_update_count
+    with _kb_segments_lock:
+        snapshot = _segment_store().upsert(documents)
+        _kb_update_count += 1
+    # _knowledge_base_lines was updated by the store's publish callback
+    return snapshot
+
+def delete_documents(doc_ids: Iterable[str]) -> KnowledgeBaseSnapshot:
+    """
+    Removes knowledge base documents (they are tombstoned and dropped by the next merge).
+
+    Args:
+        doc_ids (Iterable[str]): Ids of the documents to remove; unknown ids are ignored.
+
+    Returns:
+        KnowledgeBaseSnapshot: The knowledge base without the documents.
+    """
+    global _kb_update_count
+    with _kb_segments_lock:
+        snapshot = _segment_store().delete(doc_ids)
+        _kb_update_count += 1
+    return snapshot
+
+def _source_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """(size, modification time) of a source file, or None if it cannot be read."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+def _read_source(path: str, ingested: bool) -> List[str]:
+    """The lines of one source file, read as when the knowledge base was loaded (ingested or as a single file)."""
+    if ingested:
+        return kb_ingest.source_chunks(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.readlines() # Stripped (and empty lines skipped) like CompactKnowledgeBase.from_file
+
+def refresh_sources() -> int:
+    """
+    Applies changes to the knowledge base's source files as incremental updates.
+
+    Each source file is one document (see `load_knowledge_base`). Files whose size
+    or modification time changed since they were read are re-read and replaced,
+    files added under the KB_SOURCES directories are added, and removed files are
+    deleted, so a change costs time proportional to the changed files, not to the
+    whole knowledge base. Nothing happens before the knowledge base is loaded.
+    The bot calls this every KB_REFRESH_INTERVAL seconds.
+
+    Returns:
+        int: Number of documents added, replaced or deleted.
+    """
+    with _kb_refresh_lock:
+        sources = _kb_sources
+        kb_lines = _knowledge_base_lines
+        # The sources describe the loaded knowledge base, or the store built from it
+        if sources is None or (kb_lines is not sources[0] and not isinstance(kb_lines, KnowledgeBaseSnapshot)):
+            return 0
+        _, roots, documents, stamps = sources
+        changed: Dict[str, Sequence[str]] = {}
+        paths = roots if roots is not None else [path for path, _, _ in documents]
+        current = {path: _source_stamp(path) for path in kb_ingest.discover_sources(paths)}
+        for path, stamp in current.items():
+            if stamp == stamps.get(path):
+                continue
+            try:
+                changed[path] = _read_source(path, roots is not None)
+            except (OSError, UnicodeDecodeError) as e:
+                logger.error("Could not read knowledge base source", extra={"path": path, "error": str(e)})
+                current[path] = stamps.get(path) # Retried at the next refresh
+        removed = [path for path in stamps if path not in current]
+        if changed:
+            update_documents(changed)
+        if removed:
+            delete_documents(removed)
+        stamps.clear()
+        stamps.update((path, stamp) for path, stamp in current.items() if stamp is not None)
+    if changed or removed:
+        logger.info("Knowledge base sources refreshed", extra={"changed": len(changed), "removed": len(removed)})
+    return len(changed) + len(removed)
+
+def kb_update_count() -> int:
+    """Number of incremental updates (update_documents / delete_documents) applied so far."""
+    return _kb_update_count
+
+def extract_keywords(query: str) -> List[str]:
+    """
+    Extracts the meaningful keywords from a query.
+
+    Args:
+        query (str): The user's query string.
+
+    Returns:
+        List[str]: Lowercase words longer than 2 characters that are not stop words,
+                   in query order (repeated words are kept).
+    """
+    # 1. Find all sequences of word characters (alphanumeric + underscore) using regex.
+    query_words = re.findall(r'\b\w+\b', query.lower()) # Convert query to lowercase first.
+    # 2. Filter the words: keep only those longer than 2 characters and not in STOP_WORDS.
+    return [word for word in query_words if len(word) > 2 and word not in STOP_WORDS]
+
+# Quoted parts of a query; curly quotes are accepted too (phone keyboards type them).
+_PHRASE_PATTERN = re.compile(r'["\u201c\u201d]([^"\u201c\u201d]+)["\u201c\u201d]')
+
+def extract_phrases(query: str) -> List[Tuple[str, ...]]:
+    """
+    Extracts the quoted phrases from a query, e.g. `"box storage"`.
+
+    A line only answers a query with phrases if it contains every phrase, with
+    its words adjacent and in order (see `CompactKnowledgeBase.phrase_positions`).
+    The phrase's words are still counted as keywords, and each matched phrase
+    adds one point to the line's score, so a quoted two-word phrase can reach
+    MIN_SCORE_THRESHOLD on its own.
+
+    Args:
+        query (str): The user's query string.
+
+    Returns:
+        List[Tuple[str, ...]]: Lowercase words of each phrase (stop words included).
+            Single words and phrases made only of stop words are left out.
+    """
+    phrases = []
+    for text in _PHRASE_PATTERN.findall(query):
+        words = tuple(re.findall(r'\b\w+\b', text.lower()))
+        if len(words) > 1 and extract_keywords(text):
+            phrases.append(words)
+    return phrases
+
+def get_ann_index(kb_lines: CompactKnowledgeBase) -> Optional[Union["ann_index.AnnIndex",
+                                                                   "ann_index.CombinedAnnIndex"]]:
+    """
+    Returns the ANN index for the given knowledge base, building it on first use.
+
+    A snapshot of the segmented knowledge base (after incremental updates) gets
+    a `CombinedAnnIndex` of one index per segment, leaving out tombstoned lines.
+    Segments are immutable and shared by the snapshots that follow, so an update
+    or merge only indexes the segment it creates (on the first query after it),
+    at a cost proportional to that segment, not to the whole knowledge base.
+
+    Args:
+        kb_lines (CompactKnowledgeBase): The loaded knowledge base (or a snapshot of it).
+
+    Returns:
+        Optional[Union[AnnIndex, CombinedAnnIndex]]: The index, or None if NumPy is not installed.
+    """
+    if not ann_index.NUMPY_AVAILABLE:
+        return None
+    key = id(kb_lines)
+    entry = _ann_indexes.get(key)
+    if entry is None or entry[0]() is not kb_lines:
+        if isinstance(kb_lines, KnowledgeBaseSnapshot):
+            # Each part masks its segment's tombstoned lines. The parts don't refer to the
+            # snapshot, so it (and this entry) can still be dropped.
+            index = ann_index.CombinedAnnIndex([
+                (get_ann_index(segment.kb), start,
+                 np.isin(np.asarray(segment.line_docs), list(dead)) if dead else None)
+                for segment, dead, start in zip(kb_lines.segments, kb_lines.tombstones, kb_lines.segment_starts)])
+        else:
+            index = ann_index.AnnIndex(kb_lines.lower_line(i) for i in range(len(kb_lines)))
+        entry = _ann_indexes[key] = (weakref.ref(kb_lines, lambda _, key=key: _ann_indexes.pop(key, None)), index)
+    return entry[1]
+
+def _could_answer(kb_lines: CompactKnowledgeBase, keywords: List[str], ann_mode: bool,
+                  phrases: Sequence[Tuple[str, ...]] = ()) -> bool:
+    """
+    Vocabulary pre-check: False if the keywords cannot produce an answer.
+
+    Only keywords that occur in the knowledge base can add to a line's score, and
+    the vocabulary Bloom filter rules out most of the others with a few hash
+    lookups (see `CompactKnowledgeBase.might_contain`). In 'keyword' mode the
+    query is hopeless if fewer than MIN_SCORE_THRESHOLD keywords (with repeats)
+    may occur; in 'ann' mode a similar enough line may still qualify, so the
+    query is only rejected if none of its keywords may occur. Greetings,
+    off-topic chat and questions about other chains typically stop here.
+    Each phrase may add a point (see `extract_phrases`), so phrases count too.
+    """
+    known = sum(1 for keyword in keywords if kb_lines.might_contain(keyword))
+    if known == 0 or (not ann_mode and known + len(phrases) < MIN_SCORE_THRESHOLD):
+        metrics.VOCABULARY_REJECTIONS.inc()
+        return False
+    return True
+
+def _keyword_score(lower_line: str, keywords: List[str]) -> int:
+    """Counts the keywords (with repeats) that appear in a lowercase line as whole words."""
+    return sum(1 for keyword in keywords if re.search(r'\b' + re.escape(keyword) + r'\b', lower_line))
+
+def _keyword_line_scores(kb_lines: CompactKnowledgeBase, keywords: List[str],
+                         keyword_lines: Optional[Dict[str, List[int]]] = None,
+                         phrases: Sequence[Tuple[str, ...]] = ()) -> Dict[int, int]:
+    """
+    Returns the keyword score of every line containing at least one keyword.
+
+    `keyword_lines` memoizes the lines each keyword occurs in; pass the same
+    dictionary for several queries to search each distinct keyword only once.
+    With `phrases`, only lines containing every phrase are kept, and each
+    phrase adds one point (see `extract_phrases`).
+    """
+    # --- Matching and Scoring Lines in Knowledge Base ---
+    # A line's score is the number of query keywords that appear in it as whole
+    # words (using regex `\b` for word boundaries, so 'arc' matches 'arc' but not
+    # 'architecture'). Instead of lowercasing and testing every line, each keyword
+    # is searched once over the knowledge base's prebuilt lowercase buffer, and
+    # only the lines it occurs in get their score increased.
+    line_scores: Dict[int, int] = {}
+    if keyword_lines is None:
+        keyword_lines = {} # Repeated keywords count again but are searched once
+    for keyword in keywords:
+        if keyword not in keyword_lines:
+            keyword_lines[keyword] = kb_lines.matching_lines(keyword)
+        for i in keyword_lines[keyword]:
+            line_scores[i] = line_scores.get(i, 0) + 1
+    if phrases:
+        # Only lines containing every keyword of every phrase (a set intersection of
+        # their lines) are checked for the phrases' word order. Every phrase has a
+        # keyword (see extract_phrases), so lines containing it were scored above.
+        phrase_keywords = {word for phrase in phrases for word in phrase if word in keyword_lines}
+        candidates = set.intersection(*(set(keyword_lines[word]) for word in phrase_keywords))
+        line_scores = {i: line_scores[i] + len(phrases) for i in sorted(candidates)
+                       if all(kb_lines.phrase_positions(i, phrase) for phrase in phrases)}
+    return line_scores
+
+def _proximity(kb_lines: CompactKnowledgeBase, index: int, keywords: List[str]) -> float:
+    """
+    How close together the keywords occur in line `index`: 1.0 when the distinct
+    keywords it contains are adjacent words, falling towards 0 as they spread out.
+
+    The keyword positions come from `term_positions`; two pointers over the
+    sorted positions find the shortest span containing every distinct keyword
+    of the line, and its length in words is compared with the number of keywords.
+    """
+    hits = sorted((start, keyword) for keyword in set(keywords)
+                  for start in kb_lines.term_positions(index, keyword))
+    distinct = len({keyword for _, keyword in hits})
+    if distinct < 2:
+        return 0.0
+    lower_line = kb_lines.lower_line(index)
+    counts: Dict[str, int] = {}
+    shortest = len(lower_line) + 1
+    span = (0, 0)
+    left = 0
+    for start, keyword in hits:
+        counts[keyword] = counts.get(keyword, 0) + 1
+        # Shrink from the left while every distinct keyword stays in the window
+        while counts[hits[left][1]] > 1:
+            counts[hits[left][1]] -= 1
+            left += 1
+        if len(counts) == distinct and start - hits[left][0] < shortest:
+            shortest = start - hits[left][0]
+            span = (hits[left][0], start)
+    # Words in the span: the spaces before its last keyword, plus that keyword
+    words = lower_line.count(" ", span[0], span[1]) + 1
+    return (distinct - 1) / max(words - 1, distinct - 1)
+
+def _top_lines(kb_lines: CompactKnowledgeBase, keywords: List[str], line_scores: Dict[int, int],
+               top_k: int, min_score: int = 0) -> List[int]:
+    """
+    Returns up to `top_k` lines scoring at least `min_score`: highest score first,
+    then (with QA_PROXIMITY_SCORING) closest keywords, then earliest line.
+
+    Proximity is only computed for the PROXIMITY_CANDIDATES best lines by score,
+    so its cost doesn't grow with the number of matching lines.
+    """
+    proximity = QA_PROXIMITY_SCORING and len(set(keywords)) > 1
+    candidates = heapq.nsmallest(max(top_k, PROXIMITY_CANDIDATES) if proximity else top_k,
+                                 (i for i, score in line_scores.items() if score >= min_score),
+                                 key=lambda i: (-line_scores[i], i))
+    if proximity:
+        weighted = {i: line_scores[i] + PROXIMITY_WEIGHT * _proximity(kb_lines, i, keywords) for i in candidates}
+        candidates.sort(key=lambda i: (-weighted[i], i))
+    return candidates[:top_k]
+
+def _best_keyword_match(kb_lines: CompactKnowledgeBase, keywords: List[str],
+                        keyword_lines: Optional[Dict[str, List[int]]] = None,
+                        phrases: Sequence[Tuple[str, ...]] = ()) -> Optional[int]:
+    """
+    Scores every line by keyword overlap and returns the best line's index,
+    or None if no line reaches the minimum score (see `_keyword_line_scores`).
+    """
+    line_scores = _keyword_line_scores(kb_lines, keywords, keyword_lines, phrases)
+
+    # Only lines meeting the threshold are ranked (so hopeless queries skip the proximity
+    # work). Ties go to the closest keywords (see `_top_lines`), then to the earliest
+    # line, as when the lines were scanned in order.
+    best = _top_lines(kb_lines, keywords, line_scores, 1, MIN_SCORE_THRESHOLD)
+    best_match_line_index = best[0] if best else None # Index of the line with the highest score
+
+    logger.debug("Best match", extra={"score": line_scores.get(best_match_line_index, 0),
+                                      "line_index": best_match_line_index, "threshold": MIN_SCORE_THRESHOLD})
+    return best_match_line_index
+
+def _best_keyword_matches_vectorized(kb_lines: CompactKnowledgeBase, keyword_sets: Sequence[List[str]],
+                                     keyword_arrays: Dict[str, "np.ndarray"]) -> List[Optional[int]]:
+    """
+    Same results as `_best_keyword_match` for many queries at once, computed with NumPy (used for batches).
+
+    Queries are scored in blocks of as many queries as fit in MAX_BATCH_SCORES
+    query x line scores (at least one), so memory stays bounded however long the
+    batch is, and short knowledge bases don't cost one score array per query.
+    `keyword_arrays` memoizes each keyword's line indices.
+    """
+    rows = max(1, MAX_BATCH_SCORES // len(kb_lines))
+    results: List[Optional[int]] = []
+    for start in range(0, len(keyword_sets), rows):
+        results.extend(_score_keyword_block(kb_lines, keyword_sets[start:start + rows], keyword_arrays))
+    return results
+
+def _score_keyword_block(kb_lines: CompactKnowledgeBase, block: Sequence[List[str]],
+                         keyword_arrays: Dict[str, "np.ndarray"]) -> List[Optional[int]]:
+    """
+    Best line of each query of a block (see `_best_keyword_matches_vectorized`).
+
+    Every keyword occurrence of row `query` is encoded as `query * len(kb_lines) + line`,
+    so a single `bincount` gives the block's query x line score matrix (the product
+    of the sparse query x keyword and keyword x line matrices), and `argmax` along
+    each row returns the first (earliest) line with the highest score, matching the
+    tie-breaking of the loop version. No sorting is needed.
+    """
+    total_lines = len(kb_lines)
+    pairs = []
+    for query, keywords in enumerate(block):
+        for keyword in keywords:
+            if keyword not in keyword_arrays:
+                keyword_arrays[keyword] = np.asarray(kb_lines.matching_lines(keyword), dtype=np.int64)
+            pairs.append(keyword_arrays[keyword] + query * total_lines)
+    scores = np.bincount(np.concatenate(pairs), minlength=len(block) * total_lines).reshape(len(block), total_lines)
+    best_lines = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(block)), best_lines]
+
+    best: List[Optional[int]] = []
+    for query, keywords in enumerate(block):
+        best_score = best_scores[query]
+        if best_score < MIN_SCORE_THRESHOLD:
+            best.append(None)
+            continue
+        best_match_line_index = int(best_lines[query])
+        if QA_PROXIMITY_SCORING and len(set(keywords)) > 1:
+            # Same candidates as `_top_lines`: the earliest lines with the best score
+            tied = np.flatnonzero(scores[query] == best_score)[:PROXIMITY_CANDIDATES]
+            if len(tied) > 1:
+                best_match_line_index = int(max(tied, key=lambda i: (_proximity(kb_lines, int(i), keywords), -i)))
+        best.append(best_match_line_index)
+    return best
 
-def get_answer_from_kb(query: str) -> Optional[str]:
+def _rank_ann_candidates(kb_lines: CompactKnowledgeBase, index: "ann_index.AnnIndex",
+                         keywords: List[str], phrases: Sequence[Tuple[str, ...]] = ()) -> List[Tuple[int, float, int]]:
     """
-    Searches the loaded knowledge base (list of lines) for content relevant to the user's query.
+    Finds candidate lines with the ANN index and re-ranks them: highest keyword
+    score first, then highest similarity, then earliest line. With `phrases`,
+    only candidates containing every phrase are kept (each adds one point).
 
-    This function implements a simple keyword matching algorithm:
+    Returns:
+        List[Tuple[int, float, int]]: (keyword score, similarity, line index) per candidate.
+    """
+    ranked = []
+    # The index is queried with the keywords only, so stop words don't pull in unrelated lines.
+    # A snapshot's index leaves out the lines of replaced and deleted documents (see get_ann_index).
+    for i, similarity in index.query(" ".join(keywords), ANN_CANDIDATES):
+        if not all(kb_lines.phrase_positions(i, phrase) for phrase in phrases):
+            continue
+        ranked.append((_keyword_score(kb_lines.lower_line(i), keywords) + len(phrases), similarity, i))
+    ranked.sort(key=lambda item: (-item[0], -item[1], item[2]))
+    return ranked
+
+def _best_ann_match(kb_lines: CompactKnowledgeBase, index: "ann_index.AnnIndex",
+                    keywords: List[str], phrases: Sequence[Tuple[str, ...]] = ()) -> Optional[int]:
+    """
+    Returns the index of the best-ranked ANN candidate that is acceptable (enough
+    keyword matches or similar enough to the query), or None.
+    """
+    for score, similarity, i in _rank_ann_candidates(kb_lines, index, keywords, phrases):
+        if score >= MIN_SCORE_THRESHOLD or similarity >= ANN_MIN_SIMILARITY:
+            logger.debug("Best ANN match", extra={"score": score, "similarity": similarity, "line_index": i})
+            return i
+    return None
+
+def _best_snippet(kb_lines: CompactKnowledgeBase, index: int, keywords: List[str],
+                  max_length: int = ANSWER_SNIPPET_LENGTH) -> str:
+    """
+    Returns line `index`, or for a long line the part of it that best matches the keywords.
+
+    The keywords' positions come from the knowledge base's positional index
+    (see `CompactKnowledgeBase.term_positions`), so the line is not rescanned.
+    A window slides over the sorted matches to find the span of at most
+    `max_length` characters with the most distinct keywords (then the most
+    matches); it is widened to `max_length` around them, cut at word
+    boundaries, and the matched keywords in it are shown in bold. The cost
+    grows with the number of matches, not with the line length.
+    """
+    line = kb_lines.line(index)
+    if len(line) <= max_length:
+        return line
+    lower_line = kb_lines.lower_line(index)
+    if len(lower_line) != len(line):
+        # Lowercasing changed the length (rare characters), so positions don't map back.
+        return line[:max_length] + "..."
+
+    # --- Matches ---
+    hits = sorted((start, start + len(keyword), keyword)
+                  for keyword in set(keywords) for start in kb_lines.term_positions(index, keyword))
+    if not hits:
+        return line[:max_length] + "..."
+
+    # --- Densest Window ---
+    # Two pointers over the hits: [left, right] is the widest run of hits ending at
+    # `right` that fits in max_length; keep the one with the most distinct keywords.
+    counts: Dict[str, int] = {}
+    best = (0, 0, 0, 0) # (distinct keywords, hits, first hit, last hit)
+    left = 0
+    for right, (_, end, keyword) in enumerate(hits):
+        counts[keyword] = counts.get(keyword, 0) + 1
+        while end - hits[left][0] > max_length:
+            left_keyword = hits[left][2]
+            counts[left_keyword] -= 1
+            if not counts[left_keyword]:
+                del counts[left_keyword]
+            left += 1
+        candidate = (len(counts), right - left + 1, left, right)
+        if candidate[:2] > best[:2]:
+            best = candidate
+    _, _, first, last = best
+
+    # --- Window Bounds ---
+    # Center the matched span in max_length characters, then move the edges to word boundaries.
+    span_start, span_end = hits[first][0], hits[last][1]
+    start = max(0, min(span_start - (max_length - (span_end - span_start)) // 2, len(line) - max_length))
+    end = min(len(line), start + max_length)
+    if start > 0:
+        space = line.find(" ", start, span_start)
+        start = space + 1 if space != -1 else start
+    if end < len(line):
+        space = line.rfind(" ", span_end, end)
+        end = space if space != -1 else end
+
+    # --- Highlighting ---
+    pieces = ["..." if start > 0 else ""]
+    position = start
+    for hit_start, hit_end, _ in hits[first:last + 1]:
+        if hit_start < position:
+            continue # Overlaps the previous highlight
+        pieces += [line[position:hit_start], "**", line[hit_start:hit_end], "**"]
+        position = hit_end
+    pieces += [line[position:end], "..." if end < len(line) else ""]
+    return "".join(pieces)
+
+def _format_answer(response_text: str) -> str:
+    """Truncates a knowledge base line if needed and formats it as the bot's reply."""
+    # --- Optional: Context Enhancement ---
+    # TODO: Consider returning surrounding lines (e.g., line before and after)
+    #       to provide more context, instead of just the single best matching line.
+    #       This would require adjusting the logic here and potentially the scoring.
+
+    # --- Response Length Limiting ---
+    # Limit the response length to avoid sending excessively long messages in Discord.
+    # Long lines are normally reduced to their best snippet first (see `_best_snippet`).
+    max_length = 1000 # Define maximum characters for the response snippet.
+    if len(response_text) > max_length:
+        # Truncate the text and add ellipsis if it exceeds the max length.
+        response_text = response_text[:max_length] + "..."
+
+    # Format the final response string
+    return f"Based on the knowledge base:\n>>> {response_text}"
+
+def get_answer_from_kb(query: str, kb_lines: Optional[CompactKnowledgeBase] = None) -> Optional[str]:
+    """
+    Searches the loaded knowledge base for content relevant to the user's query.
+
+    In the default 'keyword' retrieval mode this implements a simple keyword matching algorithm:
     1. Extracts meaningful keywords from the user's query (removes short words and common stop words).
-    2. Iterates through each line in the loaded knowledge base.
-    3. For each line, calculates a relevance score based on how many query keywords appear
-       as whole words within that line (using regex `\b` for word boundaries).
-    4. Identifies the line with the highest score.
+       If too few of them occur anywhere in the knowledge base (checked with its vocabulary
+       Bloom filter), returns None right away.
+    2. Searches the knowledge base's lowercase buffer for each keyword as a whole word
+       (using regex `\b` for word boundaries), collecting the lines it appears in.
+    3. Scores each line by how many query keywords appear in it. Quoted phrases in the
+       query (`"box storage"`) must appear in the line, with their words adjacent and in order.
+    4. Identifies the line with the highest score; on ties, the line where the keywords
+       are closest together (QA_PROXIMITY_SCORING), then the earliest one.
     5. If the highest score meets a predefined minimum threshold, formats and returns that line
        as the answer. Otherwise, returns None.
 
+    In 'ann' mode (QA_RETRIEVAL_MODE=ann, requires NumPy), step 2-4 are replaced by an
+    approximate nearest-neighbour lookup whose candidates are re-ranked by keyword score;
+    a candidate is also accepted if it is similar enough to the query (ANN_MIN_SIMILARITY).
+    Without NumPy, 'ann' mode falls back to the keyword mode.
+
     Args:
         query (str): The user's query string.
+        kb_lines (Optional[CompactKnowledgeBase]): Knowledge base to search instead of
+            the shared one, e.g. a guild's layered knowledge base (see guild_data.py).
 
     Returns:
         Optional[str]: A formatted string containing the most relevant snippet found,
                        prefixed with "Based on the knowledge base:", or None if no
                        sufficiently relevant match is found.
     """
-    kb_lines = load_knowledge_base() # Ensure KB is loaded (uses cache if available)
+    if kb_lines is None:
+        kb_lines = load_knowledge_base() # Ensure KB is loaded (uses cache if available)
     if not kb_lines:
-        print("Knowledge base is empty, cannot provide answer.")
+        logger.warning("Knowledge base is empty, cannot provide answer.")
         return None # Return early if KB is not loaded
 
     # --- Keyword Extraction from Query ---
-    # Define a set of common English stop words to filter out from the query,
-    # as they usually don't contribute much to identifying the topic.
-    stop_words = set([
-        "a", "an", "the", "is", "it", "in", "on", "of", "for", "to", "and", "or", "be", "was", "are",
-        "what", "when", "where", "who", "why", "how", "do", "does", "did", "i", "you", "he", "she",
-        "me", "my", "your", "his", "her", "with", "about", "if", "get", "can", "use", "from", "by",
-        "tell", "about", "explain", "define" # Added some query-specific words
-    ])
-    # 1. Find all sequences of word characters (alphanumeric + underscore) using regex.
-    query_words = re.findall(r'\b\w+\b', query.lower()) # Convert query to lowercase first.
-    # 2. Filter the words: keep only those longer than 2 characters and not in the stop_words set.
-    keywords = [word for word in query_words if len(word) > 2 and word not in stop_words]
+    keywords = extract_keywords(query)
 
     # If no keywords are left after filtering, we can't match anything
     if not keywords:
-        print(f"No useful keywords extracted from query: '{query}'")
+        logger.debug("No useful keywords extracted from query", extra={"query": query})
         return None
 
-    print(f"Extracted keywords: {keywords}")
+    phrases = extract_phrases(query)
+    logger.debug("Extracted keywords", extra={"keywords": keywords, "phrases": phrases})
 
-    # --- Matching and Scoring Lines in Knowledge Base ---
-    best_match_score = 0        # Keep track of the highest score found so far
-    best_match_line_index = -1  # Index of the line with the highest score
-
-    # Iterate through each line in the loaded knowledge base
-    for i, line in enumerate(kb_lines):
-        line_lower = line.lower() # Convert KB line to lowercase for matching
-        current_score = 0         # Score for the current line
-
-        # Calculate the score for the current line:
-        # Sum 1 for each query keyword found as a whole word in the line.
-        # `re.escape` handles potential special characters in keywords.
-        # `\b` ensures matching whole words (e.g., 'arc' matches 'arc' but not 'architecture').
-        try:
-            current_score = sum(1 for keyword in keywords if re.search(r'\b' + re.escape(keyword) + r'\b', line_lower))
-        except re.error as e:
-            # Handle rare cases where a keyword might cause a regex error
-            print(f"Regex error processing keyword '{keyword}' in line {i}. Error: {e}")
-            continue # Skip scoring this line if a keyword causes an error
-
-        # If the current line has a higher score than the best found so far, update the best match
-        if current_score > best_match_score:
-            best_match_score = current_score
-            best_match_line_index = i
+    # --- Vocabulary Pre-Check ---
+    # Queries whose keywords are (almost) all unknown to the knowledge base can't
+    # reach the threshold; they go straight to the fallback without a search.
+    ann_mode = QA_RETRIEVAL_MODE == 'ann' and ann_index.NUMPY_AVAILABLE
+    if not _could_answer(kb_lines, keywords, ann_mode, phrases):
+        logger.debug("Query keywords not in knowledge base vocabulary", extra={"keywords": keywords})
+        return None
 
-    # --- Result Selection and Formatting ---
-    # Define a minimum score threshold. A match is only considered relevant if its
-    # score meets or exceeds this threshold. This helps filter out weak matches.
-    # Value was tuned during testing.
-    min_score_threshold = 3
-
-    print(f"[QA DEBUG] Best match score: {best_match_score} at index {best_match_line_index} (Threshold: {min_score_threshold})")
-
-    # Check if the best score meets the threshold and a valid line index was found.
-    if best_match_score >= min_score_threshold and best_match_line_index != -1:
-        # Retrieve the best matching line from the knowledge base using the stored index.
-        response_text = kb_lines[best_match_line_index]
-
-        # --- Optional: Context Enhancement ---
-        # TODO: Consider returning surrounding lines (e.g., line before and after)
-        #       to provide more context, instead of just the single best matching line.
-        #       This would require adjusting the logic here and potentially the scoring.
-
-        # --- Response Length Limiting ---
-        # Limit the response length to avoid sending excessively long messages in Discord.
-        max_length = 1000 # Define maximum characters for the response snippet.
-        if len(response_text) > max_length:
-            # Truncate the text and add ellipsis if it exceeds the max length.
-            response_text = response_text[:max_length] + "..."
-
-        # Format the final response string
-        return f"Based on the knowledge base:\n>>> {response_text}"
+    # --- Retrieval ---
+    index = get_ann_index(kb_lines) if ann_mode else None
+    if index is not None:
+        best_match_line_index = _best_ann_match(kb_lines, index, keywords, phrases)
     else:
+        best_match_line_index = _best_keyword_match(kb_lines, keywords, phrases=phrases)
+
+    # --- Result Selection and Formatting ---
+    if best_match_line_index is None:
         # Return None if no match met the minimum score threshold
         return None
+    # Retrieve (materialize) the best matching line, or the best part of a long one.
+    return _format_answer(_best_snippet(kb_lines, best_match_line_index, keywords))
+
+def get_answers_from_kb(query: str, top_k: int = 5,
+                        kb_lines: Optional[CompactKnowledgeBase] = None) -> List[str]:
+    """
+    Like `get_answer_from_kb`, but returns up to `top_k` answers, best first.
+
+    Every returned line passes the same acceptance rules as the single answer
+    (minimum keyword score, or ANN similarity in 'ann' mode), and the first one
+    is the line `get_answer_from_kb` would return. Used to page through
+    alternative answers (see result_pages.py) with one search.
+
+    Args:
+        query (str): The user's query string.
+        top_k (int): Maximum number of answers.
+        kb_lines (Optional[CompactKnowledgeBase]): Knowledge base to search instead of the shared one.
+
+    Returns:
+        List[str]: Formatted answers (see `_format_answer`); empty if nothing is relevant enough.
+    """
+    if kb_lines is None:
+        kb_lines = load_knowledge_base()
+    keywords = extract_keywords(query)
+    if not kb_lines or not keywords:
+        return []
+    phrases = extract_phrases(query)
+    ann_mode = QA_RETRIEVAL_MODE == 'ann' and ann_index.NUMPY_AVAILABLE
+    if not _could_answer(kb_lines, keywords, ann_mode, phrases):
+        return []
+    index = get_ann_index(kb_lines) if ann_mode else None
+    if index is not None:
+        best = [i for score, similarity, i in _rank_ann_candidates(kb_lines, index, keywords, phrases)
+                if score >= MIN_SCORE_THRESHOLD or similarity >= ANN_MIN_SIMILARITY][:top_k]
+    else:
+        line_scores = _keyword_line_scores(kb_lines, keywords, phrases=phrases)
+        # Same order as _best_keyword_match: highest score first, then closest keywords, then earliest line
+        best = _top_lines(kb_lines, keywords, line_scores, top_k, MIN_SCORE_THRESHOLD)
+    return [_format_answer(_best_snippet(kb_lines, i, keywords)) for i in best]
+
+def rank_kb(query: str, top_k: int = 5) -> List[int]:
+    """
+    Ranks knowledge base lines for a query, ignoring the answer thresholds.
+
+    This exposes the ordering the answer is picked from (used e.g. by the
+    retrieval evaluation harness to compute recall@k and MRR). It follows the
+    current retrieval mode: keyword score (then keyword proximity and the earliest
+    line on ties) in 'keyword' mode, re-ranked ANN candidates in 'ann' mode.
+    Quoted phrases are required as in `get_answer_from_kb`.
+
+    Args:
+        query (str): The user's query string.
+        top_k (int): Maximum number of lines to return.
+
+    Returns:
+        List[int]: Indices of the best matching lines, best first. Lines that
+                   match no keyword are not ranked.
+    """
+    kb_lines = load_knowledge_base()
+    keywords = extract_keywords(query)
+    if not kb_lines or not any(kb_lines.might_contain(keyword) for keyword in keywords):
+        return []
+    phrases = extract_phrases(query)
+    index = get_ann_index(kb_lines) if QA_RETRIEVAL_MODE == 'ann' else None
+    if index is not None:
+        return [i for _, _, i in _rank_ann_candidates(kb_lines, index, keywords, phrases)[:top_k]]
+    line_scores = _keyword_line_scores(kb_lines, keywords, phrases=phrases)
+    return _top_lines(kb_lines, keywords, line_scores, top_k)
+
+def get_answers_batch(queries: Sequence[str]) -> List[Optional[str]]:
+    """
+    Answers many queries at once, e.g. to score a FAQ export or evaluate ranking changes.
+
+    Results are the same as calling `get_answer_from_kb` on each query, but the
+    work is shared across the batch:
+    - The knowledge base (and ANN index) is looked up once for the whole batch.
+    - Each distinct keyword is searched in the knowledge base once, no matter
+      how many queries contain it.
+    - Queries that reduce to the same keywords (e.g. differing only in case,
+      punctuation or stop words) are scored once.
+    - With NumPy, keyword queries are scored together, a block of queries
+      per `bincount` (see `_best_keyword_matches_vectorized`).
+
+    Args:
+        queries (Sequence[str]): The query strings.
+
+    Returns:
+        List[Optional[str]]: One answer (or None) per query, in input order.
+    """
+    kb_lines = load_knowledge_base()
+    if not kb_lines:
+        logger.warning("Knowledge base is empty, cannot provide answers.", extra={"queries": len(queries)})
+        return [None] * len(queries)
+
+    ann_mode = QA_RETRIEVAL_MODE == 'ann' and ann_index.NUMPY_AVAILABLE
+    index = get_ann_index(kb_lines) if ann_mode else None
+    keyword_lines: Dict[str, List[int]] = {} # Shared by every query in the batch
+    # With NumPy, each keyword's lines are also kept as an array, and the keyword
+    # queries are scored together afterwards (see _best_keyword_matches_vectorized).
+    keyword_arrays: Dict[str, "np.ndarray"] = {}
+    # Answers by sorted keywords and phrases: the score only depends on which keywords
+    # occur (and how often), and the proximity on which keywords are asked for.
+    answers: Dict[Tuple, Optional[str]] = {}
+    vectorized: Dict[Tuple, List[str]] = {} # Keys scored together with NumPy, with their keywords
+    query_keys: List[Optional[Tuple]] = []
+    for query in queries:
+        keywords = extract_keywords(query)
+        if not keywords:
+            query_keys.append(None)
+            continue
+        phrases = extract_phrases(query)
+        key = (tuple(sorted(keywords)), tuple(sorted(phrases)))
+        query_keys.append(key)
+        if key in answers or key in vectorized:
+            continue
+        if not _could_answer(kb_lines, keywords, ann_mode, phrases):
+            best_match_line_index = None
+        elif index is not None:
+            best_match_line_index = _best_ann_match(kb_lines, index, keywords, phrases)
+        elif np is not None and not phrases:
+            vectorized[key] = keywords
+            continue
+        else:
+            best_match_line_index = _best_keyword_match(kb_lines, keywords, keyword_lines, phrases)
+        answers[key] = (None if best_match_line_index is None
+                        else _format_answer(_best_snippet(kb_lines, best_match_line_index, keywords)))
+
+    if vectorized:
+        best_lines = _best_keyword_matches_vectorized(kb_lines, list(vectorized.values()), keyword_arrays)
+        for (key, keywords), best_match_line_index in zip(vectorized.items(), best_lines):
+            answers[key] = (None if best_match_line_index is None
+                            else _format_answer(_best_snippet(kb_lines, best_match_line_index, keywords)))
+    results = [answers[key] if key is not None else None for key in query_keys]
+
+    logger.debug("Answered query batch", extra={"queries": len(queries), "distinct": len(answers),
+                                                "keywords": len(keyword_lines) + len(keyword_arrays)})
+    return results
 
 # --- Example Usage / Direct Execution ---
 if __name__ == '__main__':
@@ -0,0 +1,327 @@
+"""
+Routes a user's query to the handler module best suited to answer it.
+
+This module holds the routing logic that used to live inline in `bot.py`'s
+`on_message` handler. Keeping it free of any Discord objects means the same
+priority rules can be reused (and timed) without a live Discord connection,
+e.g. by the scripts in `benchmarks/`.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from modules import network_info, qa_handler, doc_linker, algokit_handler, metrics, answer_cache, guild_data, link_health
+from modules import tracing
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Keywords that indicate the user is asking about an AlgoKit CLI command.
+ALGOKIT_KEYWORDS = ["algokit", "command"]
+# Keywords that indicate the user wants a link to the documentation.
+DOC_KEYWORDS = ["doc", "link for", "documentation", "url for"]
+# Keywords that indicate the user wants live network status information.
+NETWORK_KEYWORDS = ["round", "network status", "block"]
+# Keywords that indicate the user wants the current transaction fees / suggested params.
+FEE_KEYWORDS = ["min fee", "minimum fee", "transaction fee", "current fee", "suggested params", "suggested parameters"]
+
+# Message sent when no handler could produce a response for a non-empty query.
+FALLBACK_MESSAGE = "Sorry, I couldn't find specific information for that query. Try asking differently, or check the Algorand Developer Portal: https://dev.algorand.co/"
+
+# Routes whose responses only depend on the query and the data files, so they can be
+# cached ('fallback': no handler answered). Network status changes every few seconds.
+CACHEABLE_ROUTES = frozenset(["algokit", "docs", "qa", "fallback"])
+# Prefix of answer cache keys for guilds with their own data: "guild:<id>:<version>|<query>".
+GUILD_KEY_PREFIX = "guild:"
+# Handlers a caller can ask for directly (e.g. slash subcommands), skipping the keyword checks.
+DIRECT_HANDLERS = frozenset(["algokit", "docs", "network"])
+# Prefix of answer cache keys of direct handler calls: "handler:<name>|<query>".
+HANDLER_KEY_PREFIX = "handler:"
+# Routes whose answer has ranked alternatives the user can page through (see `ranked_results`).
+PAGED_ROUTES = frozenset(["qa", "docs"])
+# Results in one paged result set.
+MAX_RESULT_PAGES = 5
+# How long the data files' fingerprint is reused before the files are checked again.
+GENERATION_CHECK_INTERVAL = 1.0
+
+# --- Answer Cache ---
+# Optional cache of responses by normalized query (see answer_cache.py), enabled by the bot.
+_answer_cache: Optional[answer_cache.AnswerCache] = None
+# (time of the last check, fingerprint of the data files and handler code)
+_file_generation: Tuple[float, str] = (float('-inf'), "")
+
+def _fingerprint_paths() -> List[str]:
+    """The files whose content decides the cached responses: the data files and the handler code."""
+    return ([qa_handler.KB_FILE_PATH, *qa_handler.KB_SOURCES, doc_linker.DOC_LINKS_FILE_PATH,
+             algokit_handler.COMMANDS_FILE_PATH]
+            + [module.__file__ for module in (qa_handler, doc_linker, algokit_handler)] + [__file__])
+
+def data_generation() -> str:
+    """
+    Identifies the data (and code) responses are computed from.
+
+    It changes when a data file or handler module changes size or modification
+    time (e.g. after a redeploy), after every incremental knowledge base
+    update, and when the link checker flags or clears broken links. The file
+    part is re-checked at most every GENERATION_CHECK_INTERVAL seconds, so
+    calling this on every query costs a tuple comparison.
+    KB_SOURCES directories are fingerprinted by their own modification time
+    (files added or removed), not by every file inside.
+    """
+    global _file_generation
+    now = time.monotonic()
+    checked_at, files = _file_generation
+    if now - checked_at >= GENERATION_CHECK_INTERVAL:
+        digest = hashlib.sha1()
+        for path in _fingerprint_paths():
+            try:
+                stat = os.stat(path)
+                digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+            except OSError:
+                digest.update(f"{os.path.basename(path)}:missing;".encode())
+        files = digest.hexdigest()[:16]
+        _file_generation = (now, files)
+    return f"{files}:{qa_handler.kb_update_count()}:{link_health.broken_version()}"
+
+def enable_answer_cache(cache: Optional[answer_cache.AnswerCache]) -> None:
+    """Makes `route_query` serve and store responses through `cache` (None disables caching)."""
+    global _answer_cache
+    _answer_cache = cache
+
+def get_answer_cache() -> Optional[answer_cache.AnswerCache]:
+    """Returns the answer cache in use, if any."""
+    return _answer_cache
+
+async def warm_answer_cache() -> int:
+    """
+    Loads the warm cache into the answer cache and recomputes its stale entries.
+
+    Entries saved under the current data generation are served as they are.
+    Entries from an older generation (new data or code since they were saved)
+    are answered again through `route_query`, most frequent first, which
+    re-caches them and warms the handlers at the same time. The file is read
+    in a worker thread; recomputation yields to the event loop between queries.
+
+    Returns:
+        int: Number of responses recomputed.
+    """
+    cache = _answer_cache
+    if cache is None:
+        return 0
+    started = time.perf_counter()
+    stale = await asyncio.to_thread(cache.load)
+    # Guild entries are keyed by the guild's file version and can't be replayed without
+    # the guild context; stale ones are left to be recomputed on the guild's next query.
+    # Direct handler entries are replayed with their handler.
+    stale = [query for query in stale if not query.startswith(GUILD_KEY_PREFIX)]
+    for query in stale:
+        handler = None
+        if query.startswith(HANDLER_KEY_PREFIX):
+            handler, query = query[len(HANDLER_KEY_PREFIX):].split("|", 1)
+        await route_query(query, handler=handler)
+        await asyncio.sleep(0) # Let live messages through during a long warm-up
+    logger.info("Answer cache warmed", extra={"entries": len(cache), "recomputed": len(stale),
+                                              "elapsed_ms": (time.perf_counter() - started) * 1000})
+    return len(stale)
+
+# --- Guild Data ---
+def _handler_data(dataset: Optional[guild_data.GuildDataset]) -> Tuple[Mapping[str, Any], Dict[str, Any],
+                                                                      Dict[str, Any], Dict[str, Any]]:
+    """
+    Returns the AlgoKit commands to match, and the extra arguments for the AlgoKit,
+    docs and Q&A handlers. A guild with its own data (`dataset`) gets views layered
+    on the shared data; otherwise the arguments are empty and the handlers use the shared data.
+    """
+    commands_data = algokit_handler.load_algokit_commands()
+    if dataset is None:
+        return commands_data, {}, {}, {}
+    commands_data = dataset.commands_view(commands_data)
+    return (commands_data, {"commands_data": commands_data},
+            {"doc_links": dataset.doc_links_view(doc_linker.load_doc_links())},
+            {"kb_lines": dataset.knowledge_base(qa_handler.load_knowledge_base())})
+
+# --- Core Function ---
+async def route_query(query: str, guild_id: Optional[int] = None, handler: Optional[str] = None,
+                      use_cache: bool = True) -> Optional[str]:
+    """
+    Answers a query with the handler best suited to it (see `route_query_with_route`).
+
+    Args:
+        query (str): The user's query with the bot prefix already removed.
+        guild_id (Optional[int]): The Discord guild the query comes from (None for DMs).
+        handler (Optional[str]): One of DIRECT_HANDLERS, or None to route by keywords.
+        use_cache (bool): If False, the handlers run even if the answer is cached.
+
+    Returns:
+        Optional[str]: The response produced by the first handler that could
+                       answer the query, or None if no handler matched.
+    """
+    response, _ = await route_query_with_route(query, guild_id, handler, use_cache)
+    return response
+
+async def route_query_with_route(query: str, guild_id: Optional[int] = None, handler: Optional[str] = None,
+                                 use_cache: bool = True) -> Tuple[Optional[str], str]:
+    """
+    Determines the user's intent based on keywords in their query and routes
+    the request to the appropriate handler module.
+
+    The order of the checks defines the priority:
+    1. AlgoKit Command Help (most specific keywords)
+    2. Documentation Link Request
+    3. Network Status Request
+    4. General Q&A (least specific, acts as a fallback)
+
+    If an answer cache is enabled (see `enable_answer_cache`), every query is
+    counted, and a cached response of the current data generation is returned
+    without running any handler. Responses of cacheable routes are stored.
+    With `use_cache=False` (e.g. to profile the handlers) the cache is not
+    looked up nor counted, but the fresh response is still stored.
+
+    Queries from a guild with its own data (see guild_data.py) are answered
+    from that guild's data layered on the shared data; the guild's dataset is
+    loaded on its first query. Their cache entries are kept apart per guild
+    and per version of the guild's files.
+
+    With `handler`, only that handler runs, whatever the keywords (for callers
+    where the user already picked one, like the slash subcommands); for
+    'network', the query names the network.
+
+    Args:
+        query (str): The user's query with the bot prefix already removed.
+        guild_id (Optional[int]): The Discord guild the query comes from (None for DMs).
+        handler (Optional[str]): One of DIRECT_HANDLERS, or None to route by keywords.
+        use_cache (bool): If False, the handlers run even if the answer is cached.
+
+    Returns:
+        Tuple[Optional[str], str]: The response produced by the first handler that
+            could answer the query (None if no handler matched), and the name of
+            the route that produced it ('fallback' if none, 'empty' for an empty query).
+    """
+    if handler is not None and handler not in DIRECT_HANDLERS:
+        raise ValueError(f"Unknown handler: {handler}")
+    with tracing.span("route_query", handler=handler or "") as span:
+        response, route = await _route_query(query, guild_id, handler, use_cache)
+        span.set_attribute("route", route)
+        span.set_attribute("answered", response is not None)
+    return response, route
+
+async def _route_query(query: str, guild_id: Optional[int], handler: Optional[str],
+                       use_cache: bool) -> Tuple[Optional[str], str]:
+    """The body of `route_query_with_route`, with a span for each stage of the current trace (see tracing.py)."""
+    cache = _answer_cache
+    # None: the guild uses the shared data (its files are checked in a worker thread)
+    guild_version = await guild_data.get_registry().version_async(guild_id)
+    cache_key = None
+    if cache is not None and query:
+        cache_key = answer_cache.normalize_query(query)
+        if handler is not None:
+            cache_key = f"{HANDLER_KEY_PREFIX}{handler}|{cache_key}"
+        if guild_version is not None:
+            cache_key = f"{GUILD_KEY_PREFIX}{guild_id}:{guild_version}|{cache_key}"
+    if cache_key is not None and use_cache:
+        with tracing.span("answer_cache.lookup") as span:
+            cache.record(cache_key)
+            cached = cache.get(cache_key)
+            span.set_attribute("hit", cached is not None)
+        metrics.CACHE_LOOKUPS.inc("answers", "hit" if cached is not None else "miss")
+        if cached is not None:
+            response, route = cached
+            metrics.ROUTE_DECISIONS.inc(route)
+            return response, route
+
+    query_lower = query.lower() # Use lowercase for case-insensitive matching
+    response: Optional[str] = None # Initialize response variable with type hint
+    route = "fallback" if query else "empty" # Name of the handler that answered, for metrics
+
+    # --- Guild Data ---
+    # A guild with its own data gets views layered on the shared data; the handlers
+    # use the shared data when they are not given any. A guild's dataset is loaded
+    # in a worker thread on its first query.
+    with tracing.span("guild_data", guild_data=guild_version is not None):
+        dataset = await guild_data.get_dataset_async(guild_id) if guild_version is not None else None
+        commands_data, algokit_data, docs_data, qa_data = _handler_data(dataset)
+
+    # --- Priority 1: AlgoKit Command Help Request ---
+    known_commands = commands_data.keys() # Get known commands
+    # Check if query contains 'algokit', 'command', or a known command name
+    if handler == "algokit" or handler is None and (any(keyword in query_lower for keyword in ALGOKIT_KEYWORDS)
+                                                    or any(cmd in query_lower for cmd in known_commands)):
+        with metrics.HANDLER_LATENCY.time("algokit"), tracing.span("handler.algokit") as span:
+            response = algokit_handler.get_algokit_help(query, **algokit_data)
+            span.set_attribute("answered", response is not None)
+        route = "algokit" if response is not None else route
+        # If response is still None here, it means keywords like 'algokit' might
+        # have matched, but no specific command was identified by the handler.
+        # We allow it to fall through to the next checks.
+
+    # --- Priority 2: Documentation Link Request ---
+    # Only runs if the AlgoKit handler didn't provide a response.
+    if response is None:
+        # Check if query contains specific keywords indicating a doc link request
+        if handler == "docs" or handler is None and any(keyword in query_lower for keyword in DOC_KEYWORDS):
+            with metrics.HANDLER_LATENCY.time("docs"), tracing.span("handler.docs") as span:
+                response = doc_linker.get_doc_link(query, **docs_data)
+                span.set_attribute("answered", response is not None)
+            route = "docs" if response is not None else route
+
+    # --- Priority 3: Network Status / Fee Request ---
+    # Only runs if previous handlers didn't respond.
+    # Determine preferred network (default to mainnet if not specified)
+    network_pref = "testnet" if "testnet" in query_lower else "mainnet"
+    if response is None and handler is None and any(keyword in query_lower for keyword in FEE_KEYWORDS):
+        # Served from network_info's suggested params cache, not a node call per message
+        with metrics.HANDLER_LATENCY.time("fees"), tracing.span("handler.fees") as span:
+            response = await network_info.get_suggested_params_message(network_pref)
+            span.set_attribute("answered", response is not None)
+        route = "fees"
+    if response is None and (handler == "network" or handler is None
+                             and any(keyword in query_lower for keyword in NETWORK_KEYWORDS)):
+        with metrics.HANDLER_LATENCY.time("network"), tracing.span("handler.network") as span:
+            response = await network_info.get_network_status_message(network_pref) # network_info is async
+            span.set_attribute("answered", response is not None)
+        route = "network"
+
+    # --- Priority 4: General Q&A Fallback ---
+    # This is the final fallback if no specific keywords were matched above.
+    # Only attempt if the query is not empty (i.e., user typed something after the prefix).
+    if response is None and query and handler is None:
+        # Pass the original query (preserving case might be useful for some Q&A models/logic)
+        with metrics.HANDLER_LATENCY.time("qa"), tracing.span("handler.qa") as span:
+            response = qa_handler.get_answer_from_kb(query, **qa_data)
+            span.set_attribute("answered", response is not None)
+        route = "qa" if response is not None else route
+
+    if cache_key is not None and route in CACHEABLE_ROUTES:
+        cache.put(cache_key, response, route)
+    metrics.ROUTE_DECISIONS.inc(route)
+    return response, route
+
+def ranked_results(query: str, route: str, guild_id: Optional[int] = None,
+                   top_k: int = MAX_RESULT_PAGES) -> List[str]:
+    """
+    Returns up to `top_k` answers of a paged route for a query, best first, with one search.
+
+    The first answer is the one `route_query` gives for that route; the others
+    are the next best matches, for users who want alternatives. Blocking (the
+    searches run synchronously); the bot runs it in a worker thread.
+
+    Args:
+        query (str): The user's query.
+        route (str): The route that answered it (see PAGED_ROUTES).
+        guild_id (Optional[int]): The Discord guild the query comes from (None for DMs).
+        top_k (int): Maximum number of answers.
+
+    Returns:
+        List[str]: Formatted answers; empty for routes without alternatives.
+    """
+    if route not in PAGED_ROUTES or not query:
+        return []
+    _, _, docs_data, qa_data = _handler_data(guild_data.get_dataset(guild_id))
+    with metrics.HANDLER_LATENCY.time(f"{route}_results"):
+        if route == "docs":
+            return doc_linker.get_doc_links(query, top_k, **docs_data)
+        return qa_handler.get_answers_from_kb(query, top_k, **qa_data)
@@ -0,0 +1,66 @@
+"""
+Pages of alternative answers for one reply, computed once and kept with the reply.
+
+Q&A and doc link replies show the single best match. Instead of re-asking
+with different wording (a full new search each time), users can page
+through the next best matches. `ResultPages` belongs to one reply (the bot
+keeps it in the reply's button view): the ranked result set is computed on
+the first page turn, with one search, and every later page turn is served
+from it. It is dropped with the reply's buttons when they time out.
+"""
+import asyncio
+import logging
+from typing import Callable, List, Optional
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+class ResultPages:
+    """The pages of one reply: its first answer, then the alternatives from a single ranked search."""
+
+    def __init__(self, first: str, fetch: Callable[[], List[str]]):
+        """
+        Args:
+            first (str): The answer already sent (page 1).
+            fetch (Callable[[], List[str]]): Blocking search returning the ranked answers
+                (run once, in a worker thread, on the first page turn).
+        """
+        self.first = first
+        self._fetch = fetch
+        self._pages: Optional[List[str]] = None
+        self._lock = asyncio.Lock()
+        self.position = 0
+
+    async def load(self) -> List[str]:
+        """Returns every page, running the search on the first call only."""
+        async with self._lock: # Concurrent button presses share one search
+            if self._pages is None:
+                results = await asyncio.to_thread(self._fetch)
+                # The answer already shown stays page 1, even if the ranking now puts it elsewhere.
+                self._pages = [self.first] + [result for result in results if result != self.first]
+                logger.debug("Result pages loaded", extra={"pages": len(self._pages)})
+            return self._pages
+
+    async def turn(self, step: int) -> str:
+        """
+        Moves `step` pages forward (negative: backward), staying within the pages.
+
+        Returns:
+            str: The new current page, with its position (e.g. "Result 2 of 5").
+        """
+        pages = await self.load()
+        self.position = min(max(self.position + step, 0), len(pages) - 1)
+        return self.render()
+
+    def render(self) -> str:
+        """The current page with its position, once the pages are loaded."""
+        if self._pages is None:
+            return self.first
+        return f"{self._pages[self.position]}\n\n*Result {self.position + 1} of {len(self._pages)}*"
+
+    def has_previous(self) -> bool:
+        return self.position > 0
+
+    def has_next(self) -> bool:
+        """True while the pages are not loaded yet (there may be alternatives) or a later page exists."""
+        return self._pages is None or self.position < len(self._pages) - 1
@@ -0,0 +1,271 @@
+"""
+Per-request tracing: timed spans for each stage of answering a message.
+
+`start_trace` opens the root span of one request (one `on_message` call) with
+a new trace ID; `span` opens a child span for a stage inside it: waiting for
+the data load, the answer cache lookup, each handler attempt, an algod call,
+sending the reply. The current span is kept in a context variable, so spans
+nest across `await`s, in tasks and in `asyncio.to_thread` workers without
+passing anything around, and a `span` outside any trace costs one lookup.
+
+Traces are head-sampled: a fraction `sample_rate` of requests is recorded. With
+a `slow_threshold`, every request is recorded and the ones slower than the
+threshold are kept as well, so the slow tail is always there to look at.
+
+Finished traces are written by a background thread (like the logs, see
+logging_setup.py) to a size-rotated JSONL file, one trace per line in the
+OpenTelemetry OTLP/JSON layout (`resourceSpans` / `scopeSpans` / `spans`, as
+written by the OpenTelemetry Collector's file exporter), so the file can be read
+with jq or replayed into a collector (otlpjsonfile receiver) and any tracing UI.
+"""
+import contextlib
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+# Module logger; output format and destination are set up by logging_setup.configure_logging.
+logger = logging.getLogger(__name__)
+
+# --- Constants ---
+# Default trace file (project root / traces); rotated files get a '.1', '.2', ... suffix.
+TRACE_FILE_PATH = os.path.join(os.path.dirname(__file__), '..', 'traces', 'traces.jsonl')
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+SERVICE_NAME = "algo-dev-helper"
+# OpenTelemetry span kinds used here: the request itself, internal stages, and calls to other services.
+KIND_SERVER = "SPAN_KIND_SERVER"
+KIND_INTERNAL = "SPAN_KIND_INTERNAL"
+KIND_CLIENT = "SPAN_KIND_CLIENT"
+# Longest string attribute value kept (queries can be long).
+MAX_ATTRIBUTE_LENGTH = 256
+
+class Span:
+    """One timed stage of a trace."""
+
+    def __init__(self, trace: "_Trace", name: str, kind: str, parent: Optional["Span"],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        """Adds an attribute (a str, bool, int or float; anything else is stored as its str)."""
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        self.end_ns = time.time_ns()
+        self.trace.spans.append(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The span in the OTLP/JSON layout."""
+        entry: Dict[str, Any] = {
+            "traceId": self.trace_id, "spanId": self.span_id, "name": self.name, "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns), "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": ({"code": "STATUS_CODE_ERROR", "message": self.error} if self.error is not None
+                       else {"code": "STATUS_CODE_UNSET"}),
+        }
+        if self.parent_span_id is not None:
+            entry["parentSpanId"] = self.parent_span_id
+        return entry
+
+class _NoopSpan:
+    """Stands in for a span when the request is not traced, so callers never check for None."""
+    trace_id = None
+    span_id = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+_NOOP_SPAN = _NoopSpan()
+
+class _Trace:
+    """The spans of one request, collected until its root span ends."""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans: List[Span] = [] # Appended when each span ends (list.append is thread-safe)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """An attribute value in the OTLP/JSON layout (64-bit integers are strings there)."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)[:MAX_ATTRIBUTE_LENGTH]}
+
+# --- Exporter ---
+class JsonlTraceExporter:
+    """
+    Writes finished traces to a size-rotated JSONL file from a background thread.
+
+    `export` only puts the trace on an in-memory queue; a QueueListener thread
+    serializes it and writes it through a RotatingFileHandler, so the event loop
+    never waits for the disk.
+    """
+
+    def __init__(self, path: str = TRACE_FILE_PATH, max_bytes: int = DEFAULT_MAX_BYTES,
+                 backup_count: int = DEFAULT_BACKUP_COUNT):
+        """
+        Args:
+            path (str): The trace file (its directory is created if missing).
+            max_bytes (int): Size at which the file is rotated.
+            backup_count (int): Rotated files kept.
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                                            encoding='utf-8')
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        self._handler = file_handler
+        self._listener = logging.handlers.QueueListener(self._queue, _SerializingHandler(file_handler))
+        self._listener.start()
+
+    def export(self, trace: _Trace) -> None:
+        """Queues a finished trace to be written."""
+        record = logging.LogRecord(__name__, logging.INFO, __file__, 0, "", None, None)
+        record.trace = trace
+        self._queue.put(record)
+
+    def shutdown(self) -> None:
+        """Writes every queued trace and closes the file."""
+        self._listener.stop()
+        self._handler.close()
+
+class _SerializingHandler(logging.Handler):
+    """Turns a queued trace into its OTLP/JSON line (in the listener thread) and hands it to the file handler."""
+
+    def __init__(self, target: logging.Handler):
+        super().__init__()
+        self.target = target
+
+    def emit(self, record: logging.LogRecord) -> None:
+        record.msg = json.dumps(trace_to_otlp(record.trace), separators=(",", ":"))
+        self.target.handle(record)
+
+def trace_to_otlp(trace: _Trace) -> Dict[str, Any]:
+    """One trace as an OTLP/JSON `ExportTraceServiceRequest` (one line of the trace file)."""
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": __name__},
+                        "spans": [item.to_otlp() for item in sorted(trace.spans, key=lambda item: item.start_ns)]}],
+    }]}
+
+# --- Configuration ---
+# The span the current code runs in (None: not traced).
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+_exporter: Optional[JsonlTraceExporter] = None
+_sample_rate = 0.0
+_slow_threshold = 0.0
+
+def configure_tracing(sample_rate: float, path: str = TRACE_FILE_PATH, slow_threshold: float = 0.0,
+                      max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT) -> bool:
+    """
+    Enables tracing (calling it again replaces the previous configuration).
+
+    Args:
+        sample_rate (float): Fraction of requests traced (0.0-1.0).
+        path (str): The trace file.
+        slow_threshold (float): If above 0, requests taking at least this many seconds are kept too.
+        max_bytes (int): Size at which the trace file is rotated.
+        backup_count (int): Rotated trace files kept.
+
+    Returns:
+        bool: True if any request will be traced.
+    """
+    global _exporter, _sample_rate, _slow_threshold
+    shutdown_tracing()
+    _sample_rate = max(0.0, min(1.0, sample_rate))
+    _slow_threshold = max(0.0, slow_threshold)
+    if _sample_rate <= 0 and _slow_threshold <= 0:
+        return False
+    _exporter = JsonlTraceExporter(path, max_bytes, backup_count)
+    logger.info("Tracing enabled", extra={"path": path, "sample_rate": _sample_rate, "slow_threshold": _slow_threshold})
+    return True
+
+def shutdown_tracing() -> None:
+    """Writes the queued traces and disables tracing."""
+    global _exporter
+    if _exporter is not None:
+        _exporter.shutdown()
+        _exporter = None
+
+# --- Spans ---
+@contextlib.contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Any]:
+    """
+    Opens the root span of a request, if tracing is enabled and the request is sampled.
+
+    The trace is exported when the root span ends: always if it was sampled, and
+    otherwise only if it took at least the slow threshold.
+
+    Yields:
+        Span: The root span (a no-op stand-in when the request is not traced).
+    """
+    exporter = _exporter
+    sampled = exporter is not None and random.random() < _sample_rate
+    if exporter is None or not (sampled or _slow_threshold > 0):
+        yield _NOOP_SPAN
+        return
+    root = Span(_Trace(), name, KIND_SERVER, None, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = str(e) or type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        root.end()
+        if sampled or (root.end_ns - root.start_ns) / 1e9 >= _slow_threshold:
+            exporter.export(root.trace)
+
+@contextlib.contextmanager
+def span(name: str, kind: str = KIND_INTERNAL, **attributes: Any) -> Iterator[Any]:
+    """
+    Times a stage of the current request as a child of the current span.
+
+    An exception leaving the block marks the span as failed (and is re-raised).
+    Outside a traced request this does nothing.
+
+    Yields:
+        Span: The new span (a no-op stand-in when the request is not traced).
+    """
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+    child = Span(parent.trace, name, kind, parent, attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = str(e) or type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end()
+
+def current_trace_id() -> Optional[str]:
+    """The trace ID of the current request, if it is traced (e.g. to put in log lines)."""
+    current = _current_span.get()
+    return current.trace_id if current is not None else None
@@ -0,0 +1,95 @@
+import unittest
+import asyncio
+import os
+import sys
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import metrics
+from modules.admission import AdmissionQueue
+
+class TestAdmissionQueue(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        metrics.reset_all()
+
+    async def asyncTearDown(self):
+        if hasattr(self, "queue"):
+            await self.queue.stop()
+
+    async def _query(self, release: asyncio.Event, running: list, outcomes: list):
+        """A query that holds its worker until `release` is set."""
+        async with self.queue.admit() as admitted:
+            outcomes.append(admitted)
+            if admitted:
+                running.append(1)
+                await release.wait()
+                running.pop()
+
+    async def test_workers_bound_the_queries_running_at_once(self):
+        """No more than `workers` queries run at once; the others wait their turn, in order."""
+        self.queue = AdmissionQueue(workers=2, max_depth=10, max_age=5)
+        release, running, outcomes = asyncio.Event(), [], []
+        tasks = [asyncio.create_task(self._query(release, running, outcomes)) for _ in range(6)]
+        await asyncio.sleep(0.05)
+        self.assertEqual(len(running), 2)
+        self.assertEqual(self.queue.busy_workers(), 2)
+        self.assertEqual(metrics.ADMISSION_QUEUE_DEPTH.value(), 4)
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(outcomes, [True] * 6)
+        self.assertEqual(self.queue.depth(), 0)
+        self.assertEqual(metrics.ADMISSION_WAIT._series[()][2], 6) # Every admitted query's wait is observed
+
+    async def test_full_queue_refuses_at_once(self):
+        """Beyond the queue depth, queries are refused immediately instead of piling up."""
+        self.queue = AdmissionQueue(workers=1, max_depth=2, max_age=5)
+        release, running, outcomes = asyncio.Event(), [], []
+        tasks = []
+        for _ in range(3): # One running, two waiting
+            tasks.append(asyncio.create_task(self._query(release, running, outcomes)))
+            await asyncio.sleep(0.01)
+        async with self.queue.admit() as admitted:
+            self.assertFalse(admitted)
+        self.assertEqual(metrics.ADMISSION_REJECTIONS.value("full"), 1)
+        release.set()
+        await asyncio.gather(*tasks)
+        self.assertEqual(outcomes, [True] * 3)
+
+    async def test_queries_waiting_too_long_are_refused_and_skipped(self):
+        """A query not taken within max_age is refused; the workers skip it and serve the next one."""
+        self.queue = AdmissionQueue(workers=1, max_depth=5, max_age=0.05)
+        release, running, outcomes = asyncio.Event(), [], []
+        first = asyncio.create_task(self._query(release, running, outcomes))
+        await asyncio.sleep(0.01)
+        async with self.queue.admit() as admitted:
+            self.assertFalse(admitted)
+        self.assertEqual(metrics.ADMISSION_REJECTIONS.value("expired"), 1)
+        release.set()
+        await first
+        async with self.queue.admit() as admitted:
+            self.assertTrue(admitted)
+        self.assertEqual(self.queue.busy_workers(), 1)
+        await asyncio.sleep(0)
+        self.assertEqual(self.queue.busy_workers(), 0)
+
+    async def test_errors_and_cancellation_free_the_worker(self):
+        """A query that fails, or is cancelled while waiting, does not keep a worker."""
+        self.queue = AdmissionQueue(workers=1, max_depth=5, max_age=5)
+        with self.assertRaises(ValueError):
+            async with self.queue.admit():
+                raise ValueError("handler failed")
+        release, running, outcomes = asyncio.Event(), [], []
+        holder = asyncio.create_task(self._query(release, running, outcomes))
+        waiter = asyncio.create_task(self._query(release, running, outcomes))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        release.set()
+        await holder
+        async with self.queue.admit() as admitted:
+            self.assertTrue(admitted)
+        self.assertEqual(outcomes, [True])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -116,6 +116,13 @@ class TestAlgoKitHandler(unittest.TestCase):
         self.assertEqual(response_init, expected_response_init)
 
 
+    def test_broken_docs_link_is_left_out(self):
+        """A command whose docs URL is flagged as broken is still explained, without the link."""
+        algokit_handler._algokit_commands_data = REAL_ALGOKIT_COMMANDS
+        with patch.object(algokit_handler.link_health, "_broken", frozenset([REAL_ALGOKIT_COMMANDS["deploy"]["url"]])):
+            self.assertEqual(algokit_handler.get_algokit_help("tell me about algokit deploy"),
+                             "**`algokit deploy`**: Deploy smart contracts from AlgoKit compliant repository.")
+
     def test_get_algokit_help_not_found(self):
         """Tests when the query doesn't match a known command."""
         # Use REAL data in cache
@@ -146,5 +153,27 @@ class TestAlgoKitHandler(unittest.TestCase):
         self.assertIsNone(response) # Should return None if cache is empty
 
 
+    def test_find_command_returns_first_match_in_file_order(self):
+        """find_command returns the earliest command (in file order) mentioned in the query."""
+        self.assertEqual(algokit_handler.find_command("localnet then deploy", REAL_ALGOKIT_COMMANDS), "deploy")
+        self.assertEqual(algokit_handler.find_command("algokit initialize", REAL_ALGOKIT_COMMANDS), "init")
+        self.assertIsNone(algokit_handler.find_command("how to compile?", REAL_ALGOKIT_COMMANDS))
+
+    def test_get_algokit_help_batch_matches_single_queries(self):
+        """The batch API returns the same help as get_algokit_help, in input order."""
+        algokit_handler._algokit_commands_data = REAL_ALGOKIT_COMMANDS
+        queries = ["tell me about algokit deploy", "how to compile?", "", "what is bootstrap",
+                   "algokit initialize", "command localnet and deploy", "Tell me about ALGOKIT DEPLOY"]
+        results = algokit_handler.get_algokit_help_batch(queries)
+        self.assertEqual(results, [algokit_handler.get_algokit_help(query) for query in queries])
+        self.assertIsNone(results[1])
+        self.assertTrue(results[4].startswith("**`algokit init`**")) # Prefix match, as in the single-query check
+
+    @patch('modules.algokit_handler.load_algokit_commands', return_value={})
+    def test_get_algokit_help_batch_no_data(self, mock_load_commands):
+        """Every query gets None when no commands are loaded."""
+        self.assertEqual(algokit_handler.get_algokit_help_batch(["algokit deploy", "init"]), [None, None])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import sys
+import os
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import ann_index
+
+TEXTS = [
+    "algorand standard assets (asa) are tokens created on the ledger.",
+    "the avm executes teal programs for smart contracts.",
+    "",
+    "pure proof-of-stake selects block proposers by sortition.",
+    "an asa token can be frozen or clawed back by its manager.",
+]
+
+class TestFeatureHashing(unittest.TestCase):
+
+    def test_tokenize_drops_short_words(self):
+        """Words are lowercased and words of two characters or fewer are dropped."""
+        self.assertEqual(ann_index.tokenize("An ASA is a Token"), ["asa", "token"])
+
+    def test_word_features_are_stable_and_in_range(self):
+        """Features are deterministic across calls and fall inside the feature space."""
+        features = ann_index.word_features("token")
+        self.assertEqual(features, ann_index.word_features("token"))
+        self.assertEqual(len(features), 1 + len("<token>") - 2) # The word plus its trigrams
+        self.assertTrue(all(0 <= index < ann_index.FEATURE_DIM for index, _ in features))
+
+
+@unittest.skipUnless(ann_index.NUMPY_AVAILABLE, "NumPy is not installed")
+class TestAnnIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = ann_index.AnnIndex(TEXTS)
+
+    def test_identical_text_is_the_best_match(self):
+        """Querying with an indexed text returns that text first, with similarity ~1."""
+        results = self.index.query(TEXTS[3], top_k=2)
+        self.assertEqual(results[0][0], 3)
+        self.assertAlmostEqual(results[0][1], 1.0, places=4)
+
+    def test_related_word_forms_match(self):
+        """Trigram features let a differently inflected query find the line."""
+        results = self.index.query("executing contract programs", top_k=1)
+        self.assertEqual(results[0][0], 1)
+
+    def test_query_without_usable_words(self):
+        """A query with no words longer than two characters returns nothing."""
+        self.assertEqual(self.index.query("is a"), [])
+
+    def test_empty_text_is_never_returned(self):
+        """Texts without words are kept in numbering but not indexed."""
+        results = self.index.query("tokens teal stake", top_k=len(TEXTS))
+        self.assertNotIn(2, [i for i, _ in results])
+
+    def test_excluded_texts_are_left_out_before_the_top_k(self):
+        """Masked texts are skipped, and the next best ones fill the `top_k` results."""
+        index = ann_index.AnnIndex(TEXTS, num_tables=2, bits_per_table=1)
+        best = index.query("asa token", top_k=2)
+        excluded = ann_index.np.zeros(len(TEXTS), dtype=bool)
+        excluded[best[0][0]] = True
+        results = index.query("asa token", top_k=2, excluded=excluded)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0], best[1][0])
+        self.assertAlmostEqual(results[0][1], best[1][1], places=5) # Fewer candidates: another float sum order
+        self.assertNotIn(best[0][0], [i for i, _ in results])
+
+    def test_lsh_results_match_brute_force_on_small_index(self):
+        """With few signature bits every text is a candidate, so LSH equals brute force."""
+        index = ann_index.AnnIndex(TEXTS, num_tables=2, bits_per_table=1)
+        for query in ("asa token", "smart contracts", "block sortition"):
+            approximate, exact = index.query(query, 3), index.exact_query(query, 3)
+            self.assertEqual([i for i, _ in approximate], [i for i, _ in exact])
+            for (_, a), (_, b) in zip(approximate, exact):
+                self.assertAlmostEqual(a, b, places=5)
+
+    def test_candidates_are_a_subset_of_a_large_index(self):
+        """On a larger index a query only scores the texts in its buckets."""
+        texts = [f"line {i} about topic{i % 500} and subject{i % 37}" for i in range(5000)]
+        index = ann_index.AnnIndex(texts)
+        vector = index.embed("topic42 subject5")
+        self.assertLess(len(index.candidates(vector)), len(texts))
+        self.assertEqual(index.size, len(texts))
+
+
+if __name__ == '__main__':
+    unittest.main()
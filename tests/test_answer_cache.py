@@ -0,0 +1,102 @@
+import unittest
+import os
+import shutil
+import sys
+import tempfile
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import answer_cache
+from modules.answer_cache import AnswerCache
+
+class TestAnswerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "warm.sqlite3")
+        self.generation = "g1"
+
+    def _cache(self, **kwargs):
+        return AnswerCache(lambda: self.generation, self.path, **kwargs)
+
+    def test_normalize_query(self):
+        """Case and surrounding whitespace are ignored; punctuation is kept."""
+        self.assertEqual(answer_cache.normalize_query("  What is TEAL?  "), "what is teal?")
+        self.assertNotEqual(answer_cache.normalize_query("deploy?"), answer_cache.normalize_query("deploy"))
+
+    def test_get_put_and_lru_eviction(self):
+        """Responses (including fallbacks) are served until evicted by newer entries."""
+        cache = self._cache(max_entries=2)
+        cache.put("a", "answer a", "qa")
+        cache.put("b", None, "fallback")
+        self.assertEqual(cache.get("a"), ("answer a", "qa")) # 'a' becomes most recent
+        self.assertEqual(cache.get("b"), (None, "fallback"))
+        cache.put("c", "answer c", "docs")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 2)
+
+    def test_other_generation_is_not_served(self):
+        """Entries computed from other data are dropped on lookup."""
+        cache = self._cache()
+        cache.put("a", "answer a", "qa")
+        self.generation = "g2"
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(len(cache), 0)
+
+    def test_save_and_load_top_queries(self):
+        """The most frequent cached queries survive a restart with their responses."""
+        cache = self._cache(top_n=2)
+        for key, hits in (("a", 5), ("b", 3), ("c", 1)):
+            cache.put(key, f"answer {key}", "qa")
+            for _ in range(hits):
+                cache.record(key)
+        cache.record("uncached")
+        self.assertEqual(cache.save(), 2)
+
+        restarted = self._cache()
+        self.assertEqual(restarted.load(), [])
+        self.assertEqual(restarted.get("a"), ("answer a", "qa"))
+        self.assertEqual(restarted.get("b"), ("answer b", "qa"))
+        self.assertIsNone(restarted.get("c"))
+
+    def test_load_returns_stale_queries(self):
+        """Entries saved under another data generation are returned for recomputation."""
+        cache = self._cache()
+        for key, hits in (("a", 1), ("b", 4)):
+            cache.put(key, f"answer {key}", "qa")
+            for _ in range(hits):
+                cache.record(key)
+        cache.save()
+        self.generation = "g2"
+        restarted = self._cache()
+        self.assertEqual(restarted.load(), ["b", "a"]) # Most frequent first
+        self.assertIsNone(restarted.get("b"))
+
+    def test_save_halves_frequencies(self):
+        """Counts decay at every save, so the ranking follows recent traffic."""
+        cache = self._cache(top_n=1)
+        cache.put("old", "old answer", "qa")
+        cache.put("new", "new answer", "qa")
+        for _ in range(8):
+            cache.record("old")
+        cache.save()
+        for _ in range(5):
+            cache.record("new")
+        cache.save()
+        restarted = self._cache()
+        restarted.load()
+        self.assertIsNotNone(restarted.get("new"))
+        self.assertIsNone(restarted.get("old"))
+
+    def test_without_path(self):
+        """A memory-only cache neither writes nor reads a file."""
+        cache = AnswerCache(lambda: "g", None)
+        cache.put("a", "answer", "qa")
+        self.assertEqual(cache.save(), 0)
+        self.assertEqual(cache.load(), [])
+        self.assertFalse(os.path.exists(self.path))
+
+if __name__ == '__main__':
+    unittest.main()
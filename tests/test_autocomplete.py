@@ -0,0 +1,70 @@
+import unittest
+from unittest.mock import patch
+import os
+import sys
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import autocomplete
+from modules.autocomplete import CompletionIndex
+
+COMMANDS = {
+    "deploy": {"keywords": ["deploy", "contracts"], "summary": "Deploy contracts."},
+    "doctor": {"keywords": ["diagnose", "environment"], "summary": "Check the environment."},
+    "init": {"keywords": ["create", "project", "template"], "summary": "Create a project."},
+}
+DOC_LINKS = {
+    "create asa tutorial": {"topic": "ASA Creation Tutorial", "url": "https://example.com/asa"},
+    "avm opcodes list": {"topic": "AVM Opcodes Reference", "url": "https://example.com/avm"},
+}
+
+class TestCompletionIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = CompletionIndex(autocomplete._command_choices(COMMANDS))
+
+    def test_prefix_matches_names_and_keywords(self):
+        """A prefix matches command names and keywords, case-insensitively."""
+        self.assertEqual(self.index.complete("D", {}), [("deploy", "deploy"), ("doctor", "doctor")])
+        self.assertEqual(self.index.complete("templ", {}), [("init", "init")])
+        self.assertEqual(self.index.complete("zzz", {}), [])
+
+    def test_ranked_by_popularity_then_label(self):
+        """More popular choices come first; the limit keeps the best ones."""
+        self.assertEqual(self.index.complete("d", {"doctor": 3}, limit=1), [("doctor", "doctor")])
+        self.assertEqual(len(self.index.complete("", {})), 3)
+
+    def test_any_word_of_a_topic_matches(self):
+        """Doc topics are found from any word of their title or key."""
+        index = CompletionIndex(autocomplete._doc_topic_choices(DOC_LINKS))
+        expected = [("ASA Creation Tutorial", "create asa tutorial")]
+        self.assertEqual(index.complete("tutor", {}), expected)
+        self.assertEqual(index.complete("asa  creat", {}), expected)
+        self.assertEqual(index.complete("opcodes", {}), [("AVM Opcodes Reference", "avm opcodes list")])
+
+class TestAutocompleteSources(unittest.TestCase):
+
+    def setUp(self):
+        self.source = autocomplete._IndexSource("algokit", lambda: self.data, autocomplete._command_choices)
+        self.data = COMMANDS
+        patcher = patch.dict(autocomplete._sources, {"algokit": self.source})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_record_use_ranks_known_choices(self):
+        """Uses of known choices raise their rank; free text is not counted."""
+        autocomplete.record_use("algokit", " Doctor ")
+        autocomplete.record_use("algokit", "something else")
+        self.assertEqual(autocomplete.complete("algokit", "d", limit=1), [("doctor", "doctor")])
+        self.assertEqual(dict(self.source.popularity), {"doctor": 1})
+
+    def test_index_rebuilt_when_data_changes(self):
+        """The index is reused for the same data object and rebuilt for a new one."""
+        first = self.source.index()
+        self.assertIs(self.source.index(), first)
+        self.data = {"localnet": {"keywords": ["sandbox"]}}
+        self.assertEqual(autocomplete.complete("algokit", "sand"), [("localnet", "localnet")])
+
+if __name__ == '__main__':
+    unittest.main()
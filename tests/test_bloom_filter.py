@@ -0,0 +1,35 @@
+import unittest
+import os
+import sys
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.bloom_filter import BloomFilter
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_no_false_negatives(self):
+        """Every added item is reported as present."""
+        words = [f"word{i}" for i in range(5000)]
+        bloom = BloomFilter(len(words))
+        bloom.update(words)
+        self.assertTrue(all(word in bloom for word in words))
+        self.assertEqual(bloom.count, 5000)
+
+    def test_false_positive_rate(self):
+        """Absent items are rarely reported as present (close to the target rate)."""
+        bloom = BloomFilter(5000, error_rate=0.01)
+        bloom.update(f"word{i}" for i in range(5000))
+        false_positives = sum(f"other{i}" in bloom for i in range(20000))
+        self.assertLess(false_positives / 20000, 0.03)
+
+    def test_sizing(self):
+        """About 10 bits per item at 1%, with 7 hash functions."""
+        bloom = BloomFilter(10000, error_rate=0.01)
+        self.assertEqual(bloom.num_hashes, 7)
+        self.assertAlmostEqual(bloom.memory_bytes() * 8 / 10000, 9.6, delta=0.1)
+        self.assertNotIn("anything", BloomFilter(0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import asyncio
+import os
+import sys
+import threading
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.data_preload import DataPreloader
+
+class TestDataPreloader(unittest.IsolatedAsyncioTestCase):
+
+    async def test_loaders_run_concurrently_once(self):
+        """Every loader runs at the same time in a worker thread, and only for the first call."""
+        barrier = threading.Barrier(3, timeout=5) # Breaks if the loaders run one after another
+        calls = []
+
+        def loader(name):
+            def load():
+                calls.append(name)
+                barrier.wait()
+            return load
+
+        preloader = DataPreloader({name: loader(name) for name in ("kb", "links", "commands")})
+        results = await asyncio.gather(*(preloader.preload() for _ in range(5)))
+        await preloader.preload() # A reconnect
+        self.assertEqual(sorted(calls), ["commands", "kb", "links"])
+        self.assertEqual(set(results[0]), {"kb", "links", "commands"})
+        self.assertTrue(preloader.is_ready())
+
+    async def test_failed_loader_does_not_block_readiness(self):
+        """A loader that raises is logged and left out; the others still count as loaded."""
+        def missing():
+            raise FileNotFoundError("data/missing.json")
+
+        preloader = DataPreloader({"ok": lambda: None, "missing": missing})
+        self.assertEqual(set(await preloader.preload()), {"ok"})
+        self.assertTrue(await preloader.wait_until_ready())
+
+    async def test_queries_wait_for_the_load(self):
+        """A query arriving during the load waits for it instead of being answered early."""
+        release = threading.Event()
+        preloader = DataPreloader({"kb": lambda: release.wait(5)})
+        load = asyncio.ensure_future(preloader.preload())
+        waiter = asyncio.ensure_future(preloader.wait_until_ready())
+        await asyncio.sleep(0.05)
+        self.assertFalse(waiter.done())
+        release.set()
+        self.assertTrue(await waiter)
+        await load
+
+    async def test_excess_and_late_queries_get_warming_up(self):
+        """Beyond max_waiting, or after wait_timeout, queries are turned away."""
+        release = threading.Event()
+        preloader = DataPreloader({"kb": lambda: release.wait(5)}, max_waiting=1, wait_timeout=0.05)
+        load = asyncio.ensure_future(preloader.preload())
+        first = asyncio.ensure_future(preloader.wait_until_ready())
+        await asyncio.sleep(0)
+        self.assertFalse(await preloader.wait_until_ready()) # Line is full
+        self.assertFalse(await first) # Timed out
+        release.set()
+        await load
+        self.assertTrue(await preloader.wait_until_ready())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest
+from unittest.mock import patch
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import data_snapshots, doc_linker, qa_handler
+
+DOC_LINKS = {"box storage": {"topic": "Boxes", "url": "https://dev.algorand.co/boxes"},
+             "asa": {"topic": "Assets", "url": "https://dev.algorand.co/asa"}}
+KB_TEXT = "Boxes store app data.\n\n  TEAL runs on the AVM.  \nBox storage costs a minimum balance.\n"
+
+@unittest.skipUnless(data_snapshots.msgpack is not None, "msgpack is not installed")
+class TestDataSnapshots(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.snapshots = patch.object(data_snapshots, "SNAPSHOT_DIR", os.path.join(self.directory, "compiled"))
+        self.snapshots.start()
+        self.doc_links_path = self._write("new_doc_links.json", json.dumps(DOC_LINKS))
+        self.kb_path = self._write("knowledge_base.txt", KB_TEXT)
+        doc_linker._doc_links_data = None
+        qa_handler._knowledge_base_lines = None
+
+    def tearDown(self):
+        self.snapshots.stop()
+        shutil.rmtree(self.directory)
+        doc_linker._doc_links_data = None
+        qa_handler._knowledge_base_lines = None
+
+    def _write(self, name: str, content: str) -> str:
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_missing_snapshot_falls_back(self):
+        """Without a compiled snapshot nothing is returned and the loaders parse the source."""
+        self.assertIsNone(data_snapshots.load_snapshot(data_snapshots.KIND_JSON, self.doc_links_path))
+        self.assertEqual(doc_linker.load_doc_links(self.doc_links_path), DOC_LINKS)
+
+    def test_json_snapshot_is_preferred(self):
+        """A current snapshot is loaded instead of the JSON file."""
+        data_snapshots.compile_json(self.doc_links_path)
+        self.assertEqual(data_snapshots.load_snapshot(data_snapshots.KIND_JSON, self.doc_links_path), DOC_LINKS)
+        with patch("modules.doc_linker.json.load") as mock_json_load:
+            self.assertEqual(doc_linker.load_doc_links(self.doc_links_path), DOC_LINKS)
+        mock_json_load.assert_not_called()
+        # The wrong kind is never returned
+        self.assertIsNone(data_snapshots.load_snapshot(data_snapshots.KIND_KNOWLEDGE_BASE, self.doc_links_path))
+
+    def test_knowledge_base_snapshot_keeps_the_word_index(self):
+        """The knowledge base comes back with its lines and prebuilt word index."""
+        data_snapshots.compile_knowledge_base(self.kb_path)
+        kb = qa_handler.load_knowledge_base(self.kb_path)
+        self.assertEqual(kb, ["Boxes store app data.", "TEAL runs on the AVM.", "Box storage costs a minimum balance."])
+        self.assertTrue(kb.has_word_index)
+        self.assertEqual(kb.phrase_positions(2, ("box", "storage")), [0])
+
+    def test_edited_source_makes_the_snapshot_stale(self):
+        """After the source changes, the snapshot is ignored and the new content is parsed."""
+        data_snapshots.compile_json(self.doc_links_path)
+        edited = dict(DOC_LINKS, teal={"topic": "TEAL", "url": "https://dev.algorand.co/teal"})
+        self._write("new_doc_links.json", json.dumps(edited))
+        self.assertIsNone(data_snapshots.load_snapshot(data_snapshots.KIND_JSON, self.doc_links_path))
+        self.assertEqual(doc_linker.load_doc_links(self.doc_links_path), edited)
+
+    def test_touched_source_with_same_content_is_current(self):
+        """A new modification time alone (e.g. a fresh checkout) is settled by the checksum."""
+        data_snapshots.compile_json(self.doc_links_path)
+        stat = os.stat(self.doc_links_path)
+        os.utime(self.doc_links_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(data_snapshots.load_snapshot(data_snapshots.KIND_JSON, self.doc_links_path), DOC_LINKS)
+        # Same size, different content: stale
+        self._write("new_doc_links.json", json.dumps(DOC_LINKS).replace("Boxes", "Boxen"))
+        self.assertIsNone(data_snapshots.load_snapshot(data_snapshots.KIND_JSON, self.doc_links_path))
+
+    def test_corrupted_snapshot_falls_back(self):
+        """A truncated snapshot is reported and ignored, never fatal."""
+        path = data_snapshots.compile_knowledge_base(self.kb_path)
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) // 2)
+        self.assertIsNone(data_snapshots.load_knowledge_base(self.kb_path))
+        self.assertEqual(len(qa_handler.load_knowledge_base(self.kb_path)), 3)
+
+if __name__ == '__main__':
+    unittest.main()
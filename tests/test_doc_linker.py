@@ -208,6 +208,51 @@ class TestDocLinker(unittest.TestCase):
         self.assertIsNone(response)
         mock_load_links.assert_called_once() # Ensure load_doc_links was called
 
+    @patch('modules.doc_linker.load_doc_links', return_value=REAL_DOC_LINKS)
+    def test_get_doc_links_batch_matches_single_queries(self, mock_load_links):
+        """The batch API returns the same links as get_doc_link, in input order, loading once."""
+        queries = ["docs for algokit setup guide", "documentation for pyteal", "",
+                   "where is the avm opcodes list?", "how to create asa tutorial", "DOCS FOR ALGOKIT SETUP GUIDE"]
+        results = doc_linker.get_doc_links_batch(queries)
+        mock_load_links.assert_called_once()
+        self.assertEqual(results, [doc_linker.get_doc_link(query) for query in queries])
+        self.assertIsNone(results[1])
+        self.assertEqual(results[0], results[5])
+
+    @patch('modules.doc_linker.load_doc_links', return_value=REAL_DOC_LINKS)
+    def test_get_doc_links_returns_ranked_alternatives(self, mock_load_links):
+        """Top-k links start with get_doc_link's link and follow the ranking."""
+        query = "docs for algokit project init guide"
+        links = doc_linker.get_doc_links(query, top_k=3)
+        self.assertEqual(len(links), 3)
+        self.assertEqual(links[0], doc_linker.get_doc_link(query))
+        self.assertIn("**AlgoKit Installation**", links[1])
+        self.assertEqual(doc_linker.get_doc_links("documentation for pyteal"), [])
+
+    @patch('modules.doc_linker.load_doc_links', return_value=REAL_DOC_LINKS)
+    def test_rank_doc_links(self, mock_load_links):
+        """Entries are ranked by keyword overlap, then file order; non-matching entries are left out."""
+        ranking = doc_linker.rank_doc_links("algokit project init guide")
+        self.assertEqual(ranking[:2], ["algokit project init", "algokit install guide"])
+        self.assertEqual(len(doc_linker.rank_doc_links("algokit project init guide", top_k=1)), 1)
+        self.assertEqual(doc_linker.rank_doc_links("documentation for pyteal"), [])
+
+    @patch('modules.doc_linker.load_doc_links', return_value=REAL_DOC_LINKS)
+    def test_broken_links_are_skipped(self, mock_load_links):
+        """Entries whose URL the link checker flagged are passed over for the next best entry."""
+        query = "docs for algokit project init guide"
+        best = doc_linker.rank_doc_links(query)[0]
+        with patch.object(doc_linker.link_health, "_broken", frozenset([REAL_DOC_LINKS[best]["url"]])):
+            links = doc_linker.get_doc_links(query)
+            self.assertEqual(links[0], doc_linker.get_doc_link(query))
+            self.assertNotIn(REAL_DOC_LINKS[best]["url"], "".join(links))
+            self.assertEqual(doc_linker.get_doc_links_batch([query]), [links[0]])
+
+    @patch('modules.doc_linker.load_doc_links', return_value={})
+    def test_get_doc_links_batch_no_data(self, mock_load_links):
+        """Every query gets None when no links are loaded."""
+        self.assertEqual(doc_linker.get_doc_links_batch(["link for asa create", "teal"]), [None, None])
+
 
 if __name__ == '__main__':
     unittest.main()
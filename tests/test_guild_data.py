@@ -0,0 +1,127 @@
+import unittest
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from unittest.mock import patch
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import guild_data
+from modules.guild_data import GuildRegistry
+from modules.kb_store import CompactKnowledgeBase
+
+BASE_KB = CompactKnowledgeBase(["Algorand uses pure proof of stake.", "TEAL is the smart contract language."])
+BASE_LINKS = {"teal": "https://dev.algorand.co/teal", "box": "https://dev.algorand.co/boxes"}
+
+class TestGuildRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.registry = GuildRegistry(self.root, memory_budget=1 << 30)
+        self._original_interval = guild_data.VERSION_CHECK_INTERVAL
+        guild_data.VERSION_CHECK_INTERVAL = 0 # Re-check files on every call
+
+    def tearDown(self):
+        guild_data.VERSION_CHECK_INTERVAL = self._original_interval
+        shutil.rmtree(self.root)
+
+    def _write(self, guild_id, name, content):
+        directory = os.path.join(self.root, str(guild_id))
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+            f.write(content if isinstance(content, str) else json.dumps(content))
+
+    def test_guild_without_data_uses_base(self):
+        """Guilds without a directory (and DMs) have no dataset and nothing is loaded."""
+        self.assertIsNone(self.registry.version(42))
+        self.assertIsNone(self.registry.get(42))
+        self.assertIsNone(self.registry.get(None))
+        self.assertEqual(self.registry.loaded_guilds(), [])
+
+    def test_layered_knowledge_base(self):
+        """A guild's knowledge base answers from both the base lines and its own."""
+        self._write(1, guild_data.KB_FILENAME, "Our validator runs participation keys.\n")
+        dataset = self.registry.get(1)
+        view = dataset.knowledge_base(BASE_KB)
+        self.assertEqual(len(view), 3)
+        self.assertEqual([view.line(i) for i in view.matching_lines("teal")], ["TEAL is the smart contract language."])
+        self.assertEqual([view.line(i) for i in view.matching_lines("validator")],
+                         ["Our validator runs participation keys."])
+        self.assertIs(dataset.knowledge_base(BASE_KB), view) # Reused while the base is unchanged
+
+    def test_guild_entries_override_base(self):
+        """Guild doc links and commands override base entries and add new ones."""
+        self._write(1, guild_data.DOC_LINKS_FILENAME, {"teal": "https://example.com/teal", "faq": "https://example.com/faq"})
+        dataset = self.registry.get(1)
+        links = dataset.doc_links_view(BASE_LINKS)
+        self.assertEqual(links["teal"], "https://example.com/teal")
+        self.assertEqual(links["box"], "https://dev.algorand.co/boxes")
+        self.assertEqual(links["faq"], "https://example.com/faq")
+        self.assertIs(dataset.commands_view(BASE_LINKS), BASE_LINKS) # No commands file
+        self.assertIs(dataset.knowledge_base(BASE_KB), BASE_KB) # No knowledge base file
+
+    def test_changed_files_are_reloaded(self):
+        """Editing a guild's files gives a new version and a fresh dataset."""
+        self._write(1, guild_data.DOC_LINKS_FILENAME, {"faq": "https://example.com/faq"})
+        first = self.registry.get(1)
+        self.assertIs(self.registry.get(1), first)
+        self._write(1, guild_data.DOC_LINKS_FILENAME, {"faq": "https://example.com/new-faq", "extra": "x"})
+        second = self.registry.get(1)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.doc_links["faq"], "https://example.com/new-faq")
+
+    def test_least_recently_used_guilds_are_evicted(self):
+        """Over the memory budget, the least recently used datasets are dropped."""
+        for guild_id in (1, 2, 3):
+            self._write(guild_id, guild_data.KB_FILENAME, f"Guild {guild_id} line.\n" * 50)
+        self.registry.get(1)
+        one_dataset = self.registry.memory_bytes()
+        self.registry.memory_budget = int(one_dataset * 2.5)
+        self.registry.get(2)
+        self.registry.get(1) # 1 is now more recent than 2
+        self.registry.get(3)
+        self.assertEqual(self.registry.loaded_guilds(), [1, 3])
+        self.assertLessEqual(self.registry.memory_bytes(), self.registry.memory_budget)
+        self.assertIsNotNone(self.registry.get(2)) # Reloaded on demand
+class TestGuildRegistryAsync(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.registry = GuildRegistry(self.root, memory_budget=1 << 30)
+        for guild_id in (1, 2):
+            os.makedirs(os.path.join(self.root, str(guild_id)))
+            with open(os.path.join(self.root, str(guild_id), guild_data.KB_FILENAME), 'w', encoding='utf-8') as f:
+                f.write(f"Guild {guild_id} line.\n")
+
+    async def test_concurrent_loads_share_one_load_off_the_loop(self):
+        """First queries of a guild share one load in a worker thread; other guilds are not blocked by it."""
+        release = threading.Event()
+        loads = []
+        original = guild_data.GuildDataset
+
+        def slow_dataset(guild_id, directory, version):
+            loads.append(guild_id)
+            if guild_id == 1:
+                release.wait(5) # A slow ingest; the event loop keeps running meanwhile
+            return original(guild_id, directory, version)
+
+        with patch.object(guild_data, "GuildDataset", side_effect=slow_dataset):
+            waiting = [asyncio.create_task(self.registry.get_async(1)) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            other = await self.registry.get_async(2) # Loads while guild 1 is still loading
+            self.assertEqual(other.guild_id, 2)
+            release.set()
+            datasets = await asyncio.gather(*waiting)
+        self.assertEqual(loads.count(1), 1)
+        self.assertTrue(all(dataset is datasets[0] for dataset in datasets))
+        self.assertIs(await self.registry.get_async(1), datasets[0])
+        self.assertIsNone(await self.registry.get_async(3))
+
+if __name__ == '__main__':
+    unittest.main()
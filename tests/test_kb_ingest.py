@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import patch
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+# Add the modules directory to the Python path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from modules import kb_ingest, qa_handler
+from modules.kb_store import CompactKnowledgeBase
+
+MARKDOWN = """# Assets
+Algorand Standard Assets are
+tokens on layer one.
+
+## Opt-in
+Accounts must opt in.
+```
+goal asset send --amount 0
+```
+"""
+
+class TestKbIngest(unittest.TestCase):
+
+    def setUp(self):
+        """Create a small source tree in a temporary directory."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.text_path = self._write("llms-full.txt", "".join(f"line {i} about teal\n\n" for i in range(200)))
+        self.markdown_path = self._write(os.path.join("portal", "assets.md"), MARKDOWN)
+        self._write(os.path.join("portal", "image.png"), "not text")
+
+    def _write(self, name, content):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+
+    def test_discover_sources(self):
+        """Directories are searched for supported files; duplicates and missing paths are skipped."""
+        sources = kb_ingest.discover_sources([self.text_path, os.path.join(self.root, "portal"),
+                                              self.root, os.path.join(self.root, "missing")])
+        self.assertEqual(sources, [self.text_path, self.markdown_path])
+
+    def test_split_ranges_cover_every_line_once(self):
+        """Byte ranges cut anywhere still yield each line exactly once, in order."""
+        units = kb_ingest.split_sources([self.text_path], split_bytes=37)
+        self.assertGreater(len(units), 10)
+        lines = [line for unit in units for line in kb_ingest._read_lines(*unit)]
+        with open(self.text_path, encoding='utf-8') as f:
+            self.assertEqual(lines, f.readlines())
+
+    def test_chunk_markdown(self):
+        """Paragraphs become chunks prefixed by their heading; code blocks stay together."""
+        chunks = list(kb_ingest.chunk_markdown(MARKDOWN.splitlines()))
+        self.assertEqual(chunks, [
+            "Assets: Algorand Standard Assets are tokens on layer one.",
+            "Opt-in: Accounts must opt in.",
+            "Opt-in: goal asset send --amount 0",
+        ])
+
+    def test_chunk_markdown_splits_long_paragraphs(self):
+        """Paragraphs longer than the limit are split at line boundaries."""
+        chunks = list(kb_ingest.chunk_markdown(["word " * 10] * 5, max_chars=120))
+        self.assertTrue(all(len(chunk) <= 120 for chunk in chunks))
+        self.assertEqual(len(chunks), 3)
+
+    def test_ingest_merges_sources_in_order_with_word_index(self):
+        """All sources are merged in order; the word index gives the same matches as a scan."""
+        kb = kb_ingest.ingest([self.root], workers=1, split_bytes=64)
+        self.assertEqual(len(kb), 203)
+        self.assertEqual(kb[0], "line 0 about teal")
+        self.assertEqual(kb[-1], "Opt-in: goal asset send --amount 0")
+        self.assertTrue(kb.has_word_index)
+        scanned = CompactKnowledgeBase(list(kb))
+        for term in ("teal", "line", "accounts", "goal", "199", "missing"):
+            self.assertEqual(kb.matching_lines(term), scanned.matching_lines(term))
+
+    def test_ingest_documents_locates_each_source(self):
+        """Every source file's chunks are one consecutive range, even when the file was split."""
+        kb, documents = kb_ingest.ingest_documents([self.root], workers=1, split_bytes=64)
+        self.assertEqual(documents, [(self.text_path, 0, 200), (self.markdown_path, 200, 203)])
+        self.assertEqual(list(kb)[200:], kb_ingest.source_chunks(self.markdown_path))
+
+    def test_process_pool_gives_the_same_result(self):
+        """Running the map step in a process pool does not change the result."""
+        serial = kb_ingest.ingest([self.root], workers=1, split_bytes=64)
+        parallel = kb_ingest.ingest([self.root], workers=2, split_bytes=64)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(parallel.matching_lines("teal"), serial.matching_lines("teal"))
+
+    @unittest.skipUnless(all(importlib.util.find_spec(name) for name in ("discord", "dotenv", "algosdk")),
+                         "bot.py's dependencies are not installed")
+    def test_process_pool_under_the_bot_entry_point(self):
+        """Pool workers re-import bot.py (the main script) without setting up a second bot."""
+        # Run in a fresh interpreter whose main script is bot.py, as under `python bot.py`.
+        # Without a token the bot's setup would exit, so it must not run in the workers.
+        code = ("import sys; sys.path.insert(0, sys.argv[1]); import bot; sys.modules['__main__'] = bot\n"
+                "from modules import kb_ingest\n"
+                "print(len(kb_ingest.ingest([sys.argv[2]], workers=2, split_bytes=64)))")
+        trace_file = os.path.join(self.root, "traces.jsonl")
+        env = {key: value for key, value in os.environ.items() if key != 'DISCORD_BOT_TOKEN'}
+        env.update(TRACE_FILE=trace_file, KB_SOURCES="")
+        result = subprocess.run([sys.executable, "-c", code, ROOT, self.root], cwd=self.root, env=env,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "203")
+        self.assertFalse(os.path.exists(trace_file)) # Tracing was not configured either
+
+    def test_qa_handler_uses_configured_sources(self):
+        """With KB_SOURCES set, the default knowledge base is built by the pipeline."""
+        qa_handler._knowledge_base_lines = None
+        self.addCleanup(setattr, qa_handler, "_knowledge_base_lines", None)
+        with patch.object(qa_handler, "KB_SOURCES", [self.markdown_path]), \
+             patch.object(qa_handler, "KB_INGEST_WORKERS", 1):
+            kb = qa_handler.load_knowledge_base()
+        self.assertEqual(len(kb), 3)
+        self.assertTrue(kb.has_word_index)
+
+
+if __name__ == '__main__':
+    unittest.main()
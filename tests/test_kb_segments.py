@@ -0,0 +1,118 @@
+import unittest
+import os
+import sys
+import threading
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import kb_segments
+from modules.kb_segments import SegmentedKnowledgeBase
+from modules.kb_store import CompactKnowledgeBase
+
+BASE_LINES = ["Algorand uses pure proof of stake.", "TEAL is the smart contract language.",
+              "Boxes store application data."]
+
+class TestSegmentedKnowledgeBase(unittest.TestCase):
+
+    def setUp(self):
+        self.store = SegmentedKnowledgeBase(CompactKnowledgeBase(BASE_LINES), auto_merge=False)
+
+    def _search(self, snapshot, term):
+        return [snapshot.line(i) for i in snapshot.matching_lines(term)]
+
+    def test_upsert_adds_a_segment(self):
+        """New documents go into a new segment and are searchable right away."""
+        snapshot = self.store.upsert({"asa": ["  Assets need an opt-in.  ", "", "Assets can be frozen."]})
+        self.assertEqual(len(snapshot.segments), 2)
+        self.assertEqual(len(snapshot.segments[-1]), 2)
+        self.assertEqual(self._search(snapshot, "assets"), ["Assets need an opt-in.", "Assets can be frozen."])
+        self.assertEqual(self._search(snapshot, "teal"), ["TEAL is the smart contract language."])
+
+    def test_base_documents_are_replaced_separately(self):
+        """A base given as several documents has each of them replaced or deleted on its own."""
+        store = SegmentedKnowledgeBase(CompactKnowledgeBase(BASE_LINES), auto_merge=False,
+                                       base_documents=[("consensus.txt", 0, 1), ("contracts.txt", 1, 3)])
+        snapshot = store.upsert({"contracts.txt": ["TEAL programs run on the AVM."]})
+        self.assertEqual(len(snapshot.segments[-1]), 1) # Only the replaced document was indexed
+        self.assertEqual(self._search(snapshot, "teal"), ["TEAL programs run on the AVM."])
+        self.assertEqual(self._search(snapshot, "boxes"), [])
+        snapshot = store.delete(["consensus.txt"])
+        self.assertEqual(list(snapshot.live_lines()), ["TEAL programs run on the AVM."])
+
+    def test_replace_and_delete_use_tombstones(self):
+        """Replaced and deleted documents stop matching without rewriting their segment."""
+        self.store.upsert({"asa": ["Assets need an opt-in."], "box": ["Boxes cost a minimum balance."]})
+        first_segment = self.store.snapshot.segments[-1]
+        snapshot = self.store.upsert({"asa": ["Assets can be clawed back."]})
+        self.assertIs(snapshot.segments[1], first_segment)
+        self.assertEqual(self._search(snapshot, "assets"), ["Assets can be clawed back."])
+        snapshot = self.store.delete(["box", "unknown"])
+        self.assertEqual(self._search(snapshot, "boxes"), ["Boxes store application data."])
+        self.assertEqual(snapshot.live_line_count, 4)
+        self.assertTrue(snapshot.is_deleted(3)) # The first copy of "asa"
+
+    def test_old_snapshot_is_unchanged(self):
+        """A snapshot keeps answering consistently after later updates and merges."""
+        before = self.store.upsert({"asa": ["Assets need an opt-in."]})
+        self.store.upsert({"asa": ["Assets can be frozen."]})
+        self.store.merge()
+        self.assertEqual(self._search(before, "assets"), ["Assets need an opt-in."])
+        self.assertEqual(self._search(self.store.snapshot, "assets"), ["Assets can be frozen."])
+
+    def test_merge_compacts_segments(self):
+        """Merging drops tombstoned documents and keeps every live line, in order."""
+        for i in range(10):
+            self.store.upsert({f"doc{i}": [f"Document {i} about teal."]})
+        self.store.upsert({"doc3": ["Document 3 rewritten."]})
+        self.store.delete(["doc5"])
+        expected = list(self.store.snapshot.live_lines())
+        self.assertGreater(self.store.merge(), 0)
+        snapshot = self.store.snapshot
+        self.assertLess(len(snapshot.segments), 12)
+        self.assertEqual(list(snapshot.live_lines()), expected)
+        self.assertEqual(len(self._search(snapshot, "document")), 9)
+        self.assertEqual(len(self._search(snapshot, "teal")), 9)
+
+    def test_mostly_deleted_segment_is_rewritten(self):
+        """A segment that is mostly tombstones is rewritten on its own."""
+        self.store.upsert({f"doc{i}": [f"line {i}"] for i in range(10)})
+        self.store.delete([f"doc{i}" for i in range(8)])
+        self.store.merge()
+        snapshot = self.store.snapshot
+        self.assertEqual(sum(snapshot.dead_lines), 0)
+        self.assertEqual(list(snapshot.live_lines()), BASE_LINES + ["line 8", "line 9"])
+
+    def test_writes_during_merge_are_kept(self):
+        """Documents replaced while a merge runs stay replaced once the merge is installed."""
+        self.store.upsert({"asa": ["Assets need an opt-in."]})
+        self.store.upsert({"box": ["Boxes cost a minimum balance."]})
+        original_build = kb_segments.Segment.build
+        merging = threading.Event()
+
+        def build_during_write(segment_id, documents):
+            documents = list(documents)
+            if not merging.is_set() and len(documents) > 1: # The merge, not the write below
+                merging.set()
+                self.store.upsert({"asa": ["Assets can be frozen."]})
+            return original_build(segment_id, documents)
+
+        kb_segments.Segment.build = build_during_write
+        try:
+            self.store.merge()
+        finally:
+            kb_segments.Segment.build = original_build
+        self.assertTrue(merging.is_set())
+        self.assertEqual(self._search(self.store.snapshot, "assets"), ["Assets can be frozen."])
+
+    def test_background_merge(self):
+        """With auto_merge, merges run in a background thread after writes."""
+        store = SegmentedKnowledgeBase(CompactKnowledgeBase(BASE_LINES))
+        for i in range(20):
+            store.upsert({f"doc{i}": [f"Document {i}."]})
+        store.wait_for_merges(timeout=10)
+        self.assertLessEqual(len(store.snapshot.segments), 6)
+        self.assertEqual(len(store.snapshot.matching_lines("document")), 20)
+
+if __name__ == '__main__':
+    unittest.main()
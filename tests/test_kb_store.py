@@ -0,0 +1,148 @@
+import unittest
+import re
+from unittest.mock import patch, mock_open
+import sys
+import os
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.kb_store import CompactKnowledgeBase
+
+LINES = [
+    "Algorand Standard Assets (ASA) are tokens.",
+    "TEAL runs on the AVM. TEAL is stack based.",
+    "Straße und Größe: ünïcödé lines work too.",
+    "The AVM executes TEAL code.",
+]
+
+class TestCompactKnowledgeBase(unittest.TestCase):
+
+    def setUp(self):
+        self.kb = CompactKnowledgeBase(LINES)
+
+    def test_behaves_like_a_sequence(self):
+        """Length, indexing, slicing, iteration and list comparison match the original lines."""
+        self.assertEqual(len(self.kb), 4)
+        self.assertEqual(self.kb[0], LINES[0])
+        self.assertEqual(self.kb[-1], LINES[-1])
+        self.assertEqual(self.kb[1:3], LINES[1:3])
+        self.assertEqual(list(self.kb), LINES)
+        self.assertEqual(self.kb, LINES)
+        self.assertNotEqual(self.kb, LINES[:3])
+        with self.assertRaises(IndexError):
+            self.kb[4]
+
+    def test_non_ascii_lines_round_trip(self):
+        """Lines with non-ASCII characters are materialized unchanged."""
+        self.assertEqual(self.kb.line(2), LINES[2])
+        self.assertEqual(self.kb.lower_line(2), LINES[2].lower())
+
+    def test_matching_lines_reports_each_line_once(self):
+        """A keyword occurring several times in a line reports that line once, in order."""
+        self.assertEqual(self.kb.matching_lines("teal"), [1, 3])
+
+    def test_matching_lines_uses_whole_words_and_lowercase(self):
+        """Matching runs on the lowercase copy and respects word boundaries."""
+        self.assertEqual(self.kb.matching_lines("asa"), [0])
+        self.assertEqual(self.kb.matching_lines("größe"), [2])
+        self.assertEqual(self.kb.matching_lines("av"), [])
+        self.assertEqual(self.kb.matching_lines("ssets"), []) # Suffix of 'assets' only
+
+    def test_line_index_at(self):
+        """Positions in the lowercase buffer map back to their line."""
+        self.assertEqual(self.kb.line_index_at(0), 0)
+        self.assertEqual(self.kb.line_index_at(len(LINES[0].lower()) + 1), 1)
+
+    def test_empty_knowledge_base(self):
+        """An empty knowledge base is falsy, equal to [] and matches nothing."""
+        kb = CompactKnowledgeBase()
+        self.assertFalse(kb)
+        self.assertEqual(kb, [])
+        self.assertEqual(kb.matching_lines("teal"), [])
+
+    def test_word_index_matches_scanning(self):
+        """After build_word_index, matching_lines gives the same results from the index."""
+        indexed = CompactKnowledgeBase(LINES)
+        indexed.build_word_index()
+        self.assertTrue(indexed.has_word_index)
+        self.assertFalse(self.kb.has_word_index)
+        for term in ("teal", "asa", "größe", "av", "ssets", "the"):
+            self.assertEqual(indexed.matching_lines(term), self.kb.matching_lines(term))
+
+    def test_might_contain_knows_every_word(self):
+        """The vocabulary filter reports every word of the knowledge base, with or without a word index."""
+        indexed = CompactKnowledgeBase(LINES)
+        indexed.build_word_index()
+        for kb in (self.kb, indexed):
+            for line in LINES:
+                for word in re.findall(r'\w+', line.lower()):
+                    self.assertTrue(kb.might_contain(word), word)
+            self.assertFalse(kb.might_contain("solana"))
+
+    def test_concatenate_keeps_order_and_word_indexes(self):
+        """Concatenated parts behave like one knowledge base; word indexes are shifted per part."""
+        parts = [CompactKnowledgeBase(LINES[:1]), CompactKnowledgeBase(LINES[1:])]
+        for part in parts:
+            part.build_word_index()
+        joined = CompactKnowledgeBase.concatenate(parts)
+        self.assertEqual(joined, LINES)
+        self.assertEqual(joined.lower_line(3), LINES[3].lower())
+        self.assertTrue(joined.has_word_index)
+        self.assertEqual(joined.matching_lines("teal"), [1, 3])
+        # Without an index on every part, the result is searched by scanning
+        mixed = CompactKnowledgeBase.concatenate([parts[0], CompactKnowledgeBase(LINES[1:])])
+        self.assertFalse(mixed.has_word_index)
+        self.assertEqual(mixed.matching_lines("teal"), [1, 3])
+
+    def test_term_positions_with_and_without_index(self):
+        """term_positions finds whole-word starts in the lowercase line, from the index or by scanning."""
+        lines = ["Teal, TEAL and teal_v2 in TEAL.", "No match here.", "teal"]
+        indexed = CompactKnowledgeBase(lines)
+        indexed.build_word_index()
+        parts = [CompactKnowledgeBase(lines[:1]), CompactKnowledgeBase(lines[1:])]
+        for part in parts:
+            part.build_word_index()
+        joined = CompactKnowledgeBase.concatenate(parts)
+        for kb in (CompactKnowledgeBase(lines), indexed, joined):
+            self.assertEqual(list(kb.term_positions(0, "teal")), [0, 6, 26])
+            self.assertEqual(list(kb.term_positions(1, "teal")), [])
+            self.assertEqual(list(kb.term_positions(2, "teal")), [0])
+            self.assertEqual(list(kb.term_positions(0, "solana")), [])
+
+    def test_phrase_positions_require_adjacent_words(self):
+        """A phrase matches its words in order with only non-word characters between them."""
+        lines = ["Box storage, box-storage, box of storage, storage box, Box  Storage."]
+        indexed = CompactKnowledgeBase(lines)
+        indexed.build_word_index()
+        for kb in (CompactKnowledgeBase(lines), indexed):
+            self.assertEqual(kb.phrase_positions(0, ("box", "storage")), [0, 13, 55])
+            self.assertEqual(kb.phrase_positions(0, ("box", "of", "storage")), [26])
+            self.assertEqual(kb.phrase_positions(0, ("storage", "teal")), [])
+
+    def test_state_round_trip_keeps_the_word_index(self):
+        """from_state(to_state()) gives the same lines and searches, with or without a word index."""
+        indexed = CompactKnowledgeBase(LINES)
+        indexed.build_word_index()
+        for kb in (self.kb, indexed):
+            restored = CompactKnowledgeBase.from_state(kb.to_state())
+            self.assertEqual(restored, LINES)
+            self.assertEqual(restored.has_word_index, kb.has_word_index)
+            self.assertEqual(restored.matching_lines("teal"), [1, 3])
+            self.assertEqual(list(restored.term_positions(1, "teal")), [0, 22])
+            self.assertEqual(restored.phrase_positions(3, ("teal", "code")), [17])
+        state = self.kb.to_state()
+        state["byteorder"] = "big" if sys.byteorder == "little" else "little"
+        with self.assertRaises(ValueError):
+            CompactKnowledgeBase.from_state(state)
+
+    @patch("builtins.open", new_callable=mock_open, read_data="\n  first line  \n\n\tsecond line\n")
+    def test_from_file_strips_and_skips_blank_lines(self, mock_file_open):
+        """Loading from a file strips whitespace and skips empty lines."""
+        kb = CompactKnowledgeBase.from_file("dummy/path.txt")
+        mock_file_open.assert_called_once_with("dummy/path.txt", 'r', encoding='utf-8')
+        self.assertEqual(kb, ["first line", "second line"])
+
+
+if __name__ == '__main__':
+    unittest.main()
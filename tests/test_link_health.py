@@ -0,0 +1,162 @@
+import unittest
+import http.server
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import link_health
+from modules.link_health import LinkHealthChecker, LinkStatus
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    """Stub documentation site: /ok (ETag "v1"), /gone (404), /moved (-> /ok), /nohead (GET only), /down (500),
+    /forbidden (403 to the checker, like bot protection), /stale (304 to any request, like a misbehaving cache)."""
+    protocol_version = "HTTP/1.1" # Keep-alive, so the client's connection pool is exercised
+    requests = []
+
+    def _answer(self):
+        path = self.path.split("?")[0]
+        type(self).requests.append((self.command, path, self.headers.get("If-None-Match")))
+        if path == "/ok":
+            status = 304 if self.headers.get("If-None-Match") == '"v1"' else 200
+            headers = {"ETag": '"v1"'}
+        elif path == "/moved":
+            status, headers = 301, {"Location": "/ok"}
+        elif path == "/nohead":
+            status, headers = (405 if self.command == "HEAD" else 200), {}
+        elif path == "/down":
+            status, headers = 500, {}
+        elif path == "/forbidden":
+            status, headers = 403, {}
+        elif path == "/stale":
+            status, headers = 304, {}
+        else:
+            status, headers = 404, {}
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_HEAD = do_GET = _answer
+
+    def log_message(self, *args):
+        pass
+
+class TestLinkStatus(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self._original = (link_health._results, link_health._broken)
+
+    def tearDown(self):
+        link_health._publish(self._original[0])
+        shutil.rmtree(self.directory)
+
+    def test_broken_rules(self):
+        """404/410 flag a link at once; other errors only after several failed checks in a row."""
+        self.assertTrue(LinkStatus("u", 404).broken)
+        self.assertTrue(LinkStatus("u", 410).broken)
+        self.assertFalse(LinkStatus("u", 429, failures=1).broken)
+        self.assertFalse(LinkStatus("u", 403, failures=1).broken)
+        self.assertTrue(LinkStatus("u", 403, failures=link_health.BROKEN_AFTER_FAILURES).broken)
+        self.assertFalse(LinkStatus("u", 200).broken)
+        self.assertFalse(LinkStatus("u", 500, failures=1).broken)
+        self.assertTrue(LinkStatus("u", None, failures=link_health.BROKEN_AFTER_FAILURES).broken)
+
+    def test_results_round_trip_and_publish_broken_links(self):
+        """Saved results are loaded back; a change in the broken set changes the version."""
+        path = os.path.join(self.directory, "link_health.json")
+        link_health._publish({"https://a.example/ok": LinkStatus("https://a.example/ok", 200, '"e"', 1.0),
+                              "https://a.example/gone": LinkStatus("https://a.example/gone", 404, None, 1.0)})
+        version = link_health.broken_version()
+        link_health.save_results(path)
+        link_health._publish({})
+        self.assertFalse(link_health.is_broken("https://a.example/gone"))
+        results = link_health.load_results(path)
+        self.assertEqual(results["https://a.example/ok"].etag, '"e"')
+        self.assertTrue(link_health.is_broken("https://a.example/gone"))
+        self.assertFalse(link_health.is_broken("https://a.example/ok"))
+        self.assertGreater(link_health.broken_version(), version)
+        self.assertEqual(link_health.load_results(os.path.join(self.directory, "missing.json")), {})
+
+    def test_catalogue_urls(self):
+        """URLs are collected from every catalogue entry once, skipping entries without a web URL."""
+        doc_links = {"a": {"url": "https://x.example/a"}, "b": {"topic": "no url"}, "c": "not an entry"}
+        commands = {"init": {"url": "https://x.example/a"}, "deploy": {"url": "No documentation URL available."}}
+        self.assertEqual(link_health.catalogue_urls(doc_links, commands), ["https://x.example/a"])
+
+@unittest.skipUnless(link_health.AIOHTTP_AVAILABLE, "aiohttp is not installed")
+class TestLinkHealthChecker(unittest.IsolatedAsyncioTestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _StubHandler.requests = []
+
+    async def test_statuses(self):
+        """Redirects are followed, HEAD falls back to GET, and only a gone page is broken at once."""
+        checker = LinkHealthChecker()
+        paths = ("ok", "gone", "moved", "nohead", "down", "forbidden")
+        results = await checker.check(f"{self.base}/{path}" for path in paths)
+        self.assertEqual({url.rsplit("/", 1)[1]: (status.status, status.broken) for url, status in results.items()},
+                         {"ok": (200, False), "gone": (404, True), "moved": (200, False),
+                          "nohead": (200, False), "down": (500, False), "forbidden": (403, False)})
+        self.assertEqual(results[f"{self.base}/ok"].etag, '"v1"')
+        self.assertEqual(results[f"{self.base}/down"].failures, 1)
+        self.assertEqual(results[f"{self.base}/forbidden"].failures, 1) # Flagged only if it keeps refusing
+
+    async def test_results_are_cached_with_ttl_and_etag(self):
+        """Within the TTL nothing is requested; afterwards the ETag makes it a conditional request."""
+        checker = LinkHealthChecker(ttl=3600)
+        url = f"{self.base}/ok"
+        await checker.check([url])
+        await checker.check([url])
+        self.assertEqual(len(_StubHandler.requests), 1)
+        checker.ttl = 0
+        result = (await checker.check([url]))[url]
+        self.assertEqual(_StubHandler.requests[-1], ("HEAD", "/ok", '"v1"'))
+        self.assertEqual((result.status, result.etag, result.broken), (200, '"v1"', False))
+
+    async def test_unconditional_not_modified_is_a_failure(self):
+        """A 304 to a request without an ETag has no earlier result to keep; it counts as a failed check."""
+        checker = LinkHealthChecker(ttl=0)
+        url = f"{self.base}/stale"
+        result = (await checker.check([url]))[url]
+        self.assertEqual((result.status, result.etag, result.failures, result.broken), (304, None, 1, False))
+        self.assertIsNotNone(result.error)
+        self.assertEqual((await checker.check([url]))[url].failures, 2)
+
+    async def test_unreachable_host_is_broken_after_repeated_failures(self):
+        """Connection errors count as failures; the link is flagged once they repeat."""
+        checker = LinkHealthChecker(ttl=0, timeout=2)
+        url = "http://127.0.0.1:9/gone-host" # Discard port: connection refused
+        for _ in range(link_health.BROKEN_AFTER_FAILURES - 1):
+            self.assertFalse((await checker.check([url]))[url].broken)
+        self.assertTrue((await checker.check([url]))[url].broken)
+
+    async def test_thousands_of_urls_in_seconds(self):
+        """Thousands of URLs go through the bounded pool in a few seconds."""
+        urls = [f"{self.base}/ok?page={i}" for i in range(2000)] + [f"{self.base}/gone?page={i}" for i in range(500)]
+        started = time.perf_counter()
+        results = await LinkHealthChecker(concurrency=64, per_host=32).check(urls)
+        self.assertLess(time.perf_counter() - started, 20)
+        self.assertEqual(sum(status.broken for status in results.values()), 500)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import io
+import json
+import logging
+import sys
+import os
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import logging_setup
+
+class TestLoggingSetup(unittest.TestCase):
+
+    def setUp(self):
+        """Remember the root logger configuration so each test can restore it."""
+        root = logging.getLogger()
+        self._saved_handlers = list(root.handlers)
+        self._saved_level = root.level
+        self.stream = io.StringIO()
+
+    def tearDown(self):
+        """Stop the listener and restore the original root logger configuration."""
+        logging_setup.shutdown_logging()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in self._saved_handlers:
+            root.addHandler(handler)
+        root.setLevel(self._saved_level)
+
+    def _records(self):
+        """Flushes the queue and returns the JSON records written so far."""
+        logging_setup.shutdown_logging()
+        return [json.loads(line) for line in self.stream.getvalue().splitlines()]
+
+    def test_records_are_json_with_structured_fields(self):
+        """Each record is one JSON line with level, logger, message and extra fields."""
+        logging_setup.configure_logging('INFO', 1.0, stream=self.stream)
+        logging.getLogger('modules.qa_handler').info("Knowledge base loaded", extra={"lines": 42})
+        records = self._records()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["level"], "INFO")
+        self.assertEqual(records[0]["logger"], "modules.qa_handler")
+        self.assertEqual(records[0]["message"], "Knowledge base loaded")
+        self.assertEqual(records[0]["lines"], 42)
+        self.assertIn("ts", records[0])
+
+    def test_level_filtering(self):
+        """Records below the configured level are not written."""
+        logging_setup.configure_logging('WARNING', 1.0, stream=self.stream)
+        logger = logging.getLogger('test')
+        logger.info("hidden")
+        logger.warning("shown")
+        self.assertEqual([r["message"] for r in self._records()], ["shown"])
+
+    def test_debug_sampling(self):
+        """A sample rate of 0 drops every DEBUG record but keeps other levels."""
+        logging_setup.configure_logging('DEBUG', 0.0, stream=self.stream)
+        logger = logging.getLogger('test')
+        for _ in range(50):
+            logger.debug("noisy")
+        logger.info("important")
+        self.assertEqual([r["message"] for r in self._records()], ["important"])
+
+    def test_exceptions_are_included(self):
+        """logger.exception adds the formatted traceback to the record."""
+        logging_setup.configure_logging('INFO', 1.0, stream=self.stream)
+        try:
+            raise ValueError("bad value")
+        except ValueError:
+            logging.getLogger('test').exception("Failed")
+        record = self._records()[0]
+        self.assertEqual(record["level"], "ERROR")
+        self.assertIn("ValueError: bad value", record["exception"])
+
+    def test_message_arguments_are_formatted(self):
+        """%-style arguments are merged into the message by the listener."""
+        logging_setup.configure_logging('INFO', 1.0, stream=self.stream)
+        logging.getLogger('test').info("Loaded %d entries", 5)
+        self.assertEqual(self._records()[0]["message"], "Loaded 5 entries")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import urllib.request
+import urllib.error
+import sys
+import os
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import metrics
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        """Start every test with empty metric values."""
+        metrics.reset_all()
+
+    def test_counter_with_labels(self):
+        """Counters keep one value per label set and render them in Prometheus format."""
+        metrics.ROUTE_DECISIONS.inc("qa")
+        metrics.ROUTE_DECISIONS.inc("qa")
+        metrics.ROUTE_DECISIONS.inc("docs", amount=3)
+        self.assertEqual(metrics.ROUTE_DECISIONS.value("qa"), 2)
+        output = metrics.render_prometheus()
+        self.assertIn("# TYPE algohelp_route_decisions_total counter", output)
+        self.assertIn('algohelp_route_decisions_total{route="qa"} 2', output)
+        self.assertIn('algohelp_route_decisions_total{route="docs"} 3', output)
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Histogram buckets are rendered cumulatively with sum, count and +Inf."""
+        histogram = metrics.Histogram('test_histogram_seconds', 'Test histogram.', buckets=(0.1, 1.0))
+        histogram.observe(0.05)
+        histogram.observe(0.5)
+        histogram.observe(5.0)
+        lines = histogram.render()
+        self.assertIn('test_histogram_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('test_histogram_seconds_bucket{le="1.0"} 2', lines)
+        self.assertIn('test_histogram_seconds_bucket{le="+Inf"} 3', lines)
+        self.assertIn('test_histogram_seconds_sum 5.55', lines)
+        self.assertIn('test_histogram_seconds_count 3', lines)
+
+    def test_histogram_time_context_manager(self):
+        """The time() context manager records one observation per block, even on errors."""
+        with metrics.HANDLER_LATENCY.time("qa"):
+            pass
+        with self.assertRaises(RuntimeError):
+            with metrics.HANDLER_LATENCY.time("qa"):
+                raise RuntimeError("boom")
+        self.assertEqual(metrics.HANDLER_LATENCY.count("qa"), 2)
+
+    def test_gauge_callback(self):
+        """A gauge with a callback reports the callback's value at scrape time."""
+        gauge = metrics.Gauge('test_gauge', 'Test gauge.', callback=lambda: 7)
+        self.assertIn('test_gauge 7', gauge.render())
+
+    def test_label_values_are_escaped(self):
+        """Quotes in label values are escaped in the output."""
+        metrics.CACHE_LOOKUPS.inc('we"ird', "hit")
+        self.assertIn('cache="we\\"ird"', metrics.render_prometheus())
+
+    def test_metrics_server(self):
+        """The HTTP endpoint serves the rendered metrics on /metrics and 404s elsewhere."""
+        metrics.REQUESTS.inc()
+        server = metrics.start_metrics_server(0)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(base_url + "/metrics") as response:
+            body = response.read().decode('utf-8')
+            self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+        self.assertIn('algohelp_requests_total 1', body)
+        with self.assertRaises(urllib.error.HTTPError):
+            urllib.request.urlopen(base_url + "/other")
+
+
+if __name__ == '__main__':
+    unittest.main()
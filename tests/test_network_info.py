@@ -108,5 +108,67 @@ class TestNetworkInfo(unittest.IsolatedAsyncioTestCase):
     #     pass
 
 
+class TestSuggestedParamsCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Give each test fresh caches."""
+        patcher = patch.dict(network_info._params_caches,
+                             {name: network_info.SuggestedParamsCache(name, ttl=60) for name in ('mainnet', 'testnet')})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('modules.network_info.algod_mainnet_client')
+    async def test_params_are_served_from_memory(self, mock_mainnet_client):
+        """Repeated requests reuse the fetched params."""
+        mock_mainnet_client.suggested_params.return_value = MagicMock(first=100, last=1100, fee=0, min_fee=1000)
+        response = await network_info.get_suggested_params_message('mainnet')
+        self.assertEqual(response, "Algorand **MainNet** suggested transaction params (round **100**): "
+                                   "minimum fee **1000** microAlgos, fee per byte **0** microAlgos, "
+                                   "valid through round **1100**.")
+        await network_info.get_suggested_params('mainnet')
+        mock_mainnet_client.suggested_params.assert_called_once()
+
+    @patch('modules.network_info.algod_mainnet_client')
+    async def test_concurrent_requests_are_coalesced(self, mock_mainnet_client):
+        """Callers arriving during a refresh share its single algod call."""
+        mock_mainnet_client.suggested_params.return_value = MagicMock(first=100)
+        results = await asyncio.gather(*(network_info.get_suggested_params('mainnet') for _ in range(10)))
+        self.assertTrue(all(result is results[0] for result in results))
+        mock_mainnet_client.suggested_params.assert_called_once()
+
+    @patch('modules.network_info.algod_mainnet_client')
+    async def test_new_round_invalidates_params(self, mock_mainnet_client):
+        """A status call showing a newer round makes the next request refetch."""
+        mock_mainnet_client.suggested_params.return_value = MagicMock(first=100)
+        mock_mainnet_client.status.return_value = {'last-round': 100}
+        await network_info.get_suggested_params('mainnet')
+        await network_info.get_network_status_message('mainnet')
+        await network_info.get_suggested_params('mainnet')
+        self.assertEqual(mock_mainnet_client.suggested_params.call_count, 1)
+        mock_mainnet_client.status.return_value = {'last-round': 101}
+        await network_info.get_network_status_message('mainnet')
+        await network_info.get_suggested_params('mainnet')
+        self.assertEqual(mock_mainnet_client.suggested_params.call_count, 2)
+
+    @patch('modules.network_info.algod_testnet_client')
+    async def test_params_expire_without_round_information(self, mock_testnet_client):
+        """Without newer rounds, params are refetched once the TTL has passed."""
+        mock_testnet_client.suggested_params.return_value = object() # No round attribute
+        network_info._params_caches['testnet'].ttl = 0
+        await network_info.get_suggested_params('testnet')
+        await network_info.get_suggested_params('testnet')
+        self.assertEqual(mock_testnet_client.suggested_params.call_count, 2)
+
+    @patch('modules.network_info.algod_mainnet_client')
+    async def test_fetch_error_returns_message(self, mock_mainnet_client):
+        """A failed fetch is reported to the user and retried on the next request."""
+        mock_mainnet_client.suggested_params.side_effect = AlgodHTTPError("API Error")
+        response = await network_info.get_suggested_params_message('mainnet')
+        self.assertEqual(response, "An error occurred while trying to fetch the transaction fees for Algorand MainNet. "
+                                   "Please try again later.")
+        await network_info.get_suggested_params_message('mainnet')
+        self.assertEqual(mock_mainnet_client.suggested_params.call_count, 2)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import asyncio
+import os
+import pstats
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import profiler
+
+def busy_scoring_function(n):
+    """Stands in for a hot spot like keyword scoring."""
+    return [str(i) * 3 for i in range(n)]
+
+class TestProfiler(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Write profile dumps to a temporary directory."""
+        self.output_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.output_dir)
+
+    async def test_profile_call_returns_result_and_writes_dumps(self):
+        """The profiled call's result is returned and both dump files are written."""
+        async def call():
+            await asyncio.sleep(0)
+            return len(busy_scoring_function(20000))
+
+        report = await profiler.profile_call(call, "what is an ASA?", self.output_dir)
+
+        self.assertEqual(report.result, 20000)
+        self.assertTrue(os.path.exists(report.stats_path))
+        self.assertTrue(os.path.exists(report.report_path))
+        self.assertTrue(os.path.basename(report.report_path).endswith("-what-is-an-asa.txt"))
+        # The raw stats can be loaded with pstats and contain the hot function
+        stats = pstats.Stats(report.stats_path)
+        self.assertTrue(any(func[2] == "busy_scoring_function" for func in stats.stats))
+        with open(report.report_path, encoding='utf-8') as f:
+            self.assertIn("busy_scoring_function", f.read())
+
+    async def test_summary_fits_in_a_discord_message(self):
+        """The summary names the hot function and stays under Discord's length limit."""
+        async def call():
+            return busy_scoring_function(5000)
+
+        report = await profiler.profile_call(call, "query", self.output_dir)
+        self.assertIn("busy_scoring_function", report.summary)
+        self.assertIn("Top allocations", report.summary)
+        self.assertLessEqual(len(report.summary), 2000)
+        self.assertGreater(report.peak_memory_bytes, 0)
+
+    async def test_tracemalloc_is_stopped_after_profiling(self):
+        """Profiling leaves tracemalloc as it found it, even when the call raises."""
+        async def call():
+            raise ValueError("boom")
+
+        self.assertFalse(tracemalloc.is_tracing())
+        with self.assertRaises(ValueError):
+            await profiler.profile_call(call, "query", self.output_dir)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    async def test_concurrent_calls_take_turns(self):
+        """A second profiled call waits for the first instead of breaking its profiler or tracemalloc."""
+        release = asyncio.Event()
+        async def slow_call():
+            await release.wait()
+            return busy_scoring_function(1000)
+
+        first = asyncio.create_task(profiler.profile_call(slow_call, "first", self.output_dir))
+        await asyncio.sleep(0)
+        self.assertTrue(profiler.is_profiling())
+        second = asyncio.create_task(profiler.profile_call(slow_call, "second", self.output_dir))
+        await asyncio.sleep(0.01)
+        release.set()
+        reports = await asyncio.gather(first, second)
+        self.assertEqual([len(report.result) for report in reports], [1000, 1000])
+        self.assertFalse(profiler.is_profiling())
+        self.assertFalse(tracemalloc.is_tracing())
+
+if __name__ == '__main__':
+    unittest.main()
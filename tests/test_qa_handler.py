@@ -2,11 +2,14 @@ import unittest
 from unittest.mock import patch, mock_open
 import sys
 import os
+import re
+import shutil
+import tempfile
 
 # Add the modules directory to the Python path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from modules import qa_handler
+from modules import qa_handler, ann_index
 
 # Mock data representing the content of llms-small.txt
 MOCK_KB_CONTENT = """
@@ -114,6 +117,246 @@ class TestQaHandler(unittest.TestCase):
         response = qa_handler.get_answer_from_kb(query)
         self.assertIsNone(response)
 
+    def test_get_answers_batch_matches_single_queries(self):
+        """The batch API returns the same answers as get_answer_from_kb, in input order."""
+        qa_handler._knowledge_base_lines = MOCK_KB_PARAGRAPHS
+        queries = ["Tell me about AVM and TEAL concepts", "algorand standards", "",
+                   "what is pure proof-of-stake (ppos)?", "concepts TEAL avm!", "how do I"]
+        results = qa_handler.get_answers_batch(queries)
+        self.assertEqual(results, [qa_handler.get_answer_from_kb(query) for query in queries])
+        self.assertEqual(results[0], results[4]) # Same keywords in another order and case
+        self.assertIsNone(results[1])
+        # The pure-Python scoring used without NumPy gives the same answers
+        with patch.object(qa_handler, "np", None):
+            self.assertEqual(qa_handler.get_answers_batch(queries), results)
+        # Scored one query per block: same answers
+        with patch.object(qa_handler, "MAX_BATCH_SCORES", 1):
+            self.assertEqual(qa_handler.get_answers_batch(queries), results)
+
+    @patch("builtins.open", side_effect=FileNotFoundError)
+    def test_get_answers_batch_without_knowledge_base(self, mock_file_open):
+        """Every query gets None when the knowledge base cannot be loaded."""
+        self.assertEqual(qa_handler.get_answers_batch(["what is TEAL?", "avm"]), [None, None])
+
+    def test_rank_kb_orders_by_score_then_line(self):
+        """rank_kb ignores the threshold and orders lines by keyword score, earliest first on ties."""
+        qa_handler._knowledge_base_lines = MOCK_KB_PARAGRAPHS
+        # 'algorand' is in paragraphs 1 and 2, 'avm' and 'teal' only in paragraph 2
+        self.assertEqual(qa_handler.rank_kb("algorand avm teal"), [1, 0])
+        self.assertEqual(qa_handler.rank_kb("algorand avm teal", top_k=1), [1])
+        self.assertEqual(qa_handler.rank_kb("algorand standards"), [0, 1]) # Below the answer threshold
+        self.assertEqual(qa_handler.rank_kb("how do I"), [])
+
+    def test_get_answers_from_kb_returns_ranked_alternatives(self):
+        """Top-k answers all pass the threshold, best first, starting with get_answer_from_kb's answer."""
+        qa_handler._knowledge_base_lines = ["Boxes store application data.",
+                                            "Box storage costs a minimum balance; boxes store application data.",
+                                            "Application boxes store data for application calls.",
+                                            "Global state stores application data."]
+        answers = qa_handler.get_answers_from_kb("how do boxes store application data")
+        self.assertEqual(answers[0], qa_handler.get_answer_from_kb("how do boxes store application data"))
+        self.assertEqual([answer.split(">>> ")[1] for answer in answers],
+                         ["Boxes store application data.",
+                          "Box storage costs a minimum balance; boxes store application data.",
+                          "Application boxes store data for application calls."])
+        self.assertEqual(len(qa_handler.get_answers_from_kb("how do boxes store application data", top_k=1)), 1)
+        self.assertEqual(qa_handler.get_answers_from_kb("how do I"), [])
+
+    def test_long_lines_are_answered_with_their_best_snippet(self):
+        """A long line is cut to the window around its matched keywords, which are shown in bold."""
+        filler = " ".join(["consensus"] * 150)
+        long_line = f"{filler} Boxes store application data for smart contracts. {filler}"
+        qa_handler._knowledge_base_lines = [long_line, "Global state is small."]
+        answer = qa_handler.get_answer_from_kb("how do boxes store application data")
+        snippet = answer.split(">>> ")[1]
+        self.assertIn("**Boxes** **store** **application** **data**", snippet)
+        self.assertTrue(snippet.startswith("...") and snippet.endswith("..."))
+        self.assertLessEqual(len(snippet.replace("**", "")), qa_handler.ANSWER_SNIPPET_LENGTH + 6)
+        # Short lines are still shown whole, without highlighting
+        self.assertIn(">>> Global state is small.", qa_handler.get_answer_from_kb("global state small"))
+
+    def test_closer_keywords_win_ties(self):
+        """Among lines with the same keyword score, the one with the keywords together is the answer."""
+        qa_handler._knowledge_base_lines = ["Start the node first; algokit can then create a localnet later.",
+                                            "Run algokit localnet start to launch the local network."]
+        self.assertIn("Run algokit localnet start", qa_handler.get_answer_from_kb("algokit localnet start"))
+        self.assertEqual(qa_handler.rank_kb("algokit localnet start"), [1, 0])
+        self.assertEqual(qa_handler.get_answers_batch(["algokit localnet start"]),
+                         [qa_handler.get_answer_from_kb("algokit localnet start")])
+        with patch.object(qa_handler, "QA_PROXIMITY_SCORING", False):
+            self.assertEqual(qa_handler.rank_kb("algokit localnet start"), [0, 1]) # Earliest line on ties
+
+    def test_quoted_phrases_must_match(self):
+        """Lines without a quoted phrase are not answers; a matched phrase adds a point."""
+        qa_handler._knowledge_base_lines = ["Storage costs for every box are paid by the application.",
+                                            "Box storage costs a minimum balance."]
+        self.assertEqual(qa_handler.extract_phrases('what do \u201cbox storage\u201d "costs" cost'),
+                         [("box", "storage")])
+        self.assertIn("Box storage costs", qa_handler.get_answer_from_kb('"box storage" costs paid'))
+        self.assertIn("Box storage costs", qa_handler.get_answer_from_kb('"box storage"'))
+        self.assertIsNone(qa_handler.get_answer_from_kb('"storage box" costs'))
+        self.assertEqual(qa_handler.get_answers_batch(['"box storage" costs paid', "box storage costs paid"]),
+                         [qa_handler.get_answer_from_kb('"box storage" costs paid'),
+                          qa_handler.get_answer_from_kb("box storage costs paid")])
+
+    def test_unknown_vocabulary_is_rejected_without_search(self):
+        """Queries with too few known keywords return None before any line is searched."""
+        qa_handler._knowledge_base_lines = MOCK_KB_PARAGRAPHS
+        kb = qa_handler.load_knowledge_base()
+        # The filter's false positives (about 1%) depend on the per-process string hash,
+        # so the exact vocabulary stands in for it to keep the test deterministic
+        vocabulary = {word for index in range(len(kb)) for word in re.findall(r"\w+", kb.lower_line(index))}
+        with patch.object(type(kb), "might_contain", lambda _, term: term in vocabulary), \
+             patch.object(type(kb), "matching_lines", side_effect=AssertionError("searched")):
+            self.assertIsNone(qa_handler.get_answer_from_kb("hello everyone, good morning!"))
+            self.assertIsNone(qa_handler.get_answer_from_kb("solana ethereum validators and TEAL"))
+            self.assertEqual(qa_handler.get_answers_batch(["gm frens"]), [None])
+            self.assertEqual(qa_handler.rank_kb("bitcoin lightning"), [])
+        # Enough known keywords still reach the search
+        self.assertIsNotNone(qa_handler.get_answer_from_kb("TEAL AVM Algorand Virtual Machine"))
+
+
+@unittest.skipUnless(ann_index.NUMPY_AVAILABLE, "NumPy is not installed")
+class TestQaHandlerAnnMode(unittest.TestCase):
+
+    def setUp(self):
+        """Use the MOCK data and switch to the ANN retrieval mode."""
+        qa_handler._knowledge_base_lines = MOCK_KB_PARAGRAPHS
+        patcher = patch.object(qa_handler, "QA_RETRIEVAL_MODE", "ann")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_keyword_matches_are_still_found(self):
+        """Candidates with enough keyword matches are returned as in keyword mode."""
+        response = qa_handler.get_answer_from_kb("Tell me about AVM and TEAL concepts")
+        self.assertTrue(response.startswith("Based on the knowledge base:\n>>> This second paragraph"))
+
+    def test_similar_line_found_without_enough_keywords(self):
+        """A short query with fewer than 3 keywords is answered if it is similar enough."""
+        response = qa_handler.get_answer_from_kb("proof of stake")
+        self.assertEqual(response, "Based on the knowledge base:\n>>> Final paragraph about Pure Proof-of-Stake (PPoS).")
+
+    def test_weak_matches_are_rejected(self):
+        """Candidates that are neither keyword matches nor similar enough give no answer."""
+        self.assertIsNone(qa_handler.get_answer_from_kb("algorand standards"))
+        self.assertIsNone(qa_handler.get_answer_from_kb("information about blockchain explorers"))
+
+    def test_falls_back_to_keywords_without_numpy(self):
+        """Without NumPy the ANN mode uses keyword retrieval."""
+        with patch.object(ann_index, "NUMPY_AVAILABLE", False):
+            self.assertIsNone(qa_handler.get_answer_from_kb("proof of stake"))
+
+
+class TestQaHandlerIncrementalUpdates(unittest.TestCase):
+
+    def setUp(self):
+        qa_handler._knowledge_base_lines = list(MOCK_KB_PARAGRAPHS)
+        qa_handler._kb_segments = None
+        self.addCleanup(setattr, qa_handler, "_knowledge_base_lines", None)
+        self.addCleanup(setattr, qa_handler, "_kb_segments", None)
+
+    def test_update_and_delete_documents(self):
+        """Updates are answered without reloading; deletions stop being answered."""
+        qa_handler.update_documents({"fees": ["Minimum transaction fee is 0.001 Algo per transaction."]})
+        answer = qa_handler.get_answer_from_kb("minimum transaction fee algo")
+        self.assertIn("0.001 Algo", answer)
+        self.assertIn("TEAL", qa_handler.get_answer_from_kb("TEAL AVM Algorand Virtual Machine"))
+        qa_handler.delete_documents(["fees"])
+        self.assertIsNone(qa_handler.get_answer_from_kb("minimum transaction fee algo"))
+
+    def test_base_document_can_be_replaced(self):
+        """The knowledge base loaded from file is the document BASE_DOCUMENT_ID."""
+        qa_handler.update_documents({qa_handler.BASE_DOCUMENT_ID: ["Boxes hold key value application data."]})
+        self.assertIsNone(qa_handler.get_answer_from_kb("TEAL AVM Algorand Virtual Machine"))
+        self.assertEqual(qa_handler.rank_kb("boxes application data"), [len(MOCK_KB_PARAGRAPHS)])
+
+    @unittest.skipUnless(ann_index.NUMPY_AVAILABLE, "NumPy is not installed")
+    def test_ann_mode_indexes_only_new_segments(self):
+        """In 'ann' mode an update indexes its own segment; the base index is reused and deletions are left out."""
+        built = [] # Lines of every index built
+        original = ann_index.AnnIndex
+
+        def build(texts):
+            index = original(texts)
+            built.append(index.size)
+            return index
+
+        # No background merges here: a merged segment is (rightly) indexed again, at a time that depends on the thread
+        with patch.object(qa_handler, "QA_RETRIEVAL_MODE", "ann"), \
+                patch.object(qa_handler.ann_index, "AnnIndex", side_effect=build), \
+                patch("modules.kb_segments.MERGE_FACTOR", 0), patch("modules.kb_segments.MAX_DEAD_RATIO", 1.0):
+            self.assertIn("TEAL", qa_handler.get_answer_from_kb("TEAL AVM Algorand Virtual Machine"))
+            qa_handler.update_documents({"fees": ["Minimum transaction fee is 0.001 Algo per transaction."]})
+            self.assertIn("0.001 Algo", qa_handler.get_answer_from_kb("minimum transaction fee algo"))
+            qa_handler.update_documents({"boxes": ["Boxes hold key value application data."]})
+            self.assertIn("Boxes", qa_handler.get_answer_from_kb("boxes application data"))
+            # The base, then each update's own segment: never the whole knowledge base again
+            self.assertEqual(built, [len(MOCK_KB_PARAGRAPHS), 1, 1])
+            qa_handler.delete_documents(["fees"])
+            self.assertIsNone(qa_handler.get_answer_from_kb("minimum transaction fee algo"))
+            self.assertEqual(len(built), 3)
+
+    def test_ann_mode_leaves_out_deleted_lines_before_the_top_k(self):
+        """A segment whose best ANN matches were deleted still returns its live lines."""
+        documents = {f"copy-{n}": [f"Box storage costs a minimum balance, copy {n}."] for n in range(40)}
+        documents["live"] = ["Box storage raises the minimum balance of the application account."]
+        with patch.object(qa_handler, "QA_RETRIEVAL_MODE", "ann"), \
+                patch("modules.kb_segments.MERGE_FACTOR", 0), patch("modules.kb_segments.MAX_DEAD_RATIO", 1.0):
+            qa_handler.update_documents(documents)
+            qa_handler.delete_documents([f"copy-{n}" for n in range(40)])
+            self.assertIn("application account", qa_handler.get_answer_from_kb("box storage costs minimum balance"))
+
+class TestQaHandlerSourceRefresh(unittest.TestCase):
+
+    def setUp(self):
+        """Two knowledge base source files in a temporary directory, nothing loaded yet."""
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.fees = self._write("fees.txt", "Minimum transaction fee is 0.001 Algo per transaction.\n")
+        self.teal = self._write("teal.txt", "TEAL programs run on the AVM.\nThe AVM limits TEAL program size.\n")
+        for name in ("_knowledge_base_lines", "_kb_segments", "_kb_sources"):
+            setattr(qa_handler, name, None)
+            self.addCleanup(setattr, qa_handler, name, None)
+
+    def _write(self, name, content):
+        path = os.path.join(self.root, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9)) # A new mtime even within the clock's resolution
+        return path
+
+    def test_changed_files_are_applied_one_document_each(self):
+        """Only the changed, added or removed source files are re-read; the other files stay as loaded."""
+        with patch.object(qa_handler, "KB_SOURCES", [self.root]), patch.object(qa_handler, "KB_INGEST_WORKERS", 1):
+            qa_handler.load_knowledge_base()
+            self.assertEqual(qa_handler.refresh_sources(), 0)
+            self._write("teal.txt", "TEAL programs are compiled to AVM bytecode with algokit compile.\n")
+            self.assertEqual(qa_handler.refresh_sources(), 1)
+            snapshot = qa_handler.load_knowledge_base()
+            self.assertEqual(len(snapshot.segments[-1]), 1) # Just the changed file
+            self.assertIn("bytecode", qa_handler.get_answer_from_kb("TEAL AVM bytecode compiled"))
+            self.assertIsNone(qa_handler.get_answer_from_kb("AVM limits TEAL program size"))
+            self.assertIn("0.001 Algo", qa_handler.get_answer_from_kb("minimum transaction fee algo"))
+            self._write("boxes.txt", "Boxes hold key value application data.\n")
+            os.remove(self.fees)
+            self.assertEqual(qa_handler.refresh_sources(), 2)
+            self.assertIn("Boxes", qa_handler.get_answer_from_kb("boxes application data"))
+            self.assertIsNone(qa_handler.get_answer_from_kb("minimum transaction fee algo"))
+            self.assertEqual(qa_handler.refresh_sources(), 0)
+
+    def test_single_file_knowledge_base_is_refreshed(self):
+        """A knowledge base read from one file is that file's document."""
+        qa_handler.load_knowledge_base(self.fees)
+        self._write("fees.txt", "Minimum transaction fee is 0.002 Algo per transaction.\n")
+        self.assertEqual(qa_handler.refresh_sources(), 1)
+        self.assertIn("0.002 Algo", qa_handler.get_answer_from_kb("minimum transaction fee algo"))
+
+    def test_knowledge_base_without_source_files_is_not_refreshed(self):
+        """Lines assigned directly (no source files) are left alone."""
+        qa_handler._knowledge_base_lines = list(MOCK_KB_PARAGRAPHS)
+        qa_handler.load_knowledge_base()
+        self.assertEqual(qa_handler.refresh_sources(), 0)
 
 if __name__ == '__main__':
     unittest.main()
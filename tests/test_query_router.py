@@ -0,0 +1,217 @@
+import unittest
+from unittest.mock import patch, MagicMock, AsyncMock
+import json
+import shutil
+import sys
+import os
+import tempfile
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# Mock algosdk before importing the router (it imports network_info, which
+# initializes Algod clients at import time)
+sys.modules.setdefault('algosdk', MagicMock())
+sys.modules.setdefault('algosdk.v2client', MagicMock())
+sys.modules.setdefault('algosdk.v2client.algod', MagicMock())
+
+from modules import query_router
+
+COMMANDS = {"deploy": {"summary": "Deploy contracts.", "url": "https://example.com/deploy"}}
+
+class TestQueryRouter(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Serve a small, fixed command catalogue to the router."""
+        patcher = patch('modules.query_router.algokit_handler.load_algokit_commands', return_value=COMMANDS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb')
+    @patch('modules.query_router.algokit_handler.get_algokit_help', return_value="algokit help")
+    async def test_algokit_has_priority(self, mock_algokit, mock_qa):
+        """AlgoKit queries are answered by the AlgoKit handler before anything else."""
+        response = await query_router.route_query("tell me about algokit deploy")
+        self.assertEqual(response, "algokit help")
+        mock_algokit.assert_called_once_with("tell me about algokit deploy")
+        mock_qa.assert_not_called()
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb')
+    @patch('modules.query_router.doc_linker.get_doc_link', return_value="doc link")
+    @patch('modules.query_router.algokit_handler.get_algokit_help', return_value=None)
+    async def test_algokit_miss_falls_through_to_docs(self, mock_algokit, mock_docs, mock_qa):
+        """An AlgoKit keyword without a known command falls through to the doc linker."""
+        response = await query_router.route_query("algokit docs for teal")
+        self.assertEqual(response, "doc link")
+        mock_algokit.assert_called_once()
+        mock_docs.assert_called_once_with("algokit docs for teal")
+        mock_qa.assert_not_called()
+
+    @patch('modules.query_router.network_info.get_network_status_message', new_callable=AsyncMock,
+           return_value="round 1")
+    async def test_network_status_prefers_requested_network(self, mock_status):
+        """Network queries are answered by network_info for the requested network."""
+        response = await query_router.route_query("testnet round")
+        self.assertEqual(response, "round 1")
+        mock_status.assert_awaited_once_with("testnet")
+
+    @patch('modules.query_router.network_info.get_suggested_params_message', new_callable=AsyncMock,
+           return_value="min fee 1000")
+    async def test_fee_queries_use_suggested_params(self, mock_params):
+        """Fee questions are answered from network_info's suggested params cache."""
+        response = await query_router.route_query("what is the min fee on testnet")
+        self.assertEqual(response, "min fee 1000")
+        mock_params.assert_awaited_once_with("testnet")
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb')
+    @patch('modules.query_router.doc_linker.get_doc_link', return_value=None)
+    @patch('modules.query_router.algokit_handler.get_algokit_help')
+    async def test_direct_handler_skips_keyword_routing(self, mock_algokit, mock_docs, mock_qa):
+        """With a handler, only that handler runs, even when other keywords match."""
+        self.assertIsNone(await query_router.route_query("deploy boxes", handler="docs"))
+        mock_docs.assert_called_once_with("deploy boxes")
+        mock_algokit.assert_not_called()
+        mock_qa.assert_not_called()
+        with self.assertRaises(ValueError):
+            await query_router.route_query("deploy", handler="qa")
+
+    @patch('modules.query_router.network_info.get_network_status_message', new_callable=AsyncMock,
+           return_value="round 1")
+    async def test_direct_network_handler_takes_network_name(self, mock_status):
+        """The network handler can be called with just the network name."""
+        self.assertEqual(await query_router.route_query("testnet", handler="network"), "round 1")
+        mock_status.assert_awaited_once_with("testnet")
+
+    @patch('modules.query_router.qa_handler.get_answers_from_kb', return_value=["a", "b"])
+    @patch('modules.query_router.qa_handler.get_answer_from_kb', return_value="a")
+    async def test_ranked_results_for_paged_routes(self, mock_qa, mock_answers):
+        """The route is reported with the response, and paged routes give ranked alternatives."""
+        self.assertEqual(await query_router.route_query_with_route("what is an asa"), ("a", "qa"))
+        self.assertEqual(query_router.ranked_results("what is an asa", "qa"), ["a", "b"])
+        mock_answers.assert_called_once_with("what is an asa", query_router.MAX_RESULT_PAGES)
+        self.assertEqual(query_router.ranked_results("mainnet round", "network"), [])
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb', return_value=None)
+    async def test_unmatched_query_returns_none(self, mock_qa):
+        """Queries no handler can answer return None so the caller can send the fallback."""
+        response = await query_router.route_query("what is an asa")
+        self.assertIsNone(response)
+        mock_qa.assert_called_once_with("what is an asa")
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb')
+    async def test_empty_query_skips_qa(self, mock_qa):
+        """An empty query never reaches the Q&A handler."""
+        response = await query_router.route_query("")
+        self.assertIsNone(response)
+        mock_qa.assert_not_called()
+
+
+class TestQueryRouterAnswerCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        """Route through a memory-only answer cache with a controllable data generation."""
+        patcher = patch('modules.query_router.algokit_handler.load_algokit_commands', return_value=COMMANDS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.generation = "g1"
+        self.cache = query_router.answer_cache.AnswerCache(lambda: self.generation, None)
+        query_router.enable_answer_cache(self.cache)
+        self.addCleanup(query_router.enable_answer_cache, None)
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb', return_value="kb answer")
+    async def test_repeated_query_is_served_from_cache(self, mock_qa):
+        """A repeated question (in any case) skips the handlers until the data changes."""
+        self.assertEqual(await query_router.route_query("What is an ASA"), "kb answer")
+        self.assertEqual(await query_router.route_query("what is an asa"), "kb answer")
+        mock_qa.assert_called_once()
+        self.generation = "g2"
+        await query_router.route_query("what is an asa")
+        self.assertEqual(mock_qa.call_count, 2)
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb', return_value="kb answer")
+    async def test_use_cache_false_runs_the_handlers(self, mock_qa):
+        """Bypassing the cache (as the profile command does) runs the handlers for a cached query."""
+        await query_router.route_query("what is an asa")
+        self.assertEqual(await query_router.route_query("what is an asa", use_cache=False), "kb answer")
+        self.assertEqual(mock_qa.call_count, 2)
+        self.assertEqual(self.cache._frequencies["what is an asa"], 1) # The bypass is not counted
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb', return_value="kb answer")
+    @patch('modules.query_router.algokit_handler.get_algokit_help', return_value=None)
+    async def test_traced_queries_get_a_span_per_stage(self, mock_algokit, mock_qa):
+        """Under a trace, the cache lookup, each handler attempt and the route decision are spans."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.addCleanup(query_router.tracing.shutdown_tracing)
+        path = os.path.join(directory, "traces.jsonl")
+        query_router.tracing.configure_tracing(1.0, path)
+        with query_router.tracing.start_trace("on_message"):
+            await query_router.route_query("algokit asa question")
+        query_router.tracing.shutdown_tracing()
+        with open(path, 'r', encoding='utf-8') as f:
+            spans = json.loads(f.read())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        self.assertEqual([span["name"] for span in spans], ["on_message", "route_query", "answer_cache.lookup",
+                                                            "guild_data", "handler.algokit", "handler.qa"])
+        attributes = {span["name"]: {item["key"]: item["value"] for item in span["attributes"]} for span in spans}
+        self.assertEqual(attributes["answer_cache.lookup"]["hit"], {"boolValue": False})
+        self.assertEqual(attributes["handler.algokit"]["answered"], {"boolValue": False})
+        self.assertEqual(attributes["route_query"]["route"], {"stringValue": "qa"})
+
+    @patch('modules.query_router.network_info.get_network_status_message', new_callable=AsyncMock,
+           return_value="round 1")
+    async def test_network_status_is_not_cached(self, mock_status):
+        """Live network status is fetched every time."""
+        await query_router.route_query("mainnet round")
+        await query_router.route_query("mainnet round")
+        self.assertEqual(mock_status.await_count, 2)
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb', return_value="kb answer")
+    async def test_warm_answer_cache_recomputes_stale_entries(self, mock_qa):
+        """Stale warm cache entries are answered again on startup and cached."""
+        with patch.object(self.cache, "load", return_value=["what is an asa"]):
+            self.assertEqual(await query_router.warm_answer_cache(), 1)
+        mock_qa.assert_called_once_with("what is an asa")
+        self.assertEqual(self.cache.get("what is an asa"), ("kb answer", "qa"))
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb', return_value="kb answer")
+    @patch('modules.query_router.doc_linker.get_doc_link', return_value="docs answer")
+    async def test_direct_handler_answers_are_cached_apart(self, mock_docs, mock_qa):
+        """A direct handler's response is not served for the same routed query, and vice versa."""
+        self.assertEqual(await query_router.route_query("boxes", handler="docs"), "docs answer")
+        self.assertEqual(await query_router.route_query("boxes"), "kb answer")
+        self.assertEqual(await query_router.route_query("Boxes", handler="docs"), "docs answer")
+        mock_docs.assert_called_once()
+        with patch.object(self.cache, "load", return_value=["handler:docs|boxes"]):
+            await query_router.warm_answer_cache()
+        mock_docs.assert_called_with("boxes")
+
+    def test_data_generation_tracks_files_and_updates(self):
+        """The generation changes with the data files and with incremental KB updates."""
+        before = query_router.data_generation()
+        self.assertEqual(query_router.data_generation(), before)
+        with patch.object(query_router.qa_handler, "_kb_update_count", 1):
+            self.assertNotEqual(query_router.data_generation(), before)
+        with patch.object(query_router, "_fingerprint_paths", return_value=["missing-file"]), \
+                patch.object(query_router, "_file_generation", (float('-inf'), "")):
+            self.assertNotEqual(query_router.data_generation(), before)
+
+    @patch('modules.query_router.qa_handler.get_answer_from_kb', return_value="guild answer")
+    async def test_guild_queries_use_guild_data_and_cache_apart(self, mock_qa):
+        """A guild with its own data is answered from its layered KB and cached under its own key."""
+        dataset = MagicMock()
+        registry = MagicMock()
+        registry.version_async = AsyncMock(side_effect=lambda guild_id: "v1" if guild_id == 7 else None)
+        with patch.object(query_router.guild_data, "get_registry", return_value=registry), \
+                patch.object(query_router.guild_data, "get_dataset_async", new_callable=AsyncMock,
+                             return_value=dataset), \
+                patch.object(query_router.qa_handler, "load_knowledge_base", return_value=["base"]):
+            self.assertEqual(await query_router.route_query("What is an ASA", 7), "guild answer")
+            mock_qa.assert_called_once_with("What is an ASA", kb_lines=dataset.knowledge_base.return_value)
+            dataset.knowledge_base.assert_called_once_with(["base"])
+            await query_router.route_query("what is an asa", 8) # No guild data: not the guild's entry
+            self.assertEqual(mock_qa.call_count, 2)
+            mock_qa.assert_called_with("what is an asa")
+
+
+if __name__ == '__main__':
+    unittest.main()
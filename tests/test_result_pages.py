@@ -0,0 +1,39 @@
+import unittest
+import os
+import sys
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.result_pages import ResultPages
+
+class TestResultPages(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.searches = 0
+
+    def _fetch(self):
+        self.searches += 1
+        return ["second", "first", "third"]
+
+    async def test_pages_are_served_from_one_search(self):
+        """The search runs on the first page turn only; the shown answer stays page 1."""
+        pages = ResultPages("first", self._fetch)
+        self.assertEqual(pages.render(), "first")
+        self.assertTrue(pages.has_next())
+        self.assertEqual(await pages.turn(1), "second\n\n*Result 2 of 3*")
+        self.assertEqual(await pages.turn(1), "third\n\n*Result 3 of 3*")
+        self.assertFalse(pages.has_next())
+        self.assertEqual(await pages.turn(1), "third\n\n*Result 3 of 3*") # Stays on the last page
+        self.assertEqual(await pages.turn(-5), "first\n\n*Result 1 of 3*")
+        self.assertFalse(pages.has_previous())
+        self.assertEqual(self.searches, 1)
+
+    async def test_no_alternatives(self):
+        """With nothing else found, the only page is the shown answer."""
+        pages = ResultPages("only", lambda: [])
+        self.assertEqual(await pages.turn(1), "only\n\n*Result 1 of 1*")
+        self.assertFalse(pages.has_next())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import asyncio
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# Add the modules directory to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import tracing
+
+def read_traces(path: str):
+    """The spans of every trace in a trace file, as {span name: span} per trace."""
+    with open(path, 'r', encoding='utf-8') as f:
+        traces = [json.loads(line) for line in f]
+    return [{span["name"]: span for span in trace["resourceSpans"][0]["scopeSpans"][0]["spans"]} for trace in traces]
+
+class TestTracing(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "traces.jsonl")
+
+    def tearDown(self):
+        tracing.shutdown_tracing()
+        shutil.rmtree(self.directory)
+
+    async def test_spans_nest_across_awaits_and_threads(self):
+        """Child spans get the root's trace ID and their parent's span ID, in tasks and worker threads too."""
+        tracing.configure_tracing(1.0, self.path)
+
+        def blocking_stage():
+            with tracing.span("worker", step=2):
+                time.sleep(0.01)
+
+        with tracing.start_trace("on_message", query_length=12) as root:
+            with tracing.span("route_query") as span:
+                await asyncio.to_thread(blocking_stage)
+                await asyncio.create_task(asyncio.sleep(0))
+                span.set_attribute("route", "qa")
+            with tracing.span("algod.status", tracing.KIND_CLIENT):
+                pass
+        tracing.shutdown_tracing()
+
+        [spans] = read_traces(self.path)
+        self.assertEqual(set(spans), {"on_message", "route_query", "worker", "algod.status"})
+        self.assertEqual({span["traceId"] for span in spans.values()}, {root.trace_id})
+        self.assertNotIn("parentSpanId", spans["on_message"])
+        self.assertEqual(spans["route_query"]["parentSpanId"], spans["on_message"]["spanId"])
+        self.assertEqual(spans["worker"]["parentSpanId"], spans["route_query"]["spanId"])
+        self.assertEqual(spans["algod.status"]["kind"], "SPAN_KIND_CLIENT")
+        self.assertIn({"key": "route", "value": {"stringValue": "qa"}}, spans["route_query"]["attributes"])
+        self.assertIn({"key": "step", "value": {"intValue": "2"}}, spans["worker"]["attributes"])
+        worker = spans["worker"]
+        self.assertGreaterEqual(int(worker["endTimeUnixNano"]) - int(worker["startTimeUnixNano"]), 10**7)
+
+    async def test_errors_are_recorded_and_reraised(self):
+        """An exception leaving a span marks it (and the root it passes through) as failed."""
+        tracing.configure_tracing(1.0, self.path)
+        with self.assertRaises(ValueError):
+            with tracing.start_trace("on_message"):
+                with tracing.span("handler.qa"):
+                    raise ValueError("boom")
+        tracing.shutdown_tracing()
+        [spans] = read_traces(self.path)
+        self.assertEqual(spans["handler.qa"]["status"], {"code": "STATUS_CODE_ERROR", "message": "boom"})
+        self.assertEqual(spans["on_message"]["status"]["code"], "STATUS_CODE_ERROR")
+
+    async def test_sampling_and_slow_threshold(self):
+        """Unsampled requests record nothing, unless they are slower than the slow threshold."""
+        self.assertFalse(tracing.configure_tracing(0.0, self.path))
+        with tracing.start_trace("on_message") as root:
+            with tracing.span("route_query") as span:
+                span.set_attribute("route", "qa") # No-op, never fails
+        self.assertIsNone(root.trace_id)
+        self.assertIsNone(tracing.current_trace_id())
+
+        tracing.configure_tracing(0.0, self.path, slow_threshold=0.05)
+        with tracing.start_trace("fast"):
+            pass
+        with tracing.start_trace("slow"):
+            self.assertIsNotNone(tracing.current_trace_id())
+            await asyncio.sleep(0.06)
+        tracing.shutdown_tracing()
+        self.assertEqual([list(spans) for spans in read_traces(self.path)], [["slow"]])
+
+    def test_trace_file_is_rotated(self):
+        """The trace file is rotated at its size limit, keeping the configured number of backups."""
+        tracing.configure_tracing(1.0, self.path, max_bytes=2000, backup_count=2)
+        for _ in range(50):
+            with tracing.start_trace("on_message", query="x" * 100):
+                pass
+        tracing.shutdown_tracing()
+        self.assertEqual(sorted(os.listdir(self.directory)), ["traces.jsonl", "traces.jsonl.1", "traces.jsonl.2"])
+        self.assertLessEqual(os.path.getsize(self.path), 2000)
+
+if __name__ == '__main__':
+    unittest.main()